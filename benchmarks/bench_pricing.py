@@ -0,0 +1,45 @@
+"""
+Benchmark del motor de precios.
+
+Calcula una cotización de 100.000 filas (en capítulos de 50 actividades)
+para clientes natural y jurídico y reporta el mejor tiempo de varias
+repeticiones.
+
+Uso:
+    python -m benchmarks.bench_pricing [--filas N] [--repeticiones N]
+"""
+import argparse
+import time
+
+from benchmarks.sinteticos import generar_filas
+from utils.pricing_engine import PricingEngine
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motor de precios")
+    parser.add_argument('--filas', type=int, default=100000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = PricingEngine()
+    filas = generar_filas(args.filas)
+    aiu = {'administracion': 10.0, 'imprevistos': 5.0, 'utilidad': 5.0, 'iva_sobre_utilidad': 19.0}
+
+    print(f"Filas de actividad: {args.filas:,} | Repeticiones: {args.repeticiones}")
+    for tipo in ('natural', 'juridica'):
+        mejor, resultado = medir(lambda: engine.price(filas, tipo, aiu), args.repeticiones)
+        print(f"  {tipo:<9} {mejor * 1000:8.1f} ms  ({args.filas / mejor:,.0f} filas/s)  "
+              f"total = ${resultado['total']:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
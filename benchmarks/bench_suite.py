@@ -0,0 +1,388 @@
+"""
+Suite de benchmarks de los caminos críticos de la aplicación.
+
+Genera datos sintéticos reproducibles (clientes, catálogo, cotizaciones en
+BD y archivos de cotización) en un directorio temporal, mide cada caso
+varias veces y compara el mejor tiempo con una línea base guardada.
+
+Casos:
+    filtros.actividades / filtros.productos      FilterManager
+    bd.cotizaciones_filtradas                    get_all_quotations con filtros
+    bd.guardar_snapshot / bd.ultimo_snapshot     save_snapshot / get_latest_snapshot
+    excel.generar                                ExcelController.generate_excel
+    word.renderizar                              WordController.generate_word_document
+    pdf.unir                                     PDFMerger.merge_pdfs
+    archivos.listar                              CotizacionFileManager.listar_cotizaciones
+
+Los casos cuyas dependencias no están instaladas (openpyxl, python-docx,
+PyPDF2, pywin32) se omiten.
+
+Uso:
+    python -m benchmarks.bench_suite [--tamano pequeno|mediano|grande] [--casos a,b]
+                                     [--repeticiones N] [--semilla N]
+                                     [--baseline RUTA] [--guardar-baseline] [--tolerancia 0.25]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks import sinteticos
+
+BASELINE_POR_DEFECTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+class CasoOmitido(Exception):
+    """El caso no se puede ejecutar en este entorno (falta una dependencia o un recurso)."""
+
+
+class Contexto:
+    """Datos sintéticos compartidos por los casos de una corrida."""
+
+    def __init__(self, directorio, tamano, semilla):
+        self.directorio = directorio
+        self.tamano = tamano
+        self.semilla = semilla
+        self.clientes = sinteticos.generar_clientes(tamano['clientes'], semilla)
+        self.catalogo = sinteticos.generar_catalogo(tamano['actividades'], tamano['capitulos'], semilla)
+        self.filas = sinteticos.generar_cotizacion(self.catalogo, tamano['filas'], semilla)
+        self._db = None
+
+    @property
+    def db(self):
+        """Base de datos poblada (se crea la primera vez que un caso la pide)."""
+        if self._db is None:
+            from utils.database_manager import DatabaseManager
+            self._db = DatabaseManager(os.path.join(self.directorio, 'bench.db'))
+            sinteticos.poblar_base_datos(self._db, self.clientes, self.catalogo,
+                                         self.tamano['cotizaciones'], self.semilla)
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+
+
+def _requiere(*modulos):
+    for modulo in modulos:
+        try:
+            __import__(modulo)
+        except ImportError as e:
+            raise CasoOmitido(f"falta {modulo} ({e})")
+
+
+# ===== CASOS =====
+# Cada caso recibe el contexto y devuelve la función a medir (la preparación no se mide)
+
+def caso_filtros_actividades(ctx):
+    from utils.filter_manager import FilterManager
+    filtros = FilterManager(ctx.db)
+    terminos = ['muro', 'concreto', 'pintura de', 'tipo 1', 'zzz']
+
+    def ejecutar():
+        for termino in terminos:
+            filtros.search_activities(termino)
+            filtros.search_activities(termino, category_id=1)
+    return ejecutar
+
+
+def caso_filtros_productos(ctx):
+    from utils.filter_manager import FilterManager
+    filtros = FilterManager(ctx.db)
+    terminos = ['cemento', 'referencia 1', 'acero', 'zzz']
+
+    def ejecutar():
+        for termino in terminos:
+            filtros.search_products(termino)
+            filtros.search_products(termino, category_id=1)
+    return ejecutar
+
+
+def caso_cotizaciones_filtradas(ctx):
+    db = ctx.db
+    consultas = [
+        {},
+        {'estado': 'pendiente'},
+        {'fecha_inicio': '2024-06-01', 'fecha_fin': '2024-12-31'},
+        {'estado': 'ganada', 'monto_min': 1e7, 'monto_max': 2e8},
+        {'cliente_id': 1},
+    ]
+
+    def ejecutar():
+        for filtros in consultas:
+            db.get_all_quotations(include_test=False, filters=filtros)
+    return ejecutar
+
+
+def caso_guardar_snapshot(ctx):
+    db = ctx.db
+    cotizacion_id = db.save_quotation(nombre_proyecto='Benchmark', monto_total=0)
+    datos = {'cliente': ctx.clientes[0], 'aiu': {'administracion': 10, 'imprevistos': 5, 'utilidad': 5,
+                                                 'iva_sobre_utilidad': 19}, 'tipo_cliente': 'Juridica'}
+
+    def ejecutar():
+        db.save_snapshot(cotizacion_id, datos, ctx.filas, {'formato': 'largo'})
+    return ejecutar
+
+
+def caso_ultimo_snapshot(ctx):
+    db = ctx.db
+    cotizacion_id = db.save_quotation(nombre_proyecto='Benchmark', monto_total=0)
+    for _ in range(5):
+        db.save_snapshot(cotizacion_id, {'cliente': ctx.clientes[0]}, ctx.filas)
+
+    def ejecutar():
+        db.get_latest_snapshot(cotizacion_id)
+    return ejecutar
+
+
+def caso_generar_excel(ctx):
+    _requiere('openpyxl')
+    from controllers.excel_controller import ExcelController
+    controller = ExcelController(cotizacion_controller=None, aiu_manager=None)
+    salida = os.path.join(ctx.directorio, 'excel')
+    os.makedirs(salida, exist_ok=True)
+
+    def ejecutar():
+        ruta = controller.generate_excel(
+            items=ctx.filas, activities=ctx.filas, tipo_persona='juridica',
+            administracion=10, imprevistos=5, utilidad=5, iva_utilidad=19,
+            nombre_cliente='Benchmark', ruta_personalizada=salida)
+        os.remove(ruta)
+    return ejecutar
+
+
+class _ControladorSintetico:
+    """Entrega a WordController una cotización con el cliente sintético (como get_current_cotizacion_id)."""
+
+    def __init__(self, cliente):
+        self.cotizacion = type('Cotizacion', (), {'cliente': type('Cliente', (), dict(cliente))()})()
+
+    def obtener_cotizacion(self, cotizacion_id):
+        return self.cotizacion
+
+
+def caso_renderizar_word(ctx):
+    _requiere('docx')
+    from controllers.word_controller import WordController
+    cliente = next(c for c in ctx.clientes if c['tipo'] == 'Juridica')
+    controller = WordController(_ControladorSintetico(cliente))
+    if not os.path.exists(controller.template_juridica_larga):
+        raise CasoOmitido(f"no existe la plantilla {controller.template_juridica_larga}")
+    datos = {
+        'referencia': 'Benchmark', 'titulo': 'COTIZACIÓN', 'lugar': cliente['direccion'],
+        'validez': '30', 'cuadrillas': '2', 'operarios': '4', 'plazo_dias': '30',
+        'pago_porcentajes': True, 'anticipo': 30, 'avance': 40, 'final': 30,
+        'polizas_incluir': {'cumplimiento_contrato': True, 'calidad_servicio': True},
+        'totales': {'costo_directo': 1e8, 'aiu_total': 2e7, 'iva': 9.5e5, 'total': 1.2095e8},
+    }
+
+    def ejecutar():
+        ruta = controller.generate_word_document(1, None, datos, formato='largo')
+        os.remove(ruta)
+    return ejecutar
+
+
+def caso_unir_pdfs(ctx):
+    _requiere('PyPDF2', 'docx', 'win32com')
+    import PyPDF2
+    from utils.pdf_merger import PDFMerger
+    plantillas = os.path.join(ctx.directorio, 'pdf_templates')
+    os.makedirs(plantillas, exist_ok=True)
+
+    def pdf_sintetico(ruta, paginas):
+        writer = PyPDF2.PdfWriter()
+        for _ in range(paginas):
+            writer.add_blank_page(width=612, height=792)
+        with open(ruta, 'wb') as f:
+            writer.write(f)
+
+    for indice, archivo in enumerate(PDFMerger.SECTION_MAP.values()):
+        pdf_sintetico(os.path.join(plantillas, archivo), 2 + indice % 5)
+    presupuesto = os.path.join(ctx.directorio, 'presupuesto.pdf')
+    pdf_sintetico(presupuesto, max(ctx.tamano['filas'] // 40, 1))
+    merger = PDFMerger(plantillas)
+    orden = list(PDFMerger.SECTION_MAP) + ['presupuesto_programacion']
+    salida = os.path.join(ctx.directorio, 'unido.pdf')
+
+    def ejecutar():
+        if not merger.merge_pdfs(salida, orden, presupuesto, {}):
+            raise RuntimeError("merge_pdfs falló")
+    return ejecutar
+
+
+def caso_listar_archivos(ctx):
+    from utils.cotizacion_file_manager import CotizacionFileManager
+    directorio = os.path.join(ctx.directorio, 'cotizaciones')
+    sinteticos.escribir_archivos_cotizacion(directorio, ctx.clientes, ctx.catalogo, ctx.tamano['archivos'],
+                                            min(ctx.tamano['filas'], 500), ctx.semilla)
+    manager = CotizacionFileManager(directorio)
+
+    def ejecutar():
+        manager.listar_cotizaciones()
+    return ejecutar
+
+
+CASOS = {
+    'filtros.actividades': caso_filtros_actividades,
+    'filtros.productos': caso_filtros_productos,
+    'bd.cotizaciones_filtradas': caso_cotizaciones_filtradas,
+    'bd.guardar_snapshot': caso_guardar_snapshot,
+    'bd.ultimo_snapshot': caso_ultimo_snapshot,
+    'excel.generar': caso_generar_excel,
+    'word.renderizar': caso_renderizar_word,
+    'pdf.unir': caso_unir_pdfs,
+    'archivos.listar': caso_listar_archivos,
+}
+
+
+# ===== EJECUCIÓN Y LÍNEA BASE =====
+
+def medir(funcion, repeticiones):
+    """Tiempos (s) de cada repetición, con la salida de consola del código medido silenciada."""
+    tiempos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        funcion()  # calentamiento (cachés de SQLite, imports perezosos)
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def ejecutar_suite(nombres, tamano='pequeno', repeticiones=5, semilla=42):
+    """
+    Ejecuta los casos indicados en un directorio temporal.
+
+    Returns:
+        dict: {'tamano', 'semilla', 'fecha', 'python', 'plataforma',
+               'casos': {nombre: {'mejor_ms', 'mediana_ms', 'repeticiones'} o {'omitido': motivo}}}
+    """
+    resultados = {}
+    directorio = tempfile.mkdtemp(prefix='cotizer_bench_')
+    cwd = os.getcwd()
+    try:
+        # WordController y PDFMerger escriben archivos relativos al directorio de trabajo
+        os.chdir(directorio)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ctx = Contexto(directorio, sinteticos.TAMANOS[tamano], semilla)
+        try:
+            for nombre in nombres:
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        funcion = CASOS[nombre](ctx)
+                    tiempos = medir(funcion, repeticiones)
+                    resultados[nombre] = {
+                        'mejor_ms': round(min(tiempos) * 1000, 3),
+                        'mediana_ms': round(statistics.median(tiempos) * 1000, 3),
+                        'repeticiones': repeticiones,
+                    }
+                except CasoOmitido as e:
+                    resultados[nombre] = {'omitido': str(e)}
+        finally:
+            with contextlib.redirect_stdout(io.StringIO()):
+                ctx.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return {
+        'tamano': tamano,
+        'semilla': semilla,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'casos': resultados,
+    }
+
+
+def comparar(resultado, baseline, tolerancia):
+    """
+    Compara el mejor tiempo de cada caso con la línea base.
+
+    Returns:
+        dict: {nombre: (razón actual/base, 'regresion' | 'mejora' | 'igual')} para los casos presentes en ambas
+    """
+    comparacion = {}
+    for nombre, actual in resultado['casos'].items():
+        base = baseline.get('casos', {}).get(nombre)
+        if not base or 'mejor_ms' not in base or 'mejor_ms' not in actual or not base['mejor_ms']:
+            continue
+        razon = actual['mejor_ms'] / base['mejor_ms']
+        if razon > 1 + tolerancia:
+            estado = 'regresion'
+        elif razon < 1 - tolerancia:
+            estado = 'mejora'
+        else:
+            estado = 'igual'
+        comparacion[nombre] = (razon, estado)
+    return comparacion
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de los caminos críticos")
+    parser.add_argument('--tamano', choices=sorted(sinteticos.TAMANOS), default='pequeno')
+    parser.add_argument('--casos', default='', help='Casos separados por comas (por defecto todos)')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--baseline', default=BASELINE_POR_DEFECTO)
+    parser.add_argument('--guardar-baseline', action='store_true', help='Guarda esta corrida como línea base')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='Variación relativa aceptada frente a la línea base')
+    parser.add_argument('--json', action='store_true', help='Imprime los resultados como JSON')
+    args = parser.parse_args(argv)
+
+    nombres = [n.strip() for n in args.casos.split(',') if n.strip()] or list(CASOS)
+    desconocidos = [n for n in nombres if n not in CASOS]
+    if desconocidos:
+        parser.error(f"casos desconocidos: {', '.join(desconocidos)} (disponibles: {', '.join(CASOS)})")
+
+    resultado = ejecutar_suite(nombres, args.tamano, args.repeticiones, args.semilla)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.guardar_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('tamano') != args.tamano or baseline.get('semilla') != args.semilla:
+            print(f"La línea base es de tamaño '{baseline.get('tamano')}' y semilla {baseline.get('semilla')}; "
+                  f"no se compara.", file=sys.stderr)
+            baseline = None
+    comparacion = comparar(resultado, baseline, args.tolerancia) if baseline else {}
+
+    if args.json:
+        print(json.dumps(dict(resultado, comparacion={n: {'razon': round(r, 3), 'estado': e}
+                                                      for n, (r, e) in comparacion.items()}),
+                         ensure_ascii=False, indent=2))
+    else:
+        tamano = sinteticos.TAMANOS[args.tamano]
+        print(f"Tamaño '{args.tamano}': {tamano['clientes']:,} clientes, {tamano['actividades']:,} actividades, "
+              f"{tamano['capitulos']} capítulos, {tamano['cotizaciones']:,} cotizaciones, "
+              f"{tamano['filas']:,} filas por cotización | Repeticiones: {args.repeticiones}")
+        for nombre, datos in resultado['casos'].items():
+            if 'omitido' in datos:
+                print(f"  {nombre:<26} omitido: {datos['omitido']}")
+                continue
+            linea = f"  {nombre:<26} {datos['mejor_ms']:10.1f} ms  (mediana {datos['mediana_ms']:.1f} ms)"
+            if nombre in comparacion:
+                razon, estado = comparacion[nombre]
+                linea += f"  x{razon:.2f} vs base" + ("  << REGRESIÓN" if estado == 'regresion' else "")
+            print(linea)
+
+    if args.guardar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"Línea base guardada en {args.baseline}", file=sys.stderr)
+
+    return 1 if any(estado == 'regresion' for _, estado in comparacion.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Generadores de datos sintéticos reproducibles para los benchmarks.
+
+Todos reciben una semilla: con los mismos parámetros producen exactamente
+los mismos clientes, catálogo y cotizaciones, de modo que los tiempos de dos
+corridas (o de una corrida y la línea base) son comparables.
+"""
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+TRABAJOS = ["Demolición", "Excavación", "Relleno", "Concreto", "Mampostería", "Pañete", "Estuco",
+            "Pintura", "Enchape", "Impermeabilización", "Cubierta", "Instalación", "Suministro",
+            "Desmonte", "Reparación", "Limpieza", "Resane", "Sellado", "Nivelación", "Alistado"]
+ELEMENTOS = ["muro", "placa", "columna", "viga", "cubierta", "fachada", "piso", "escalera",
+             "tanque", "andén", "cielo raso", "baño", "cocina", "canal", "bajante", "ventana"]
+MATERIALES = ["cemento", "arena", "gravilla", "ladrillo", "bloque", "acero", "pintura", "estuco",
+              "cerámica", "porcelanato", "PVC", "drywall", "sellante", "malla", "teja", "madera"]
+CAPITULOS = ["PRELIMINARES", "DEMOLICIONES", "CIMENTACIÓN", "ESTRUCTURA", "MAMPOSTERÍA",
+             "PAÑETES", "PISOS", "ENCHAPES", "CUBIERTA", "CARPINTERÍA", "PINTURA",
+             "INSTALACIONES HIDRÁULICAS", "INSTALACIONES ELÉCTRICAS", "ASEO", "OBRAS EXTERIORES"]
+UNIDADES = ["m2", "m3", "ml", "und", "gl", "kg"]
+ESTADOS = ["pendiente", "ganada", "perdida", "cancelada"]
+
+# Tamaños predefinidos: clientes, actividades del catálogo, capítulos, cotizaciones en BD,
+# filas por cotización y archivos de cotización
+TAMANOS = {
+    'pequeno': {'clientes': 50, 'actividades': 1000, 'capitulos': 15, 'cotizaciones': 500,
+                'filas': 200, 'archivos': 50},
+    'mediano': {'clientes': 500, 'actividades': 10000, 'capitulos': 40, 'cotizaciones': 5000,
+                'filas': 2000, 'archivos': 200},
+    'grande': {'clientes': 2000, 'actividades': 50000, 'capitulos': 80, 'cotizaciones': 20000,
+               'filas': 10000, 'archivos': 500},
+}
+
+
+def generar_filas(num_filas, actividades_por_capitulo=50, semilla=42):
+    """Genera filas de cotización reproducibles con capítulos intercalados."""
+    rng = random.Random(semilla)
+    filas = []
+    for i in range(num_filas):
+        if i % actividades_por_capitulo == 0:
+            filas.append({'type': 'chapter', 'name': f"Capítulo {i // actividades_por_capitulo + 1}"})
+        filas.append({
+            'type': 'activity',
+            'descripcion': f"Actividad {i}",
+            'cantidad': round(rng.uniform(0.5, 500), 2),
+            'unidad': 'm2',
+            'valor_unitario': round(rng.uniform(1000, 250000), 2),
+        })
+    return filas
+
+
+def nombres_capitulos(num_capitulos):
+    """Nombres de capítulo únicos (se numeran al agotar la lista base)."""
+    return [CAPITULOS[i % len(CAPITULOS)] + (f" {i // len(CAPITULOS) + 1}" if i >= len(CAPITULOS) else "")
+            for i in range(num_capitulos)]
+
+
+def generar_clientes(num_clientes, semilla=42):
+    rng = random.Random(semilla)
+    clientes = []
+    for i in range(num_clientes):
+        juridica = rng.random() < 0.6
+        nombre = (f"Constructora {rng.choice(ELEMENTOS).title()} {i} SAS" if juridica
+                  else f"Cliente Natural {i}")
+        clientes.append({
+            'tipo': 'Juridica' if juridica else 'Natural',
+            'nombre': nombre,
+            'direccion': f"Calle {rng.randint(1, 150)} # {rng.randint(1, 99)}-{rng.randint(1, 99)}",
+            'nit': f"{rng.randint(800000000, 999999999)}-{rng.randint(0, 9)}",
+            'telefono': f"3{rng.randint(100000000, 199999999)}",
+            'email': f"cliente{i}@ejemplo.com",
+        })
+    return clientes
+
+
+def generar_catalogo(num_actividades, num_capitulos, semilla=42, num_productos=None):
+    """
+    Catálogo de actividades y productos repartidos en capítulos (categorías).
+
+    Returns:
+        dict: {'capitulos': [nombre], 'actividades': [{descripcion, unidad, valor_unitario, capitulo}],
+               'productos': [{nombre, unidad, precio_unitario, capitulo}]}
+    """
+    rng = random.Random(semilla)
+    capitulos = nombres_capitulos(num_capitulos)
+    actividades = []
+    for i in range(num_actividades):
+        descripcion = (f"{rng.choice(TRABAJOS)} de {rng.choice(ELEMENTOS)} en {rng.choice(MATERIALES)} "
+                       f"tipo {i}")
+        actividades.append({
+            'descripcion': descripcion,
+            'unidad': rng.choice(UNIDADES),
+            'valor_unitario': round(rng.uniform(1000, 250000), 2),
+            'capitulo': rng.randrange(num_capitulos),
+        })
+    productos = []
+    for i in range(num_productos if num_productos is not None else max(num_actividades // 4, 1)):
+        productos.append({
+            'nombre': f"{rng.choice(MATERIALES).title()} referencia {i}",
+            'unidad': rng.choice(UNIDADES),
+            'precio_unitario': round(rng.uniform(500, 90000), 2),
+            'capitulo': rng.randrange(num_capitulos),
+        })
+    return {'capitulos': capitulos, 'actividades': actividades, 'productos': productos}
+
+
+def generar_cotizacion(catalogo, num_filas, semilla=42):
+    """
+    Filas de una cotización (formato de snapshot) tomadas del catálogo, agrupadas por capítulo.
+    """
+    rng = random.Random(semilla)
+    actividades = catalogo['actividades']
+    elegidas = [actividades[rng.randrange(len(actividades))] for _ in range(num_filas)]
+    elegidas.sort(key=lambda a: a['capitulo'])
+    filas = []
+    capitulo_actual = None
+    for actividad in elegidas:
+        if actividad['capitulo'] != capitulo_actual:
+            capitulo_actual = actividad['capitulo']
+            filas.append({'type': 'chapter', 'name': catalogo['capitulos'][capitulo_actual]})
+        filas.append({
+            'type': 'activity',
+            'descripcion': actividad['descripcion'],
+            'cantidad': round(rng.uniform(0.5, 500), 2),
+            'unidad': actividad['unidad'],
+            'valor_unitario': actividad['valor_unitario'],
+        })
+    return filas
+
+
+def poblar_base_datos(db, clientes, catalogo, num_cotizaciones, semilla=42):
+    """
+    Inserta clientes, catálogo y cotizaciones generadas en una base de DatabaseManager.
+
+    Usa executemany sobre la conexión para que poblar bases grandes no domine el tiempo de la corrida.
+    """
+    rng = random.Random(semilla)
+    cursor = db.connection.cursor()
+    cursor.executemany(
+        "INSERT INTO clientes (tipo, nombre, direccion, nit, telefono, email) VALUES (?, ?, ?, ?, ?, ?)",
+        [(c['tipo'], c['nombre'], c['direccion'], c['nit'], c['telefono'], c['email']) for c in clientes])
+    cursor.execute("SELECT COALESCE(MIN(id), 1) FROM clientes")
+    primer_cliente = cursor.fetchone()[0]
+
+    categoria_ids = []
+    for nombre in catalogo['capitulos']:
+        cursor.execute("INSERT OR IGNORE INTO categorias (nombre) VALUES (?)", (nombre,))
+        cursor.execute("SELECT id FROM categorias WHERE nombre = ?", (nombre,))
+        categoria_ids.append(cursor.fetchone()[0])
+    cursor.executemany(
+        "INSERT INTO capitulos (nombre, orden) VALUES (?, ?)",
+        [(nombre, orden) for orden, nombre in enumerate(catalogo['capitulos'])])
+    cursor.executemany(
+        "INSERT INTO actividades (descripcion, unidad, valor_unitario, categoria_id) VALUES (?, ?, ?, ?)",
+        [(a['descripcion'], a['unidad'], a['valor_unitario'], categoria_ids[a['capitulo']])
+         for a in catalogo['actividades']])
+    cursor.executemany(
+        "INSERT INTO productos (nombre, unidad, precio_unitario, categoria_id) VALUES (?, ?, ?, ?)",
+        [(p['nombre'], p['unidad'], p['precio_unitario'], categoria_ids[p['capitulo']])
+         for p in catalogo['productos']])
+
+    inicio = datetime(2024, 1, 1)
+    cotizaciones = []
+    for i in range(num_cotizaciones):
+        fecha = inicio + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60))
+        cliente = rng.randrange(len(clientes)) if clientes else None
+        cotizaciones.append((
+            primer_cliente + cliente if cliente is not None else None,
+            fecha.strftime('%Y-%m-%d %H:%M:%S'), fecha.strftime('%Y-%m-%d %H:%M:%S'),
+            f"Proyecto {i}", round(rng.uniform(1e6, 5e8), 2), rng.choice(ESTADOS),
+            int(rng.random() < 0.1), (fecha + timedelta(days=30)).strftime('%Y-%m-%d'),
+            clientes[cliente]['tipo'].lower() if cliente is not None else 'natural',
+        ))
+    cursor.executemany("""
+        INSERT INTO cotizaciones_generadas (cliente_id, fecha_creacion, fecha_modificacion, nombre_proyecto,
+            monto_total, estado, es_prueba, fecha_vencimiento, tipo_cliente)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, cotizaciones)
+    db.connection.commit()
+
+
+def escribir_archivos_cotizacion(directorio, clientes, catalogo, num_archivos, num_filas, semilla=42):
+    """Escribe archivos de cotización .json (formato v2.0) como los de CotizacionFileManager."""
+    rng = random.Random(semilla)
+    os.makedirs(directorio, exist_ok=True)
+    rutas = []
+    for i in range(num_archivos):
+        cliente = clientes[rng.randrange(len(clientes))]
+        table_rows = []
+        for row in generar_cotizacion(catalogo, num_filas, semilla=semilla + i):
+            if row['type'] == 'chapter':
+                table_rows.append({'type': 'chapter_header', 'descripcion': row['name']})
+            else:
+                table_rows.append(dict(row, total=round(row['cantidad'] * row['valor_unitario'], 2)))
+        datos = {
+            'fecha': (datetime(2024, 1, 1) + timedelta(days=i)).strftime('%Y-%m-%d'),
+            'numero': f"{i:03d}",
+            'cliente': cliente,
+            'table_rows': table_rows,
+            'total': round(sum(r.get('total', 0) for r in table_rows), 2),
+            'version': '2.0',
+        }
+        ruta = os.path.join(directorio, f"cotizacion_{i:03d}.json")
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, indent=4)
+        rutas.append(ruta)
+    return rutas
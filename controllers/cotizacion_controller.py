@@ -5,6 +5,11 @@ from utils.database_manager import DatabaseManager
 from utils.aiu_manager import AIUManager
 from utils.filter_manager import FilterManager
 from utils.cotizacion_file_manager import CotizacionFileManager
+from utils.material_rollup_manager import MaterialRollupManager
+from utils.excel_quotation_importer import ExcelQuotationImporter
+from utils.related_activity_index import RelatedActivityIndex
+from utils.cooccurrence_manager import CooccurrenceManager
+from utils.price_analytics import PriceAnalytics
 
 
 class CotizacionController:
@@ -20,6 +25,11 @@ class CotizacionController:
         # Se le pasa la instancia de database_manager a los managers que la necesiten.
         self.aiu_manager = AIUManager(self.database_manager)
         self.filter_manager = FilterManager(self.database_manager)
+        self.material_rollup_manager = MaterialRollupManager(self.database_manager)
+        self.cooccurrence_manager = CooccurrenceManager(self.database_manager)
+        self.cooccurrence_manager.update()  # Solo procesa snapshots pendientes
+        self.related_activity_index = RelatedActivityIndex(self.database_manager, self.cooccurrence_manager)
+        self.price_analytics = PriceAnalytics(self.database_manager)
 
         # --- 3. Inicializar managers independientes ---
         self.file_manager = CotizacionFileManager()
@@ -91,10 +101,42 @@ class CotizacionController:
     def get_related_activities(self, activity_id):
         """
         Obtiene las actividades relacionadas con una actividad por su ID.
-        Este método ahora delega correctamente en el database_manager.
+        Se sirven desde el índice en memoria, que se mantiene sincronizado
+        con la tabla actividad_relacionada.
         """
-        # ¡CORRECCIÓN! La lógica se mueve al DatabaseManager, el controlador solo llama.
-        return self.database_manager.get_related_activities(activity_id)
+        return self.related_activity_index.get_related_activities(activity_id)
+
+    def get_activity_suggestions(self, activity_id, limit=5):
+        """Sugiere actividades que suelen cotizarse junto con la indicada"""
+        return self.related_activity_index.get_suggestions(activity_id, limit)
+
+    def get_quotation_materials(self, table_rows):
+        """Consolida los materiales de las actividades de una cotización"""
+        return self.material_rollup_manager.get_quotation_materials(table_rows)
+
+    def export_materials_list(self, table_rows, filepath, titulo=None):
+        """Exporta la lista de materiales consolidada de una cotización a Excel"""
+        materials = self.material_rollup_manager.get_quotation_materials(table_rows)
+        if materials is None:
+            return False
+        return self.material_rollup_manager.export_materials_list(materials, filepath, titulo)
+
+    def import_excel_quotation(self, filepath):
+        """Reconstruye una cotización desde un Excel generado por la aplicación (p. ej. devuelto por el cliente)"""
+        importer = ExcelQuotationImporter(self.related_activity_index, self.get_all_chapters())
+        return importer.importar(filepath)
+
+    def get_also_quoted(self, descripcion, limit=5):
+        """Actividades que otros clientes cotizaron junto con la descripción indicada"""
+        return self.cooccurrence_manager.get_also_quoted(descripcion, limit)
+
+    def check_quoted_price(self, descripcion, unidad, valor_unitario):
+        """Compara un valor unitario con los precios cotizados antes para la misma actividad"""
+        return self.price_analytics.check_price(descripcion, unidad, valor_unitario)
+
+    def get_price_series(self, descripcion, unidad=None):
+        """Valores unitarios cotizados de una actividad a lo largo del tiempo"""
+        return self.price_analytics.get_price_series(descripcion, unidad)
 
     def save_cotizacion_to_file(self, cotizacion_data, filepath):
         """Guarda una cotización como archivo"""
@@ -1,157 +1,213 @@
 # En controllers/excel_controller.py
 
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, numbers
 from openpyxl.utils import get_column_letter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from decimal import Decimal
 import os
+import re
+from utils.excel_styles import ExcelStyleRegistry, ExcelStylePlanner
+from utils.instrumentation import instrumentado
+from utils.pricing_engine import PricingEngine, get_pricing_engine
+from utils.xlsx_cached_values import inject_cached_values, fill_cached_values
+from utils.xlsx_stitch import worksheet_xml, use_named_styles, named_style_indices, remap_styles, rewrite_sheets
+
+
+# Hojas de capítulo del Excel por capítulos: encabezado, título y luego actividades
+FILA_PRIMERA_ACTIVIDAD = 3
+
+
+def _preparar_hoja_capitulo(indice, nombre, actividades, engine):
+    """
+    Prepara las filas de la hoja de un capítulo.
+
+    Returns:
+        dict: {'indice', 'nombre', 'filas', 'num_actividades', 'valores', 'subtotal_fila', 'subtotal'}
+    """
+    totales = engine.line_totals([a.get('cantidad', 0) for a in actividades],
+                                 [a.get('valor_unitario', 0) for a in actividades])
+
+    filas = []
+    valores = {}
+    for n, (actividad, total) in enumerate(zip(actividades, totales), 1):
+        row_num = FILA_PRIMERA_ACTIVIDAD + n - 1
+        if engine.redondear_lineas:
+            formula = "=" + engine.excel_formula(f"C{row_num}*E{row_num}")
+        else:
+            formula = f"=C{row_num}*E{row_num}"
+        filas.append([f"{indice}.{n}", actividad['descripcion'], float(actividad['cantidad']),
+                      actividad['unidad'], float(actividad['valor_unitario']), formula])
+        valores[f"F{row_num}"] = total
+
+    subtotal_fila = FILA_PRIMERA_ACTIVIDAD + len(actividades)
+    subtotal = engine.round(sum(totales, Decimal(0)))
+    valores[f"F{subtotal_fila}"] = subtotal
+    return {
+        'indice': indice,
+        'nombre': nombre,
+        'filas': filas,
+        'num_actividades': len(filas),
+        'valores': valores,
+        'subtotal_fila': subtotal_fila,
+        'subtotal': subtotal,
+    }
+
+
+def _generar_hoja_capitulo(tarea):
+    """
+    Escribe la hoja de un capítulo en un libro propio y devuelve su XML.
+
+    Se ejecuta en procesos aparte al exportar por capítulos, por eso es una
+    función de módulo que solo recibe y devuelve datos serializables. El
+    proceso principal une el XML al libro final (ver generate_excel_por_capitulos).
+
+    Args:
+        tarea (tuple): (indice, nombre, actividades, opciones del motor, título de la hoja,
+                        escribir valores calculados)
+
+    Returns:
+        dict: Datos del capítulo sin las filas, más 'xml' y 'estilos'
+              ({índice de estilo en el XML: combinación del ExcelStyleRegistry})
+    """
+    indice, nombre, actividades, opciones, titulo, valores_calculados = tarea
+    controller = ExcelController(None, None)
+    controller.pricing_engine = PricingEngine(**opciones)
+    capitulo = _preparar_hoja_capitulo(indice, nombre, actividades, controller.pricing_engine)
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = titulo
+    registry = ExcelStyleRegistry.para_libro(workbook)
+    controller._escribir_hoja_capitulo(sheet, capitulo, ExcelStylePlanner(workbook, registry))
+
+    xml, estilos = worksheet_xml(workbook, titulo)
+    if valores_calculados:
+        xml = fill_cached_values(xml, capitulo['valores'])[0]
+    del capitulo['filas']
+    capitulo.update(titulo=titulo, xml=xml,
+                    estilos={indice_xml: registry.clave(nombre) for indice_xml, nombre in estilos.items()})
+    return capitulo
 
 
 class ExcelController:
+    ANCHOS_COLUMNAS = {'A': 5, 'B': 60, 'C': 12, 'D': 15, 'E': 20, 'F': 20}
+    ENCABEZADOS = ["Item", "Descripción", "Cantidad", "Unidad", "Precio Unitario", "Total"]
+
+    # Actividades a partir de las cuales las hojas de capítulo se preparan en paralelo
+    UMBRAL_PARALELO = 5000
+
     def __init__(self, cotizacion_controller, aiu_manager):
         self.cotizacion_controller = cotizacion_controller
         self.aiu_manager = aiu_manager
+        self.pricing_engine = get_pricing_engine()
+        self.last_pricing = None
 
-    def bordes_marco_con_interior(self, sheet, start_row, end_row, start_col=1, end_col=6):
-        # Estilos
-        grueso = Side(border_style="medium", color="000000")
-        delgado = Side(border_style="thin", color="000000")
-
-        for row in range(start_row, end_row + 1):
-            for col in range(start_col, end_col + 1):
-                cell = sheet.cell(row=row, column=col)
-
-                # Por defecto, bordes internos son delgados
-                left = delgado
-                right = delgado
-                top = delgado
-                bottom = delgado
+    def bordes_marco_con_interior(self, sheet, start_row, end_row, start_col=1, end_col=6, estilos=None):
+        """Bordes exteriores gruesos e interiores delgados en un bloque de celdas."""
+        planner = estilos or ExcelStylePlanner(sheet.parent)
+        planner.marco(start_row, end_row, start_col, end_col)
+        if estilos is None:
+            planner.apply(sheet)
 
-                # Bordes exteriores → gruesos
-                if col == start_col:  # primera columna
-                    left = grueso
-                if col == end_col:  # última columna
-                    right = grueso
-                if row == start_row:  # primera fila
-                    top = grueso
-                if row == end_row:  # última fila
-                    bottom = grueso
-
-                cell.border = Border(left=left, right=right, top=top, bottom=bottom)
-
-
-    def aplicar_bordes_totales(self, sheet, start_row, end_row, color_hex):
+    def aplicar_bordes_totales(self, sheet, start_row, end_row, color_hex, estilos=None):
         """Aplica bordes exteriores gruesos y bordes interiores delgados a un bloque de celdas."""
-        thin = Side(border_style="thin", color="000000")
-        medium = Side(border_style="medium", color="000000")
-
-        fill = PatternFill(start_color=color_hex, end_color=color_hex, fill_type="solid")
-
-        for row in range(start_row, end_row + 1):
-            for col in range(1, 7):  # Columnas A (1) a F (6)
-                cell = sheet.cell(row=row, column=col)
-                cell.fill = fill
-
-                # Determinar bordes según posición
-                left = medium if col == 1 else thin
-                right = medium if col == 6 else thin
-                top = medium if row == start_row else thin
-                bottom = medium if row == end_row else thin
-
-                cell.border = Border(left=left, right=right, top=top, bottom=bottom)
+        self.aplicar_bordes_totales_con_marco_grueso(sheet, start_row, end_row, 1, 6, color_hex, estilos)
 
     def aplicar_bordes_totales_con_marco_grueso(self, sheet, start_row, end_row, start_col=1, end_col=6,
-                                                color_hex="D9EAD3"):
+                                                color_hex="D9EAD3", estilos=None):
         """
         Aplica bordes delgados internos y un marco grueso alrededor de un bloque rectangular.
         - start_row, end_row: filas del bloque.
         - start_col, end_col: columnas del bloque (por defecto A:F → 1:6).
         """
-        thin = Side(border_style="thin", color="000000")
-        medium = Side(border_style="medium", color="000000")
-        fill = PatternFill(start_color=color_hex, end_color=color_hex, fill_type="solid")
-
-        for row in range(start_row, end_row + 1):
-            for col in range(start_col, end_col + 1):
-                cell = sheet.cell(row=row, column=col)
-                cell.fill = fill
-
-                # Determinar bordes por posición (marco grueso)
-                left = medium if col == start_col else thin
-                right = medium if col == end_col else thin
-                top = medium if row == start_row else thin
-                bottom = medium if row == end_row else thin
-
-                cell.border = Border(left=left, right=right, top=top, bottom=bottom)
+        planner = estilos or ExcelStylePlanner(sheet.parent)
+        planner.estilo_rango(start_row, end_row, start_col, end_col, relleno=color_hex)
+        planner.marco(start_row, end_row, start_col, end_col)
+        if estilos is None:
+            planner.apply(sheet)
 
-    def _insertar_subtotal_capitulo(self, sheet, row_num, start_row, chapter_num):
+    def _insertar_subtotal_capitulo(self, sheet, row_num, start_row, chapter_num, estilos):
         """Inserta subtotal y devuelve la siguiente fila y la referencia de celda."""
-        subtotal_font = Font(bold=True, italic=True, color="FFFFFF")
-        subtotal_fill = PatternFill(start_color="008080", end_color="008080", fill_type="solid")
-        # Mantener la alineación para que no se rompa el ajuste automático de la fila
-        alignment = Alignment(horizontal="right", vertical="center")
-
         sheet.merge_cells(start_row=row_num, start_column=1, end_row=row_num, end_column=5)
 
-        cell_label = sheet.cell(row=row_num, column=1)
-        cell_label.value = f"SUBTOTAL CAPÍTULO {chapter_num}.0"
-        cell_label.font = subtotal_font
-        cell_label.fill = subtotal_fill
-        cell_label.alignment = alignment
+        sheet.cell(row=row_num, column=1).value = f"SUBTOTAL CAPÍTULO {chapter_num}.0"
+        sheet.cell(row=row_num, column=6).value = "=" + self.pricing_engine.excel_formula(
+            f"SUM(F{start_row}:F{row_num - 1})")
 
-        cell_total = sheet.cell(row=row_num, column=6)
-        cell_total.value = f"=SUM(F{start_row}:F{row_num - 1})"
-        cell_total.font = subtotal_font
-        cell_total.fill = subtotal_fill
-        cell_total.alignment = alignment
-        cell_total.number_format = '"$"#,##0.00'
+        # Mantener la alineación para que no se rompa el ajuste automático de la fila
+        estilos.estilo(row_num, 1, fuente='subtotal', relleno="008080", alineacion='derecha_centro')
+        estilos.estilo(row_num, 6, fuente='subtotal', relleno="008080", alineacion='derecha_centro',
+                       formato='moneda')
 
         # Aplicar bordes para que combine con el resto
-        self.bordes_marco_con_interior(sheet, row_num, row_num)
+        estilos.marco(row_num, row_num)
 
         celda_referencia = f"F{row_num}"
         return row_num + 1, celda_referencia
 
 
-    def generate_excel(self, items, activities, tipo_persona, administracion, imprevistos, utilidad, iva_utilidad, nombre_cliente="", ruta_personalizada=""):
+    @staticmethod
+    def _ruta_exportacion(nombre_cliente, ruta_personalizada, prefijo="cotizacion"):
+        """Ruta del archivo a generar dentro de la carpeta del proyecto (o exports/)."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if ruta_personalizada and os.path.exists(ruta_personalizada):
+            export_dir = ruta_personalizada
+
+        else:
+            # Fallback a la carpeta local si no hay ruta seleccionada
+            export_dir = "exports"
+            if not os.path.exists(export_dir):
+                os.makedirs(export_dir)
+
+        safe_name = "".join(c for c in nombre_cliente if c.isalnum() or c in (" ", "_", "-")).strip()
+        safe_name = safe_name.replace(" ", "_")
+
+        # Construir la ruta final
+        filename = f"{prefijo}_{safe_name}_{timestamp}.xlsx"
+        return os.path.join(export_dir, filename)
+
+    @instrumentado('excel.build')
+    def generate_excel(self, items, activities, tipo_persona, administracion, imprevistos, utilidad, iva_utilidad, nombre_cliente="", ruta_personalizada="",
+                       valores_calculados=True):
 
         """
         Genera un archivo Excel de cotización profesional, manejando capítulos,
         formato de celdas y lógica de AIU/IVA.
+
+        Con valores_calculados=True, cada celda con fórmula se guarda además
+        con el resultado del motor de precios, de modo que el libro se puede
+        leer con data_only=True sin abrirlo en Excel.
         """
+        # Totales calculados con el motor de precios; las fórmulas replican su redondeo
+        engine = self.pricing_engine
+        self.last_pricing = engine.price(items, tipo_persona, {
+            'administracion': administracion,
+            'imprevistos': imprevistos,
+            'utilidad': utilidad,
+            'iva_sobre_utilidad': iva_utilidad
+        })
+
         # 1. --- CONFIGURACIÓN INICIAL DEL LIBRO Y LA HOJA ---
         workbook = openpyxl.Workbook()
         sheet = workbook.active
         sheet.title = "Cotización"
 
-        # 2. --- DEFINICIÓN DE ESTILOS REUTILIZABLES ---
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="008080", end_color="008080", fill_type="solid")
-        chapter_font = Font(bold=True, color="FFFFFF")
-        chapter_fill = PatternFill(start_color="004D40", end_color="004D40", fill_type="solid")
-        total_font = Font(bold=True)
-
-        ### SOLUCIÓN AL PROBLEMA 2 y 3: DEFINIR ALINEACIONES ###
-        # Alineación para la descripción: centrada verticalmente y con ajuste de texto
-        description_alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
-        # Alineación para el resto de columnas: centrada en ambas direcciones
-        center_alignment = Alignment(horizontal="center", vertical="center")
+        # 2. --- ESTILOS ---
+        # Los estilos y bordes se planifican por celda y se aplican una sola vez
+        # al final, como NamedStyle creados una vez por combinación
+        estilos = ExcelStylePlanner(workbook)
+        header_fill = "008080"
+        chapter_fill = "004D40"
 
         # 3. --- CONFIGURACIÓN DE LA HOJA (ANCHOS Y ENCABEZADOS) ---
-        sheet.column_dimensions['A'].width = 5
-        sheet.column_dimensions['B'].width = 60
-        sheet.column_dimensions['C'].width = 12
-        sheet.column_dimensions['D'].width = 15
-        sheet.column_dimensions['E'].width = 20
-        sheet.column_dimensions['F'].width = 20
-
-        headers = ["Item", "Descripción", "Cantidad", "Unidad", "Precio Unitario", "Total"]
-        for col_num, header_title in enumerate(headers, 1):
-            cell = sheet.cell(row=1, column=col_num)
-            cell.value = header_title
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_alignment
+        for letra, ancho in self.ANCHOS_COLUMNAS.items():
+            sheet.column_dimensions[letra].width = ancho
+
+        for col_num, header_title in enumerate(self.ENCABEZADOS, 1):
+            sheet.cell(row=1, column=col_num).value = header_title
+            estilos.estilo(1, col_num, fuente='encabezado', relleno=header_fill, alineacion='centro')
 
         # 4. --- PROCESAMIENTO DE LOS ÍTEMS (CAPÍTULOS Y ACTIVIDADES) ---
         row_num = 2
@@ -159,23 +215,25 @@ class ExcelController:
         activity_counter = 0
         chapter_start_row = None
         capitulos_subtotales_celdas = []
+        valores_celdas = {}  # {'F12': valor calculado} para las celdas con fórmula
+        lineas = iter(self.last_pricing['lineas'])
+        subtotales_capitulo = {c['indice']: c['subtotal'] for c in self.last_pricing['capitulos']}
 
         for i, item in enumerate(items):
             if item['type'] == 'chapter':
                 # Antes de iniciar un nuevo capítulo, cerramos el anterior (si existe)
                 if chapter_counter > 0 and activity_counter > 0:
-                    row_num, celda_subtotal = self._insertar_subtotal_capitulo(sheet, row_num, chapter_start_row,chapter_counter)
+                    row_num, celda_subtotal = self._insertar_subtotal_capitulo(sheet, row_num, chapter_start_row,
+                                                                               chapter_counter, estilos)
                     capitulos_subtotales_celdas.append(celda_subtotal)
+                    valores_celdas[celda_subtotal] = subtotales_capitulo[chapter_counter]
 
                 chapter_counter += 1
                 activity_counter = 0
 
                 sheet.merge_cells(start_row=row_num, start_column=1, end_row=row_num, end_column=6)
-                cell = sheet.cell(row=row_num, column=1)
-                cell.value = f"{chapter_counter}.0 {item['name'].upper()}"
-                cell.font = chapter_font
-                cell.fill = chapter_fill
-                cell.alignment = center_alignment
+                sheet.cell(row=row_num, column=1).value = f"{chapter_counter}.0 {item['name'].upper()}"
+                estilos.estilo(row_num, 1, fuente='encabezado', relleno=chapter_fill, alineacion='centro')
                 row_num += 1
                 chapter_start_row = row_num
 
@@ -189,18 +247,26 @@ class ExcelController:
                 sheet.cell(row=row_num, column=3).value = float(item['cantidad'])
                 sheet.cell(row=row_num, column=4).value = item['unidad']
                 sheet.cell(row=row_num, column=5).value = float(item['valor_unitario'])
-                sheet.cell(row=row_num, column=6).value = f"=C{row_num}*E{row_num}"
+                if engine.redondear_lineas:
+                    sheet.cell(row=row_num, column=6).value = "=" + engine.excel_formula(f"C{row_num}*E{row_num}")
+                else:
+                    sheet.cell(row=row_num, column=6).value = f"=C{row_num}*E{row_num}"
+                valores_celdas[f"F{row_num}"] = next(lineas)
+                if chapter_counter == 0:
+                    # Actividad sin capítulo: entra directo al total de costos directos
+                    capitulos_subtotales_celdas.append(f"F{row_num}")
 
                 # Estilos y formatos
                 for col in range(1, 7):
-                    sheet.cell(row=row_num,column=col).alignment = description_alignment if col == 2 else center_alignment
-                sheet.cell(row=row_num, column=5).number_format = '"$"#,##0.00'
-                sheet.cell(row=row_num, column=6).number_format = '"$"#,##0.00'
+                    estilos.estilo(row_num, col, alineacion='descripcion' if col == 2 else 'centro',
+                                   formato='moneda' if col >= 5 else None)
                 row_num += 1
 
         if chapter_counter > 0 and activity_counter > 0:
-            row_num, celda_subtotal = self._insertar_subtotal_capitulo(sheet, row_num, chapter_start_row,chapter_counter)
+            row_num, celda_subtotal = self._insertar_subtotal_capitulo(sheet, row_num, chapter_start_row,
+                                                                       chapter_counter, estilos)
             capitulos_subtotales_celdas.append(celda_subtotal)
+            valores_celdas[celda_subtotal] = subtotales_capitulo[chapter_counter]
 
 
         # 5. --- CÁLCULO DE SUBTOTAL, TOTALES Y AIU ---
@@ -210,23 +276,20 @@ class ExcelController:
         # Fila de Subtotal
         sheet.merge_cells(f"A{subtotal_row_num}:E{subtotal_row_num}")
         sheet[f"A{subtotal_row_num}"].value = "TOTAL COSTOS DIRECTOS"
-        sheet[f"A{subtotal_row_num}"].font = header_font
-        sheet[f"A{subtotal_row_num}"].fill = header_fill
-        sheet[f"A{subtotal_row_num}"].alignment = Alignment(horizontal="right")
+        estilos.estilo(subtotal_row_num, 1, fuente='encabezado', relleno=header_fill, alineacion='derecha')
 
         if capitulos_subtotales_celdas:
             formula_subtotales = ",".join(capitulos_subtotales_celdas)
             sheet[subtotal_cell_address].value = f"=SUM({formula_subtotales})"
+            valores_celdas[subtotal_cell_address] = self.last_pricing['costo_directo']
         else:
             sheet[subtotal_cell_address].value = 0
 
-        sheet[subtotal_cell_address].number_format = '"$"#,##0.00'
-        sheet[subtotal_cell_address].font = header_font
-        sheet[subtotal_cell_address].fill = header_fill
-        self.bordes_marco_con_interior(sheet, subtotal_row_num, subtotal_row_num)
+        estilos.estilo(subtotal_row_num, 6, fuente='encabezado', relleno=header_fill, formato='moneda')
+        self.bordes_marco_con_interior(sheet, subtotal_row_num, subtotal_row_num, estilos=estilos)
         row_num += 1
 
-        if tipo_persona.lower() == "juridica":
+        if self.last_pricing['tipo_persona'] == "juridica":
             # Lógica completa para AIU
             # Aplicar estilos a las filas de totales
 
@@ -237,49 +300,48 @@ class ExcelController:
             total_row_num = row_num + 4
             # Aplicar estilos y bordes a las filas de totales
             for i in range(admin_row_num, total_row_num + 1):
-                sheet[f"A{i}"].alignment = Alignment(horizontal="right")
-                sheet[f"F{i}"].number_format = '"$"#,##0.00'
-                sheet[f"A{i}"].font = total_font
-                sheet[f"F{i}"].font = total_font
+                estilos.estilo(i, 1, fuente='total', alineacion='derecha')
+                estilos.estilo(i, 6, fuente='total', formato='moneda')
             # Aplicar color y bordes gruesos por fuera
-            self.aplicar_bordes_totales(sheet, admin_row_num, total_row_num, color_hex="D9EAD3")
+            self.aplicar_bordes_totales(sheet, admin_row_num, total_row_num, color_hex="D9EAD3", estilos=estilos)
 
             # Administración
             sheet.merge_cells(f"A{admin_row_num}:E{admin_row_num}");
             sheet[f"A{admin_row_num}"].value = f"ADMINISTRACIÓN ({administracion}%)"
-            sheet[f"F{admin_row_num}"].value = f"={subtotal_cell_address}*({administracion}/100)"
+            sheet[f"F{admin_row_num}"].value = "=" + engine.excel_formula(f"{subtotal_cell_address}*({administracion}/100)")
 
             # Imprevistos
             sheet.merge_cells(f"A{impr_row_num}:E{impr_row_num}");
             sheet[f"A{impr_row_num}"].value = f"IMPREVISTOS ({imprevistos}%)"
-            sheet[f"F{impr_row_num}"].value = f"={subtotal_cell_address}*({imprevistos}/100)"
+            sheet[f"F{impr_row_num}"].value = "=" + engine.excel_formula(f"{subtotal_cell_address}*({imprevistos}/100)")
 
             # Utilidad
             sheet.merge_cells(f"A{util_row_num}:E{util_row_num}");
             sheet[f"A{util_row_num}"].value = f"UTILIDAD ({utilidad}%)"
-            sheet[f"F{util_row_num}"].value = f"={subtotal_cell_address}*({utilidad}/100)"
+            sheet[f"F{util_row_num}"].value = "=" + engine.excel_formula(f"{subtotal_cell_address}*({utilidad}/100)")
 
             # IVA sobre Utilidad
             sheet.merge_cells(f"A{iva_row_num}:E{iva_row_num}");
             sheet[f"A{iva_row_num}"].value = f"IVA SOBRE UTILIDAD ({iva_utilidad}%)"
-            sheet[f"F{iva_row_num}"].value = f"=F{util_row_num}*({iva_utilidad}/100)"
+            sheet[f"F{iva_row_num}"].value = "=" + engine.excel_formula(f"F{util_row_num}*({iva_utilidad}/100)")
 
             # Fila de Total Final
             sheet.merge_cells(f"A{total_row_num}:E{total_row_num}");
             sheet[f"A{total_row_num}"].value = "VALOR TOTAL COTIZACIÓN"
             sheet[f"F{total_row_num}"].value = f"=SUM(F{subtotal_row_num}:F{iva_row_num})"
-            self.bordes_marco_con_interior(sheet,total_row_num,total_row_num)
-
-            # Aplicar estilos a las filas de totales
-            for i in range(admin_row_num, total_row_num + 1):
-                sheet[f"A{i}"].alignment = Alignment(horizontal="right")
-                sheet[f"F{i}"].number_format = '"$"#,##0.00'
-                if i == total_row_num:
-                    sheet[f"A{i}"].font = header_font
-                    sheet[f"F{i}"].font = header_font
-                    sheet[f"A{i}"].fill = header_fill
-                    sheet[f"F{i}"].fill = header_fill
-            self.bordes_marco_con_interior(sheet, 1, total_row_num)
+            valores_celdas.update({
+                f"F{admin_row_num}": self.last_pricing['administracion'],
+                f"F{impr_row_num}": self.last_pricing['imprevistos'],
+                f"F{util_row_num}": self.last_pricing['utilidad'],
+                f"F{iva_row_num}": self.last_pricing['iva'],
+                f"F{total_row_num}": self.last_pricing['total'],
+            })
+            self.bordes_marco_con_interior(sheet, total_row_num, total_row_num, estilos=estilos)
+
+            # Fila de total con el estilo del encabezado
+            estilos.estilo(total_row_num, 1, fuente='encabezado', relleno=header_fill)
+            estilos.estilo(total_row_num, 6, fuente='encabezado', relleno=header_fill)
+            self.bordes_marco_con_interior(sheet, 1, total_row_num, estilos=estilos)
 
         else:  # Persona Natural
             # Lógica simple con IVA sobre el subtotal
@@ -289,46 +351,280 @@ class ExcelController:
             # IVA
             sheet.merge_cells(f"A{iva_row_num}:E{iva_row_num}");
             sheet[f"A{iva_row_num}"].value = f"IVA ({iva_utilidad}%)"
-            sheet[f"F{iva_row_num}"].value = f"={subtotal_cell_address}*({iva_utilidad}/100)"
-            sheet[f"A{iva_row_num}"].alignment = Alignment(horizontal="right")
-            sheet[f"F{iva_row_num}"].number_format = '"$"#,##0.00'
+            sheet[f"F{iva_row_num}"].value = "=" + engine.excel_formula(f"{subtotal_cell_address}*({iva_utilidad}/100)")
+            estilos.estilo(iva_row_num, 1, alineacion='derecha')
+            estilos.estilo(iva_row_num, 6, formato='moneda')
 
             # Fila de Total Final
             sheet.merge_cells(f"A{total_row_num}:E{total_row_num}");
             sheet[f"A{total_row_num}"].value = "VALOR TOTAL COTIZACIÓN"
             sheet[f"F{total_row_num}"].value = f"=SUM(F{subtotal_row_num}, F{iva_row_num})"
-            sheet[f"A{total_row_num}"].font = header_font;
-            sheet[f"F{total_row_num}"].font = header_font
-            sheet[f"A{total_row_num}"].alignment = Alignment(horizontal="right")
-            sheet[f"F{total_row_num}"].number_format = '"$"#,##0.00'
-            sheet[f"A{total_row_num}"].fill = header_fill
-            sheet[f"F{total_row_num}"].fill = header_fill
-            self.bordes_marco_con_interior(sheet, total_row_num, total_row_num)
+            valores_celdas.update({
+                f"F{iva_row_num}": self.last_pricing['iva'],
+                f"F{total_row_num}": self.last_pricing['total'],
+            })
+            estilos.estilo(total_row_num, 1, fuente='encabezado', relleno=header_fill, alineacion='derecha')
+            estilos.estilo(total_row_num, 6, fuente='encabezado', relleno=header_fill, formato='moneda')
+            self.bordes_marco_con_interior(sheet, total_row_num, total_row_num, estilos=estilos)
+
+            self.aplicar_bordes_totales_con_marco_grueso(sheet, iva_row_num, iva_row_num, color_hex="D9EAD3",
+                                                         estilos=estilos)
+            self.bordes_marco_con_interior(sheet, 1, total_row_num, estilos=estilos)
 
-            self.aplicar_bordes_totales_con_marco_grueso(sheet, iva_row_num, iva_row_num, color_hex="D9EAD3")
-            self.bordes_marco_con_interior(sheet, 1, total_row_num)
+        # Cada celda recibe su estilo definitivo en una sola pasada
+        estilos.apply(sheet)
 
         # 6. --- GUARDAR EL ARCHIVO ---
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        if ruta_personalizada and os.path.exists(ruta_personalizada):
-            export_dir = ruta_personalizada
+        excel_path = self._ruta_exportacion(nombre_cliente, ruta_personalizada)
+
+        try:
+            workbook.save(excel_path)
+            if valores_calculados:
+                inject_cached_values(excel_path, sheet.title, valores_celdas)
+            print(f"Archivo Excel guardado en: {excel_path}")
+            return excel_path
+        except Exception as e:
+            print(f"Error al guardar el archivo Excel: {e}")
+            return None
+
+    # ===== EXPORTACIÓN POR CAPÍTULOS =====
+
+    @staticmethod
+    def _titulo_hoja(texto, usados):
+        """Nombre de hoja válido para Excel (31 caracteres, sin []:*?/\\) y no repetido."""
+        titulo = re.sub(r"[\[\]:*?/\\]", " ", texto).strip(" '")[:31].strip(" '") or "Hoja"
+        base = titulo
+        n = 2
+        while titulo.lower() in usados:
+            sufijo = f" ({n})"
+            titulo = base[:31 - len(sufijo)] + sufijo
+            n += 1
+        usados.add(titulo.lower())
+        return titulo
+
+    @staticmethod
+    def _referencia_hoja(titulo, celda):
+        return "'" + titulo.replace("'", "''") + "'!" + celda
+
+    def _generar_capitulos(self, tareas, procesos=None):
+        """
+        Genera las hojas de capítulo en orden.
+
+        Con presupuestos grandes cada hoja se escribe y serializa en un proceso
+        aparte (_generar_hoja_capitulo) y se entrega con su XML, mientras el
+        proceso principal sigue con las que ya están listas. Si no se pueden
+        crear procesos, el equipo tiene un solo núcleo o el presupuesto es
+        pequeño, se entregan las filas para escribirlas en el libro principal.
+        """
+        listos = 0
+        total_actividades = sum(len(tarea[2]) for tarea in tareas)
+        if len(tareas) > 1 and total_actividades >= self.UMBRAL_PARALELO and (os.cpu_count() or 1) > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=procesos) as executor:
+                    for capitulo in executor.map(_generar_hoja_capitulo, tareas):
+                        listos += 1
+                        yield capitulo
+                return
+            except (OSError, BrokenProcessPool) as e:
+                print(f"No se pudieron generar los capítulos en paralelo, se continúa en serie: {e}")
+        for indice, nombre, actividades, _, titulo, _ in tareas[listos:]:
+            capitulo = _preparar_hoja_capitulo(indice, nombre, actividades, self.pricing_engine)
+            capitulo['titulo'] = titulo
+            yield capitulo
+
+    def _escribir_hoja_capitulo(self, sheet, capitulo, estilos):
+        """Escribe la hoja de un capítulo: título, actividades y subtotal."""
+        for letra, ancho in self.ANCHOS_COLUMNAS.items():
+            sheet.column_dimensions[letra].width = ancho
+
+        sheet.append(self.ENCABEZADOS)
+        estilos.estilo_rango(1, 1, 1, 6, fuente='encabezado', relleno="008080", alineacion='centro')
+
+        sheet.append([f"{capitulo['indice']}.0 {capitulo['nombre'].upper()}"])
+        sheet.merge_cells(start_row=2, start_column=1, end_row=2, end_column=6)
+        estilos.estilo(2, 1, fuente='encabezado', relleno="004D40", alineacion='centro')
+
+        row_num = FILA_PRIMERA_ACTIVIDAD
+        for fila in capitulo['filas']:
+            sheet.append(fila)
+            for col in range(1, 7):
+                estilos.estilo(row_num, col, alineacion='descripcion' if col == 2 else 'centro',
+                               formato='moneda' if col >= 5 else None)
+            row_num += 1
+
+        self._insertar_subtotal_capitulo(sheet, row_num, FILA_PRIMERA_ACTIVIDAD, capitulo['indice'], estilos)
+        estilos.marco(1, row_num)
+        estilos.apply(sheet)
+        sheet.freeze_panes = f"A{FILA_PRIMERA_ACTIVIDAD}"
+
+    def _escribir_resumen(self, sheet, capitulos, estilos, aiu):
+        """
+        Escribe la hoja resumen: subtotal de cada capítulo (referencia a su hoja),
+        costos directos y el bloque de AIU/IVA.
+
+        Returns:
+            dict: Valores calculados de las celdas con fórmula
+        """
+        engine = self.pricing_engine
+        pricing = self.last_pricing
+        for letra, ancho in {'A': 8, 'B': 60, 'C': 14, 'D': 20}.items():
+            sheet.column_dimensions[letra].width = ancho
+
+        sheet.append(["Item", "Capítulo", "Actividades", "Total"])
+        estilos.estilo_rango(1, 1, 1, 4, fuente='encabezado', relleno="008080", alineacion='centro')
 
+        valores = {}
+        row_num = 2
+        for capitulo, titulo in capitulos:
+            sheet.append([f"{capitulo['indice']}.0", capitulo['nombre'], capitulo['num_actividades'],
+                          "=" + self._referencia_hoja(titulo, f"F{capitulo['subtotal_fila']}")])
+            valores[f"D{row_num}"] = capitulo['subtotal']
+            estilos.estilo(row_num, 1, alineacion='centro')
+            estilos.estilo(row_num, 2, alineacion='descripcion')
+            estilos.estilo(row_num, 3, alineacion='centro')
+            estilos.estilo(row_num, 4, alineacion='centro', formato='moneda')
+            row_num += 1
+
+        subtotal_row_num = row_num
+        filas_totales = [("TOTAL COSTOS DIRECTOS",
+                          f"=SUM(D2:D{subtotal_row_num - 1})" if capitulos else 0,
+                          pricing['costo_directo'], 'subtotal')]
+        if pricing['tipo_persona'] == "juridica":
+            util_row_num = subtotal_row_num + 3
+            iva_row_num = subtotal_row_num + 4
+            filas_totales += [
+                (f"ADMINISTRACIÓN ({aiu['administracion']}%)",
+                 "=" + engine.excel_formula(f"D{subtotal_row_num}*({aiu['administracion']}/100)"),
+                 pricing['administracion'], 'aiu'),
+                (f"IMPREVISTOS ({aiu['imprevistos']}%)",
+                 "=" + engine.excel_formula(f"D{subtotal_row_num}*({aiu['imprevistos']}/100)"),
+                 pricing['imprevistos'], 'aiu'),
+                (f"UTILIDAD ({aiu['utilidad']}%)",
+                 "=" + engine.excel_formula(f"D{subtotal_row_num}*({aiu['utilidad']}/100)"),
+                 pricing['utilidad'], 'aiu'),
+                (f"IVA SOBRE UTILIDAD ({aiu['iva_sobre_utilidad']}%)",
+                 "=" + engine.excel_formula(f"D{util_row_num}*({aiu['iva_sobre_utilidad']}/100)"),
+                 pricing['iva'], 'aiu'),
+                ("VALOR TOTAL COTIZACIÓN", f"=SUM(D{subtotal_row_num}:D{iva_row_num})", pricing['total'], 'total'),
+            ]
         else:
-            # Fallback a la carpeta local si no hay ruta seleccionada
-            export_dir = "exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
+            iva_row_num = subtotal_row_num + 1
+            filas_totales += [
+                (f"IVA ({aiu['iva_sobre_utilidad']}%)",
+                 "=" + engine.excel_formula(f"D{subtotal_row_num}*({aiu['iva_sobre_utilidad']}/100)"),
+                 pricing['iva'], 'iva'),
+                ("VALOR TOTAL COTIZACIÓN", f"=SUM(D{subtotal_row_num}, D{iva_row_num})", pricing['total'], 'total'),
+            ]
+
+        for etiqueta, formula, valor, tipo in filas_totales:
+            sheet.append([etiqueta, None, None, formula])
+            sheet.merge_cells(f"A{row_num}:C{row_num}")
+            if isinstance(formula, str):
+                valores[f"D{row_num}"] = valor
+            if tipo in ('subtotal', 'total'):
+                estilos.estilo_rango(row_num, row_num, 1, 4, fuente='encabezado', relleno="008080")
+            elif tipo == 'aiu':
+                estilos.estilo_rango(row_num, row_num, 1, 4, fuente='total', relleno="D9EAD3")
+            else:
+                estilos.estilo_rango(row_num, row_num, 1, 4, relleno="D9EAD3")
+            estilos.estilo(row_num, 1, alineacion='derecha')
+            estilos.estilo(row_num, 4, formato='moneda')
+            row_num += 1
+
+        estilos.marco(1, row_num - 1, 1, 4)
+        estilos.apply(sheet)
+        return valores
+
+    @instrumentado('excel.build_capitulos')
+    def generate_excel_por_capitulos(self, items, tipo_persona, administracion, imprevistos, utilidad, iva_utilidad,
+                                     nombre_cliente="", ruta_personalizada="", valores_calculados=True, procesos=None):
+        """
+        Genera un libro con una hoja resumen, una hoja por capítulo y una hoja de materiales.
 
-        safe_name = "".join(c for c in nombre_cliente if c.isalnum() or c in (" ", "_", "-")).strip()
-        safe_name = safe_name.replace(" ", "_")
+        Los subtotales del resumen son referencias a la hoja de cada capítulo,
+        de modo que el libro sigue siendo editable como el de una sola hoja.
+        Con presupuestos grandes las hojas de capítulo se escriben en procesos
+        aparte y se unen al libro final (ver _generar_capitulos).
 
-        # Construir la ruta final
-        filename = f"cotizacion_{safe_name}_{timestamp}.xlsx"
-        excel_path = os.path.join(export_dir, filename)
+        Args:
+            procesos (int): Máximo de procesos para escribir capítulos (None = núcleos del equipo)
 
+        Returns:
+            str: Ruta del archivo generado, o None si hubo error
+        """
+        engine = self.pricing_engine
+        aiu = {
+            'administracion': administracion,
+            'imprevistos': imprevistos,
+            'utilidad': utilidad,
+            'iva_sobre_utilidad': iva_utilidad
+        }
+        self.last_pricing = engine.price(items, tipo_persona, aiu)
+
+        # Agrupar actividades por capítulo; el 0 reúne las anteriores al primer capítulo
+        grupos = {0: ("SIN CAPÍTULO", [])}
+        indice = 0
+        for item in items:
+            if item['type'] == 'chapter':
+                indice += 1
+                grupos[indice] = (item['name'], [])
+            elif item['type'] == 'activity':
+                grupos[indice][1].append(item)
+        opciones = {'decimales': engine.decimales, 'redondeo': engine.redondeo,
+                    'redondear_lineas': engine.redondear_lineas}
+
+        workbook = openpyxl.Workbook()
+        registry = ExcelStyleRegistry.para_libro(workbook)
+        resumen = workbook.active
+        resumen.title = "Resumen"
+        usados = {resumen.title.lower()}
+        tareas = [(i, nombre, actividades, opciones, self._titulo_hoja(f"{i}.0 {nombre}", usados),
+                   valores_calculados)
+                  for i, (nombre, actividades) in grupos.items() if actividades]
+
+        valores_por_hoja = {}
+        hojas_unidas = {}
+        capitulos = []
+        for capitulo in self._generar_capitulos(tareas, procesos):
+            sheet = workbook.create_sheet(capitulo['titulo'])
+            if 'xml' in capitulo:
+                # Hoja generada en otro proceso: solo lleva sus estilos y se reemplaza por su XML
+                # al guardar, con los índices de estilo traducidos a los del libro final
+                nombres = {indice_xml: registry.nombre(*clave)
+                           for indice_xml, clave in capitulo['estilos'].items()}
+                use_named_styles(sheet, sorted(set(nombres.values())))
+                hojas_unidas[sheet.title] = (capitulo.pop('xml'), nombres)
+            else:
+                self._escribir_hoja_capitulo(sheet, capitulo, ExcelStylePlanner(workbook, registry))
+                valores_por_hoja[sheet.title] = capitulo['valores']
+            capitulos.append((capitulo, sheet.title))
+
+        valores_por_hoja[resumen.title] = self._escribir_resumen(
+            resumen, capitulos, ExcelStylePlanner(workbook, registry), aiu)
+
+        # Hoja de materiales a partir de los APU (actividad_producto)
+        if self.cotizacion_controller is not None:
+            materiales = self.cotizacion_controller.get_quotation_materials(items)
+            if materiales is not None:
+                sheet = workbook.create_sheet(self._titulo_hoja("Materiales", usados))
+                self.cotizacion_controller.material_rollup_manager.write_materials_sheet(
+                    sheet, materiales, f"LISTA DE MATERIALES - {nombre_cliente}" if nombre_cliente else None)
+
+        excel_path = self._ruta_exportacion(nombre_cliente, ruta_personalizada, prefijo="cotizacion_capitulos")
         try:
             workbook.save(excel_path)
-            print(f"Archivo Excel guardado en: {excel_path}")
+            transforms = {}
+            if hojas_unidas:
+                indices = named_style_indices(excel_path)
+                for titulo, (xml, nombres) in hojas_unidas.items():
+                    xml = remap_styles(xml, {indice_xml: indices[nombre] for indice_xml, nombre in nombres.items()})
+                    transforms[titulo] = lambda _, xml=xml: xml
+            if valores_calculados:
+                transforms.update({titulo: (lambda xml, valores=valores: fill_cached_values(xml, valores)[0])
+                                   for titulo, valores in valores_por_hoja.items()})
+            if not rewrite_sheets(excel_path, transforms):
+                return None
+            print(f"Archivo Excel por capítulos guardado en: {excel_path}")
             return excel_path
         except Exception as e:
             print(f"Error al guardar el archivo Excel: {e}")
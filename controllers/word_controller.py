@@ -2,6 +2,9 @@ from docx import Document
 import os
 import re
 from datetime import datetime
+from utils.instrumentation import get_logger, instrumentado
+
+logger = get_logger('word')
 
 
 
@@ -34,11 +37,10 @@ class WordController:
                 missing_templates.append(f"  - {name}: {path}")
 
         if missing_templates:
-            print("⚠️  ADVERTENCIA: Las siguientes plantillas no se encontraron:")
-            for template in missing_templates:
-                print(template)
-            print(f"\nAsegúrate de que estén en: {self.templates_dir}")
+            logger.warning("Las siguientes plantillas no se encontraron (deben estar en %s):\n%s",
+                           self.templates_dir, "\n".join(missing_templates))
 
+    @instrumentado('word.render')
     def generate_word_document(self, cotizacion_id, excel_path, datos_adicionales, formato='auto',
                                template_personalizada=None):
         """
@@ -178,6 +180,10 @@ class WordController:
             'operarios': 'Número de operarios',
             'plazo': 'Días de plazo de ejecución',
             'forma_pago': 'Forma de pago (se genera automáticamente según configuración)',
+            'costo_directo': 'Total costos directos',
+            'valor_aiu': 'Administración + imprevistos + utilidad (jurídica)',
+            'valor_iva': 'IVA de la cotización',
+            'valor_total': 'Valor total de la cotización',
             'tabla_cotizacion': 'Se reemplaza por imagen de la tabla de Excel'
         }
 
@@ -307,6 +313,16 @@ class WordController:
         if 'texto_forma_pago' in locals():
             replace_data['forma_pago'] = texto_forma_pago
 
+        # --- 4. Valores de la cotización (motor de precios) ---
+        totales = datos_adicionales.get('totales')
+        if totales:
+            replace_data.update({
+                'costo_directo': f"${totales['costo_directo']:,.2f}",
+                'valor_aiu': f"${totales['aiu_total']:,.2f}",
+                'valor_iva': f"${totales['iva']:,.2f}",
+                'valor_total': f"${totales['total']:,.2f}",
+            })
+
         return replace_data
 
     def _generate_document(self, template_path, replace_data):
@@ -355,7 +371,7 @@ class WordController:
             return output_path
 
         except Exception as e:
-            print(f"Error al generar el documento Word: {e}")
+            logger.error("Error al generar el documento Word: %s", e)
             raise
 
     def _replace_text_in_paragraph(self, paragraph, marker, content):
@@ -1,246 +1,178 @@
-import sqlite3
 import os
 
+from utils.database_manager import DatabaseManager
+
+# Datos de ejemplo. El esquema lo crean las migraciones (utils/schema_migrations.py)
+CATEGORIAS = [
+    'Pintura',
+    'Plomería',
+    'Electricidad',
+    'Albañilería',
+    'Carpintería'
+]
+
+# (descripción, unidad, valor unitario, categoría)
+ACTIVIDADES = [
+    ('Pintura interior', 'm²', 15000, 'Pintura'),
+    ('Pintura exterior', 'm²', 18000, 'Pintura'),
+    ('Instalación de tubería PVC', 'm', 25000, 'Plomería'),
+    ('Instalación de sanitario', 'und', 120000, 'Plomería'),
+    ('Instalación de lavamanos', 'und', 90000, 'Plomería'),
+    ('Instalación de cableado eléctrico', 'm', 12000, 'Electricidad'),
+    ('Instalación de tomacorrientes', 'und', 35000, 'Electricidad'),
+    ('Instalación de interruptores', 'und', 30000, 'Electricidad'),
+    ('Construcción de muro en ladrillo', 'm²', 85000, 'Albañilería'),
+    ('Instalación de piso cerámico', 'm²', 65000, 'Albañilería'),
+    ('Fabricación de mueble de cocina', 'm', 350000, 'Carpintería'),
+    ('Instalación de puerta', 'und', 180000, 'Carpintería')
+]
+
+# (nombre, descripción, unidad, precio unitario, categoría)
+PRODUCTOS = [
+    ('Pintura blanca', 'Pintura vinilo tipo 1', 'galón', 120000, 'Pintura'),
+    ('Pintura de colores', 'Pintura vinilo tipo 1', 'galón', 135000, 'Pintura'),
+    ('Rodillo', 'Rodillo para pintura', 'und', 15000, 'Pintura'),
+    ('Brocha', 'Brocha de 3 pulgadas', 'und', 8000, 'Pintura'),
+    ('Tubo PVC 1/2"', 'Tubo PVC para agua potable', 'm', 5000, 'Plomería'),
+    ('Codo PVC 1/2"', 'Codo PVC 90 grados', 'und', 1200, 'Plomería'),
+    ('Sanitario', 'Sanitario completo con tanque', 'und', 250000, 'Plomería'),
+    ('Lavamanos', 'Lavamanos de pedestal', 'und', 150000, 'Plomería'),
+    ('Cable #12', 'Cable eléctrico calibre 12', 'm', 3500, 'Electricidad'),
+    ('Tomacorriente', 'Tomacorriente doble', 'und', 12000, 'Electricidad'),
+    ('Interruptor', 'Interruptor sencillo', 'und', 10000, 'Electricidad'),
+    ('Ladrillo', 'Ladrillo farol', 'und', 1200, 'Albañilería'),
+    ('Cemento', 'Cemento gris', 'kg', 800, 'Albañilería'),
+    ('Arena', 'Arena de río', 'm³', 120000, 'Albañilería'),
+    ('Cerámica', 'Cerámica para piso', 'm²', 35000, 'Albañilería'),
+    ('Madera', 'Madera pino', 'm²', 45000, 'Carpintería'),
+    ('Tornillos', 'Tornillos para madera', 'und', 200, 'Carpintería'),
+    ('Bisagras', 'Bisagras para puerta', 'par', 8000, 'Carpintería'),
+    ('Puerta', 'Puerta de madera', 'und', 120000, 'Carpintería')
+]
+
+# (actividad, producto, cantidad)
+ACTIVIDAD_PRODUCTO = [
+    ('Pintura interior', 'Pintura blanca', 0.1),
+    ('Pintura interior', 'Rodillo', 0.02),
+    ('Pintura interior', 'Brocha', 0.01),
+    ('Pintura exterior', 'Pintura de colores', 0.12),
+    ('Pintura exterior', 'Rodillo', 0.02),
+    ('Pintura exterior', 'Brocha', 0.01),
+    ('Instalación de tubería PVC', 'Tubo PVC 1/2"', 1),
+    ('Instalación de tubería PVC', 'Codo PVC 1/2"', 0.2),
+    ('Instalación de sanitario', 'Sanitario', 1),
+    ('Instalación de lavamanos', 'Lavamanos', 1),
+    ('Instalación de cableado eléctrico', 'Cable #12', 1),
+    ('Instalación de tomacorrientes', 'Tomacorriente', 1),
+    ('Instalación de interruptores', 'Interruptor', 1),
+    ('Construcción de muro en ladrillo', 'Ladrillo', 50),
+    ('Construcción de muro en ladrillo', 'Cemento', 10),
+    ('Construcción de muro en ladrillo', 'Arena', 0.05),
+    ('Instalación de piso cerámico', 'Cerámica', 1),
+    ('Instalación de piso cerámico', 'Cemento', 5),
+    ('Fabricación de mueble de cocina', 'Madera', 2),
+    ('Fabricación de mueble de cocina', 'Tornillos', 50),
+    ('Instalación de puerta', 'Puerta', 1),
+    ('Instalación de puerta', 'Bisagras', 1.5)
+]
+
+# (actividad principal, actividad relacionada)
+ACTIVIDADES_RELACIONADAS = [
+    ('Pintura interior', 'Pintura exterior'),
+    ('Instalación de tubería PVC', 'Instalación de sanitario'),
+    ('Instalación de tubería PVC', 'Instalación de lavamanos'),
+    ('Instalación de cableado eléctrico', 'Instalación de tomacorrientes'),
+    ('Instalación de cableado eléctrico', 'Instalación de interruptores'),
+    ('Construcción de muro en ladrillo', 'Pintura interior'),
+    ('Instalación de piso cerámico', 'Construcción de muro en ladrillo'),
+    ('Fabricación de mueble de cocina', 'Instalación de puerta')
+]
+
+# (nombre, tipo, dirección, NIT, teléfono, email)
+CLIENTES = [
+    ('Juan Pérez', 'natural', 'Calle 123 #45-67', None, '3101234567', 'juan@example.com'),
+    ('María López', 'natural', 'Carrera 78 #90-12', None, '3109876543', 'maria@example.com'),
+    ('Constructora XYZ', 'jurídica', 'Avenida Principal #123', '900123456-7', '6011234567', 'info@constructoraxyz.com'),
+    ('Inmobiliaria ABC', 'jurídica', 'Calle Comercial #456', '800987654-3', '6019876543', 'contacto@inmobiliariaabc.com')
+]
+
+TABLAS_EJEMPLO = ('categorias', 'actividades', 'productos', 'actividad_producto', 'actividad_relacionada', 'clientes')
+
+
+def insertar_datos_ejemplo(cursor, tablas=TABLAS_EJEMPLO, solo_vacias=False):
+    """
+    Inserta los datos de ejemplo en una base con el esquema ya creado. No hace commit.
+
+    Args:
+        tablas (tuple): Tablas que se llenan
+        solo_vacias (bool): Llenar cada tabla solo si no tiene filas
+    """
+    def llenar(tabla):
+        if tabla not in tablas:
+            return False
+        if solo_vacias:
+            cursor.execute(f"SELECT COUNT(*) FROM {tabla}")
+            return cursor.fetchone()[0] == 0
+        return True
+
+    def ids(tabla, columna):
+        cursor.execute(f"SELECT id, {columna} FROM {tabla}")
+        return {valor: id for id, valor in cursor.fetchall()}
+
+    if llenar('categorias'):
+        cursor.executemany('INSERT OR IGNORE INTO categorias (nombre) VALUES (?)', [(c,) for c in CATEGORIAS])
+    categorias = ids('categorias', 'nombre')
+
+    if llenar('actividades'):
+        cursor.executemany(
+            'INSERT OR IGNORE INTO actividades (descripcion, unidad, valor_unitario, categoria_id) VALUES (?, ?, ?, ?)',
+            [(d, u, v, categorias.get(c)) for d, u, v, c in ACTIVIDADES])
+    if llenar('productos'):
+        cursor.executemany(
+            'INSERT OR IGNORE INTO productos (nombre, descripcion, unidad, precio_unitario, categoria_id) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(n, d, u, p, categorias.get(c)) for n, d, u, p, c in PRODUCTOS])
+    actividades = ids('actividades', 'descripcion')
+    productos = ids('productos', 'nombre')
+
+    if llenar('actividad_producto'):
+        cursor.executemany(
+            'INSERT OR IGNORE INTO actividad_producto (actividad_id, producto_id, cantidad) VALUES (?, ?, ?)',
+            [(actividades[a], productos[p], c) for a, p, c in ACTIVIDAD_PRODUCTO
+             if a in actividades and p in productos])
+    if llenar('actividad_relacionada'):
+        cursor.executemany(
+            'INSERT OR IGNORE INTO actividad_relacionada (actividad_principal_id, actividad_relacionada_id) '
+            'VALUES (?, ?)',
+            [(actividades[a], actividades[r]) for a, r in ACTIVIDADES_RELACIONADAS
+             if a in actividades and r in actividades])
+    if llenar('clientes'):
+        cursor.executemany(
+            'INSERT OR IGNORE INTO clientes (nombre, tipo, direccion, nit, telefono, email) VALUES (?, ?, ?, ?, ?, ?)',
+            CLIENTES)
+
+
+def poblar_base(db_path, tablas=TABLAS_EJEMPLO, solo_vacias=False):
+    """Crea o actualiza el esquema de la base (migraciones) y le agrega los datos de ejemplo."""
+    db = DatabaseManager(db_path)
+    try:
+        cursor = db.connection.cursor()
+        insertar_datos_ejemplo(cursor, tablas, solo_vacias)
+        # Precio inicial en el historial para los ítems de ejemplo
+        db.create_price_history_table(cursor)
+        db.connection.commit()
+    finally:
+        db.close()
+
+
 def init_db():
     """Inicializa la base de datos con tablas y datos de ejemplo"""
     # Verificar si existe el directorio data
     if not os.path.exists('data'):
         os.makedirs('data')
-    
-    # Conectar a la base de datos (la crea si no existe)
-    conn = sqlite3.connect('data/cotizaciones.db')
-    cursor = conn.cursor()
-    
-    # Crear tablas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS clientes (
-        id INTEGER PRIMARY KEY,
-        nombre TEXT NOT NULL,
-        tipo TEXT NOT NULL,
-        direccion TEXT,
-        nit TEXT,
-        telefono TEXT,
-        email TEXT
-    )
-    ''')
-    
-    # Crear tabla de categorías
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS categorias (
-        id INTEGER PRIMARY KEY,
-        nombre TEXT NOT NULL,
-        descripcion TEXT
-    )
-    ''')
-    
-    # Crear tabla de actividades con referencia a categoría
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS actividades (
-        id INTEGER PRIMARY KEY,
-        descripcion TEXT NOT NULL,
-        unidad TEXT NOT NULL,
-        valor_unitario REAL NOT NULL,
-        categoria_id INTEGER,
-        FOREIGN KEY (categoria_id) REFERENCES categorias (id)
-    )
-    ''')
-    
-    # Crear tabla de productos
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS productos (
-        id INTEGER PRIMARY KEY,
-        nombre TEXT NOT NULL,
-        descripcion TEXT,
-        unidad TEXT NOT NULL,
-        precio_unitario REAL NOT NULL,
-        categoria_id INTEGER,
-        FOREIGN KEY (categoria_id) REFERENCES categorias (id)
-    )
-    ''')
-    
-    # Crear tabla de relación entre actividades y productos
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS actividad_producto (
-        id INTEGER PRIMARY KEY,
-        actividad_id INTEGER NOT NULL,
-        producto_id INTEGER NOT NULL,
-        cantidad REAL NOT NULL,
-        FOREIGN KEY (actividad_id) REFERENCES actividades (id),
-        FOREIGN KEY (producto_id) REFERENCES productos (id)
-    )
-    ''')
-    
-    # Crear tabla de relaciones entre actividades
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS actividad_relacionada (
-        id INTEGER PRIMARY KEY,
-        actividad_principal_id INTEGER NOT NULL,
-        actividad_relacionada_id INTEGER NOT NULL,
-        FOREIGN KEY (actividad_principal_id) REFERENCES actividades (id),
-        FOREIGN KEY (actividad_relacionada_id) REFERENCES actividades (id)
-    )
-    ''')
-    
-    # Crear tabla de cotizaciones
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS cotizaciones (
-        id INTEGER PRIMARY KEY,
-        numero TEXT NOT NULL,
-        fecha TEXT NOT NULL,
-        cliente_id INTEGER NOT NULL,
-        subtotal REAL NOT NULL,
-        iva REAL NOT NULL,
-        total REAL NOT NULL,
-        administracion REAL,
-        imprevistos REAL,
-        utilidad REAL,
-        iva_utilidad REAL,
-        FOREIGN KEY (cliente_id) REFERENCES clientes (id)
-    )
-    ''')
-    
-    # Crear tabla de detalles de cotización (actividades incluidas)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS cotizacion_detalles (
-        id INTEGER PRIMARY KEY,
-        cotizacion_id INTEGER NOT NULL,
-        actividad_id INTEGER NOT NULL,
-        cantidad REAL NOT NULL,
-        valor_unitario REAL NOT NULL,
-        total REAL NOT NULL,
-        FOREIGN KEY (cotizacion_id) REFERENCES cotizaciones (id),
-        FOREIGN KEY (actividad_id) REFERENCES actividades (id)
-    )
-    ''')
-    
-    # Insertar datos de ejemplo para categorías
-    categorias = [
-        ('Pintura', 'Trabajos de pintura y acabados'),
-        ('Plomería', 'Instalaciones y reparaciones de plomería'),
-        ('Electricidad', 'Instalaciones y reparaciones eléctricas'),
-        ('Albañilería', 'Trabajos de construcción y reparación'),
-        ('Carpintería', 'Trabajos en madera y muebles')
-    ]
-    
-    for categoria in categorias:
-        cursor.execute('INSERT OR IGNORE INTO categorias (nombre, descripcion) VALUES (?, ?)', categoria)
-    
-    # Obtener IDs de categorías
-    cursor.execute('SELECT id, nombre FROM categorias')
-    categorias_dict = {nombre: id for id, nombre in cursor.fetchall()}
-    
-    # Insertar datos de ejemplo para actividades
-    actividades = [
-        ('Pintura interior', 'm²', 15000, categorias_dict['Pintura']),
-        ('Pintura exterior', 'm²', 18000, categorias_dict['Pintura']),
-        ('Instalación de tubería PVC', 'm', 25000, categorias_dict['Plomería']),
-        ('Instalación de sanitario', 'und', 120000, categorias_dict['Plomería']),
-        ('Instalación de lavamanos', 'und', 90000, categorias_dict['Plomería']),
-        ('Instalación de cableado eléctrico', 'm', 12000, categorias_dict['Electricidad']),
-        ('Instalación de tomacorrientes', 'und', 35000, categorias_dict['Electricidad']),
-        ('Instalación de interruptores', 'und', 30000, categorias_dict['Electricidad']),
-        ('Construcción de muro en ladrillo', 'm²', 85000, categorias_dict['Albañilería']),
-        ('Instalación de piso cerámico', 'm²', 65000, categorias_dict['Albañilería']),
-        ('Fabricación de mueble de cocina', 'm', 350000, categorias_dict['Carpintería']),
-        ('Instalación de puerta', 'und', 180000, categorias_dict['Carpintería'])
-    ]
-    
-    for actividad in actividades:
-        cursor.execute('INSERT OR IGNORE INTO actividades (descripcion, unidad, valor_unitario, categoria_id) VALUES (?, ?, ?, ?)', actividad)
-    
-    # Obtener IDs de actividades
-    cursor.execute('SELECT id, descripcion FROM actividades')
-    actividades_dict = {descripcion: id for id, descripcion in cursor.fetchall()}
-    
-    # Insertar datos de ejemplo para productos
-    productos = [
-        ('Pintura blanca', 'Pintura vinilo tipo 1', 'galón', 120000, categorias_dict['Pintura']),
-        ('Pintura de colores', 'Pintura vinilo tipo 1', 'galón', 135000, categorias_dict['Pintura']),
-        ('Rodillo', 'Rodillo para pintura', 'und', 15000, categorias_dict['Pintura']),
-        ('Brocha', 'Brocha de 3 pulgadas', 'und', 8000, categorias_dict['Pintura']),
-        ('Tubo PVC 1/2"', 'Tubo PVC para agua potable', 'm', 5000, categorias_dict['Plomería']),
-        ('Codo PVC 1/2"', 'Codo PVC 90 grados', 'und', 1200, categorias_dict['Plomería']),
-        ('Sanitario', 'Sanitario completo con tanque', 'und', 250000, categorias_dict['Plomería']),
-        ('Lavamanos', 'Lavamanos de pedestal', 'und', 150000, categorias_dict['Plomería']),
-        ('Cable #12', 'Cable eléctrico calibre 12', 'm', 3500, categorias_dict['Electricidad']),
-        ('Tomacorriente', 'Tomacorriente doble', 'und', 12000, categorias_dict['Electricidad']),
-        ('Interruptor', 'Interruptor sencillo', 'und', 10000, categorias_dict['Electricidad']),
-        ('Ladrillo', 'Ladrillo farol', 'und', 1200, categorias_dict['Albañilería']),
-        ('Cemento', 'Cemento gris', 'kg', 800, categorias_dict['Albañilería']),
-        ('Arena', 'Arena de río', 'm³', 120000, categorias_dict['Albañilería']),
-        ('Cerámica', 'Cerámica para piso', 'm²', 35000, categorias_dict['Albañilería']),
-        ('Madera', 'Madera pino', 'm²', 45000, categorias_dict['Carpintería']),
-        ('Tornillos', 'Tornillos para madera', 'und', 200, categorias_dict['Carpintería']),
-        ('Bisagras', 'Bisagras para puerta', 'par', 8000, categorias_dict['Carpintería']),
-        ('Puerta', 'Puerta de madera', 'und', 120000, categorias_dict['Carpintería'])
-    ]
-    
-    for producto in productos:
-        cursor.execute('INSERT OR IGNORE INTO productos (nombre, descripcion, unidad, precio_unitario, categoria_id) VALUES (?, ?, ?, ?, ?)', producto)
-    
-    # Obtener IDs de productos
-    cursor.execute('SELECT id, nombre FROM productos')
-    productos_dict = {nombre: id for id, nombre in cursor.fetchall()}
-    
-    # Insertar relaciones entre actividades y productos
-    relaciones_actividad_producto = [
-        (actividades_dict['Pintura interior'], productos_dict['Pintura blanca'], 0.1),
-        (actividades_dict['Pintura interior'], productos_dict['Rodillo'], 0.02),
-        (actividades_dict['Pintura interior'], productos_dict['Brocha'], 0.01),
-        (actividades_dict['Pintura exterior'], productos_dict['Pintura de colores'], 0.12),
-        (actividades_dict['Pintura exterior'], productos_dict['Rodillo'], 0.02),
-        (actividades_dict['Pintura exterior'], productos_dict['Brocha'], 0.01),
-        (actividades_dict['Instalación de tubería PVC'], productos_dict['Tubo PVC 1/2"'], 1),
-        (actividades_dict['Instalación de tubería PVC'], productos_dict['Codo PVC 1/2"'], 0.2),
-        (actividades_dict['Instalación de sanitario'], productos_dict['Sanitario'], 1),
-        (actividades_dict['Instalación de lavamanos'], productos_dict['Lavamanos'], 1),
-        (actividades_dict['Instalación de cableado eléctrico'], productos_dict['Cable #12'], 1),
-        (actividades_dict['Instalación de tomacorrientes'], productos_dict['Tomacorriente'], 1),
-        (actividades_dict['Instalación de interruptores'], productos_dict['Interruptor'], 1),
-        (actividades_dict['Construcción de muro en ladrillo'], productos_dict['Ladrillo'], 50),
-        (actividades_dict['Construcción de muro en ladrillo'], productos_dict['Cemento'], 10),
-        (actividades_dict['Construcción de muro en ladrillo'], productos_dict['Arena'], 0.05),
-        (actividades_dict['Instalación de piso cerámico'], productos_dict['Cerámica'], 1),
-        (actividades_dict['Instalación de piso cerámico'], productos_dict['Cemento'], 5),
-        (actividades_dict['Fabricación de mueble de cocina'], productos_dict['Madera'], 2),
-        (actividades_dict['Fabricación de mueble de cocina'], productos_dict['Tornillos'], 50),
-        (actividades_dict['Instalación de puerta'], productos_dict['Puerta'], 1),
-        (actividades_dict['Instalación de puerta'], productos_dict['Bisagras'], 1.5)
-    ]
-    
-    for relacion in relaciones_actividad_producto:
-        cursor.execute('INSERT OR IGNORE INTO actividad_producto (actividad_id, producto_id, cantidad) VALUES (?, ?, ?)', relacion)
-    
-    # Insertar relaciones entre actividades
-    relaciones_actividades = [
-        (actividades_dict['Pintura interior'], actividades_dict['Pintura exterior']),
-        (actividades_dict['Instalación de tubería PVC'], actividades_dict['Instalación de sanitario']),
-        (actividades_dict['Instalación de tubería PVC'], actividades_dict['Instalación de lavamanos']),
-        (actividades_dict['Instalación de cableado eléctrico'], actividades_dict['Instalación de tomacorrientes']),
-        (actividades_dict['Instalación de cableado eléctrico'], actividades_dict['Instalación de interruptores']),
-        (actividades_dict['Construcción de muro en ladrillo'], actividades_dict['Pintura interior']),
-        (actividades_dict['Instalación de piso cerámico'], actividades_dict['Construcción de muro en ladrillo']),
-        (actividades_dict['Fabricación de mueble de cocina'], actividades_dict['Instalación de puerta'])
-    ]
-    
-    for relacion in relaciones_actividades:
-        cursor.execute('INSERT OR IGNORE INTO actividad_relacionada (actividad_principal_id, actividad_relacionada_id) VALUES (?, ?)', relacion)
-    
-    # Insertar datos de ejemplo para clientes
-    clientes = [
-        ('Juan Pérez', 'natural', 'Calle 123 #45-67', None, '3101234567', 'juan@example.com'),
-        ('María López', 'natural', 'Carrera 78 #90-12', None, '3109876543', 'maria@example.com'),
-        ('Constructora XYZ', 'jurídica', 'Avenida Principal #123', '900123456-7', '6011234567', 'info@constructoraxyz.com'),
-        ('Inmobiliaria ABC', 'jurídica', 'Calle Comercial #456', '800987654-3', '6019876543', 'contacto@inmobiliariaabc.com')
-    ]
-    
-    for cliente in clientes:
-        cursor.execute('INSERT OR IGNORE INTO clientes (nombre, tipo, direccion, nit, telefono, email) VALUES (?, ?, ?, ?, ?, ?)', cliente)
-    
-    # Guardar cambios y cerrar conexión
-    conn.commit()
-    conn.close()
-    
+
+    poblar_base('data/cotizaciones.db')
+
     print("Base de datos inicializada correctamente con datos de ejemplo.")
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 
+import multiprocessing
 import os
 import sys
 
@@ -8,6 +9,8 @@ from PyQt5.QtWidgets import QApplication
 # Importaciones de los componentes de la aplicación
 from utils.database_manager import DatabaseManager
 from utils.aiu_manager import AIUManager
+from utils.instrumentation import configure as configure_instrumentation
+from utils.sql_profiler import configure as configure_sql_profiler
 from controllers.cotizacion_controller import CotizacionController
 from controllers.excel_controller import ExcelController
 from views.main_window import MainWindow
@@ -40,6 +43,11 @@ def main():
     """
     Función principal que configura e inicia la aplicación de cotizaciones.
     """
+    # Logs de la aplicación y medición de tiempos (sección 'instrumentacion' de config.json)
+    configure_instrumentation()
+    # Perfil de consultas SQL y registro de consultas lentas (sección 'perfil_sql')
+    configure_sql_profiler()
+
     # --- 1. Configuración de Rutas y Verificación de la Base de Datos ---
     # Construir una ruta robusta al archivo de la base de datos
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -87,4 +95,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Necesario para los procesos del Excel por capítulos en el ejecutable empaquetado
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -3,7 +3,7 @@ from datetime import date
 from typing import List
 from .cliente import Cliente
 from .actividad import Actividad
-from utils.aiu_manager import AIUManager
+from utils.pricing_engine import get_pricing_engine
 
 
 @dataclass
@@ -20,28 +20,30 @@ class Cotizacion:
     utilidad: float = 5
     iva_utilidad: float = 19
     
-    def __post_init__(self):
-        # Inicializar el gestor AIU con los valores proporcionados
-        self.aiu_manager = AIUManager(
-            administracion=self.administracion,
-            imprevistos=self.imprevistos,
-            utilidad=self.utilidad,
-            iva_sobre_utilidad=self.iva_utilidad
+    def _aiu_values(self):
+        return {
+            'administracion': self.administracion,
+            'imprevistos': self.imprevistos,
+            'utilidad': self.utilidad,
+            'iva_sobre_utilidad': self.iva_utilidad
+        }
+
+    def _price(self):
+        """Calcula la cotización con el motor de precios compartido"""
+        engine = get_pricing_engine()
+        return engine.price_arrays(
+            [actividad.cantidad for actividad in self.actividades],
+            [actividad.valor_unitario for actividad in self.actividades],
+            [0] * len(self.actividades),
+            self.cliente.tipo,
+            self._aiu_values()
         )
 
     def calcular_total(self):
-        # Calcular el subtotal sumando el valor total de cada actividad
-        self.subtotal = sum(actividad.valor_total for actividad in self.actividades)
-        
-        # Aplicar AIU si el cliente es jurídico
-        if self.cliente.tipo == 'jurídica':
-            admin_value, imprevistos_value, utilidad_value, iva_value = self.aiu_manager.calcular_aiu(self.subtotal)
-            self.total = self.subtotal + admin_value + imprevistos_value + utilidad_value + iva_value
-        else:
-            # Para clientes naturales, solo aplicar IVA general
-            self.iva = self.subtotal * (self.iva_utilidad / 100)
-            self.total = self.subtotal + self.iva
-        
+        resultado = self._price()
+        self.subtotal = float(resultado['costo_directo'])
+        self.iva = float(resultado['iva'])
+        self.total = float(resultado['total'])
         return self.total
     
     def actualizar_valores_aiu(self, administracion, imprevistos, utilidad, iva_utilidad):
@@ -51,32 +53,29 @@ class Cotizacion:
         self.utilidad = utilidad
         self.iva_utilidad = iva_utilidad
         
-        # Actualizar el gestor AIU
-        self.aiu_manager.modificar_aiu(administracion, imprevistos, utilidad, iva_utilidad)
-        
         # Recalcular totales
         return self.calcular_total()
     
     def obtener_desglose(self):
         """Retorna un desglose detallado de los valores de la cotización"""
+        resultado = self._price()
         desglose = {
-            'subtotal': self.subtotal,
-            'iva': self.iva,
-            'total': self.total
+            'subtotal': float(resultado['costo_directo']),
+            'iva': float(resultado['iva']),
+            'total': float(resultado['total'])
         }
         
         # Si es cliente jurídico, incluir desglose de AIU
-        if self.cliente.tipo == 'jurídica':
-            admin_value, imprevistos_value, utilidad_value, iva_value = self.aiu_manager.calcular_aiu(self.subtotal)
+        if resultado['tipo_persona'] == 'juridica':
             desglose.update({
                 'administracion_porcentaje': self.administracion,
-                'administracion_valor': admin_value,
+                'administracion_valor': float(resultado['administracion']),
                 'imprevistos_porcentaje': self.imprevistos,
-                'imprevistos_valor': imprevistos_value,
+                'imprevistos_valor': float(resultado['imprevistos']),
                 'utilidad_porcentaje': self.utilidad,
-                'utilidad_valor': utilidad_value,
+                'utilidad_valor': float(resultado['utilidad']),
                 'iva_utilidad_porcentaje': self.iva_utilidad,
-                'iva_utilidad_valor': iva_value
+                'iva_utilidad_valor': float(resultado['iva'])
             })
         
         return desglose
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database_manager import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """DatabaseManager sobre una base temporal, con las migraciones aplicadas."""
+    # config.json y las rutas relativas se buscan en el directorio temporal, no en el del proyecto
+    monkeypatch.chdir(tmp_path)
+    manager = DatabaseManager(str(tmp_path / 'data' / 'cotizaciones.db'))
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def hora_colombia(monkeypatch):
+    """Zona horaria local UTC-5 (sin horario de verano) durante la prueba."""
+    import time
+    if not hasattr(time, 'tzset'):
+        pytest.skip("time.tzset no está disponible en esta plataforma")
+    monkeypatch.setenv('TZ', 'America/Bogota')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
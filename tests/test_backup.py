@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+from utils import backup_manager
+from utils.backup_manager import BackupCancelado, BackupManager, copiar_base_datos, verificar_integridad
+
+
+@pytest.fixture
+def origen(tmp_path):
+    ruta = str(tmp_path / 'origen.db')
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("CREATE TABLE datos (id INTEGER PRIMARY KEY, texto TEXT)")
+    conexion.executemany("INSERT INTO datos (texto) VALUES (?)", [('x' * 500,) for _ in range(2000)])
+    conexion.commit()
+    conexion.close()
+    return ruta
+
+
+def _filas(ruta):
+    conexion = sqlite3.connect(ruta)
+    try:
+        return conexion.execute("SELECT COUNT(*) FROM datos").fetchone()[0]
+    finally:
+        conexion.close()
+
+
+@pytest.mark.parametrize('max_reinicios, max_escrituras', [(3, 10), (10 ** 6, 200)])
+def test_copia_termina_aunque_la_base_se_escriba_en_cada_paso(origen, tmp_path, monkeypatch,
+                                                               max_reinicios, max_escrituras):
+    # Sin límite de reinicios la copia se corta por el límite de pasos
+    monkeypatch.setattr(backup_manager, 'MAX_REINICIOS', max_reinicios)
+    escritor = sqlite3.connect(origen)
+    escrituras = []
+
+    def escribir(copiadas, total):
+        # Otra conexión escribe entre cada paso: SQLite reinicia la copia desde el principio
+        if len(escrituras) < 1000:
+            escritor.execute("INSERT INTO datos (texto) VALUES ('y')")
+            escritor.commit()
+            escrituras.append(copiadas)
+
+    destino = str(tmp_path / 'copia.db')
+    try:
+        copiar_base_datos(origen, destino, paginas_por_lote=8, progreso=escribir)
+    finally:
+        escritor.close()
+
+    assert len(escrituras) < max_escrituras
+    assert verificar_integridad(destino) == []
+    assert _filas(destino) >= 2000
+
+
+def test_backup_comprimido_rota_generaciones_y_restaura(origen, tmp_path):
+    directorio = tmp_path / 'respaldos'
+    directorio.mkdir()
+    for marca in ('20250101_000000', '20250102_000000'):
+        (directorio / f'origen_{marca}.db.gz').write_bytes(b'')
+    (directorio / 'otra_20250101_000000.db').write_bytes(b'')
+    gestor = BackupManager(origen, directorio=str(directorio), generaciones=2, comprimir=True,
+                           paginas_por_lote=16, pausa=0)
+
+    ruta = gestor.backup()['ruta']
+
+    assert ruta.endswith('.db.gz')
+    assert [r['ruta'] for r in gestor.list_backups()] == [ruta, str(directorio / 'origen_20250102_000000.db.gz')]
+    assert (directorio / 'otra_20250101_000000.db').exists()
+    restaurada = str(tmp_path / 'restaurada.db')
+    gestor.restore(ruta, destino=restaurada)
+    assert _filas(restaurada) == 2000
+
+
+def test_cancelar_no_deja_archivos(origen, tmp_path):
+    destino = tmp_path / 'respaldos' / 'copia.db'
+    with pytest.raises(BackupCancelado):
+        copiar_base_datos(origen, str(destino), paginas_por_lote=8, cancelado=lambda: True)
+    assert list((tmp_path / 'respaldos').iterdir()) == []
@@ -0,0 +1,32 @@
+import openpyxl
+
+from controllers.excel_controller import ExcelController
+from utils.excel_styles import ExcelStyleRegistry
+
+
+def test_helpers_de_bordes_se_pueden_llamar_varias_veces_sobre_un_libro():
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    controller = ExcelController(None, None)
+
+    controller.bordes_marco_con_interior(sheet, 1, 3)
+    controller.bordes_marco_con_interior(sheet, 5, 7)
+    controller.aplicar_bordes_totales(sheet, 9, 10, "D9EAD3")
+
+    # El mismo marco en otro lugar reutiliza los mismos estilos
+    assert sheet['A1'].style == sheet['A5'].style
+    assert len(workbook.named_styles) == len(set(workbook.named_styles))
+
+
+def test_registro_no_repite_nombres_de_un_libro_guardado(tmp_path):
+    workbook = openpyxl.Workbook()
+    registro = ExcelStyleRegistry.para_libro(workbook)
+    assert ExcelStyleRegistry.para_libro(workbook) is registro
+    workbook.active['A1'].style = registro.nombre(fuente='total')
+    ruta = tmp_path / 'libro.xlsx'
+    workbook.save(ruta)
+
+    abierto = openpyxl.load_workbook(ruta)
+    nombre = ExcelStyleRegistry.para_libro(abierto).nombre(fuente='encabezado')
+
+    assert nombre != 'cot_1' and abierto.named_styles.count(nombre) == 1
@@ -0,0 +1,64 @@
+import pytest
+
+from utils.pipeline import Pipeline
+
+
+@pytest.fixture(autouse=True)
+def en_directorio_temporal(tmp_path, monkeypatch):
+    # Las huellas se guardan en data/cache/pipeline relativo al directorio de trabajo
+    monkeypatch.chdir(tmp_path)
+
+
+def _escribir(ruta, texto, llamadas):
+    llamadas.append(ruta)
+    with open(ruta, 'w') as f:
+        f.write(texto)
+
+
+def _correr(salida, llamadas, **opciones):
+    pipeline = Pipeline('prueba', max_procesos=1)
+    pipeline.agregar('generar', _escribir, (str(salida), 'x', llamadas), salidas=[str(salida)], **opciones)
+    return pipeline.ejecutar()['generar'].estado
+
+
+def test_etapa_sin_entradas_se_repite(tmp_path):
+    llamadas = []
+    salida = tmp_path / 'salida.txt'
+
+    assert _correr(salida, llamadas) == 'ok'
+    assert _correr(salida, llamadas) == 'ok'
+    assert len(llamadas) == 2
+
+
+def test_version_decide_si_la_etapa_se_repite(tmp_path):
+    llamadas = []
+    salida = tmp_path / 'salida.txt'
+
+    assert _correr(salida, llamadas, version={'titulo': 'A'}) == 'ok'
+    assert _correr(salida, llamadas, version={'titulo': 'A'}) == 'omitida'
+    assert _correr(salida, llamadas, version={'titulo': 'B'}) == 'ok'
+    assert _correr(salida, llamadas, version={'titulo': 'B'}, siempre=True) == 'ok'
+    assert len(llamadas) == 3
+
+
+def test_etapa_con_entradas_vigentes_se_omite_y_las_dependientes_se_bloquean(tmp_path):
+    entrada = tmp_path / 'entrada.txt'
+    entrada.write_text('datos')
+    salida = tmp_path / 'salida.txt'
+    llamadas = []
+
+    def fallar():
+        raise RuntimeError("sin datos")
+
+    pipeline = Pipeline('prueba', max_procesos=1)
+    pipeline.agregar('copiar', _escribir, (str(salida), 'x', llamadas), entradas=[str(entrada)],
+                     salidas=[str(salida)])
+    pipeline.agregar('fallar', fallar, entradas=[str(salida)], salidas=[str(tmp_path / 'otra.txt')])
+    pipeline.agregar('final', _escribir, (str(tmp_path / 'final.txt'), 'x', llamadas),
+                     depende=['fallar'], siempre=True)
+    primera = pipeline.ejecutar()
+    segunda = pipeline.ejecutar()
+
+    assert [r.estado for r in primera.values()] == ['ok', 'error', 'bloqueada']
+    assert segunda['copiar'].estado == 'omitida'
+    assert len(llamadas) == 1
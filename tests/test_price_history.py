@@ -0,0 +1,60 @@
+import sqlite3
+from datetime import date, datetime, timezone
+
+from utils.price_history_manager import PriceHistoryManager
+
+
+def _registrar(db, actividad_id, precio, fecha_utc):
+    cursor = db.connection.cursor()
+    db._record_price_change(cursor, 'actividad', actividad_id, precio, fecha=fecha_utc)
+    db.connection.commit()
+
+
+def test_fechas_sin_zona_se_toman_en_hora_local(hora_colombia):
+    timestamp = PriceHistoryManager._price_timestamp
+    assert timestamp(datetime(2025, 3, 1, 20, 0)) == '2025-03-02 01:00:00'
+    assert timestamp(date(2025, 3, 1)) == '2025-03-02 04:59:59'
+    assert timestamp('2025-03-01') == '2025-03-02 04:59:59'
+    assert timestamp(date(2025, 3, 1), fin_del_dia=False) == '2025-03-01 05:00:00'
+    # Con zona explícita o como cadena con hora (formato de la base) ya es UTC
+    assert timestamp(datetime(2025, 3, 1, 20, 0, tzinfo=timezone.utc)) == '2025-03-01 20:00:00'
+    assert timestamp('2025-03-01 20:00:00') == '2025-03-01 20:00:00'
+
+
+def test_precios_del_mismo_dia_en_hora_local(db, hora_colombia):
+    actividad_id = db.add_activity('Muro en ladrillo', 'm2', 100)
+    # 09:00 y 17:00 hora de Colombia
+    _registrar(db, actividad_id, 120, '2025-03-01 14:00:00')
+    _registrar(db, actividad_id, 150, '2025-03-01 22:00:00')
+
+    assert db.get_price_as_of('actividad', actividad_id, datetime(2025, 3, 1, 12, 0)) == 120
+    assert db.get_price_as_of('actividad', actividad_id, datetime(2025, 3, 1, 18, 0)) == 150
+    assert db.get_price_as_of('actividad', actividad_id, date(2025, 3, 1)) == 150
+
+
+def test_catalogo_historico_sin_items_posteriores_y_con_eliminados(db):
+    antigua = db.add_activity('Pintura interior', 'm2', 100)
+    eliminada = db.add_activity('Pintura exterior', 'm2', 200)
+    db.connection.execute("UPDATE historial_precios SET valido_desde = '2024-01-01 00:00:00'")
+    db.connection.commit()
+    db.delete_activity(eliminada)
+    db.add_activity('Instalación de puerta', 'und', 300)
+
+    catalogo = {a['id']: a for a in db.get_catalog_as_of(date(2024, 6, 1))}
+
+    assert set(catalogo) == {antigua, eliminada}
+    assert catalogo[antigua]['valor_unitario'] == 100 and not catalogo[antigua]['eliminado']
+    assert catalogo[eliminada]['eliminado']
+
+
+def test_eliminar_actividad_revierte_si_falla_el_historial(db, monkeypatch):
+    actividad_id = db.add_activity('Pintura interior', 'm2', 100)
+
+    def falla(*args, **kwargs):
+        raise sqlite3.OperationalError("fallo simulado")
+
+    monkeypatch.setattr(db, '_close_price_history', falla)
+    assert db.delete_activity(actividad_id) is False
+    db.connection.commit()
+
+    assert [a['id'] for a in db.get_all_activities()] == [actividad_id]
@@ -0,0 +1,62 @@
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+
+import pytest
+
+from utils.pricing_engine import PricingEngine
+
+
+def _filas():
+    return [
+        {'type': 'activity', 'cantidad': '3', 'valor_unitario': '0.1'},
+        {'type': 'chapter', 'name': 'Cimentación'},
+        {'type': 'activity', 'cantidad': 2.5, 'valor_unitario': '$1,000.05'},
+        {'type': 'chapter_header', 'descripcion': 'Cubierta'},
+        {'type': 'activity', 'cantidad': 1, 'valor_unitario': 99.995},
+    ]
+
+
+def test_totales_exactos_por_capitulo():
+    resultado = PricingEngine().price(_filas(), 'Natural')
+
+    assert resultado['lineas'] == [Decimal('0.30'), Decimal('2500.13'), Decimal('100.00')]
+    assert [(c['indice'], c['nombre'], c['subtotal']) for c in resultado['capitulos']] == [
+        (0, '', Decimal('0.30')), (1, 'Cimentación', Decimal('2500.13')), (2, 'Cubierta', Decimal('100.00'))]
+    assert resultado['costo_directo'] == Decimal('2600.43')
+    assert resultado['iva'] == Decimal('494.08')
+    assert resultado['total'] == Decimal('3094.51')
+
+
+def test_aiu_de_persona_juridica():
+    aiu = {'administracion': 10, 'imprevistos': 5, 'utilidad': 5, 'iva_sobre_utilidad': 19}
+    resultado = PricingEngine().price_arrays([1], [1000], [0], 'Jurídica', aiu)
+
+    assert (resultado['administracion'], resultado['imprevistos'], resultado['utilidad'], resultado['iva']) == (
+        Decimal('100.00'), Decimal('50.00'), Decimal('50.00'), Decimal('9.50'))
+    assert resultado['total'] == Decimal('1209.50')
+
+
+@pytest.mark.parametrize('redondeo, esperado', [('half_up', ['0.13', '0.14', '-0.13']),
+                                                 ('half_even', ['0.12', '0.14', '-0.12']),
+                                                 ('down', ['0.12', '0.13', '-0.12'])])
+def test_modos_de_redondeo(redondeo, esperado):
+    engine = PricingEngine(redondeo=redondeo)
+    assert [str(engine.round(Decimal(v))) for v in ('0.125', '0.135', '-0.125')] == esperado
+
+
+def _evaluar_formula_par(valor, decimales):
+    """La fórmula de Excel de half_even evaluada con Decimal."""
+    escala = Decimal(10) ** decimales
+    cuantos = Decimal(1).scaleb(-decimales)
+    resto = (abs(valor) * escala).quantize(Decimal('0.000001'), rounding=ROUND_HALF_UP) % 2
+    modo = ROUND_DOWN if resto == Decimal('0.5') else ROUND_HALF_UP
+    return valor.quantize(cuantos, rounding=modo)
+
+
+def test_formula_de_excel_redondea_al_par():
+    engine = PricingEngine(redondeo='half_even')
+    formula = engine.excel_formula('C5*E5')
+
+    assert formula.startswith('IF(MOD(ROUND(ABS(C5*E5)*10^2,6),2)=0.5,ROUNDDOWN(C5*E5,2)')
+    for valor in ('0.125', '0.135', '2.345', '-0.125', '7.1250001'):
+        assert _evaluar_formula_par(Decimal(valor), 2) == engine.round(Decimal(valor)), valor
+    assert PricingEngine(redondeo='up', decimales=0).excel_formula('A1') == 'ROUNDUP(A1,0)'
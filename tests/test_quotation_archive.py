@@ -0,0 +1,54 @@
+import os
+
+
+def _cotizacion(db, proyecto, descripcion, fecha_creacion=None):
+    cotizacion_id = db.save_quotation(nombre_proyecto=proyecto, monto_total=100)
+    db.save_snapshot(cotizacion_id, {}, [{'type': 'activity', 'descripcion': descripcion, 'unidad': 'm2',
+                                          'cantidad': 1, 'valor_unitario': 100}])
+    db.add_quotation_history(cotizacion_id, 'creada')
+    if fecha_creacion:
+        db.connection.execute("UPDATE cotizaciones_generadas SET fecha_creacion = ? WHERE id = ?",
+                              (fecha_creacion, cotizacion_id))
+        db.connection.commit()
+    return cotizacion_id
+
+
+def _conteo(db, tabla, cotizacion_id):
+    columna = 'id' if tabla == 'cotizaciones_generadas' else 'cotizacion_id'
+    cursor = db.connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM main.{tabla} WHERE {columna} = ?", (cotizacion_id,))
+    return cursor.fetchone()[0]
+
+
+TABLAS = ('cotizaciones_generadas', 'historial_cotizacion', 'cotizaciones_snapshot', 'quotation_lines')
+
+
+def test_archiva_por_anio_y_restaura(db, tmp_path):
+    antigua = _cotizacion(db, 'Bodega', 'Cubierta en teja', '2019-05-10 10:00:00')
+    otra = _cotizacion(db, 'Local', 'Cubierta en policarbonato', '2019-11-02 10:00:00')
+    reciente = _cotizacion(db, 'Casa', 'Cubierta en zinc')
+
+    assert db.archive_quotations(edad_dias=365) == {2019: 2}
+    assert db.list_archives() == [(2019, str(tmp_path / 'data' / 'archivo' / 'cotizaciones_2019.db'))]
+    assert all(_conteo(db, tabla, antigua) == 0 for tabla in TABLAS)
+    assert [q['id'] for q in db.get_all_quotations()] == [reciente]
+    archivadas = {q['id'] for q in db.get_all_quotations(include_archived=True)}
+    assert archivadas == {antigua, otra, reciente}
+    assert db.search_quotations_by_activity('cubierta') == {reciente}
+
+    assert db.restore_quotations([antigua]) == 1
+    assert all(_conteo(db, tabla, antigua) == 1 for tabla in TABLAS)
+    assert db.get_latest_snapshot(antigua) is not None
+    assert db.search_quotations_by_activity('cubierta') == {antigua, reciente}
+    assert {q['id'] for q in db.get_all_quotations()} == {antigua, reciente}
+    # La otra cotización del año sigue archivada
+    assert _conteo(db, 'cotizaciones_generadas', otra) == 0
+    assert os.path.exists(db.archive_path(2019))
+
+
+def test_sin_cotizaciones_antiguas_no_crea_archivo(db):
+    _cotizacion(db, 'Casa', 'Cubierta en zinc')
+
+    assert db.archive_quotations(edad_dias=365) == {}
+    assert db.list_archives() == []
+    assert db.restore_quotations([999]) == 0
@@ -0,0 +1,50 @@
+def _filas(*actividades, capitulo='Obra gris'):
+    filas = [{'type': 'chapter', 'name': capitulo}]
+    for descripcion, cantidad, valor in actividades:
+        filas.append({'type': 'activity', 'descripcion': descripcion, 'unidad': 'm2',
+                      'cantidad': cantidad, 'valor_unitario': valor})
+    return filas
+
+
+def _cotizacion(db, *versiones):
+    cotizacion_id = db.save_quotation(nombre_proyecto='Proyecto', monto_total=0)
+    for filas in versiones:
+        db.save_snapshot(cotizacion_id, {}, filas)
+    return cotizacion_id
+
+
+def _lineas(db):
+    cursor = db.connection.cursor()
+    cursor.execute("SELECT cotizacion_id, snapshot_id, capitulo, descripcion, total, vigente "
+                   "FROM quotation_lines ORDER BY snapshot_id, posicion")
+    return cursor.fetchall()
+
+
+def test_save_snapshot_deja_vigente_solo_la_ultima_version(db):
+    actividad_id = db.add_activity('Muro en ladrillo', 'm2', 100)
+    _cotizacion(db, _filas(('Muro en ladrillo', 2, 100)),
+                _filas(('Muro en ladrillo', 3, 100), ('Pañete', 1, 50)))
+
+    vigentes = [l for l in _lineas(db) if l[5]]
+    assert [(l[2], l[3], l[4]) for l in vigentes] == [('Obra gris', 'Muro en ladrillo', 300),
+                                                      ('Obra gris', 'Pañete', 50)]
+    totales = db.get_quoted_activity_totals(actividad_id=actividad_id)
+    assert totales[0]['cantidad_total'] == 3 and totales[0]['cotizaciones'] == 1
+
+
+def test_backfill_carga_el_historial_y_omite_cotizaciones_eliminadas(db):
+    conservada = _cotizacion(db, _filas(('Muro', 1, 10)), _filas(('Muro', 2, 10)))
+    eliminada = _cotizacion(db, _filas(('Piso', 1, 20)))
+    esperadas = [l for l in _lineas(db) if l[0] == conservada]
+
+    # Historial anterior a la tabla, con un snapshot que quedó huérfano
+    cursor = db.connection.cursor()
+    cursor.execute("DELETE FROM quotation_lines")
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    cursor.execute("DELETE FROM cotizaciones_generadas WHERE id = ?", (eliminada,))
+    db.connection.commit()
+
+    assert db.backfill_quotation_lines(batch_size=1) == 2
+    assert _lineas(db) == esperadas
+    # Con todo cargado no queda trabajo pendiente
+    assert db.backfill_quotation_lines() == 0
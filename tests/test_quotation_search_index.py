@@ -0,0 +1,44 @@
+from utils.quotation_search_index import tokenize
+
+
+def _actividades(*descripciones):
+    return [{'type': 'activity', 'descripcion': d, 'unidad': 'm2', 'cantidad': 1, 'valor_unitario': 10}
+            for d in descripciones]
+
+
+def _cotizacion(db, *versiones):
+    cotizacion_id = db.save_quotation(nombre_proyecto='Proyecto', monto_total=0)
+    for filas in versiones:
+        db.save_snapshot(cotizacion_id, {}, filas)
+    return cotizacion_id
+
+
+def test_tokenize_normaliza_y_quita_palabras_vacias():
+    assert tokenize("Demolición de MURO en ladrillo, muro") == ['demolicion', 'muro', 'ladrillo']
+
+
+def test_busca_por_prefijos_en_la_version_vigente(db):
+    muro = _cotizacion(db, _actividades('Pintura de fachada'), _actividades('Demolición de muro', 'Pañete liso'))
+    piso = _cotizacion(db, _actividades('Demolición de piso', 'Muro divisorio en drywall'))
+
+    assert db.search_quotations_by_activity('demol') == {muro, piso}
+    assert db.search_quotations_by_activity('DEMOLICION muro') == {muro}
+    # La primera versión ya no está vigente
+    assert db.search_quotations_by_activity('pintura') == set()
+
+    db.delete_quotation(muro)
+    assert db.search_quotations_by_activity('demol') == {piso}
+
+
+def test_construye_el_indice_desde_quotation_lines(db):
+    primera = _cotizacion(db, _actividades('Cielo raso en drywall'))
+    segunda = _cotizacion(db, _actividades('Cielo raso en PVC'), _actividades('Cielo raso en madera'))
+    cursor = db.connection.cursor()
+    cursor.execute("DELETE FROM indice_terminos_cotizacion")
+    cursor.execute("DELETE FROM indice_cotizaciones")
+    db.connection.commit()
+
+    assert db.build_quotation_search_index(batch_size=1) == 2
+    assert db.search_quotations_by_activity('cielo raso') == {primera, segunda}
+    assert db.search_quotations_by_activity('madera') == {segunda}
+    assert db.build_quotation_search_index() == 0
@@ -0,0 +1,62 @@
+import os
+from datetime import date
+
+from utils.render_cache import RenderCache
+
+
+def _archivo(ruta, contenido):
+    ruta.write_bytes(contenido)
+    return str(ruta)
+
+
+def test_clave_depende_del_contenido_y_la_fecha(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    filas = [['1', 'Muro', '2', 'm2', '100']]
+    base = cache.clave('word', filas, cliente={'nombre': 'Ana'}, fecha=date(2025, 3, 1))
+
+    assert cache.clave('word', [list(f) for f in filas], cliente={'nombre': 'Ana'}, fecha=date(2025, 3, 1)) == base
+    assert cache.clave('word', filas, cliente={'nombre': 'Ana'}, fecha=date(2025, 3, 2)) != base
+    assert cache.clave('excel', filas, cliente={'nombre': 'Ana'}, fecha=date(2025, 3, 1)) != base
+    assert cache.clave('word', filas + [['2', 'Piso', '1', 'm2', '50']], cliente={'nombre': 'Ana'},
+                       fecha=date(2025, 3, 1)) != base
+
+
+def test_guardar_y_restaurar(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    origen = _archivo(tmp_path / 'cotizacion.xlsx', b'contenido')
+    clave = cache.clave('excel', [])
+
+    assert cache.put(clave, {'excel': origen, 'pdf': None})
+    manifiesto = cache.get(clave)
+    destino = str(tmp_path / 'copia.xlsx')
+
+    assert RenderCache.restore(manifiesto, {'excel': destino}) == {'excel': destino}
+    assert open(destino, 'rb').read() == b'contenido'
+    assert RenderCache.restore(manifiesto, {'pdf': destino}) is None
+
+
+def test_entrada_incompleta_se_descarta(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    clave = cache.clave('excel', [])
+    cache.put(clave, {'excel': _archivo(tmp_path / 'a.xlsx', b'x')})
+    os.remove(cache.get(clave)['archivos']['excel']['ruta'])
+
+    assert cache.get(clave) is None
+    assert not os.path.exists(os.path.join(cache.directorio, clave))
+
+
+def test_desaloja_las_entradas_usadas_hace_mas_tiempo(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'), max_bytes=10 ** 6)
+    claves = [cache.clave('excel', [[str(i)]]) for i in range(3)]
+    for i, clave in enumerate(claves):
+        cache.put(clave, {'excel': _archivo(tmp_path / f'{i}.xlsx', b'x' * 1000)})
+        # Último uso: la primera entrada es la más reciente
+        manifiesto = os.path.join(cache.directorio, clave, RenderCache.MANIFIESTO)
+        os.utime(manifiesto, (1000 - i * 100, 1000 - i * 100))
+
+    cache.max_bytes = cache.size() - 1
+    assert cache.evict(conservar=claves[2]) == 1
+
+    assert cache.get(claves[0]) is not None
+    assert cache.get(claves[1]) is None
+    assert cache.get(claves[2]) is not None
@@ -0,0 +1,91 @@
+import json
+import sqlite3
+
+from init_db import poblar_base
+from utils.database_manager import DatabaseManager
+from utils.schema_migrations import VERSION_ESQUEMA, migrar, tiene_indice_unico, version_actual
+
+
+def _columnas(conexion, tabla):
+    return {fila[1] for fila in conexion.execute(f"PRAGMA table_info({tabla})")}
+
+
+def _conteo(conexion, tabla):
+    return conexion.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+
+
+def test_base_nueva_queda_en_la_ultima_version(db):
+    assert version_actual(db.connection) == VERSION_ESQUEMA == 8
+    assert {'categoria_id', 'capitulo_id', 'orden'} <= _columnas(db.connection, 'actividades')
+    assert 'descripciones' in _columnas(db.connection, 'coocurrencia_cotizacion')
+    # Con el esquema al día no se aplica nada
+    assert migrar(db) == 0
+
+
+def test_migra_una_base_de_versiones_anteriores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ruta = tmp_path / 'data' / 'antigua.db'
+    ruta.parent.mkdir()
+    conexion = sqlite3.connect(ruta)
+    # Esquema de los scripts anteriores: categorías repetidas y actividades sin categoría
+    conexion.executescript("""
+        CREATE TABLE categorias (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, descripcion TEXT);
+        CREATE TABLE actividades (id INTEGER PRIMARY KEY AUTOINCREMENT, descripcion TEXT NOT NULL,
+                                  unidad TEXT NOT NULL, valor_unitario REAL NOT NULL);
+        CREATE TABLE productos (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, descripcion TEXT,
+                                unidad TEXT NOT NULL, precio_unitario REAL NOT NULL, categoria_id INTEGER);
+        CREATE TABLE cotizaciones_generadas (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id INTEGER,
+            fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP, fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            nombre_proyecto TEXT NOT NULL, monto_total REAL NOT NULL, estado TEXT DEFAULT 'pendiente',
+            es_prueba BOOLEAN DEFAULT 0, ruta_pdf TEXT, ruta_excel TEXT, ruta_word TEXT, notas TEXT,
+            validez_dias INTEGER DEFAULT 30, fecha_vencimiento DATE, tipo_cliente TEXT);
+        CREATE TABLE cotizaciones_snapshot (id INTEGER PRIMARY KEY AUTOINCREMENT, cotizacion_id INTEGER NOT NULL,
+            fecha_snapshot DATETIME DEFAULT CURRENT_TIMESTAMP, datos_json TEXT NOT NULL,
+            table_rows_json TEXT NOT NULL, config_json TEXT);
+        INSERT INTO categorias (nombre, descripcion) VALUES ('Muros', ''), ('Pisos', ''), ('Muros', 'repetida');
+        INSERT INTO actividades (descripcion, unidad, valor_unitario) VALUES ('Muro en ladrillo', 'm2', 100);
+        INSERT INTO productos (nombre, unidad, precio_unitario, categoria_id) VALUES ('Ladrillo', 'un', 1, 3);
+        INSERT INTO cotizaciones_generadas (nombre_proyecto, monto_total) VALUES ('Bodega', 200);
+    """)
+    filas = [{'type': 'activity', 'descripcion': 'Muro en ladrillo', 'unidad': 'm2',
+              'cantidad': 2, 'valor_unitario': 100}]
+    conexion.execute("INSERT INTO cotizaciones_snapshot (cotizacion_id, datos_json, table_rows_json) "
+                     "VALUES (1, '{}', ?)", (json.dumps(filas),))
+    conexion.commit()
+    conexion.close()
+
+    db = DatabaseManager(str(ruta))
+    try:
+        cursor = db.connection.cursor()
+        assert version_actual(db.connection) == VERSION_ESQUEMA
+        assert tiene_indice_unico(cursor, 'categorias', 'nombre')
+        assert db.connection.execute("SELECT id, nombre FROM categorias ORDER BY id").fetchall() == [
+            (1, 'Muros'), (2, 'Pisos')]
+        assert db.connection.execute("SELECT categoria_id FROM productos").fetchone()[0] == 1
+        assert 'categoria_id' in _columnas(db.connection, 'actividades')
+        # Snapshots anteriores a quotation_lines y al índice de búsqueda
+        assert db.connection.execute("SELECT actividad_id, total FROM quotation_lines").fetchall() == [(1, 200)]
+        assert db.search_quotations_by_activity('ladrillo') == {1}
+    finally:
+        db.close()
+
+
+def test_poblar_base_crea_el_esquema_y_los_datos_de_ejemplo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ruta = str(tmp_path / 'data' / 'cotizaciones.db')
+    poblar_base(ruta)
+    conexion = sqlite3.connect(ruta)
+    try:
+        assert version_actual(conexion) == VERSION_ESQUEMA
+        conteos = {tabla: _conteo(conexion, tabla) for tabla in ('categorias', 'actividades', 'productos')}
+        assert all(conteos.values())
+    finally:
+        conexion.close()
+
+    poblar_base(ruta, solo_vacias=True)
+    conexion = sqlite3.connect(ruta)
+    try:
+        assert {tabla: _conteo(conexion, tabla) for tabla in conteos} == conteos
+        assert _conteo(conexion, 'historial_precios') >= conteos['actividades']
+    finally:
+        conexion.close()
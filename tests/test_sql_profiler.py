@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from utils import sql_profiler
+
+
+@pytest.fixture
+def conexion(tmp_path):
+    conexion = sql_profiler.conectar(str(tmp_path / 'perfil.db'))
+    conexion.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, nombre TEXT)")
+    conexion.executemany("INSERT INTO t (nombre) VALUES (?)", [(f"n{i}",) for i in range(5)])
+    sql_profiler.reset()
+    yield conexion
+    conexion.close()
+    sql_profiler.set_enabled(False, sql_profiler.UMBRAL_MS_POR_DEFECTO, sql_profiler.REGISTRO_POR_DEFECTO)
+    sql_profiler.reset()
+
+
+def _estadistica(sentencia):
+    return next(e for e in sql_profiler.estadisticas() if e.sentencia == sentencia)
+
+
+def test_desactivado_entrega_cursores_sqlite3(conexion):
+    sql_profiler.set_enabled(False)
+
+    assert type(conexion.cursor()) is sqlite3.Cursor
+    assert type(conexion.execute("SELECT 1")) is sqlite3.Cursor
+    assert sql_profiler.estadisticas() == []
+
+
+def test_activado_mide_lecturas_al_iterar(conexion):
+    sql_profiler.set_enabled(True, umbral_ms=10 ** 6, registro='')
+    cursor = conexion.cursor()
+    assert isinstance(cursor, sql_profiler.PerfilCursor)
+
+    filas = [fila for fila in cursor.execute("SELECT id FROM t WHERE id > ?", (1,))]
+    conexion.execute("SELECT nombre FROM t").fetchall()
+
+    assert len(filas) == 4
+    assert _estadistica("SELECT id FROM t WHERE id > ?").filas == 4
+    assert _estadistica("SELECT nombre FROM t").filas == 5
+
+
+def test_se_activa_en_tiempo_de_ejecucion(conexion):
+    sql_profiler.set_enabled(False)
+    conexion.execute("SELECT 1").fetchall()
+    sql_profiler.set_enabled(True, umbral_ms=10 ** 6, registro='')
+    conexion.execute("SELECT id FROM t").fetchall()
+
+    assert [e.sentencia for e in sql_profiler.estadisticas()] == ["SELECT id FROM t"]
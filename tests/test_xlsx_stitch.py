@@ -0,0 +1,41 @@
+import openpyxl
+
+import controllers.excel_controller as excel_controller
+from controllers.excel_controller import ExcelController
+
+
+def _items():
+    items = []
+    for capitulo in range(3):
+        items.append({'type': 'chapter', 'name': f'Capítulo {capitulo}'})
+        for i in range(4):
+            items.append({'type': 'activity', 'id': i, 'descripcion': f'Actividad {capitulo}.{i}',
+                          'cantidad': i + 1, 'unidad': 'm2', 'valor_unitario': 1000 + i})
+    return items
+
+
+def _exportar(carpeta, umbral):
+    carpeta.mkdir()
+    controller = ExcelController(None, None)
+    controller.UMBRAL_PARALELO = umbral
+    return controller.generate_excel_por_capitulos(_items(), 'natural', 5, 5, 5, False,
+                                                   ruta_personalizada=str(carpeta), procesos=2)
+
+
+def _formato(celda):
+    return (celda.value, celda.font.b, celda.fill.fgColor.rgb, celda.number_format, celda.alignment.horizontal,
+            celda.border.left.style, celda.border.right.style, celda.border.top.style, celda.border.bottom.style)
+
+
+def test_hojas_unidas_conservan_los_estilos(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_controller.os, 'cpu_count', lambda: 2)
+    en_serie = openpyxl.load_workbook(_exportar(tmp_path / 'serie', umbral=10 ** 9))
+    en_paralelo = openpyxl.load_workbook(_exportar(tmp_path / 'paralelo', umbral=1))
+
+    assert en_serie.sheetnames == en_paralelo.sheetnames
+    for hoja in en_serie.worksheets[1:4]:
+        unida = en_paralelo[hoja.title]
+        assert unida.max_row == hoja.max_row
+        for fila in hoja.iter_rows():
+            for celda in fila:
+                assert _formato(unida[celda.coordinate]) == _formato(celda), (hoja.title, celda.coordinate)
@@ -1,3 +1,6 @@
+from utils.change_events import MODIFICACION
+
+
 class AIUManager:
     def __init__(self, database_manager):
         self.database_manager = database_manager
@@ -27,6 +30,7 @@ class AIUManager:
             cursor.execute("UPDATE aiu_values SET administracion = ?, imprevistos = ?, utilidad = ?, iva_sobre_utilidad = ? WHERE id = 1",
                            (administracion, imprevistos, utilidad, iva_sobre_utilidad))
             self.database_manager.connection.commit()
+            self.database_manager.events.publish('aiu', 1, MODIFICACION)
             return True
         except Exception as e:
             print(f"Error al actualizar valores AIU: {str(e)}")
@@ -0,0 +1,297 @@
+"""
+Copias de seguridad de la base de datos con la API de backup de SQLite.
+
+La copia se hace por lotes de páginas (sqlite3.Connection.backup) desde una
+conexión propia, de modo que la aplicación puede seguir leyendo y
+escribiendo mientras tanto: entre lotes la base queda libre y, si otra
+conexión la modifica, SQLite reinicia la copia para que el resultado sea
+siempre un estado consistente.
+
+Cada copia se escribe primero en un archivo temporal, se verifica con
+PRAGMA integrity_check y solo entonces se renombra (os.replace), así que
+nunca queda un respaldo a medio escribir con el nombre definitivo. Se
+conservan las últimas `generaciones` copias; con `comprimir` se guardan
+como .db.gz.
+
+Configuración: sección 'respaldo' de config.json
+    {"directorio": "data/respaldos", "generaciones": 7, "comprimir": false,
+     "intervalo_horas": 24, "paginas_por_lote": 256}
+
+Uso por consola:
+    python -m utils.backup_manager [ruta_db] [--comprimir] [--listar]
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from utils.instrumentation import get_logger
+
+logger = get_logger('respaldo')
+
+PATRON_RESPALDO = re.compile(r'(?P<base>.+)_(?P<fecha>\d{8}_\d{6})\.db(?P<gz>\.gz)?$')
+
+
+class BackupError(Exception):
+    """La copia no se pudo completar o no pasó la verificación."""
+
+
+class BackupCancelado(BackupError):
+    """La copia se interrumpió a pedido (por ejemplo, al cerrar la aplicación)."""
+
+
+class _CopiaReiniciada(Exception):
+    """La base cambió demasiadas veces durante la copia por lotes."""
+
+
+# Reinicios tolerados (escrituras de otras conexiones) antes de copiar en un solo paso
+MAX_REINICIOS = 3
+# Pasos tolerados, como múltiplo de los que necesita la copia sin reinicios, antes de copiar en un solo paso
+MAX_PASOS_POR_LOTE = 4
+
+
+def verificar_integridad(ruta):
+    """Ejecuta PRAGMA integrity_check sobre un archivo; devuelve la lista de problemas (vacía si está bien)."""
+    conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    try:
+        resultado = [row[0] for row in conexion.execute("PRAGMA integrity_check")]
+    finally:
+        conexion.close()
+    return [] if resultado == ['ok'] else resultado
+
+
+def copiar_base_datos(origen, destino, paginas_por_lote=256, pausa=0.0, progreso=None, verificar=True,
+                      cancelado=None):
+    """
+    Copia una base SQLite (aunque esté abierta por otra conexión) a destino.
+
+    Args:
+        origen (str): Base a copiar
+        destino (str): Archivo final; se reemplaza solo si la copia terminó y está íntegra
+        paginas_por_lote (int): Páginas copiadas por paso
+        pausa (float): Segundos de espera entre pasos (deja la base libre para la aplicación)
+        progreso (callable): progreso(copiadas, total) tras cada paso
+        verificar (bool): Ejecutar PRAGMA integrity_check sobre la copia
+        cancelado (callable): Se consulta tras cada paso; si devuelve True la copia se interrumpe
+
+    Raises:
+        BackupError: Si la copia falla o la verificación encuentra problemas
+        BackupCancelado: Si se interrumpió (no queda ningún archivo)
+    """
+    temporal = f"{destino}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+    fuente = sqlite3.connect(origen)
+    copia = sqlite3.connect(temporal)
+    try:
+        avance = {'copiadas': 0, 'reinicios': 0, 'pasos': 0}
+        lote = paginas_por_lote if paginas_por_lote > 0 else None
+
+        def _progreso(estado, restantes, total):
+            if cancelado and cancelado():
+                raise BackupCancelado("Respaldo cancelado")
+            copiadas = total - restantes
+            avance['pasos'] += 1
+            if restantes and copiadas <= avance['copiadas']:
+                # Otra conexión escribió en la base: SQLite reinició la copia. Si lo hace en cada
+                # paso, las copiadas se repiten (no bajan) y la copia no avanzaría nunca
+                avance['reinicios'] += 1
+                if avance['reinicios'] > MAX_REINICIOS:
+                    raise _CopiaReiniciada()
+            # Límite duro por si los reinicios no se distinguen (p. ej. la base crece entre pasos)
+            if restantes and lote and avance['pasos'] > MAX_PASOS_POR_LOTE * (total // lote + 1):
+                raise _CopiaReiniciada()
+            avance['copiadas'] = copiadas
+            if progreso:
+                progreso(copiadas, total)
+            if pausa and restantes:
+                time.sleep(pausa)
+
+        try:
+            fuente.backup(copia, pages=paginas_por_lote, progress=_progreso)
+        except _CopiaReiniciada:
+            # Con escrituras continuas la copia por lotes no termina: se copia en un solo paso
+            # (lectura consistente; los escritores esperan lo que dure la copia)
+            logger.info("La base cambió %d veces durante la copia de %s (%d pasos); se copia en un solo paso",
+                        avance['reinicios'], origen, avance['pasos'])
+            fuente.backup(copia, pages=-1)
+            if progreso:
+                progreso(avance['copiadas'], avance['copiadas'])
+        copia.close()
+        if verificar:
+            problemas = verificar_integridad(temporal)
+            if problemas:
+                raise BackupError(f"La copia no pasó integrity_check: {'; '.join(problemas[:5])}")
+        os.replace(temporal, destino)
+    except sqlite3.Error as e:
+        raise BackupError(f"Error al copiar {origen}: {e}") from e
+    finally:
+        copia.close()
+        fuente.close()
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+class BackupManager:
+    """Respaldos rotativos de la base de datos."""
+
+    def __init__(self, db_path, directorio=None, generaciones=7, comprimir=False, intervalo_horas=24,
+                 paginas_por_lote=256, pausa=0.005):
+        self.db_path = db_path
+        self.directorio = directorio or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'respaldos')
+        self.generaciones = max(1, int(generaciones))
+        self.comprimir = comprimir
+        self.intervalo_horas = intervalo_horas
+        self.paginas_por_lote = paginas_por_lote
+        self.pausa = pausa
+
+    @classmethod
+    def from_config(cls, db_path, config_file=None):
+        """Crea el gestor con la sección 'respaldo' de config.json, si existe."""
+        if not config_file:
+            config_file = os.path.join(os.getcwd(), 'config.json')
+        opciones = {}
+        try:
+            if os.path.exists(config_file):
+                with open(config_file, 'r') as f:
+                    opciones = json.load(f).get('respaldo', {})
+        except Exception as e:
+            logger.error("Error al cargar la configuración de respaldos: %s", e)
+        kwargs = {}
+        for clave in ('directorio', 'generaciones', 'comprimir', 'intervalo_horas', 'paginas_por_lote'):
+            if opciones.get(clave) is not None:
+                kwargs[clave] = opciones[clave]
+        return cls(db_path, **kwargs)
+
+    # ===== GENERACIONES =====
+
+    def _nombre_base(self):
+        return os.path.splitext(os.path.basename(self.db_path))[0]
+
+    def list_backups(self):
+        """Respaldos existentes del más reciente al más antiguo: [{'ruta', 'fecha', 'comprimido', 'bytes'}]."""
+        if not os.path.isdir(self.directorio):
+            return []
+        respaldos = []
+        for nombre in os.listdir(self.directorio):
+            coincidencia = PATRON_RESPALDO.fullmatch(nombre)
+            if not coincidencia or coincidencia.group('base') != self._nombre_base():
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            respaldos.append({
+                'ruta': ruta,
+                'fecha': datetime.strptime(coincidencia.group('fecha'), '%Y%m%d_%H%M%S'),
+                'comprimido': bool(coincidencia.group('gz')),
+                'bytes': os.path.getsize(ruta),
+            })
+        return sorted(respaldos, key=lambda r: r['fecha'], reverse=True)
+
+    def last_backup(self):
+        respaldos = self.list_backups()
+        return respaldos[0] if respaldos else None
+
+    def is_due(self):
+        """True si no hay respaldo o el último tiene más de intervalo_horas."""
+        ultimo = self.last_backup()
+        if ultimo is None:
+            return True
+        return (datetime.now() - ultimo['fecha']).total_seconds() >= self.intervalo_horas * 3600
+
+    def _rotar(self):
+        """Elimina las generaciones que exceden el límite."""
+        for respaldo in self.list_backups()[self.generaciones:]:
+            try:
+                os.remove(respaldo['ruta'])
+                logger.info("Respaldo antiguo eliminado: %s", respaldo['ruta'])
+            except OSError as e:
+                logger.warning("No se pudo eliminar %s: %s", respaldo['ruta'], e)
+
+    # ===== RESPALDO =====
+
+    def _limpiar_temporales(self):
+        """Elimina los archivos .tmp que dejó una copia interrumpida (p. ej. al cerrar el proceso)."""
+        if not os.path.isdir(self.directorio):
+            return
+        for nombre in os.listdir(self.directorio):
+            coincidencia = nombre.endswith('.tmp') and PATRON_RESPALDO.fullmatch(nombre[:-4])
+            if coincidencia and coincidencia.group('base') == self._nombre_base():
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                    logger.info("Temporal de un respaldo interrumpido eliminado: %s", nombre)
+                except OSError as e:
+                    logger.warning("No se pudo eliminar %s: %s", nombre, e)
+
+    def backup(self, progreso=None, verificar=True, cancelado=None):
+        """
+        Crea una nueva generación. Pensado para ejecutarse fuera del hilo de la interfaz
+        (ver utils/backup_worker.py); cancelado() permite interrumpirla.
+
+        Returns:
+            dict: {'ruta', 'bytes', 'segundos'} del respaldo creado
+
+        Raises:
+            BackupError: Si la copia falla o no está íntegra (no se deja ningún archivo)
+        """
+        inicio = time.perf_counter()
+        self._limpiar_temporales()
+        marca = datetime.now().strftime('%Y%m%d_%H%M%S')
+        destino = os.path.join(self.directorio, f"{self._nombre_base()}_{marca}.db")
+        copiar_base_datos(self.db_path, destino, self.paginas_por_lote, self.pausa, progreso, verificar, cancelado)
+
+        if self.comprimir:
+            comprimido = f"{destino}.gz"
+            try:
+                with open(destino, 'rb') as entrada, gzip.open(f"{comprimido}.tmp", 'wb') as salida:
+                    shutil.copyfileobj(entrada, salida, 1024 * 1024)
+                os.replace(f"{comprimido}.tmp", comprimido)
+            finally:
+                if os.path.exists(f"{comprimido}.tmp"):
+                    os.remove(f"{comprimido}.tmp")
+            os.remove(destino)
+            destino = comprimido
+
+        self._rotar()
+        resultado = {'ruta': destino, 'bytes': os.path.getsize(destino), 'segundos': time.perf_counter() - inicio}
+        logger.info("Respaldo creado: %s (%.1f MB en %.1f s)", destino, resultado['bytes'] / (1024 * 1024),
+                    resultado['segundos'])
+        return resultado
+
+    def restore(self, ruta_respaldo, destino=None):
+        """
+        Restaura un respaldo (comprimido o no) sobre destino (por defecto la base configurada).
+        La aplicación no debe tener la base abierta mientras tanto.
+        """
+        destino = destino or self.db_path
+        origen = ruta_respaldo
+        descomprimido = None
+        try:
+            if ruta_respaldo.endswith('.gz'):
+                descomprimido = f"{destino}.restaurar"
+                with gzip.open(ruta_respaldo, 'rb') as entrada, open(descomprimido, 'wb') as salida:
+                    shutil.copyfileobj(entrada, salida, 1024 * 1024)
+                origen = descomprimido
+            copiar_base_datos(origen, destino, self.paginas_por_lote)
+        finally:
+            if descomprimido and os.path.exists(descomprimido):
+                os.remove(descomprimido)
+
+
+if __name__ == "__main__":
+    from utils.instrumentation import configure
+
+    configure()
+    args = sys.argv[1:]
+    rutas = [a for a in args if not a.startswith('--')]
+    gestor = BackupManager.from_config(rutas[0] if rutas else os.path.join('data', 'cotizaciones.db'))
+    if '--comprimir' in args:
+        gestor.comprimir = True
+    if '--listar' in args:
+        for respaldo in gestor.list_backups():
+            logger.info("%s  %8.1f MB  %s", f"{respaldo['fecha']:%Y-%m-%d %H:%M:%S}", respaldo['bytes'] / (1024 * 1024),
+                        respaldo['ruta'])
+    else:
+        gestor.backup(progreso=lambda hechas, total: logger.debug("%d/%d páginas", hechas, total))
@@ -0,0 +1,32 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from utils.backup_manager import BackupError
+
+
+class BackupWorker(QThread):
+    """
+    Ejecuta BackupManager.backup en un hilo aparte, para que copiar y
+    verificar una base grande no congele la interfaz. cancel() interrumpe
+    la copia en el siguiente lote de páginas.
+    """
+
+    # Señales para comunicarse con la interfaz gráfica
+    progress = pyqtSignal(int, int)      # páginas copiadas, total
+    finished_ok = pyqtSignal(dict)       # resultado de BackupManager.backup
+    failed = pyqtSignal(str)
+
+    def __init__(self, backup_manager, parent=None):
+        super().__init__(parent)
+        self.backup_manager = backup_manager
+        self._cancelado = False
+
+    def cancel(self):
+        self._cancelado = True
+
+    def run(self):
+        try:
+            resultado = self.backup_manager.backup(progreso=lambda hechas, total: self.progress.emit(hechas, total),
+                                                   cancelado=lambda: self._cancelado)
+            self.finished_ok.emit(resultado)
+        except (BackupError, OSError) as e:
+            self.failed.emit(str(e))
@@ -0,0 +1,78 @@
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+from utils.change_events import BAJA, RECARGA
+
+
+class ChangeEventBridge(QObject):
+    """
+    Reenvía los eventos de DatabaseManager.events como señal de Qt, para
+    que las vistas los reciban en el hilo de la interfaz aunque la escritura
+    ocurra en otro hilo, y consulta periódicamente si otro proceso cambió la
+    base (DatabaseManager.check_external_changes).
+    """
+
+    # entidad, item_id (None en recargas), operacion, externo
+    changed = pyqtSignal(str, object, str, bool)
+
+    INTERVALO_MS = 2000
+
+    def __init__(self, database_manager, intervalo_ms=INTERVALO_MS, parent=None):
+        super().__init__(parent)
+        self.database_manager = database_manager
+        database_manager.events.subscribe(self._reenviar)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(database_manager.check_external_changes)
+        if intervalo_ms:
+            self._timer.start(intervalo_ms)
+
+    def _reenviar(self, evento):
+        self.changed.emit(evento.entidad, evento.item_id, evento.operacion, evento.externo)
+
+    def stop(self):
+        self._timer.stop()
+        self.database_manager.events.unsubscribe(self._reenviar)
+
+
+def get_event_bridge(database_manager):
+    """Puente compartido por todas las ventanas de una misma base (se crea en el hilo de la interfaz)."""
+    puente = getattr(database_manager, '_event_bridge', None)
+    if puente is None:
+        puente = database_manager._event_bridge = ChangeEventBridge(database_manager)
+    return puente
+
+
+def apply_combo_change(combo, item_id, operacion, texto, recargar):
+    """
+    Aplica un cambio a un QComboBox cuyos ítems guardan el id en data.
+
+    Args:
+        texto (str): Texto actual del registro, o None si ya no existe
+        recargar (callable): Recarga completa, para las recargas sin id
+    """
+    if operacion == RECARGA or item_id is None:
+        recargar()
+        return
+    index = combo.findData(item_id)
+    if operacion == BAJA or texto is None:
+        if index >= 0:
+            combo.removeItem(index)
+    elif index >= 0:
+        combo.setItemText(index, texto)
+    else:
+        combo.addItem(texto, item_id)
+
+
+def apply_list_change(lista, item_id, operacion, texto, recargar, rol=Qt.UserRole):
+    """Igual que apply_combo_change para un QListWidget (id en el rol indicado)."""
+    if operacion == RECARGA or item_id is None:
+        recargar()
+        return
+    fila = next((i for i in range(lista.count()) if lista.item(i).data(rol) == item_id), -1)
+    if operacion == BAJA or texto is None:
+        if fila >= 0:
+            lista.takeItem(fila)
+    elif fila >= 0:
+        lista.item(fila).setText(texto)
+    else:
+        lista.addItem(texto)
+        lista.item(lista.count() - 1).setData(rol, item_id)
@@ -0,0 +1,100 @@
+"""
+Bus de eventos de cambio de la base de datos.
+
+Cada método de escritura de DatabaseManager publica, después del commit,
+un CambioEvento (entidad, item_id, operacion). Las vistas y los índices en
+memoria se suscriben a las entidades que muestran y aplican solo ese
+cambio, en lugar de recargar todas sus listas.
+
+Operaciones:
+    alta / modificacion / baja: un registro concreto (item_id)
+    recarga: cambiaron varios registros o no se sabe cuáles (item_id None);
+             el suscriptor debe volver a leer esa entidad
+
+Los cambios hechos por otro proceso sobre la misma base (otra instancia de
+la aplicación) se detectan con DataVersionWatcher: PRAGMA data_version
+cambia cuando otra conexión confirma una transacción, y entonces se
+publica una recarga (externo=True) de cada entidad. Desde la interfaz se
+usa a través de utils/change_event_bridge.py.
+"""
+from collections import namedtuple
+
+from utils.instrumentation import get_logger
+
+logger = get_logger('eventos')
+
+ALTA = 'alta'
+MODIFICACION = 'modificacion'
+BAJA = 'baja'
+RECARGA = 'recarga'
+
+# Entidades que publica DatabaseManager
+ENTIDADES = ('cliente', 'categoria', 'actividad', 'producto', 'actividad_producto', 'actividad_relacionada',
+             'capitulo', 'aiu', 'cotizacion', 'snapshot')
+
+
+class CambioEvento(namedtuple('CambioEvento', ['entidad', 'item_id', 'operacion', 'externo'])):
+    """Un cambio confirmado en la base de datos."""
+    __slots__ = ()
+
+
+class ChangeEventBus:
+    """Suscriptores por entidad; la entrega es síncrona, en el hilo que publica."""
+
+    def __init__(self):
+        self._suscriptores = []     # [(callback, frozenset de entidades o None)]
+
+    def subscribe(self, callback, entidades=None):
+        """
+        Registra callback(evento) para las entidades indicadas (todas si es None).
+        Registrar de nuevo la misma función reemplaza su filtro.
+        """
+        self.unsubscribe(callback)
+        self._suscriptores.append((callback, frozenset(entidades) if entidades else None))
+
+    def unsubscribe(self, callback):
+        self._suscriptores = [s for s in self._suscriptores if s[0] != callback]
+
+    def publish(self, entidad, item_id=None, operacion=MODIFICACION, externo=False):
+        """Entrega el evento a los suscriptores; un error en uno no impide la entrega a los demás."""
+        if item_id is None:
+            operacion = RECARGA
+        evento = CambioEvento(entidad, item_id, operacion, externo)
+        for callback, entidades in list(self._suscriptores):
+            if entidades is not None and entidad not in entidades:
+                continue
+            try:
+                callback(evento)
+            except Exception as e:
+                logger.error("Error en listener de cambios (%s): %s", entidad, e)
+        return evento
+
+
+class DataVersionWatcher:
+    """
+    Detecta escrituras de otras conexiones comparando PRAGMA data_version.
+
+    El valor no cambia con los commits de la propia conexión, así que
+    consultarlo (sin lectura de tablas) solo informa lo que hizo otro
+    proceso o conexión.
+    """
+
+    def __init__(self, connection, bus, entidades=ENTIDADES):
+        self.connection = connection
+        self.bus = bus
+        self.entidades = entidades
+        self._version = self._leer()
+
+    def _leer(self):
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def check(self):
+        """Publica una recarga externa de cada entidad si otra conexión escribió desde la última vez."""
+        version = self._leer()
+        if version == self._version:
+            return False
+        self._version = version
+        logger.info("La base cambió desde otra conexión: se recargan las vistas")
+        for entidad in self.entidades:
+            self.bus.publish(entidad, None, RECARGA, externo=True)
+        return True
@@ -0,0 +1,342 @@
+import json
+import sqlite3
+import sys
+from collections import Counter
+from itertools import combinations
+
+from utils.change_events import BAJA, RECARGA
+from utils.text_utils import normalize_text
+
+
+class CooccurrenceManager:
+    """
+    Matriz dispersa de co-ocurrencia de actividades cotizadas.
+
+    Un proceso incremental recorre cotizaciones_snapshot desde el último
+    snapshot procesado y acumula, por pares de descripciones normalizadas,
+    en cuántas cotizaciones aparecieron juntas. Solo cuenta el snapshot más
+    reciente de cada cotización: cuando llega uno nuevo se descuenta el
+    aporte del anterior, y cuando la cotización se elimina o se archiva se
+    descuenta el suyo.
+
+    Almacenamiento:
+        - descripciones_cotizadas: diccionario descripción normalizada -> id
+        - coocurrencia_actividades: pares (desc_a < desc_b) WITHOUT ROWID
+        - coocurrencia_cotizacion: snapshot vigente contado por cotización y
+          las descripciones que aportó (para descontarlas sin releerlo)
+        - coocurrencia_estado: último snapshot procesado
+
+    El proceso puede ejecutarse aparte (python -m utils.cooccurrence_manager)
+    y además se actualiza solo cada vez que se guarda un snapshot.
+    """
+
+    def __init__(self, database_manager):
+        self.database_manager = database_manager
+        # Las tablas las crea la migración de esquema al abrir DatabaseManager
+        database_manager.events.subscribe(self._on_change, entidades=('snapshot', 'cotizacion'))
+
+    def _on_change(self, evento):
+        if evento.entidad == 'snapshot' or evento.operacion in (BAJA, RECARGA):
+            self.update()
+
+    def create_tables(self):
+        """Crea las tablas de la matriz si no existen."""
+        try:
+            self.create_schema(self.database_manager.connection.cursor())
+            self.database_manager.connection.commit()
+        except sqlite3.Error as e:
+            print(f"Error al crear tablas de co-ocurrencia: {e}")
+
+    @staticmethod
+    def create_schema(cursor):
+        """Sentencias de las tablas de la matriz (migración de esquema 2). No hace commit."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS descripciones_cotizadas (
+                id INTEGER PRIMARY KEY,
+                descripcion_norm TEXT NOT NULL UNIQUE,
+                descripcion TEXT NOT NULL,
+                veces INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS coocurrencia_actividades (
+                desc_a INTEGER NOT NULL,
+                desc_b INTEGER NOT NULL,
+                veces INTEGER NOT NULL,
+                PRIMARY KEY (desc_a, desc_b)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_coocurrencia_desc_b
+            ON coocurrencia_actividades (desc_b, desc_a, veces)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS coocurrencia_cotizacion (
+                cotizacion_id INTEGER PRIMARY KEY,
+                snapshot_id INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS coocurrencia_estado (
+                clave TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            )
+        """)
+
+    def _descriptions_from_rows(self, table_rows_json):
+        """Devuelve {descripcion_norm: descripcion} de las actividades de un snapshot."""
+        try:
+            rows = json.loads(table_rows_json)
+        except (TypeError, ValueError):
+            return {}
+        descripciones = {}
+        for row in rows:
+            if row.get('type') != 'activity':
+                continue
+            original = (row.get('descripcion') or '').strip()
+            norm = normalize_text(original)
+            if norm:
+                descripciones.setdefault(norm, original)
+        return descripciones
+
+    def _get_state(self, cursor, clave):
+        cursor.execute("SELECT valor FROM coocurrencia_estado WHERE clave = ?", (clave,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _description_ids(self, cursor, descripciones):
+        """Obtiene (y registra si faltan) los ids de un conjunto de descripciones."""
+        cursor.executemany("""
+            INSERT OR IGNORE INTO descripciones_cotizadas (descripcion_norm, descripcion)
+            VALUES (?, ?)
+        """, list(descripciones.items()))
+        ids = {}
+        normas = list(descripciones)
+        for inicio in range(0, len(normas), 500):
+            lote = normas[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(lote))
+            cursor.execute(
+                f"SELECT descripcion_norm, id FROM descripciones_cotizadas WHERE descripcion_norm IN ({marcadores})",
+                lote)
+            ids.update(cursor.fetchall())
+        return ids
+
+    @staticmethod
+    def _acumular(delta_veces, delta_pares, ids, signo):
+        for desc_id in ids:
+            delta_veces[desc_id] += signo
+        for par in combinations(sorted(ids), 2):
+            delta_pares[par] += signo
+
+    def _apply_deltas(self, cursor, delta_veces, delta_pares):
+        cursor.executemany("UPDATE descripciones_cotizadas SET veces = veces + ? WHERE id = ?",
+                           [(delta, desc_id) for desc_id, delta in delta_veces.items() if delta])
+        cursor.executemany("""
+            INSERT INTO coocurrencia_actividades (desc_a, desc_b, veces) VALUES (?, ?, ?)
+            ON CONFLICT (desc_a, desc_b) DO UPDATE SET veces = veces + excluded.veces
+        """, [(a, b, delta) for (a, b), delta in delta_pares.items() if delta])
+        cursor.execute("DELETE FROM coocurrencia_actividades WHERE veces <= 0")
+
+    def _counted_ids(self, cursor, cotizacion_ids):
+        """{cotizacion_id: ids de descripción contados} para las cotizaciones ya incluidas en la matriz."""
+        contadas = {}
+        cotizacion_ids = list(cotizacion_ids)
+        for inicio in range(0, len(cotizacion_ids), 500):
+            lote = cotizacion_ids[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(lote))
+            cursor.execute(f"""
+                SELECT cotizacion_id, descripciones FROM coocurrencia_cotizacion
+                WHERE cotizacion_id IN ({marcadores})
+            """, lote)
+            for cotizacion_id, descripciones in cursor.fetchall():
+                contadas[cotizacion_id] = json.loads(descripciones or '[]')
+        return contadas
+
+    def _count_snapshots(self, cursor, snapshots):
+        """
+        Reemplaza en la matriz el aporte de cada cotización por el de su snapshot.
+        No hace commit.
+
+        Args:
+            snapshots (list): [(snapshot_id, cotizacion_id, table_rows_json)] en orden de id;
+                              de cada cotización cuenta solo el último
+        """
+        vigentes = {}
+        for snapshot_id, cotizacion_id, table_rows_json in snapshots:
+            vigentes[cotizacion_id] = (snapshot_id, self._descriptions_from_rows(table_rows_json))
+        todas = {}
+        for _, descripciones in vigentes.values():
+            todas.update(descripciones)
+        ids = self._description_ids(cursor, todas) if todas else {}
+
+        delta_veces = Counter()
+        delta_pares = Counter()
+        # Descontar lo que aportaba el snapshot anterior de la misma cotización
+        for anteriores in self._counted_ids(cursor, vigentes).values():
+            self._acumular(delta_veces, delta_pares, anteriores, -1)
+        filas = []
+        for cotizacion_id, (snapshot_id, descripciones) in vigentes.items():
+            nuevos = sorted(ids[norm] for norm in descripciones)
+            self._acumular(delta_veces, delta_pares, nuevos, 1)
+            filas.append((cotizacion_id, snapshot_id, json.dumps(nuevos)))
+        self._apply_deltas(cursor, delta_veces, delta_pares)
+        cursor.executemany("""
+            INSERT INTO coocurrencia_cotizacion (cotizacion_id, snapshot_id, descripciones) VALUES (?, ?, ?)
+            ON CONFLICT (cotizacion_id) DO UPDATE
+            SET snapshot_id = excluded.snapshot_id, descripciones = excluded.descripciones
+        """, filas)
+
+    def _deleted_quotations(self, cursor):
+        """Descuenta de la matriz el aporte de las cotizaciones eliminadas o archivadas. No hace commit."""
+        cursor.execute("""
+            SELECT c.cotizacion_id, c.descripciones FROM coocurrencia_cotizacion c
+            WHERE NOT EXISTS (SELECT 1 FROM cotizaciones_generadas g WHERE g.id = c.cotizacion_id)
+        """)
+        eliminadas = cursor.fetchall()
+        if eliminadas:
+            delta_veces = Counter()
+            delta_pares = Counter()
+            for _, descripciones in eliminadas:
+                self._acumular(delta_veces, delta_pares, json.loads(descripciones or '[]'), -1)
+            self._apply_deltas(cursor, delta_veces, delta_pares)
+            cursor.executemany("DELETE FROM coocurrencia_cotizacion WHERE cotizacion_id = ?",
+                               [(row[0],) for row in eliminadas])
+        return len(eliminadas)
+
+    def _restored_quotations(self, cursor, ultimo_id, batch_size=500):
+        """
+        Vuelve a contar las cotizaciones restauradas del archivo: su último
+        snapshot es anterior al último procesado. No hace commit.
+        """
+        cursor.execute("""
+            SELECT MAX(s.id) FROM cotizaciones_snapshot s
+            WHERE s.id <= ?
+              AND EXISTS (SELECT 1 FROM cotizaciones_generadas g WHERE g.id = s.cotizacion_id)
+              AND NOT EXISTS (SELECT 1 FROM coocurrencia_cotizacion c WHERE c.cotizacion_id = s.cotizacion_id)
+            GROUP BY s.cotizacion_id
+        """, (ultimo_id,))
+        pendientes = [row[0] for row in cursor.fetchall()]
+        for inicio in range(0, len(pendientes), batch_size):
+            lote = pendientes[inicio:inicio + batch_size]
+            marcadores = ",".join("?" * len(lote))
+            cursor.execute(f"""
+                SELECT id, cotizacion_id, table_rows_json FROM cotizaciones_snapshot
+                WHERE id IN ({marcadores}) ORDER BY id
+            """, lote)
+            self._count_snapshots(cursor, cursor.fetchall())
+        return len(pendientes)
+
+    def update(self, batch_size=500):
+        """
+        Procesa los snapshots nuevos y las cotizaciones eliminadas, archivadas
+        o restauradas desde la última vez, y actualiza la matriz.
+
+        Args:
+            batch_size (int): Snapshots leídos por lote
+
+        Returns:
+            int: Número de snapshots procesados, o None si hubo error
+        """
+        connection = self.database_manager.connection
+        procesados = 0
+        try:
+            cursor = connection.cursor()
+            ultimo_id = self._get_state(cursor, 'ultimo_snapshot_id')
+            if self._deleted_quotations(cursor) + self._restored_quotations(cursor, ultimo_id, batch_size):
+                connection.commit()
+
+            while True:
+                cursor.execute("""
+                    SELECT s.id, s.cotizacion_id, s.table_rows_json,
+                           EXISTS (SELECT 1 FROM cotizaciones_generadas g WHERE g.id = s.cotizacion_id)
+                    FROM cotizaciones_snapshot s
+                    WHERE s.id > ?
+                    ORDER BY s.id
+                    LIMIT ?
+                """, (ultimo_id, batch_size))
+                snapshots = cursor.fetchall()
+                if not snapshots:
+                    break
+
+                # Los snapshots de cotizaciones ya eliminadas no cuentan
+                self._count_snapshots(cursor, [row[:3] for row in snapshots if row[3]])
+
+                ultimo_id = snapshots[-1][0]
+                cursor.execute("""
+                    INSERT INTO coocurrencia_estado (clave, valor) VALUES ('ultimo_snapshot_id', ?)
+                    ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor
+                """, (ultimo_id,))
+                connection.commit()
+                procesados += len(snapshots)
+
+            return procesados
+        except sqlite3.Error as e:
+            connection.rollback()
+            print(f"Error al actualizar matriz de co-ocurrencia: {e}")
+            return None
+
+    def rebuild(self):
+        """Borra la matriz y la reconstruye desde todos los snapshots."""
+        try:
+            cursor = self.database_manager.connection.cursor()
+            cursor.execute("DELETE FROM coocurrencia_actividades")
+            cursor.execute("DELETE FROM coocurrencia_cotizacion")
+            cursor.execute("DELETE FROM coocurrencia_estado")
+            cursor.execute("UPDATE descripciones_cotizadas SET veces = 0")
+            self.database_manager.connection.commit()
+        except sqlite3.Error as e:
+            print(f"Error al reiniciar matriz de co-ocurrencia: {e}")
+            return None
+        return self.update()
+
+    def get_also_quoted(self, descripcion, limit=5, min_veces=1):
+        """
+        Actividades que suelen cotizarse junto con la descripción indicada.
+
+        Args:
+            descripcion (str): Descripción de la actividad
+            limit (int): Máximo de resultados
+            min_veces (int): Mínimo de cotizaciones en común
+
+        Returns:
+            list: [{'descripcion', 'veces', 'confianza'}] ordenado por veces;
+                  confianza = cotizaciones en común / cotizaciones con la actividad
+        """
+        try:
+            cursor = self.database_manager.connection.cursor()
+            cursor.execute("SELECT id, veces FROM descripciones_cotizadas WHERE descripcion_norm = ?",
+                           (normalize_text(descripcion),))
+            row = cursor.fetchone()
+            if not row or not row[1]:
+                return []
+            desc_id, total = row
+
+            cursor.execute("""
+                SELECT d.descripcion, v.veces
+                FROM (
+                    SELECT desc_b AS otra, veces FROM coocurrencia_actividades WHERE desc_a = ?
+                    UNION ALL
+                    SELECT desc_a AS otra, veces FROM coocurrencia_actividades WHERE desc_b = ?
+                ) v
+                JOIN descripciones_cotizadas d ON d.id = v.otra
+                WHERE v.veces >= ?
+                ORDER BY v.veces DESC, d.descripcion
+                LIMIT ?
+            """, (desc_id, desc_id, min_veces, limit))
+            return [{'descripcion': r[0], 'veces': r[1], 'confianza': r[1] / total}
+                    for r in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error al consultar co-ocurrencias: {e}")
+            return []
+
+
+if __name__ == "__main__":
+    # Uso: python -m utils.cooccurrence_manager [ruta_db] [--rebuild]
+    from utils.database_manager import DatabaseManager
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    db = DatabaseManager(args[0]) if args else DatabaseManager()
+    manager = CooccurrenceManager(db)
+    total = manager.rebuild() if '--rebuild' in sys.argv else manager.update()
+    print(f"Snapshots procesados: {total}")
+    db.close()
@@ -2,6 +2,10 @@ import os
 import json
 from datetime import datetime
 
+from utils.instrumentation import get_logger, instrumentado
+
+logger = get_logger('archivos')
+
 
 class CotizacionFileManager:
     """
@@ -61,6 +65,7 @@ class CotizacionFileManager:
             print(f"Error guardando cotización: {e}")
             raise e
 
+    @instrumentado('archivo.cargar')
     def cargar_cotizacion(self, filepath):
         """
         Carga una cotización desde un archivo JSON con manejo robusto de errores.
@@ -72,7 +77,7 @@ class CotizacionFileManager:
             dict: Datos de la cotización cargada o None si hay error
         """
         try:
-            print(f"Intentando cargar: {filepath}")  # Debug temporal
+            logger.debug(f"Intentando cargar: {filepath}")
 
             # Verificar que el archivo existe
             if not os.path.exists(filepath):
@@ -85,14 +90,14 @@ class CotizacionFileManager:
                 print(f"Error: El archivo está vacío: {filepath}")
                 raise ValueError(f"El archivo está vacío: {filepath}")
 
-            print(f"Tamaño del archivo: {file_size} bytes")  # Debug temporal
+            logger.debug(f"Tamaño del archivo: {file_size} bytes")
 
             # Intentar leer con diferentes codificaciones
             encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
 
             for encoding in encodings:
                 try:
-                    print(f"Intentando con codificación: {encoding}")  # Debug temporal
+                    logger.debug(f"Intentando con codificación: {encoding}")
 
                     with open(filepath, 'r', encoding=encoding) as f:
                         content = f.read().strip()
@@ -100,7 +105,7 @@ class CotizacionFileManager:
                         if not content:
                             raise ValueError("El archivo está vacío después de leer")
 
-                        print(f"Primeros 100 caracteres: {repr(content[:100])}")  # Debug temporal
+                        logger.debug(f"Primeros 100 caracteres: {repr(content[:100])}")
 
                         # Parsear JSON
                         cotizacion_data = json.loads(content)
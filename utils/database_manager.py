@@ -3,16 +3,34 @@ from typing import List, Dict
 
 import sqlite3
 from utils.quotation_manager import QuotationManager
+from utils.price_history_manager import PriceHistoryManager
+from utils.quotation_lines_manager import QuotationLinesManager
+from utils.quotation_search_index import QuotationSearchIndex
+from utils.quotation_archive_manager import QuotationArchiveManager
+from utils.schema_migrations import migrar, VERSION_ESQUEMA
+from utils.change_events import ChangeEventBus, DataVersionWatcher, ALTA, MODIFICACION, BAJA
+from utils.instrumentation import get_logger
+from utils.sql_profiler import conectar
 
+logger = get_logger('db')
 
 
 
-class DatabaseManager(QuotationManager):
+
+class DatabaseManager(QuotationManager, PriceHistoryManager, QuotationLinesManager, QuotationSearchIndex,
+                      QuotationArchiveManager):
     def __init__(self, db_path="data/cotizaciones.db"): # Ruta corregida para ser más robusta
         self.db_path = db_path
         self.connection = None
+        self.events = ChangeEventBus()
+        self._change_listeners = {}    # callback de add_change_listener -> suscriptor del bus
+        self._data_version = None
+        self._archivos_adjuntos = {}   # año -> alias de la base de archivo adjunta
+        self._vista_archivo = None     # años incluidos en la vista cotizaciones_todas
         self.connect()
         self.create_tables()
+        if self.connection:
+            self._data_version = DataVersionWatcher(self.connection, self.events)
 
     def connect(self):
         """Establece la conexión a la base de datos."""
@@ -20,127 +38,195 @@ class DatabaseManager(QuotationManager):
             # Asegurarse de que el directorio de datos exista
             import os
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-            self.connection = sqlite3.connect(self.db_path)
-            print("Conexión a la base de datos establecida.")
+            # Conexión perfilable: ver utils/sql_profiler.py
+            self.connection = conectar(self.db_path)
+            logger.info("Conexión a la base de datos establecida: %s", self.db_path)
         except sqlite3.Error as e:
-            print(f"Error al conectar a la base de datos: {e}")
+            logger.error("Error al conectar a la base de datos: %s", e)
 
     def close(self):
         """Cierra la conexión a la base de datos."""
         if self.connection:
             self.connection.close()
-            print("Conexión a la base de datos cerrada.")
+            logger.info("Conexión a la base de datos cerrada.")
+
+    def add_change_listener(self, callback):
+        """
+        Registra una función que se llama tras cada cambio confirmado del catálogo.
+
+        La función recibe (entidad, item_id); item_id puede ser None cuando el
+        cambio afecta a varios registros. Para recibir también la operación,
+        suscribirse a self.events (ver utils/change_events.py).
+        """
+        if callback not in self._change_listeners:
+            suscriptor = lambda evento: callback(evento.entidad, evento.item_id)
+            self._change_listeners[callback] = suscriptor
+            self.events.subscribe(suscriptor)
+
+    def remove_change_listener(self, callback):
+        """Elimina una función registrada con add_change_listener."""
+        suscriptor = self._change_listeners.pop(callback, None)
+        if suscriptor:
+            self.events.unsubscribe(suscriptor)
+
+    def _notify_change(self, entidad, item_id=None, operacion=MODIFICACION):
+        """Publica en self.events un cambio ya confirmado."""
+        self.events.publish(entidad, item_id, operacion)
+
+    def check_external_changes(self):
+        """
+        Publica recargas si otro proceso escribió en la base (PRAGMA data_version).
+        Pensado para llamarse periódicamente desde la interfaz; devuelve True si hubo cambios.
+        """
+        try:
+            return bool(self._data_version and self._data_version.check())
+        except sqlite3.Error as e:
+            logger.error("Error al consultar data_version: %s", e)
+            return False
 
     def create_tables(self):
-        """Crea las tablas necesarias si no existen."""
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS clientes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tipo TEXT NOT NULL,
-                    nombre TEXT NOT NULL,
-                    direccion TEXT,
-                    nit TEXT,
-                    telefono TEXT,
-                    email TEXT
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS categorias (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre TEXT NOT NULL UNIQUE
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS actividades (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    descripcion TEXT NOT NULL,
-                    unidad TEXT NOT NULL,
-                    valor_unitario REAL NOT NULL,
-                    categoria_id INTEGER,
-                    FOREIGN KEY (categoria_id) REFERENCES categorias(id)
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS capitulos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre TEXT NOT NULL,
-                    descripcion TEXT,
-                    orden INTEGER DEFAULT 0
-                )
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS aiu_values (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    administracion REAL,
-                    imprevistos REAL,
-                    utilidad REAL,
-                    iva_sobre_utilidad REAL
-                )
-            """)
-            
-            # ===== NUEVAS TABLAS PARA DASHBOARD Y GESTIÓN =====
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS cotizaciones_generadas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cliente_id INTEGER,
-                    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    nombre_proyecto TEXT NOT NULL,
-                    monto_total REAL NOT NULL,
-                    estado TEXT DEFAULT 'pendiente',
-                    es_prueba BOOLEAN DEFAULT 0,
-                    ruta_pdf TEXT,
-                    ruta_excel TEXT,
-                    ruta_word TEXT,
-                    notas TEXT,
-                    validez_dias INTEGER DEFAULT 30,
-                    fecha_vencimiento DATE,
-                    tipo_cliente TEXT,
-                    FOREIGN KEY (cliente_id) REFERENCES clientes(id)
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS historial_cotizacion (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cotizacion_id INTEGER NOT NULL,
-                    fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    accion TEXT NOT NULL,
-                    usuario TEXT,
-                    notas TEXT,
-                    FOREIGN KEY (cotizacion_id) REFERENCES cotizaciones_generadas(id) ON DELETE CASCADE
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS cotizaciones_snapshot (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cotizacion_id INTEGER NOT NULL,
-                    fecha_snapshot DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    datos_json TEXT NOT NULL,
-                    table_rows_json TEXT NOT NULL,
-                    config_json TEXT,
-                    FOREIGN KEY (cotizacion_id) REFERENCES cotizaciones_generadas(id) ON DELETE CASCADE
-                )
-            """)
-            
-            self.connection.commit()
-            print("Tablas verificadas/creadas correctamente.")
-
-            # Insertar valores AIU por defecto si no existen
-            cursor.execute("SELECT COUNT(*) FROM aiu_values")
-            if cursor.fetchone()[0] == 0:
-                cursor.execute(
-                    "INSERT INTO aiu_values (administracion, imprevistos, utilidad, iva_sobre_utilidad) VALUES (?, ?, ?, ?)",
-                    (10.0, 5.0, 5.0, 19.0))
-                self.connection.commit()
-                print("Valores AIU por defecto insertados.")
-
+        """
+        Pone el esquema al día aplicando las migraciones pendientes (ver
+        utils/schema_migrations.py). Con la base en la última versión no se
+        ejecuta ninguna sentencia de esquema.
+        """
+        try:
+            aplicadas = migrar(self)
+            if aplicadas:
+                logger.info("Esquema actualizado a la versión %d (%d migraciones).", VERSION_ESQUEMA, aplicadas)
         except sqlite3.Error as e:
-            print(f"Error al crear tablas: {e}")
+            logger.error("Error al crear tablas: %s", e)
+
+    def create_base_tables(self, cursor):
+        """Tablas principales de la aplicación y valores AIU por defecto (migración 1). No hace commit."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS clientes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                nombre TEXT NOT NULL,
+                direccion TEXT,
+                nit TEXT,
+                telefono TEXT,
+                email TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS categorias (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre TEXT NOT NULL UNIQUE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS actividades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                descripcion TEXT NOT NULL,
+                unidad TEXT NOT NULL,
+                valor_unitario REAL NOT NULL,
+                categoria_id INTEGER,
+                FOREIGN KEY (categoria_id) REFERENCES categorias(id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS productos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre TEXT NOT NULL,
+                descripcion TEXT,
+                unidad TEXT NOT NULL,
+                precio_unitario REAL NOT NULL,
+                categoria_id INTEGER,
+                FOREIGN KEY (categoria_id) REFERENCES categorias(id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS actividad_producto (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                actividad_id INTEGER NOT NULL,
+                producto_id INTEGER NOT NULL,
+                cantidad REAL NOT NULL,
+                FOREIGN KEY (actividad_id) REFERENCES actividades(id),
+                FOREIGN KEY (producto_id) REFERENCES productos(id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS actividad_relacionada (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                actividad_principal_id INTEGER NOT NULL,
+                actividad_relacionada_id INTEGER NOT NULL,
+                FOREIGN KEY (actividad_principal_id) REFERENCES actividades(id),
+                FOREIGN KEY (actividad_relacionada_id) REFERENCES actividades(id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS capitulos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre TEXT NOT NULL,
+                descripcion TEXT,
+                orden INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS aiu_values (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                administracion REAL,
+                imprevistos REAL,
+                utilidad REAL,
+                iva_sobre_utilidad REAL
+            )
+        """)
+        
+        # ===== NUEVAS TABLAS PARA DASHBOARD Y GESTIÓN =====
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cotizaciones_generadas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cliente_id INTEGER,
+                fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+                fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+                nombre_proyecto TEXT NOT NULL,
+                monto_total REAL NOT NULL,
+                estado TEXT DEFAULT 'pendiente',
+                es_prueba BOOLEAN DEFAULT 0,
+                ruta_pdf TEXT,
+                ruta_excel TEXT,
+                ruta_word TEXT,
+                notas TEXT,
+                validez_dias INTEGER DEFAULT 30,
+                fecha_vencimiento DATE,
+                tipo_cliente TEXT,
+                FOREIGN KEY (cliente_id) REFERENCES clientes(id)
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS historial_cotizacion (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cotizacion_id INTEGER NOT NULL,
+                fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
+                accion TEXT NOT NULL,
+                usuario TEXT,
+                notas TEXT,
+                FOREIGN KEY (cotizacion_id) REFERENCES cotizaciones_generadas(id) ON DELETE CASCADE
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cotizaciones_snapshot (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cotizacion_id INTEGER NOT NULL,
+                fecha_snapshot DATETIME DEFAULT CURRENT_TIMESTAMP,
+                datos_json TEXT NOT NULL,
+                table_rows_json TEXT NOT NULL,
+                config_json TEXT,
+                FOREIGN KEY (cotizacion_id) REFERENCES cotizaciones_generadas(id) ON DELETE CASCADE
+            )
+        """)
+
+        # Insertar valores AIU por defecto si no existen
+        cursor.execute("SELECT COUNT(*) FROM aiu_values")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(
+                "INSERT INTO aiu_values (administracion, imprevistos, utilidad, iva_sobre_utilidad) VALUES (?, ?, ?, ?)",
+                (10.0, 5.0, 5.0, 19.0))
 
     # Métodos para clientes
     def add_client(self, tipo, nombre, direccion, nit, telefono, email):
@@ -151,7 +237,9 @@ class DatabaseManager(QuotationManager):
                 "INSERT INTO clientes (tipo, nombre, direccion, nit, telefono, email) VALUES (?, ?, ?, ?, ?, ?)",
                 (tipo, nombre, direccion, nit, telefono, email))
             self.connection.commit()
-            return cursor.lastrowid
+            client_id = cursor.lastrowid
+            self._notify_change('cliente', client_id, ALTA)
+            return client_id
         except sqlite3.Error as e:
             print(f"Error al agregar cliente: {e}")
             return None
@@ -210,6 +298,7 @@ class DatabaseManager(QuotationManager):
             """, (client_data['tipo'], client_data['nombre'], client_data['direccion'],
                   client_data['nit'], client_data['telefono'], client_data['email'], client_id))
             self.connection.commit()
+            self._notify_change('cliente', client_id, MODIFICACION)
             return True
         except sqlite3.Error as e:
             print(f"Error al actualizar cliente: {e}")
@@ -220,17 +309,16 @@ class DatabaseManager(QuotationManager):
             cursor = self.connection.cursor()
             cursor.execute("""
                         SELECT
-                            a.id, a.descripcion, a.unidad, a.valor_unitario, a.categoria_id, c.nombre as categoria_nombre
+                            a.id, a.descripcion, a.unidad, a.valor_unitario, a.categoria_id, c.nombre as categoria_nombre,
+                            ar.id as relation_id
                         FROM
-                            actividades a
+                            actividad_relacionada ar
+                        JOIN
+                            actividades a ON a.id = ar.actividad_relacionada_id
                         LEFT JOIN
                             categorias c ON a.categoria_id = c.id
                         WHERE
-                            a.id IN (
-                                SELECT actividad_relacionada_id 
-                                FROM actividad_relacionada 
-                                WHERE actividad_principal_id = ?
-                            )
+                            ar.actividad_principal_id = ?
                     """, (activity_id,))
             activities = []
             for row in cursor.fetchall():
@@ -240,13 +328,65 @@ class DatabaseManager(QuotationManager):
                     'unidad': row[2],
                     'valor_unitario': row[3],
                     'categoria_id': row[4],
-                    'categoria_nombre': row[5]
+                    'categoria_nombre': row[5],
+                    'relation_id': row[6]
                 })
             return activities
         except Exception as e:
             print(f"Error al obtener actividades relacionadas: {str(e)}")
             return []
 
+    def get_all_activity_relations(self):
+        """Obtiene todas las relaciones entre actividades como (relation_id, principal_id, relacionada_id)."""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT id, actividad_principal_id, actividad_relacionada_id FROM actividad_relacionada")
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Error al obtener relaciones de actividades: {e}")
+            return []
+
+    def get_activity_relation_by_id(self, relation_id):
+        """Obtiene una relación entre actividades como (relation_id, principal_id, relacionada_id)."""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT id, actividad_principal_id, actividad_relacionada_id
+                FROM actividad_relacionada WHERE id = ?
+            """, (relation_id,))
+            return cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"Error al obtener relación de actividades: {e}")
+            return None
+
+    def add_related_activity(self, main_activity_id, related_activity_id):
+        """Relaciona una actividad con otra actividad principal."""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                INSERT INTO actividad_relacionada (actividad_principal_id, actividad_relacionada_id)
+                VALUES (?, ?)
+            """, (main_activity_id, related_activity_id))
+            self.connection.commit()
+            relation_id = cursor.lastrowid
+            self._notify_change('actividad_relacionada', relation_id, ALTA)
+            return relation_id
+        except sqlite3.Error as e:
+            print(f"Error al agregar relación entre actividades: {e}")
+            return None
+
+    def delete_related_activity(self, relation_id):
+        """Elimina una relación entre actividades por su ID."""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("DELETE FROM actividad_relacionada WHERE id = ?", (relation_id,))
+            self.connection.commit()
+            self._notify_change('actividad_relacionada', relation_id, BAJA)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error al eliminar relación entre actividades: {e}")
+            return False
+
 
     def delete_client(self, client_id):
         """Elimina un cliente de la base de datos."""
@@ -254,6 +394,7 @@ class DatabaseManager(QuotationManager):
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM clientes WHERE id = ?", (client_id,))
             self.connection.commit()
+            self._notify_change('cliente', client_id, BAJA)
             return True
         except sqlite3.Error as e:
             print(f"Error al eliminar cliente: {e}")
@@ -266,7 +407,9 @@ class DatabaseManager(QuotationManager):
             cursor = self.connection.cursor()
             cursor.execute("INSERT INTO categorias (nombre) VALUES (?) ", (nombre,))
             self.connection.commit()
-            return cursor.lastrowid
+            category_id = cursor.lastrowid
+            self._notify_change('categoria', category_id, ALTA)
+            return category_id
         except sqlite3.Error as e:
             print(f"Error al agregar categoría: {e}")
             return None
@@ -287,12 +430,24 @@ class DatabaseManager(QuotationManager):
             print(f"Error al obtener categorías: {e}")
             return []
 
+    def get_category_by_id(self, category_id):
+        """Obtiene una categoría por su ID."""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT id, nombre FROM categorias WHERE id = ?", (category_id,))
+            row = cursor.fetchone()
+            return {'id': row[0], 'nombre': row[1]} if row else None
+        except sqlite3.Error as e:
+            print(f"Error al obtener categoría por ID: {e}")
+            return None
+
     def update_category(self, category_id, new_name):
         """Actualiza el nombre de una categoría."""
         try:
             cursor = self.connection.cursor()
             cursor.execute("UPDATE categorias SET nombre = ? WHERE id = ?", (new_name, category_id))
             self.connection.commit()
+            self._notify_change('categoria', category_id, MODIFICACION)
             return True
         except sqlite3.Error as e:
             print(f"Error al actualizar categoría: {e}")
@@ -304,6 +459,7 @@ class DatabaseManager(QuotationManager):
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM categorias WHERE id = ?", (category_id,))
             self.connection.commit()
+            self._notify_change('categoria', category_id, BAJA)
             return True
         except sqlite3.Error as e:
             print(f"Error al eliminar categoría: {e}")
@@ -317,9 +473,13 @@ class DatabaseManager(QuotationManager):
             cursor.execute(
                 "INSERT INTO actividades (descripcion, unidad, valor_unitario, categoria_id) VALUES (?, ?, ?, ?)",
                 (descripcion, unidad, valor_unitario, categoria_id))
+            activity_id = cursor.lastrowid
+            self._record_price_change(cursor, 'actividad', activity_id, valor_unitario, motivo='alta')
             self.connection.commit()
-            return cursor.lastrowid
+            self._notify_change('actividad', activity_id, ALTA)
+            return activity_id
         except sqlite3.Error as e:
+            self.connection.rollback()
             print(f"Error al agregar actividad: {e}")
             return None
 
@@ -388,9 +548,12 @@ class DatabaseManager(QuotationManager):
                 SET descripcion = ?, unidad = ?, valor_unitario = ?, categoria_id = ?
                 WHERE id = ?
             """, (descripcion, unidad, valor_unitario, categoria_id, activity_id))
+            self._record_price_change(cursor, 'actividad', activity_id, valor_unitario)
             self.connection.commit()
+            self._notify_change('actividad', activity_id, MODIFICACION)
             return True
         except sqlite3.Error as e:
+            self.connection.rollback()
             print(f"Error al actualizar actividad: {e}")
             return False
 
@@ -399,9 +562,12 @@ class DatabaseManager(QuotationManager):
         try:
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM actividades WHERE id = ?", (activity_id,))
+            self._close_price_history(cursor, 'actividad', activity_id)
             self.connection.commit()
+            self._notify_change('actividad', activity_id, BAJA)
             return True
         except sqlite3.Error as e:
+            self.connection.rollback()
             print(f"Error al eliminar actividad: {e}")
             return False
 
@@ -432,6 +598,7 @@ class DatabaseManager(QuotationManager):
                 "UPDATE aiu_values SET administracion = ?, imprevistos = ?, utilidad = ?, iva_sobre_utilidad = ? WHERE id = 1",
                 (administracion, imprevistos, utilidad, iva_sobre_utilidad))
             self.connection.commit()
+            self._notify_change('aiu', 1, MODIFICACION)
             return True
         except sqlite3.Error as e:
             print(f"Error al actualizar valores AIU: {e}")
@@ -480,6 +647,7 @@ class DatabaseManager(QuotationManager):
             cursor.execute(sql, (nombre, descripcion))
             self.connection.commit()
             last_id = cursor.lastrowid
+            self._notify_change('capitulo', last_id, ALTA)
             print(f"DEBUG (DB): Capítulo '{nombre}' agregado con ID: {last_id}")
             return last_id
         except Exception as e:
@@ -493,6 +661,7 @@ class DatabaseManager(QuotationManager):
             cursor = self.connection.cursor()
             cursor.execute(sql, (nombre, descripcion, chapter_id))
             self.connection.commit()
+            self._notify_change('capitulo', chapter_id, MODIFICACION)
             print(f"DEBUG (DB): Capítulo ID {chapter_id} actualizado.")
             return True
         except sqlite3.Error as e:
@@ -506,6 +675,7 @@ class DatabaseManager(QuotationManager):
             cursor = self.connection.cursor()
             cursor.execute(sql, (chapter_id,))
             self.connection.commit()
+            self._notify_change('capitulo', chapter_id, BAJA)
             print(f"DEBUG (DB): Capítulo con ID {chapter_id} eliminado.")
             return True
         except Exception as e:
@@ -521,9 +691,13 @@ class DatabaseManager(QuotationManager):
                 (product_data['nombre'], product_data['descripcion'], product_data['unidad'],
                  product_data['precio_unitario'], product_data.get('categoria_id'))
             )
+            product_id = cursor.lastrowid
+            self._record_price_change(cursor, 'producto', product_id, product_data['precio_unitario'], motivo='alta')
             self.connection.commit()
-            return cursor.lastrowid
+            self._notify_change('producto', product_id, ALTA)
+            return product_id
         except sqlite3.Error as e:
+            self.connection.rollback()
             print(f"Error al agregar producto: {e}")
             return None
 
@@ -561,9 +735,12 @@ class DatabaseManager(QuotationManager):
                 WHERE id = ?
             """, (product_data['nombre'], product_data['descripcion'], product_data['unidad'],
                   product_data['precio_unitario'], product_data.get('categoria_id'), product_id))
+            self._record_price_change(cursor, 'producto', product_id, product_data['precio_unitario'])
             self.connection.commit()
+            self._notify_change('producto', product_id, MODIFICACION)
             return True
         except sqlite3.Error as e:
+            self.connection.rollback()
             print(f"Error al actualizar producto: {e}")
             return False
 
@@ -572,9 +749,12 @@ class DatabaseManager(QuotationManager):
         try:
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM productos WHERE id = ?", (product_id,))
+            self._close_price_history(cursor, 'producto', product_id)
             self.connection.commit()
+            self._notify_change('producto', product_id, BAJA)
             return True
         except sqlite3.Error as e:
+            self.connection.rollback()
             print(f"Error al eliminar producto: {e}")
             return False
 
@@ -588,8 +768,10 @@ class DatabaseManager(QuotationManager):
                 "INSERT INTO actividad_producto (actividad_id, producto_id, cantidad) VALUES (?, ?, ?)",
                 (activity_id, product_id, quantity)
             )
+            relation_id = cursor.lastrowid
             self.connection.commit()
-            return cursor.lastrowid
+            self._notify_change('actividad_producto', relation_id, ALTA)
+            return relation_id
         except sqlite3.Error as e:
             print(f"Error al agregar relación actividad-producto: {e}")
             return None
@@ -600,6 +782,7 @@ class DatabaseManager(QuotationManager):
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM actividad_producto WHERE id = ?", (relation_id,))
             self.connection.commit()
+            self._notify_change('actividad_producto', relation_id, BAJA)
             return True
         except sqlite3.Error as e:
             print(f"Error al eliminar relación actividad-producto: {e}")
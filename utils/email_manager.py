@@ -6,6 +6,10 @@ import os
 import json
 from typing import List, Optional
 
+from utils.instrumentation import get_logger, instrumentado
+
+logger = get_logger('email')
+
 
 class EmailManager:
     def __init__(self, config_file=None):
@@ -50,7 +54,7 @@ class EmailManager:
             if 'email' in config_data:
                 self.config.update(config_data['email'])
         except Exception as e:
-            print(f"Error al cargar la configuración de email: {e}")
+            logger.error("Error al cargar la configuración de email: %s", e)
 
     def save_config(self, config_file=None):
         """
@@ -79,9 +83,10 @@ class EmailManager:
 
             return True
         except Exception as e:
-            print(f"Error al guardar la configuración de email: {e}")
+            logger.error("Error al guardar la configuración de email: %s", e)
             return False
 
+    @instrumentado('email.send')
     def send_email(self,
                    recipients: List[str] = None,
                    subject: str = None,
@@ -109,12 +114,12 @@ class EmailManager:
 
         # Verificar que haya destinatarios
         if not recipients:
-            print("Error: No se especificaron destinatarios")
+            logger.error("No se especificaron destinatarios")
             return False
 
         # Verificar que haya credenciales SMTP
         if not self.config['smtp_user'] or not self.config['smtp_password']:
-            print("Error: Faltan credenciales SMTP")
+            logger.error("Faltan credenciales SMTP")
             return False
 
         try:
@@ -136,7 +141,7 @@ class EmailManager:
                             part['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
                             msg.attach(part)
                     else:
-                        print(f"Advertencia: No se encontró el archivo {file_path}")
+                        logger.warning("No se encontró el archivo %s", file_path)
 
             # Conectar al servidor SMTP
             server = smtplib.SMTP(self.config['smtp_server'], self.config['smtp_port'])
@@ -147,11 +152,11 @@ class EmailManager:
             server.send_message(msg)
             server.quit()
 
-            print(f"Correo enviado correctamente a {', '.join(recipients)}")
+            logger.info("Correo enviado correctamente a %s", ', '.join(recipients))
             return True
 
         except Exception as e:
-            print(f"Error al enviar correo: {e}")
+            logger.error("Error al enviar correo: %s", e)
             return False
 
     def test_connection(self) -> bool:
@@ -168,7 +173,7 @@ class EmailManager:
             server.quit()
             return True
         except Exception as e:
-            print(f"Error al conectar con el servidor SMTP: {e}")
+            logger.error("Error al conectar con el servidor SMTP: %s", e)
             return False
 
     def update_config(self, **kwargs):
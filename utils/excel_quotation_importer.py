@@ -0,0 +1,209 @@
+import os
+import re
+from datetime import datetime
+
+from utils.pricing_engine import PricingEngine, get_pricing_engine
+from utils.text_utils import normalize_text
+
+
+class ExcelQuotationImporter:
+    """
+    Importa cotizaciones desde los .xlsx que genera ExcelController.
+
+    Recorre el libro en modo de solo lectura (fila por fila, sin cargar
+    estilos ni celdas combinadas) y reconoce el formato de generate_excel:
+    filas "N.0 CAPÍTULO", actividades "N.M", filas "SUBTOTAL CAPÍTULO N.0"
+    y el bloque de totales (AIU o IVA). También acepta el libro por
+    capítulos: cada hoja de capítulo tiene el mismo formato y el bloque de
+    totales está en la hoja "Resumen".
+
+    Las descripciones se asocian a las actividades del catálogo a través de
+    un índice en memoria (ver RelatedActivityIndex.find_activity).
+    """
+
+    PATRON_CAPITULO = re.compile(r'^\s*(\d+)\.0\s+(.+?)\s*$')
+    PATRON_ITEM = re.compile(r'^\s*\d+\.\d+\s*$')
+    PATRON_PORCENTAJE = re.compile(r'\(\s*([0-9]+(?:[.,][0-9]+)?)\s*%\s*\)')
+    PATRON_ARCHIVO = re.compile(r'^cotizacion(?:_capitulos)?_(.*?)(?:_\d{8}_\d{6})?$')
+
+    # Etiqueta normalizada del bloque de totales -> clave de aiu_values (en orden de prueba)
+    ETIQUETAS_AIU = (
+        ('iva sobre utilidad', 'iva_sobre_utilidad'),
+        ('administracion', 'administracion'),
+        ('imprevistos', 'imprevistos'),
+        ('utilidad', 'utilidad'),
+        ('iva', 'iva_sobre_utilidad'),
+    )
+    ETIQUETA_COSTOS_DIRECTOS = 'total costos directos'
+    HOJA_RESUMEN = 'resumen'
+    HOJAS_OMITIDAS = ('materiales', 'lista de materiales')
+
+    def __init__(self, activity_index=None, chapters=None, pricing_engine=None):
+        """
+        Args:
+            activity_index: Objeto con find_activity(descripcion) -> dict o None
+            chapters (list): Capítulos del catálogo [{'id', 'nombre'}]
+            pricing_engine (PricingEngine): Motor para los totales por línea
+        """
+        self.activity_index = activity_index
+        self.pricing_engine = pricing_engine or get_pricing_engine()
+        self._chapter_ids = {}
+        for chapter in chapters or []:
+            self._chapter_ids.setdefault(normalize_text(chapter['nombre']), chapter['id'])
+
+    # ===== LECTURA =====
+
+    @staticmethod
+    def _numero(valor):
+        """Convierte el valor de una celda a float (acepta textos como "1,234.50")."""
+        if isinstance(valor, (int, float)):
+            return float(valor)
+        return float(PricingEngine.to_decimal(valor))
+
+    def _leer_hoja(self, rows, table_rows, aiu, etiquetas):
+        """
+        Procesa las filas (valores de A a E) de una hoja.
+
+        La columna F solo tiene fórmulas que se recalculan al importar, así
+        que no se lee.
+
+        Returns:
+            bool: True si se encontró el bloque de totales
+        """
+        en_totales = False
+        for row in rows:
+            a, b, c, d, e = (tuple(row) + (None,) * 5)[:5]
+            etiqueta = a.strip() if isinstance(a, str) else a
+
+            if isinstance(etiqueta, str):
+                texto = normalize_text(etiqueta)
+                if texto.startswith('subtotal capitulo'):
+                    continue
+                if texto.startswith(self.ETIQUETA_COSTOS_DIRECTOS):
+                    en_totales = True
+                    continue
+                if en_totales:
+                    for prefijo, clave in self.ETIQUETAS_AIU:
+                        if texto.startswith(prefijo):
+                            porcentaje = self.PATRON_PORCENTAJE.search(etiqueta)
+                            if porcentaje:
+                                aiu[clave] = float(porcentaje.group(1).replace(',', '.'))
+                            etiquetas.add(prefijo)
+                            break
+                    continue
+                capitulo = self.PATRON_CAPITULO.match(etiqueta)
+                if capitulo and b is None:
+                    if capitulo.group(1) == '0':
+                        # Título de la hoja de actividades sin capítulo (Excel por capítulos)
+                        continue
+                    nombre = capitulo.group(2)
+                    table_rows.append({
+                        'type': 'chapter_header',
+                        'descripcion': nombre,
+                        'chapter_id': self._chapter_ids.get(normalize_text(nombre)),
+                    })
+                    continue
+
+            if en_totales:
+                continue
+
+            # Actividad: ítem "N.M" (texto o número si el cliente lo cambió) y descripción
+            es_item = isinstance(etiqueta, (int, float)) or (
+                isinstance(etiqueta, str) and self.PATRON_ITEM.match(etiqueta))
+            descripcion = str(b).strip() if b is not None else ''
+            if not es_item or not descripcion:
+                continue
+            table_rows.append({
+                'type': 'activity',
+                'descripcion': descripcion,
+                'cantidad': self._numero(c),
+                'unidad': str(d).strip() if d is not None else '',
+                'valor_unitario': self._numero(e),
+            })
+        return en_totales
+
+    def importar(self, filepath):
+        """
+        Reconstruye una cotización (formato de archivo v2.0) desde un .xlsx generado.
+
+        Args:
+            filepath (str): Ruta del libro
+
+        Returns:
+            dict: Cotización con 'cliente', 'table_rows', 'actividades', 'aiu_values' y 'total'
+
+        Raises:
+            ValueError: Si el libro no tiene el formato de las cotizaciones generadas
+        """
+        from openpyxl import load_workbook
+
+        try:
+            workbook = load_workbook(filepath, read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"No se pudo leer el libro de Excel: {e}")
+
+        table_rows = []
+        aiu = {}
+        etiquetas = set()
+        encontro_totales = False
+        try:
+            for sheet in workbook.worksheets:
+                titulo = normalize_text(sheet.title)
+                if titulo in self.HOJAS_OMITIDAS:
+                    continue
+                rows = sheet.iter_rows(min_row=2, max_col=5, values_only=True)
+                if titulo == self.HOJA_RESUMEN:
+                    # Solo el bloque de totales: los capítulos están en sus hojas
+                    encontro_totales |= self._leer_hoja(rows, [], aiu, etiquetas)
+                else:
+                    encontro_totales |= self._leer_hoja(rows, table_rows, aiu, etiquetas)
+        finally:
+            workbook.close()
+
+        if not any(row['type'] == 'activity' for row in table_rows):
+            raise ValueError("El libro no contiene actividades con el formato de las cotizaciones generadas.")
+        if not encontro_totales:
+            print("Advertencia: el libro no tiene el bloque de totales; se usan los porcentajes por defecto")
+
+        return self._armar_cotizacion(filepath, table_rows, aiu, etiquetas)
+
+    # ===== RESULTADO =====
+
+    def _armar_cotizacion(self, filepath, table_rows, aiu, etiquetas):
+        engine = self.pricing_engine
+        tipo = 'Juridica' if 'administracion' in etiquetas else 'Natural'
+
+        activities = []
+        actividades = [row for row in table_rows if row['type'] == 'activity']
+        totales = engine.line_totals([row['cantidad'] for row in actividades],
+                                     [row['valor_unitario'] for row in actividades])
+        for numero, (row, total) in enumerate(zip(actividades, totales), 1):
+            row['total'] = float(total)
+            row['id'] = numero
+            activity = self.activity_index.find_activity(row['descripcion']) if self.activity_index else None
+            row['actividad_id'] = activity['id'] if activity else None
+            activities.append({k: v for k, v in row.items() if k != 'type'})
+
+        aiu_values = dict(engine.DEFAULT_AIU)
+        aiu_values.update(aiu)
+        resultado = engine.price(table_rows, tipo, aiu_values)
+
+        nombre_archivo = os.path.splitext(os.path.basename(filepath))[0]
+        coincidencia = self.PATRON_ARCHIVO.match(nombre_archivo)
+        cliente = (coincidencia.group(1) if coincidencia else nombre_archivo).replace('_', ' ').strip()
+
+        return {
+            'fecha': datetime.now().strftime('%Y-%m-%d'),
+            'cliente': {'nombre': cliente, 'tipo': tipo},
+            'table_rows': table_rows,
+            'actividades': activities,
+            'subtotal': float(resultado['costo_directo']),
+            'administracion': float(resultado['administracion']),
+            'imprevistos': float(resultado['imprevistos']),
+            'utilidad': float(resultado['utilidad']),
+            'iva_utilidad': float(resultado['iva']),
+            'total': float(resultado['total']),
+            'aiu_values': aiu_values,
+            'origen': os.path.basename(filepath),
+            'version': '2.0'
+        }
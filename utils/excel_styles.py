@@ -0,0 +1,166 @@
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+
+class ExcelStyleRegistry:
+    """
+    Registro de estilos con nombre (NamedStyle) de un libro.
+
+    Cada combinación de fuente, relleno, alineación, formato numérico y
+    bordes se construye una sola vez por libro y se registra como NamedStyle;
+    las celdas solo guardan la referencia al estilo. Use para_libro() para
+    compartir el registro de un libro: dos registros con el mismo prefijo
+    crearían estilos con el mismo nombre.
+    """
+
+    FUENTES = {
+        'encabezado': {'bold': True, 'color': "FFFFFF"},
+        'subtotal': {'bold': True, 'italic': True, 'color': "FFFFFF"},
+        'total': {'bold': True},
+    }
+
+    ALINEACIONES = {
+        'descripcion': {'horizontal': "left", 'vertical': "center", 'wrap_text': True},
+        'centro': {'horizontal': "center", 'vertical': "center"},
+        'derecha': {'horizontal': "right"},
+        'derecha_centro': {'horizontal': "right", 'vertical': "center"},
+    }
+
+    FORMATOS = {
+        'moneda': '"$"#,##0.00',
+    }
+
+    def __init__(self, workbook, prefijo="cot"):
+        self.workbook = workbook
+        self.prefijo = prefijo
+        self._nombres = {}      # combinación -> nombre del NamedStyle
+        self._claves = {}       # nombre del NamedStyle -> combinación
+        self._lados = {}        # estilo de línea -> Side
+
+    @classmethod
+    def para_libro(cls, workbook, prefijo="cot"):
+        """Registro del libro para ese prefijo; se crea la primera vez y queda guardado en el libro."""
+        registros = getattr(workbook, '_registros_estilo', None)
+        if registros is None:
+            registros = workbook._registros_estilo = {}
+        if prefijo not in registros:
+            registros[prefijo] = cls(workbook, prefijo)
+        return registros[prefijo]
+
+    def _side(self, estilo):
+        if estilo is None:
+            return Side()
+        if estilo not in self._lados:
+            self._lados[estilo] = Side(border_style=estilo, color="000000")
+        return self._lados[estilo]
+
+    def nombre(self, fuente=None, relleno=None, alineacion=None, formato=None, borde=None):
+        """
+        Devuelve el nombre del NamedStyle para una combinación, creándolo si no existe.
+
+        Args:
+            fuente (str): Clave de FUENTES
+            relleno (str): Color hexadecimal del relleno sólido
+            alineacion (str): Clave de ALINEACIONES
+            formato (str): Clave de FORMATOS
+            borde (tuple): Estilos de línea (izquierda, derecha, arriba, abajo)
+        """
+        clave = (fuente, relleno, alineacion, formato, borde)
+        nombre = self._nombres.get(clave)
+        if nombre is not None:
+            return nombre
+
+        # Un libro abierto desde disco puede traer estilos con estos nombres
+        existentes = set(self.workbook.named_styles)
+        numero = len(self._nombres) + 1
+        while f"{self.prefijo}_{numero}" in existentes:
+            numero += 1
+        nombre = f"{self.prefijo}_{numero}"
+        estilo = NamedStyle(name=nombre)
+        estilo.font = Font(**self.FUENTES[fuente]) if fuente else DEFAULT_FONT
+        if relleno:
+            estilo.fill = PatternFill(start_color=relleno, end_color=relleno, fill_type="solid")
+        if alineacion:
+            estilo.alignment = Alignment(**self.ALINEACIONES[alineacion])
+        if formato:
+            estilo.number_format = self.FORMATOS[formato]
+        if borde:
+            left, right, top, bottom = borde
+            estilo.border = Border(left=self._side(left), right=self._side(right),
+                                   top=self._side(top), bottom=self._side(bottom))
+        self.workbook.add_named_style(estilo)
+        self._nombres[clave] = nombre
+        self._claves[nombre] = clave
+        return nombre
+
+    def clave(self, nombre):
+        """Combinación (fuente, relleno, alineacion, formato, borde) de un estilo registrado."""
+        return self._claves.get(nombre)
+
+
+class ExcelStylePlanner:
+    """
+    Planificador de estilos y bordes de una hoja.
+
+    Los generadores registran atributos por celda y marcos de bordes
+    (exterior grueso, interior delgado) en el orden en que antes los
+    aplicaban; al final apply() calcula el estado definitivo de cada celda
+    y le asigna su NamedStyle una única vez. Un marco posterior reemplaza
+    los bordes de uno anterior en las celdas que comparten, igual que al
+    aplicarlos en secuencia, y los marcos tapados por completo no se recorren.
+    """
+
+    def __init__(self, workbook, registry=None):
+        self.registry = registry or ExcelStyleRegistry.para_libro(workbook)
+        self._atributos = {}    # (fila, columna) -> {'fuente': ..., 'relleno': ..., ...}
+        self._marcos = []       # (fila_ini, fila_fin, col_ini, col_fin, exterior, interior)
+
+    def estilo(self, row, col, **atributos):
+        """Registra atributos de una celda; los posteriores reemplazan a los anteriores."""
+        celda = self._atributos.get((row, col))
+        if celda is None:
+            self._atributos[(row, col)] = dict(atributos)
+        else:
+            celda.update(atributos)
+
+    def estilo_rango(self, start_row, end_row, start_col, end_col, **atributos):
+        for row in range(start_row, end_row + 1):
+            for col in range(start_col, end_col + 1):
+                self.estilo(row, col, **atributos)
+
+    def marco(self, start_row, end_row, start_col=1, end_col=6, exterior="medium", interior="thin"):
+        """Registra un marco: bordes exteriores `exterior` e interiores `interior`."""
+        self._marcos.append((start_row, end_row, start_col, end_col, exterior, interior))
+
+    def _resolver_bordes(self):
+        """Calcula el borde final de cada celda en una sola pasada (el último marco gana)."""
+        bordes = {}
+        cubiertos = []
+        for start_row, end_row, start_col, end_col, exterior, interior in reversed(self._marcos):
+            if any(r1 <= start_row and end_row <= r2 and c1 <= start_col and end_col <= c2
+                   for r1, r2, c1, c2 in cubiertos):
+                continue
+            for row in range(start_row, end_row + 1):
+                top = exterior if row == start_row else interior
+                bottom = exterior if row == end_row else interior
+                for col in range(start_col, end_col + 1):
+                    if (row, col) in bordes:
+                        continue
+                    left = exterior if col == start_col else interior
+                    right = exterior if col == end_col else interior
+                    bordes[(row, col)] = (left, right, top, bottom)
+            cubiertos.append((start_row, end_row, start_col, end_col))
+        return bordes
+
+    def apply(self, sheet):
+        """Asigna a cada celda planificada su estilo definitivo."""
+        bordes = self._resolver_bordes()
+        nombre = self.registry.nombre
+        sin_atributos = {}
+        for posicion in self._atributos.keys() | bordes.keys():
+            atributos = self._atributos.get(posicion, sin_atributos)
+            estilo = nombre(atributos.get('fuente'), atributos.get('relleno'), atributos.get('alineacion'),
+                            atributos.get('formato'), bordes.get(posicion))
+            sheet.cell(row=posicion[0], column=posicion[1]).style = estilo
+        self._atributos.clear()
+        self._marcos.clear()
@@ -2,12 +2,14 @@ import win32com.client as win32
 import os
 import pythoncom
 import time
+from utils.instrumentation import instrumentado
 
 class ExcelToWordAutomation:
     def __init__(self):
         self.excel = None
         self.word = None
 
+    @instrumentado('office.flujo_completo')
     def ejecutar_flujo_completo(self, excel_path, word_template_path, pdf_output_path):
         """
         Coordina la apertura de Excel, copia de tabla, pegado en Word y exportación a PDF.
@@ -119,6 +121,7 @@ class ExcelToWordAutomation:
                 self.word.Quit()
             pythoncom.CoUninitialize()
 
+    @instrumentado('pdf.convert')
     def convert_word_to_pdf(self, word_path, pdf_output_path):
         """Convierte un documento Word existente a PDF."""
         try:
@@ -140,6 +143,7 @@ class ExcelToWordAutomation:
             if self.word: self.word.Quit()
             pythoncom.CoUninitialize()
 
+    @instrumentado('pdf.convert')
     def convert_excel_to_pdf(self, excel_path, pdf_output_path):
         """Convierte la hoja activa de un Excel a PDF."""
         try:
@@ -162,4 +166,20 @@ class ExcelToWordAutomation:
             return False, str(e)
         finally:
             if self.excel: self.excel.Quit()
-            pythoncom.CoUninitialize()
\ No newline at end of file
+            pythoncom.CoUninitialize()
+
+# ===== Funciones para procesos de trabajo (utils/pipeline.py) =====
+# Cada proceso crea su propia instancia de Word/Excel; un error se propaga como excepción.
+
+def convertir_word_a_pdf(word_path, pdf_output_path):
+    exito, mensaje = ExcelToWordAutomation().convert_word_to_pdf(word_path, pdf_output_path)
+    if not exito:
+        raise RuntimeError(f"Error Word: {mensaje}")
+    return pdf_output_path
+
+
+def convertir_excel_a_pdf(excel_path, pdf_output_path):
+    exito, mensaje = ExcelToWordAutomation().convert_excel_to_pdf(excel_path, pdf_output_path)
+    if not exito:
+        raise RuntimeError(f"Error Excel: {mensaje}")
+    return pdf_output_path
@@ -11,48 +11,12 @@ class CapitulosManager:
     def __init__(self, database_manager):
         """
         Inicializa el gestor de capítulos con una referencia al DatabaseManager existente.
+        La tabla capitulos y las columnas capitulo_id / orden de actividades las crean
+        las migraciones (utils/schema_migrations.py).
         """
         self.db_manager = database_manager
-        self.conn = database_manager.conn
-        self.cursor = database_manager.cursor
-
-    def create_capitulos_table(self):
-        """
-        Crea la tabla de capítulos si no existe.
-        """
-        try:
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS capitulos (
-                id INTEGER PRIMARY KEY,
-                nombre TEXT NOT NULL,
-                descripcion TEXT,
-                orden INTEGER DEFAULT 0
-            )
-            ''')
-
-            # Verificar si la columna capitulo_id ya existe en la tabla actividades
-            self.cursor.execute("PRAGMA table_info(actividades)")
-            columns = [column[1] for column in self.cursor.fetchall()]
-
-            if 'capitulo_id' not in columns:
-                # Añadir columna capitulo_id a la tabla actividades
-                self.cursor.execute('''
-                ALTER TABLE actividades ADD COLUMN capitulo_id INTEGER
-                REFERENCES capitulos(id)
-                ''')
-
-            # Verificar si la columna orden ya existe en la tabla actividades
-            if 'orden' not in columns:
-                # Añadir columna orden a la tabla actividades
-                self.cursor.execute('''
-                ALTER TABLE actividades ADD COLUMN orden INTEGER DEFAULT 0
-                ''')
-
-            self.conn.commit()
-            return True
-        except sqlite3.Error as e:
-            print(f"Error al crear tabla de capítulos: {e}")
-            return False
+        self.conn = database_manager.connection
+        self.cursor = self.conn.cursor()
 
     def add_capitulo(self, capitulo_data: Dict) -> int:
         """
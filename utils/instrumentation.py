@@ -0,0 +1,300 @@
+"""
+Instrumentación: logs estructurados, mediciones por etapa y trazas.
+
+Las etapas de la generación (lectura de BD, armado del Excel, Word, PDF,
+unión de PDFs, correo) se miden con span():
+
+    with span('excel.build', cotizacion_id=12, filas=500):
+        ...
+
+o con el decorador @instrumentado('pdf.convert'). Los spans anidados
+forman un árbol por ejecución (ContextVar), heredan el ID de cotización del
+span padre y, al terminar el span raíz, la ejecución queda disponible en
+ultima_ejecucion() para el panel de tiempos. Con una ruta de traza
+configurada, cada span se agrega como una línea JSON.
+
+Desactivada (por defecto), span() devuelve un objeto nulo compartido y el
+decorador solo comprueba una bandera: no se crean objetos ni se miden
+tiempos.
+
+Configuración: sección 'instrumentacion' de config.json
+({"activo": true, "traza": "logs/traza.jsonl", "nivel": "INFO"}) o las
+variables de entorno COTIZER_INSTRUMENTACION=1 y COTIZER_TRAZA=ruta.
+"""
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+LOGGER_RAIZ = 'cotizer'
+
+_span_actual = ContextVar('cotizer_span', default=None)
+_cotizacion_actual = ContextVar('cotizer_cotizacion', default=None)
+
+
+class _Estado:
+    activo = False
+    traza = None
+    ultima_ejecucion = []
+    lock = threading.Lock()
+    ids = itertools.count(1)
+
+
+_estado = _Estado()
+
+
+def get_logger(nombre):
+    """Logger de un módulo de la aplicación (cotizer.<nombre>)."""
+    return logging.getLogger(f"{LOGGER_RAIZ}.{nombre}")
+
+
+_logger = get_logger('instrumentacion')
+
+
+# ===== LOGS ESTRUCTURADOS =====
+
+class ContextoFilter(logging.Filter):
+    """Agrega a cada registro el ID de cotización y el span en curso."""
+
+    def filter(self, record):
+        span_actual = _span_actual.get()
+        record.cotizacion_id = _cotizacion_actual.get() or '-'
+        record.span = span_actual.nombre if span_actual else '-'
+        return True
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Formatea cada registro como un objeto JSON en una línea."""
+
+    def format(self, record):
+        datos = {
+            'ts': round(record.created, 6),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'cotizacion_id': getattr(record, 'cotizacion_id', None),
+            'span': getattr(record, 'span', None),
+        }
+        if record.exc_info:
+            datos['error'] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configure(activo=None, traza=None, nivel=None, json_logs=False, config_file=None):
+    """
+    Configura los logs de la aplicación y la instrumentación.
+
+    Los argumentos explícitos tienen prioridad sobre las variables de entorno
+    y estas sobre config.json.
+
+    Args:
+        activo (bool): Activa los spans y las mediciones
+        traza (str): Archivo JSONL donde se agrega cada span
+        nivel (str): Nivel de log ('DEBUG', 'INFO', ...)
+        json_logs (bool): Logs de consola en formato JSON
+    """
+    if not config_file:
+        config_file = os.path.join(os.getcwd(), 'config.json')
+    opciones = {}
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r') as f:
+                opciones = json.load(f).get('instrumentacion', {})
+    except Exception as e:
+        print(f"Error al cargar la configuración de instrumentación: {e}")
+
+    if activo is None:
+        entorno = os.environ.get('COTIZER_INSTRUMENTACION')
+        activo = entorno not in ('', '0', 'false', 'no') if entorno is not None else bool(opciones.get('activo'))
+    traza = traza or os.environ.get('COTIZER_TRAZA') or opciones.get('traza')
+    nivel = nivel or opciones.get('nivel', 'INFO')
+
+    raiz = logging.getLogger(LOGGER_RAIZ)
+    raiz.setLevel(getattr(logging, str(nivel).upper(), logging.INFO))
+    if not any(getattr(h, '_cotizer', False) for h in raiz.handlers):
+        handler = logging.StreamHandler()
+        handler._cotizer = True
+        handler.addFilter(ContextoFilter())
+        raiz.addHandler(handler)
+        raiz.propagate = False
+    for handler in raiz.handlers:
+        if getattr(handler, '_cotizer', False):
+            handler.setFormatter(JsonLineFormatter() if json_logs else logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s [cot=%(cotizacion_id)s %(span)s] %(message)s"))
+
+    set_enabled(activo, traza)
+
+
+def set_enabled(activo, traza=None):
+    """Activa o desactiva la instrumentación en tiempo de ejecución."""
+    _estado.activo = bool(activo)
+    _estado.traza = traza or None
+    if _estado.traza:
+        directorio = os.path.dirname(os.path.abspath(_estado.traza))
+        os.makedirs(directorio, exist_ok=True)
+
+
+def is_enabled():
+    return _estado.activo
+
+
+def trace_path():
+    return _estado.traza
+
+
+# ===== SPANS =====
+
+class Span:
+    """Etapa medida: nombre, atributos, duración y posición en el árbol de la ejecución."""
+
+    __slots__ = ('nombre', 'atributos', 'span_id', 'padre', 'traza_id', 'cotizacion_id',
+                 'inicio', 'inicio_ts', 'duracion_ms', 'estado', 'error', 'hijos',
+                 '_token_span', '_token_cotizacion')
+
+    def __init__(self, nombre, cotizacion_id=None, **atributos):
+        padre = _span_actual.get()
+        self.nombre = nombre
+        self.atributos = atributos
+        self.span_id = next(_estado.ids)
+        self.padre = padre
+        self.traza_id = padre.traza_id if padre else uuid.uuid4().hex[:16]
+        self.cotizacion_id = cotizacion_id if cotizacion_id is not None else _cotizacion_actual.get()
+        self.inicio = None
+        self.inicio_ts = None
+        self.duracion_ms = None
+        self.estado = 'ok'
+        self.error = None
+        self.hijos = []
+
+    def set(self, **atributos):
+        """Agrega atributos al span (p. ej. el número de filas procesadas)."""
+        self.atributos.update(atributos)
+
+    def set_cotizacion(self, cotizacion_id):
+        """Asocia el span (y los siguientes de la ejecución) a una cotización."""
+        self.cotizacion_id = cotizacion_id
+        _cotizacion_actual.set(cotizacion_id)
+
+    def __enter__(self):
+        self._token_span = _span_actual.set(self)
+        self._token_cotizacion = _cotizacion_actual.set(self.cotizacion_id)
+        self.inicio_ts = time.time()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duracion_ms = (time.perf_counter() - self.inicio) * 1000
+        if exc_type is not None:
+            self.estado = 'error'
+            self.error = f"{exc_type.__name__}: {exc}"
+        _logger.debug("%s %.1f ms %s", self.nombre, self.duracion_ms, self.estado)
+        _span_actual.reset(self._token_span)
+        _cotizacion_actual.reset(self._token_cotizacion)
+
+        if self.padre is not None:
+            self.padre.hijos.append(self)
+            if self.cotizacion_id is not None and self.padre.cotizacion_id is None:
+                self.padre.cotizacion_id = self.cotizacion_id
+        else:
+            _estado.ultima_ejecucion = list(self.recorrer())
+        if _estado.traza:
+            _escribir_traza(self)
+        return False
+
+    def recorrer(self, nivel=0):
+        """Este span y sus descendientes en orden de inicio, como (nivel, span)."""
+        yield nivel, self
+        for hijo in sorted(self.hijos, key=lambda s: s.inicio):
+            yield from hijo.recorrer(nivel + 1)
+
+    def to_dict(self):
+        return {
+            'traza_id': self.traza_id,
+            'span_id': self.span_id,
+            'padre_id': self.padre.span_id if self.padre else None,
+            'nombre': self.nombre,
+            'cotizacion_id': self.cotizacion_id,
+            'inicio': round(self.inicio_ts, 6),
+            'duracion_ms': round(self.duracion_ms, 3) if self.duracion_ms is not None else None,
+            'estado': self.estado,
+            'error': self.error,
+            'atributos': self.atributos,
+        }
+
+
+class _SpanNulo:
+    """Span sin efecto que se usa cuando la instrumentación está desactivada."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **atributos):
+        pass
+
+    def set_cotizacion(self, cotizacion_id):
+        pass
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+def span(nombre, cotizacion_id=None, **atributos):
+    """
+    Mide una etapa dentro de un bloque with.
+
+    Args:
+        nombre (str): Etapa, por convención "area.accion" (excel.build, pdf.convert, ...)
+        cotizacion_id: Cotización de la etapa; si se omite, se hereda del span padre
+        **atributos: Datos adicionales para la traza
+    """
+    if not _estado.activo:
+        return _SPAN_NULO
+    return Span(nombre, cotizacion_id, **atributos)
+
+
+def instrumentado(nombre):
+    """Decorador que mide cada llamada a la función como un span."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _estado.activo:
+                return funcion(*args, **kwargs)
+            with Span(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def current_span():
+    """Span en curso, o el span nulo si no hay ninguno o está desactivado."""
+    return _span_actual.get() or _SPAN_NULO
+
+
+def _escribir_traza(span_terminado):
+    linea = json.dumps(span_terminado.to_dict(), ensure_ascii=False, default=str)
+    try:
+        with _estado.lock:
+            with open(_estado.traza, 'a', encoding='utf-8') as f:
+                f.write(linea + '\n')
+    except OSError as e:
+        _logger.warning("No se pudo escribir la traza en %s: %s", _estado.traza, e)
+
+
+def ultima_ejecucion():
+    """
+    Etapas de la última ejecución completa (el último span raíz terminado).
+
+    Returns:
+        list: [(nivel, Span)] en orden de inicio
+    """
+    return list(_estado.ultima_ejecucion)
@@ -0,0 +1,242 @@
+import sqlite3
+from datetime import datetime
+
+
+class MaterialRollupManager:
+    """
+    Consolidación de materiales (APU) por actividad y por cotización.
+
+    Los costos se obtienen con consultas agregadas sobre actividad_producto y
+    productos, y se guardan en caché hasta que el catálogo notifica un cambio
+    en productos, actividades o sus relaciones.
+    """
+
+    ENTIDADES_INVALIDANTES = ('producto', 'actividad', 'actividad_producto')
+
+    def __init__(self, database_manager):
+        self.database_manager = database_manager
+        self._activity_costs = None
+        self._quotation_cache = {}
+        database_manager.add_change_listener(self._on_catalog_change)
+
+    def _on_catalog_change(self, entidad, item_id=None):
+        if entidad in self.ENTIDADES_INVALIDANTES:
+            self.invalidate()
+
+    def invalidate(self):
+        """Descarta todos los resultados en caché."""
+        self._activity_costs = None
+        self._quotation_cache.clear()
+
+    # ===== COSTO POR ACTIVIDAD =====
+
+    def get_activity_material_costs(self):
+        """
+        Calcula el costo de materiales de todas las actividades con APU.
+
+        Returns:
+            dict: {actividad_id: {'costo': float, 'num_productos': int}}
+        """
+        if self._activity_costs is not None:
+            return self._activity_costs
+        try:
+            cursor = self.database_manager.connection.cursor()
+            cursor.execute("""
+                SELECT ap.actividad_id,
+                       SUM(ap.cantidad * p.precio_unitario) AS costo,
+                       COUNT(*) AS num_productos
+                FROM actividad_producto ap
+                JOIN productos p ON p.id = ap.producto_id
+                GROUP BY ap.actividad_id
+            """)
+            self._activity_costs = {
+                row[0]: {'costo': row[1], 'num_productos': row[2]} for row in cursor.fetchall()
+            }
+            return self._activity_costs
+        except sqlite3.Error as e:
+            print(f"Error al calcular costos de materiales: {e}")
+            return {}
+
+    def get_activity_material_cost(self, activity_id):
+        """Costo de materiales de una actividad, o 0.0 si no tiene APU."""
+        info = self.get_activity_material_costs().get(activity_id)
+        return info['costo'] if info else 0.0
+
+    # ===== MATERIALES POR COTIZACIÓN =====
+
+    @staticmethod
+    def _activity_lines(table_rows):
+        """Extrae (descripcion, cantidad) de las filas de actividad de una cotización."""
+        lines = []
+        for row in table_rows or []:
+            if row.get('type') != 'activity':
+                continue
+            descripcion = (row.get('descripcion') or '').strip()
+            if not descripcion:
+                continue
+            try:
+                cantidad = float(row.get('cantidad', 0) or 0)
+            except (TypeError, ValueError):
+                cantidad = 0.0
+            lines.append((descripcion, cantidad))
+        return lines
+
+    def get_quotation_materials(self, table_rows):
+        """
+        Agrega las cantidades de materiales de todas las actividades de una cotización.
+
+        Las actividades de la tabla se asocian al catálogo por descripción.
+
+        Args:
+            table_rows (list): Filas de la cotización (snapshot o archivo)
+
+        Returns:
+            dict: {'materiales': [...], 'costo_total': float,
+                   'sin_apu': [descripciones sin productos asociados]}
+                  o None si hubo error
+        """
+        lines = self._activity_lines(table_rows)
+        cache_key = tuple(lines)
+        if cache_key in self._quotation_cache:
+            return self._quotation_cache[cache_key]
+
+        try:
+            cursor = self.database_manager.connection.cursor()
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS temp_lineas_cotizacion (
+                    descripcion TEXT NOT NULL,
+                    cantidad REAL NOT NULL
+                )
+            """)
+            cursor.execute("DELETE FROM temp_lineas_cotizacion")
+            cursor.executemany("INSERT INTO temp_lineas_cotizacion (descripcion, cantidad) VALUES (?, ?)", lines)
+
+            cursor.execute("""
+                WITH catalogo AS (
+                    SELECT descripcion, MIN(id) AS actividad_id
+                    FROM actividades
+                    GROUP BY descripcion
+                )
+                SELECT p.id, p.nombre, p.unidad, p.precio_unitario,
+                       SUM(l.cantidad * ap.cantidad) AS cantidad_total
+                FROM temp_lineas_cotizacion l
+                JOIN catalogo c ON c.descripcion = l.descripcion
+                JOIN actividad_producto ap ON ap.actividad_id = c.actividad_id
+                JOIN productos p ON p.id = ap.producto_id
+                GROUP BY p.id
+                ORDER BY p.nombre
+            """)
+            materiales = []
+            costo_total = 0.0
+            for producto_id, nombre, unidad, precio, cantidad in cursor.fetchall():
+                subtotal = cantidad * precio
+                costo_total += subtotal
+                materiales.append({
+                    'producto_id': producto_id,
+                    'nombre': nombre,
+                    'unidad': unidad,
+                    'cantidad': cantidad,
+                    'precio_unitario': precio,
+                    'subtotal': subtotal,
+                })
+
+            cursor.execute("""
+                SELECT DISTINCT l.descripcion
+                FROM temp_lineas_cotizacion l
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM actividades a
+                    JOIN actividad_producto ap ON ap.actividad_id = a.id
+                    WHERE a.descripcion = l.descripcion
+                )
+            """)
+            sin_apu = [row[0] for row in cursor.fetchall()]
+            cursor.execute("DELETE FROM temp_lineas_cotizacion")
+
+            result = {'materiales': materiales, 'costo_total': costo_total, 'sin_apu': sin_apu}
+            self._quotation_cache[cache_key] = result
+            return result
+        except sqlite3.Error as e:
+            print(f"Error al consolidar materiales de la cotización: {e}")
+            return None
+
+    def get_quotation_materials_by_id(self, quotation_id):
+        """Consolida los materiales del último snapshot de una cotización guardada."""
+        snapshot = self.database_manager.get_latest_snapshot(quotation_id)
+        if not snapshot:
+            return None
+        return self.get_quotation_materials(snapshot['table_rows'])
+
+    # ===== EXPORTACIÓN =====
+
+    def export_materials_list(self, materials, filepath, titulo=None):
+        """
+        Exporta la lista de materiales consolidada a un archivo Excel.
+
+        Args:
+            materials (dict): Resultado de get_quotation_materials
+            filepath (str): Ruta del archivo .xlsx a generar
+            titulo (str): Título opcional (nombre del proyecto)
+
+        Returns:
+            bool: True si se generó el archivo
+        """
+        try:
+            from openpyxl import Workbook
+
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "Lista de Materiales"
+            self.write_materials_sheet(ws, materials, titulo)
+            wb.save(filepath)
+            return True
+        except Exception as e:
+            print(f"Error al exportar lista de materiales: {e}")
+            return False
+
+    def write_materials_sheet(self, ws, materials, titulo=None):
+        """
+        Escribe la lista de materiales consolidada en una hoja de openpyxl.
+
+        Args:
+            ws: Hoja de cálculo destino (vacía)
+            materials (dict): Resultado de get_quotation_materials
+            titulo (str): Título opcional (nombre del proyecto)
+        """
+        from openpyxl.styles import Font, Alignment, PatternFill
+
+        ws['A1'] = titulo or "LISTA DE MATERIALES"
+        ws['A1'].font = Font(bold=True, size=14)
+        ws['A2'] = f"Generado: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+
+        headers = ["MATERIAL", "UNIDAD", "CANTIDAD", "VR. UNITARIO", "SUBTOTAL"]
+        header_fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+        for col, header in enumerate(headers, start=1):
+            cell = ws.cell(row=4, column=col, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = header_fill
+            cell.alignment = Alignment(horizontal='center')
+
+        row = 5
+        for material in materials['materiales']:
+            ws.cell(row=row, column=1, value=material['nombre'])
+            ws.cell(row=row, column=2, value=material['unidad'])
+            ws.cell(row=row, column=3, value=round(material['cantidad'], 4)).number_format = '#,##0.00'
+            ws.cell(row=row, column=4, value=material['precio_unitario']).number_format = '"$"#,##0.00'
+            ws.cell(row=row, column=5, value=material['subtotal']).number_format = '"$"#,##0.00'
+            row += 1
+
+        ws.cell(row=row, column=4, value="TOTAL").font = Font(bold=True)
+        total_cell = ws.cell(row=row, column=5, value=materials['costo_total'])
+        total_cell.font = Font(bold=True)
+        total_cell.number_format = '"$"#,##0.00'
+
+        if materials['sin_apu']:
+            row += 2
+            ws.cell(row=row, column=1, value="Actividades sin productos asociados:").font = Font(bold=True, italic=True)
+            for descripcion in materials['sin_apu']:
+                row += 1
+                ws.cell(row=row, column=1, value=descripcion)
+
+        ws.column_dimensions['A'].width = 50
+        for letra in ('B', 'C', 'D', 'E'):
+            ws.column_dimensions[letra].width = 16
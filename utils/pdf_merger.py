@@ -5,6 +5,9 @@ from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import win32com.client
+from utils.instrumentation import get_logger, instrumentado
+
+logger = get_logger('pdf_merger')
 
 class PDFMerger:
     # Mapeo de claves de checkbox a nombres de archivo físicos
@@ -123,9 +126,10 @@ class PDFMerger:
             return True
 
         except Exception as e:
-            print(f"Error generando separadores: {e}")
+            logger.error("Error generando separadores: %s", e)
             return False
 
+    @instrumentado('pdf.merge')
     def merge_pdfs(self, output_path, ordered_items, generated_quotation_pdf, external_files_map):
         """
         Une los PDFs en el orden especificado.
@@ -171,7 +175,7 @@ class PDFMerger:
                          reader = PyPDF2.PdfReader(pdf_path)
                          pages_in_item = len(reader.pages)
                      except Exception as e:
-                         print(f"Error leyendo páginas de {item_key}: {e}")
+                         logger.error("Error leyendo páginas de %s: %s", item_key, e)
                          pages_in_item = 0
                 
                 # Guardar en mapa (donde empieza esta sección)
@@ -209,7 +213,7 @@ class PDFMerger:
                 if pdf_to_add and os.path.exists(pdf_to_add):
                     merger.append(pdf_to_add)
                 else:
-                    print(f"Advertencia: No se encontró PDF para '{item_key}' en {pdf_to_add}")
+                    logger.warning("No se encontró PDF para '%s' en %s", item_key, pdf_to_add)
 
             merger.write(output_path)
             merger.close()
@@ -221,5 +225,5 @@ class PDFMerger:
             return True
 
         except Exception as e:
-            print(f"Error uniendo PDFs: {e}")
+            logger.error("Error uniendo PDFs: %s", e)
             return False
@@ -0,0 +1,337 @@
+"""
+Ejecutor de etapas con dependencias (grafo acíclico) para la generación de documentos.
+
+Cada etapa declara los archivos que lee (entradas) y los que produce
+(salidas). Una etapa depende de las que producen sus entradas y de las que
+se indiquen en `depende`. El ejecutor:
+
+- corre en procesos de trabajo las etapas marcadas con proceso=True cuyas
+  dependencias ya terminaron, de modo que las conversiones independientes
+  (Word→PDF y Excel→PDF) avanzan a la vez mientras el proceso principal
+  ejecuta las etapas locales;
+- omite las etapas cuyas salidas ya existen y son más recientes que sus
+  entradas, o que se pueden copiar de un archivo equivalente vigente
+  (`reutilizar`). Lo que no está en archivos (datos de la base, opciones
+  del diálogo) se declara en `version`: la etapa se repite cuando su huella
+  cambia. Una etapa sin entradas ni `version`, o con siempre=True, se
+  ejecuta en cada corrida;
+- bloquea las etapas que dependen de una que falló;
+- mide cada etapa y deja los tiempos en el span en curso.
+
+Las funciones de las etapas en proceso deben poder importarse desde un
+módulo (funciones de nivel superior) y sus argumentos deben ser serializables.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.instrumentation import get_logger, span, current_span
+
+logger = get_logger('pipeline')
+
+
+class Etapa:
+    """Una etapa del grafo: función, argumentos y archivos que lee y produce."""
+
+    def __init__(self, nombre, funcion, args=(), entradas=(), salidas=(), depende=(), proceso=False,
+                 reutilizar=None, version=None, siempre=False):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.args = tuple(args)
+        self.entradas = [os.path.abspath(r) for r in entradas]
+        self.salidas = [os.path.abspath(r) for r in salidas]
+        self.depende = list(depende)
+        self.proceso = proceso
+        # {salida: archivo equivalente}: si el equivalente está vigente se copia en lugar de ejecutar
+        self.reutilizar = {os.path.abspath(s): os.path.abspath(r) for s, r in (reutilizar or {}).items()}
+        # Huella de lo que la etapa usa además de sus entradas; None si solo dependen de los archivos
+        self.huella = _huella(version) if version is not None else None
+        self.siempre = siempre
+
+
+class ResultadoEtapa:
+    """Resultado de una etapa: 'ok', 'omitida' (salidas vigentes), 'error' o 'bloqueada'."""
+
+    __slots__ = ('nombre', 'estado', 'valor', 'error', 'ms', 'proceso')
+
+    def __init__(self, nombre, estado, valor=None, error=None, ms=0.0, proceso=False):
+        self.nombre = nombre
+        self.estado = estado
+        self.valor = valor
+        self.error = error
+        self.ms = ms
+        self.proceso = proceso
+
+    @property
+    def exito(self):
+        return self.estado in ('ok', 'omitida')
+
+    def __repr__(self):
+        return f"ResultadoEtapa({self.nombre!r}, {self.estado!r}, {self.ms:.1f} ms)"
+
+
+def _mtime(ruta):
+    try:
+        return os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _vigentes(salidas, entradas):
+    """True si todas las salidas existen y ninguna es más antigua que la entrada más reciente."""
+    if not salidas:
+        return False
+    tiempos_salida = [_mtime(r) for r in salidas]
+    if any(t is None for t in tiempos_salida):
+        return False
+    tiempos_entrada = [_mtime(r) for r in entradas]
+    if any(t is None for t in tiempos_entrada):
+        return False
+    return not tiempos_entrada or min(tiempos_salida) >= max(tiempos_entrada)
+
+
+def _huella(version):
+    """Hash estable de un valor serializable (ver Etapa.version)."""
+    serializado = json.dumps(version, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def _ejecutar_en_proceso(funcion, args):
+    """Punto de entrada de los procesos de trabajo: devuelve (valor, ms)."""
+    inicio = time.perf_counter()
+    valor = funcion(*args)
+    return valor, (time.perf_counter() - inicio) * 1000
+
+
+class Pipeline:
+    """Grafo de etapas que se ejecuta respetando dependencias."""
+
+    # Huella de la última ejecución correcta de cada etapa con `version`, por sus salidas
+    DIRECTORIO_HUELLAS = os.path.join('data', 'cache', 'pipeline')
+
+    def __init__(self, nombre='pipeline', max_procesos=2):
+        self.nombre = nombre
+        self.max_procesos = max_procesos
+        self.etapas = {}
+        self.resultados = {}
+
+    def agregar(self, nombre, funcion, args=(), entradas=(), salidas=(), depende=(), proceso=False,
+                reutilizar=None, version=None, siempre=False):
+        """
+        Agrega una etapa. Devuelve la Etapa creada.
+
+        Args:
+            version: Valor serializable con lo que la etapa usa además de sus entradas;
+                     si cambia, la etapa se repite aunque sus salidas estén vigentes
+            siempre (bool): Ejecutar la etapa en cada corrida
+        """
+        if nombre in self.etapas:
+            raise ValueError(f"La etapa '{nombre}' ya existe en {self.nombre}")
+        etapa = Etapa(nombre, funcion, args, entradas, salidas, depende, proceso, reutilizar, version, siempre)
+        self.etapas[nombre] = etapa
+        return etapa
+
+    def dependencias(self):
+        """
+        Dependencias de cada etapa: las declaradas y las que producen sus entradas.
+
+        Returns:
+            dict: {nombre: set(nombres)}
+        """
+        productores = {}
+        for etapa in self.etapas.values():
+            for salida in etapa.salidas:
+                productores[salida] = etapa.nombre
+        dependencias = {}
+        for etapa in self.etapas.values():
+            previas = set(etapa.depende)
+            previas.update(productores[r] for r in etapa.entradas + list(etapa.reutilizar.values())
+                           if r in productores)
+            previas.discard(etapa.nombre)
+            desconocidas = previas - set(self.etapas)
+            if desconocidas:
+                raise ValueError(f"La etapa '{etapa.nombre}' depende de etapas inexistentes: {sorted(desconocidas)}")
+            dependencias[etapa.nombre] = previas
+        return dependencias
+
+    def orden(self):
+        """Orden topológico estable (por orden de inserción); ValueError si hay un ciclo."""
+        dependencias = self.dependencias()
+        orden = []
+        hechas = set()
+        pendientes = list(self.etapas)
+        while pendientes:
+            listas = [n for n in pendientes if dependencias[n] <= hechas]
+            if not listas:
+                raise ValueError(f"Ciclo de dependencias en {self.nombre}: {pendientes}")
+            for nombre in listas:
+                orden.append(nombre)
+                hechas.add(nombre)
+                pendientes.remove(nombre)
+        return orden
+
+    # ===== EJECUCIÓN =====
+
+    def _ruta_huella(self, etapa):
+        clave = hashlib.sha256('\n'.join(sorted(etapa.salidas)).encode('utf-8')).hexdigest()
+        return os.path.join(self.DIRECTORIO_HUELLAS, f"{clave}.json")
+
+    def _huella_guardada(self, etapa):
+        try:
+            with open(self._ruta_huella(etapa), 'r', encoding='utf-8') as f:
+                return json.load(f).get('huella')
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _guardar_huella(self, etapa):
+        """Registra la huella con la que se generaron las salidas de una etapa que terminó bien."""
+        if etapa.huella is None or not etapa.salidas:
+            return
+        try:
+            os.makedirs(self.DIRECTORIO_HUELLAS, exist_ok=True)
+            with open(self._ruta_huella(etapa), 'w', encoding='utf-8') as f:
+                json.dump({'etapa': etapa.nombre, 'huella': etapa.huella}, f)
+        except OSError as e:
+            logger.warning("No se pudo guardar la huella de %s: %s", etapa.nombre, e)
+
+    def _omitir_si_vigente(self, etapa):
+        """Resultado 'omitida' si las salidas están vigentes (o se copiaron de un equivalente); si no, None."""
+        if etapa.siempre:
+            return None
+        if etapa.huella is not None:
+            if self._huella_guardada(etapa) != etapa.huella:
+                return None
+        elif not etapa.entradas:
+            # Sin entradas ni versión no hay con qué saber si las salidas siguen siendo válidas
+            return None
+        if _vigentes(etapa.salidas, etapa.entradas):
+            return ResultadoEtapa(etapa.nombre, 'omitida', valor=etapa.salidas)
+        # El archivo equivalente no lleva huella: con `version` no se puede saber si sirve
+        if etapa.huella is None and etapa.reutilizar and set(etapa.reutilizar) == set(etapa.salidas):
+            equivalentes = list(etapa.reutilizar.values())
+            if _vigentes(equivalentes, etapa.entradas):
+                inicio = time.perf_counter()
+                for salida, equivalente in etapa.reutilizar.items():
+                    if salida != equivalente:
+                        shutil.copy2(equivalente, salida)
+                logger.info("%s: se reutiliza %s", etapa.nombre, ", ".join(map(os.path.basename, equivalentes)))
+                return ResultadoEtapa(etapa.nombre, 'omitida', valor=etapa.salidas,
+                                      ms=(time.perf_counter() - inicio) * 1000)
+        return None
+
+    def _ejecutar_local(self, etapa):
+        inicio = time.perf_counter()
+        try:
+            with span(f"{self.nombre}.{etapa.nombre}"):
+                valor = etapa.funcion(*etapa.args)
+            self._guardar_huella(etapa)
+            return ResultadoEtapa(etapa.nombre, 'ok', valor=valor, ms=(time.perf_counter() - inicio) * 1000)
+        except Exception as e:
+            logger.error("Etapa %s falló: %s", etapa.nombre, e)
+            return ResultadoEtapa(etapa.nombre, 'error', error=str(e), ms=(time.perf_counter() - inicio) * 1000)
+
+    def _crear_pool(self, en_proceso):
+        # Las conversiones esperan a Word/Excel (procesos externos): se paralelizan aun con un solo núcleo
+        if not en_proceso or self.max_procesos < 2:
+            return None
+        try:
+            return ProcessPoolExecutor(max_workers=min(self.max_procesos, en_proceso))
+        except (OSError, ValueError, NotImplementedError) as e:
+            logger.warning("No se pudieron crear procesos de trabajo, %s se ejecuta en serie: %s", self.nombre, e)
+            return None
+
+    def ejecutar(self):
+        """
+        Ejecuta el grafo.
+
+        Returns:
+            dict: {nombre: ResultadoEtapa} en orden topológico
+        """
+        dependencias = self.dependencias()
+        orden = self.orden()
+        self.resultados = {}
+        pendientes = list(orden)
+        en_curso = {}
+        inicio_total = time.perf_counter()
+        pool = self._crear_pool(sum(1 for e in self.etapas.values() if e.proceso))
+
+        try:
+            while pendientes or en_curso:
+                # Etapas cuyas dependencias terminaron: se omiten, se bloquean o se lanzan
+                locales = []
+                for nombre in list(pendientes):
+                    previas = dependencias[nombre]
+                    if not previas <= set(self.resultados):
+                        continue
+                    pendientes.remove(nombre)
+                    etapa = self.etapas[nombre]
+                    fallidas = [p for p in previas if not self.resultados[p].exito]
+                    if fallidas:
+                        self.resultados[nombre] = ResultadoEtapa(nombre, 'bloqueada',
+                                                                 error=f"Depende de: {', '.join(sorted(fallidas))}")
+                        continue
+                    omitida = self._omitir_si_vigente(etapa)
+                    if omitida:
+                        self.resultados[nombre] = omitida
+                    elif etapa.proceso and pool is not None:
+                        futuro = pool.submit(_ejecutar_en_proceso, etapa.funcion, etapa.args)
+                        en_curso[futuro] = (etapa, time.perf_counter())
+                    else:
+                        locales.append(etapa)
+
+                # Las etapas locales corren mientras los procesos avanzan
+                if locales:
+                    for etapa in locales:
+                        self.resultados[etapa.nombre] = self._ejecutar_local(etapa)
+                    continue
+
+                if not en_curso:
+                    if pendientes:
+                        raise RuntimeError(f"{self.nombre}: etapas sin poder ejecutarse: {pendientes}")
+                    break
+
+                terminados, _ = wait(list(en_curso), return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    etapa, inicio = en_curso.pop(futuro)
+                    try:
+                        valor, ms = futuro.result()
+                        self._guardar_huella(etapa)
+                        self.resultados[etapa.nombre] = ResultadoEtapa(etapa.nombre, 'ok', valor=valor, ms=ms,
+                                                                       proceso=True)
+                    except BrokenProcessPool as e:
+                        logger.warning("Proceso de trabajo caído en %s, se repite en serie: %s", etapa.nombre, e)
+                        if pool is not None:
+                            # Libera el hilo de gestión y los procesos del pool roto
+                            pool.shutdown(wait=False, cancel_futures=True)
+                            pool = None
+                        self.resultados[etapa.nombre] = self._ejecutar_local(etapa)
+                    except Exception as e:
+                        logger.error("Etapa %s falló: %s", etapa.nombre, e)
+                        self.resultados[etapa.nombre] = ResultadoEtapa(
+                            etapa.nombre, 'error', error=str(e),
+                            ms=(time.perf_counter() - inicio) * 1000, proceso=True)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+        self.resultados = {nombre: self.resultados[nombre] for nombre in orden}
+        total_ms = (time.perf_counter() - inicio_total) * 1000
+        current_span().set(etapas={n: f"{r.estado} {r.ms:.0f} ms" for n, r in self.resultados.items()})
+        logger.info("%s terminado en %.1f ms: %s", self.nombre, total_ms,
+                    ", ".join(f"{n}={r.estado}/{r.ms:.0f}ms" for n, r in self.resultados.items()))
+        return self.resultados
+
+    def resumen(self):
+        """Texto con el estado y el tiempo de cada etapa de la última ejecución."""
+        lineas = []
+        for resultado in self.resultados.values():
+            donde = " (proceso)" if resultado.proceso else ""
+            linea = f"{resultado.nombre:<20} {resultado.estado:<10} {resultado.ms:9.1f} ms{donde}"
+            if resultado.error:
+                linea += f"  {resultado.error}"
+            lineas.append(linea)
+        return "\n".join(lineas)
@@ -0,0 +1,228 @@
+import sqlite3
+from itertools import groupby
+
+from utils.change_events import BAJA, RECARGA
+from utils.pricing_engine import get_pricing_engine
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista ordenada, con interpolación lineal entre posiciones."""
+    if not valores:
+        return None
+    posicion = (len(valores) - 1) * p / 100.0
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (posicion - inferior)
+
+
+class EstadisticaPrecio:
+    """Distribución del valor unitario cotizado de una actividad en una unidad."""
+
+    __slots__ = ('clave', 'descripcion', 'unidad', 'muestras', 'cotizaciones', 'minimo', 'maximo', 'media',
+                 'p10', 'p25', 'p50', 'p75', 'p90', 'limite_inferior', 'limite_superior', 'atipicos')
+
+    def __init__(self, clave, descripcion, unidad, valores, cotizaciones, factor_iqr, min_cotizaciones):
+        self.clave = clave
+        self.descripcion = descripcion
+        self.unidad = unidad
+        self.muestras = len(valores)            # líneas cotizadas
+        self.cotizaciones = cotizaciones        # cotizaciones distintas con esas líneas
+        self.minimo = valores[0]
+        self.maximo = valores[-1]
+        self.media = sum(valores) / len(valores)
+        self.p10, self.p25, self.p50, self.p75, self.p90 = (percentil(valores, p) for p in (10, 25, 50, 75, 90))
+        if cotizaciones >= min_cotizaciones:
+            # Banda de Tukey: fuera de [Q1 - k·IQR, Q3 + k·IQR] es atípico
+            iqr = self.p75 - self.p25
+            self.limite_inferior = max(0.0, self.p25 - factor_iqr * iqr)
+            self.limite_superior = self.p75 + factor_iqr * iqr
+            self.atipicos = sum(1 for v in valores if v < self.limite_inferior or v > self.limite_superior)
+        else:
+            self.limite_inferior = self.limite_superior = None
+            self.atipicos = 0
+
+    @property
+    def tiene_banda(self):
+        return self.limite_inferior is not None
+
+    def clasificar(self, valor):
+        """'bajo', 'alto' o 'normal' según la banda; None si no hay suficientes cotizaciones."""
+        if not self.tiene_banda:
+            return None
+        if valor < self.limite_inferior:
+            return 'bajo'
+        if valor > self.limite_superior:
+            return 'alto'
+        return 'normal'
+
+    def to_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+
+class PriceAnalytics:
+    """
+    Analítica del valor unitario cotizado por actividad sobre quotation_lines.
+
+    Las estadísticas (percentiles, media y banda de atípicos por rango
+    intercuartílico) se calculan para cada actividad y unidad con una sola
+    consulta ordenada por actividad, unidad y precio, recorrida una vez en
+    orden. Se usa la versión vigente de cada cotización y se excluyen las
+    cotizaciones de prueba. Las líneas que coinciden con el catálogo se
+    agrupan por actividad; las demás, por descripción.
+
+    El resultado queda en memoria. Cuando se guarda un snapshot solo se
+    recalculan, en la siguiente consulta, las actividades de esa cotización
+    (las de sus líneas vigentes y las de las que dejaron de estarlo); al
+    eliminar o archivar cotizaciones se recalcula todo.
+    """
+
+    FACTOR_IQR = 1.5
+    # Cotizaciones distintas necesarias para calcular la banda de atípicos
+    MIN_COTIZACIONES = 5
+
+    # Mismo criterio de agrupación que QuotationLinesManager.get_quoted_activity_totals
+    _GRUPO = "COALESCE('a' || l.actividad_id, 'd' || l.descripcion)"
+
+    def __init__(self, database_manager):
+        self.database_manager = database_manager
+        self._estadisticas = None           # (clave, unidad) -> EstadisticaPrecio
+        self._ultimo_snapshot = 0           # mayor cotizaciones_snapshot.id incluido
+        self._completo = False
+        database_manager.events.subscribe(self._on_change, entidades=('cotizacion',))
+
+    def _on_change(self, evento):
+        # Altas y cambios de estado no cambian las líneas; los snapshots nuevos se detectan por id
+        if evento.operacion in (BAJA, RECARGA):
+            self._completo = False
+
+    # ===== CÁLCULO =====
+
+    def _consulta(self, condicion="", parametros=()):
+        cursor = self.database_manager.connection.cursor()
+        cursor.execute(f"""
+            SELECT {self._GRUPO} AS grupo, l.unidad, l.valor_unitario, l.descripcion, l.cotizacion_id
+            FROM quotation_lines l
+            JOIN cotizaciones_generadas c ON c.id = l.cotizacion_id
+            WHERE l.vigente = 1 AND c.es_prueba = 0 AND l.valor_unitario > 0 {condicion}
+            ORDER BY grupo, l.unidad, l.valor_unitario
+        """, parametros)
+        return cursor
+
+    def _agrupar(self, cursor):
+        """Recorre las filas ordenadas y calcula la estadística de cada grupo."""
+        resultado = {}
+        for (clave, unidad), filas in groupby(cursor, key=lambda f: (f[0], f[1])):
+            filas = list(filas)
+            resultado[(clave, unidad)] = EstadisticaPrecio(
+                clave, filas[0][3], unidad, [f[2] for f in filas], len({f[4] for f in filas}),
+                self.FACTOR_IQR, self.MIN_COTIZACIONES)
+        return resultado
+
+    def refresh(self):
+        """Pone al día las estadísticas: completas la primera vez o tras eliminar, si no solo lo que cambió."""
+        try:
+            cursor = self.database_manager.connection.cursor()
+            # Por snapshots y no por líneas: un snapshot sin actividades no agrega
+            # líneas pero sí retira las anteriores
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cotizaciones_snapshot")
+            ultimo = cursor.fetchone()[0]
+
+            if self._estadisticas is None or not self._completo:
+                self._estadisticas = self._agrupar(self._consulta())
+                self._ultimo_snapshot = ultimo
+                self._completo = True
+                return
+            if ultimo <= self._ultimo_snapshot:
+                return
+
+            # Grupos de las cotizaciones con snapshots nuevos (incluye las líneas que dejaron de estar vigentes)
+            cursor.execute(f"""
+                SELECT DISTINCT {self._GRUPO}, l.unidad FROM quotation_lines l
+                WHERE l.cotizacion_id IN (SELECT cotizacion_id FROM cotizaciones_snapshot WHERE id > ?)
+            """, (self._ultimo_snapshot,))
+            grupos = cursor.fetchall()
+            for inicio in range(0, len(grupos), 400):
+                lote = grupos[inicio:inicio + 400]
+                claves = sorted({g[0] for g in lote})
+                marcadores = ",".join("?" * len(claves))
+                recalculados = self._agrupar(self._consulta(f"AND {self._GRUPO} IN ({marcadores})", claves))
+                for grupo in lote:
+                    self._estadisticas.pop(tuple(grupo), None)
+                self._estadisticas.update(recalculados)
+            self._ultimo_snapshot = ultimo
+        except sqlite3.Error as e:
+            self._completo = False
+            print(f"Error al calcular la analítica de precios: {e}")
+
+    def get_statistics(self):
+        """Estadísticas de todas las actividades: {(clave, unidad): EstadisticaPrecio}."""
+        self.refresh()
+        return dict(self._estadisticas or {})
+
+    # ===== CONSULTAS =====
+
+    def _clave(self, descripcion):
+        """Clave de agrupación de una descripción: la actividad del catálogo si coincide exactamente."""
+        descripcion = (descripcion or '').strip()
+        cursor = self.database_manager.connection.cursor()
+        cursor.execute("SELECT MIN(id) FROM actividades WHERE descripcion = ?", (descripcion,))
+        actividad_id = cursor.fetchone()[0]
+        return f"a{actividad_id}" if actividad_id is not None else f"d{descripcion}"
+
+    def get_activity_statistics(self, descripcion, unidad):
+        """EstadisticaPrecio de una actividad y unidad, o None si nunca se cotizó."""
+        try:
+            self.refresh()
+            return (self._estadisticas or {}).get((self._clave(descripcion), unidad or ''))
+        except sqlite3.Error as e:
+            print(f"Error al consultar la analítica de precios: {e}")
+            return None
+
+    def check_price(self, descripcion, unidad, valor_unitario):
+        """
+        Compara un valor unitario con la banda histórica de la actividad.
+
+        Returns:
+            dict: {'estado': 'bajo'|'alto'|'normal', 'valor', 'estadistica'} o None
+                  si no hay suficientes cotizaciones para tener banda
+        """
+        estadistica = self.get_activity_statistics(descripcion, unidad)
+        if estadistica is None or not estadistica.tiene_banda:
+            return None
+        valor = float(get_pricing_engine().to_decimal(valor_unitario))
+        return {'estado': estadistica.clasificar(valor), 'valor': valor, 'estadistica': estadistica}
+
+    def get_price_series(self, descripcion, unidad=None):
+        """
+        Valor unitario cotizado de una actividad a lo largo del tiempo, con el cliente de cada cotización.
+
+        Returns:
+            list: [{'fecha', 'cotizacion_id', 'cliente', 'unidad', 'valor_unitario', 'cantidad'}] por fecha
+        """
+        try:
+            clave = self._clave(descripcion)
+            condicion = "l.actividad_id = ?" if clave.startswith('a') else "l.actividad_id IS NULL AND l.descripcion = ?"
+            parametros = [int(clave[1:]) if clave.startswith('a') else clave[1:]]
+            if unidad is not None:
+                condicion += " AND l.unidad = ?"
+                parametros.append(unidad)
+            cursor = self.database_manager.connection.cursor()
+            cursor.execute(f"""
+                SELECT c.fecha_creacion, l.cotizacion_id, cl.nombre, l.unidad, l.valor_unitario, l.cantidad
+                FROM quotation_lines l
+                JOIN cotizaciones_generadas c ON c.id = l.cotizacion_id
+                LEFT JOIN clientes cl ON cl.id = c.cliente_id
+                WHERE l.vigente = 1 AND c.es_prueba = 0 AND {condicion}
+                ORDER BY c.fecha_creacion, l.cotizacion_id
+            """, parametros)
+            return [{
+                'fecha': row[0],
+                'cotizacion_id': row[1],
+                'cliente': row[2],
+                'unidad': row[3],
+                'valor_unitario': row[4],
+                'cantidad': row[5],
+            } for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error al consultar la serie de precios: {e}")
+            return []
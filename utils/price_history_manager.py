@@ -0,0 +1,342 @@
+# utils/price_history_manager.py
+"""
+Métodos de extensión para DatabaseManager que mantienen el historial de precios
+de actividades y productos.
+
+Cada cambio de `valor_unitario`/`precio_unitario` agrega una fila a
+`historial_precios` con su intervalo de vigencia [valido_desde, valido_hasta).
+La fila vigente de cada ítem tiene `valido_hasta` en NULL.
+"""
+from datetime import date, datetime, time, timezone
+import sqlite3
+
+
+class PriceHistoryManager:
+    """Mixin class para el historial de precios - extiende DatabaseManager"""
+
+    # tipo_item -> (tabla, columna de precio)
+    PRICE_TABLES = {
+        'actividad': ('actividades', 'valor_unitario'),
+        'producto': ('productos', 'precio_unitario'),
+    }
+
+    # Fecha de inicio usada para el precio que ya existía antes de llevar historial
+    FECHA_INICIAL = '1970-01-01 00:00:00'
+
+    def create_price_history_table(self, cursor):
+        """Crea la tabla de historial de precios y registra el precio actual de los ítems sin historial."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS historial_precios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo_item TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                precio REAL NOT NULL,
+                valido_desde DATETIME NOT NULL,
+                valido_hasta DATETIME,
+                motivo TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_historial_precios_item_fecha
+            ON historial_precios (tipo_item, item_id, valido_desde)
+        """)
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_historial_precios_vigente
+            ON historial_precios (tipo_item, item_id) WHERE valido_hasta IS NULL
+        """)
+
+        for tipo_item, (tabla, columna) in self.PRICE_TABLES.items():
+            cursor.execute(f"""
+                INSERT INTO historial_precios (tipo_item, item_id, precio, valido_desde, motivo)
+                SELECT ?, t.id, t.{columna}, ?, 'inicial'
+                FROM {tabla} t
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM historial_precios h
+                    WHERE h.tipo_item = ? AND h.item_id = t.id
+                )
+            """, (tipo_item, self.FECHA_INICIAL, tipo_item))
+
+    @staticmethod
+    def _price_timestamp(fecha=None, fin_del_dia=True):
+        """
+        Normaliza una fecha al formato de CURRENT_TIMESTAMP (UTC, 'YYYY-MM-DD HH:MM:SS').
+
+        Los date y datetime sin zona horaria están en hora local y se pasan a
+        UTC; un datetime con zona se convierte desde la suya. Una fecha sin
+        hora (date o 'YYYY-MM-DD') es el final de ese día local, o su inicio
+        con fin_del_dia=False. Una cadena con hora ya está en UTC, como las
+        que guarda la base.
+        """
+        if fecha is None:
+            return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(fecha, str):
+            texto = fecha.strip().replace('T', ' ')
+            if len(texto) != 10:
+                return texto[:19]
+            fecha = date.fromisoformat(texto)
+        if not isinstance(fecha, datetime):
+            fecha = datetime.combine(fecha, time(23, 59, 59) if fin_del_dia else time.min)
+        # astimezone() toma un datetime sin zona como hora local
+        return fecha.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def _record_price_change(self, cursor, tipo_item, item_id, precio, fecha=None, motivo=None):
+        """
+        Cierra el intervalo vigente del ítem y abre uno nuevo con el precio dado.
+        No hace commit: se ejecuta dentro de la transacción de quien lo llama.
+
+        Returns:
+            bool: True si se registró un cambio, False si el precio no cambió
+        """
+        fecha = fecha or self._price_timestamp()
+        cursor.execute("""
+            SELECT precio FROM historial_precios
+            WHERE tipo_item = ? AND item_id = ? AND valido_hasta IS NULL
+        """, (tipo_item, item_id))
+        row = cursor.fetchone()
+        if row and row[0] == precio:
+            return False
+
+        cursor.execute("""
+            UPDATE historial_precios SET valido_hasta = ?
+            WHERE tipo_item = ? AND item_id = ? AND valido_hasta IS NULL
+        """, (fecha, tipo_item, item_id))
+        cursor.execute("""
+            INSERT INTO historial_precios (tipo_item, item_id, precio, valido_desde, motivo)
+            VALUES (?, ?, ?, ?, ?)
+        """, (tipo_item, item_id, precio, fecha, motivo))
+        return True
+
+    def _close_price_history(self, cursor, tipo_item, item_id, fecha=None):
+        """Cierra el intervalo vigente de un ítem eliminado (sin commit)."""
+        cursor.execute("""
+            UPDATE historial_precios SET valido_hasta = ?
+            WHERE tipo_item = ? AND item_id = ? AND valido_hasta IS NULL
+        """, (fecha or self._price_timestamp(), tipo_item, item_id))
+
+    # ===== CONSULTAS =====
+
+    def get_price_history(self, tipo_item, item_id):
+        """
+        Obtiene todos los precios que ha tenido un ítem, del más antiguo al más reciente.
+
+        Args:
+            tipo_item (str): 'actividad' o 'producto'
+            item_id (int): ID de la actividad o producto
+
+        Returns:
+            list: Diccionarios con precio, valido_desde, valido_hasta y motivo
+        """
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT id, precio, valido_desde, valido_hasta, motivo
+                FROM historial_precios
+                WHERE tipo_item = ? AND item_id = ?
+                ORDER BY valido_desde ASC, id ASC
+            """, (tipo_item, item_id))
+            return [{'id': r[0], 'precio': r[1], 'valido_desde': r[2],
+                     'valido_hasta': r[3], 'motivo': r[4]} for r in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error al obtener historial de precios: {e}")
+            return []
+
+    def get_price_as_of(self, tipo_item, item_id, fecha):
+        """Obtiene el precio vigente de un ítem en una fecha, o None si no había precio registrado."""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT precio FROM historial_precios
+                WHERE tipo_item = ? AND item_id = ?
+                  AND valido_desde <= ?
+                  AND (valido_hasta IS NULL OR valido_hasta > ?)
+            """, (tipo_item, item_id, self._price_timestamp(fecha), self._price_timestamp(fecha)))
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"Error al obtener precio histórico: {e}")
+            return None
+
+    def get_catalog_as_of(self, fecha, tipo_item='actividad'):
+        """
+        Devuelve el catálogo tal como era en una fecha, en una sola consulta.
+
+        Se arma con los intervalos de historial vigentes en esa fecha: no
+        aparecen los ítems creados después e incluyen los eliminados desde
+        entonces (con 'eliminado' en True; la descripción de una actividad
+        eliminada se toma de la última línea de cotización que la usó). Solo
+        los ítems que no tienen ningún historial conservan su precio actual.
+
+        Args:
+            fecha (date|datetime|str): Fecha de consulta. Una fecha sin hora
+                                       se toma como el final de ese día.
+            tipo_item (str): 'actividad' o 'producto'
+
+        Returns:
+            list: Mismo formato que get_all_activities() / get_all_products(),
+                  más la clave 'eliminado'
+        """
+        fecha_sql = self._price_timestamp(fecha)
+        try:
+            cursor = self.connection.cursor()
+            if tipo_item == 'actividad':
+                cursor.execute("""
+                    SELECT
+                        h.item_id,
+                        COALESCE(a.descripcion, (
+                            SELECT l.descripcion FROM quotation_lines l
+                            WHERE l.actividad_id = h.item_id ORDER BY l.id DESC LIMIT 1
+                        )) AS descripcion,
+                        COALESCE(a.unidad, (
+                            SELECT l.unidad FROM quotation_lines l
+                            WHERE l.actividad_id = h.item_id ORDER BY l.id DESC LIMIT 1
+                        )) AS unidad,
+                        h.precio AS valor_unitario,
+                        a.categoria_id, c.nombre AS categoria_nombre,
+                        a.id IS NULL AS eliminado
+                    FROM historial_precios h
+                    LEFT JOIN actividades a ON a.id = h.item_id
+                    LEFT JOIN categorias c ON a.categoria_id = c.id
+                    WHERE h.tipo_item = 'actividad'
+                      AND h.valido_desde <= ?
+                      AND (h.valido_hasta IS NULL OR h.valido_hasta > ?)
+                    UNION ALL
+                    SELECT a.id, a.descripcion, a.unidad, a.valor_unitario,
+                           a.categoria_id, c.nombre, 0
+                    FROM actividades a
+                    LEFT JOIN categorias c ON a.categoria_id = c.id
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM historial_precios h
+                        WHERE h.tipo_item = 'actividad' AND h.item_id = a.id
+                    )
+                    ORDER BY 1
+                """, (fecha_sql, fecha_sql))
+                return [{'id': r[0], 'descripcion': r[1], 'unidad': r[2], 'valor_unitario': r[3],
+                         'categoria_id': r[4], 'categoria_nombre': r[5], 'eliminado': bool(r[6])}
+                        for r in cursor.fetchall()]
+
+            cursor.execute("""
+                SELECT h.item_id, p.nombre, p.unidad, h.precio AS precio_unitario, p.id IS NULL AS eliminado
+                FROM historial_precios h
+                LEFT JOIN productos p ON p.id = h.item_id
+                WHERE h.tipo_item = 'producto'
+                  AND h.valido_desde <= ?
+                  AND (h.valido_hasta IS NULL OR h.valido_hasta > ?)
+                UNION ALL
+                SELECT p.id, p.nombre, p.unidad, p.precio_unitario, 0
+                FROM productos p
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM historial_precios h
+                    WHERE h.tipo_item = 'producto' AND h.item_id = p.id
+                )
+                ORDER BY 1
+            """, (fecha_sql, fecha_sql))
+            return [{'id': r[0], 'nombre': r[1], 'unidad': r[2], 'precio_unitario': r[3], 'eliminado': bool(r[4])}
+                    for r in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error al obtener catálogo histórico: {e}")
+            return []
+
+    def get_price_changes(self, tipo_item=None, fecha_inicio=None, fecha_fin=None):
+        """
+        Lista los cambios de precio con el precio anterior y la variación porcentual.
+
+        Args:
+            tipo_item (str): 'actividad', 'producto' o None para ambos
+            fecha_inicio (date|str): Solo cambios desde esta fecha (opcional)
+            fecha_fin (date|str): Solo cambios hasta esta fecha (opcional)
+
+        Returns:
+            list: Diccionarios con tipo_item, item_id, fecha, precio_anterior,
+                  precio_nuevo, variacion_pct y motivo
+        """
+        where_clauses = ["precio_anterior IS NOT NULL"]
+        params = []
+        if tipo_item:
+            where_clauses.append("tipo_item = ?")
+            params.append(tipo_item)
+        if fecha_inicio:
+            where_clauses.append("valido_desde >= ?")
+            params.append(self._price_timestamp(fecha_inicio, fin_del_dia=False))
+        if fecha_fin:
+            where_clauses.append("valido_desde <= ?")
+            params.append(self._price_timestamp(fecha_fin))
+
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(f"""
+                SELECT tipo_item, item_id, valido_desde, precio_anterior, precio, motivo
+                FROM (
+                    SELECT tipo_item, item_id, valido_desde, precio, motivo,
+                           LAG(precio) OVER (PARTITION BY tipo_item, item_id
+                                             ORDER BY valido_desde, id) AS precio_anterior
+                    FROM historial_precios
+                )
+                WHERE {" AND ".join(where_clauses)}
+                ORDER BY valido_desde DESC
+            """, params)
+            changes = []
+            for row in cursor.fetchall():
+                anterior, nuevo = row[3], row[4]
+                changes.append({
+                    'tipo_item': row[0],
+                    'item_id': row[1],
+                    'fecha': row[2],
+                    'precio_anterior': anterior,
+                    'precio_nuevo': nuevo,
+                    'variacion_pct': ((nuevo - anterior) / anterior * 100) if anterior else None,
+                    'motivo': row[5]
+                })
+            return changes
+        except sqlite3.Error as e:
+            print(f"Error al obtener cambios de precio: {e}")
+            return []
+
+    # ===== OPERACIONES MASIVAS =====
+
+    def bulk_update_prices(self, tipo_item, nuevos_precios, motivo=None):
+        """
+        Actualiza el precio de muchos ítems y registra su historial en una sola transacción.
+
+        Args:
+            tipo_item (str): 'actividad' o 'producto'
+            nuevos_precios (dict): {item_id: nuevo_precio}
+            motivo (str): Descripción del reajuste (opcional)
+
+        Returns:
+            int: Número de ítems cuyo precio cambió, o None si hubo error
+                 (en cuyo caso no se aplica ningún cambio)
+        """
+        if tipo_item not in self.PRICE_TABLES:
+            print(f"Error en reajuste masivo: tipo de ítem desconocido '{tipo_item}'")
+            return None
+        tabla, columna = self.PRICE_TABLES[tipo_item]
+        fecha = self._price_timestamp()
+
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(f"SELECT id, {columna} FROM {tabla}")
+            actuales = dict(cursor.fetchall())
+
+            cambios = [(item_id, float(precio)) for item_id, precio in nuevos_precios.items()
+                       if item_id in actuales and actuales[item_id] != float(precio)]
+            if not cambios:
+                return 0
+
+            cursor.executemany(f"UPDATE {tabla} SET {columna} = ? WHERE id = ?",
+                               [(precio, item_id) for item_id, precio in cambios])
+            cursor.executemany("""
+                UPDATE historial_precios SET valido_hasta = ?
+                WHERE tipo_item = ? AND item_id = ? AND valido_hasta IS NULL
+            """, [(fecha, tipo_item, item_id) for item_id, _ in cambios])
+            cursor.executemany("""
+                INSERT INTO historial_precios (tipo_item, item_id, precio, valido_desde, motivo)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(tipo_item, item_id, precio, fecha, motivo) for item_id, precio in cambios])
+
+            self.connection.commit()
+            self._notify_change(tipo_item)
+            return len(cambios)
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error en reajuste masivo de precios: {e}")
+            return None
@@ -0,0 +1,227 @@
+import json
+import os
+from decimal import Decimal, ROUND_HALF_UP, ROUND_HALF_EVEN, ROUND_DOWN, ROUND_UP, InvalidOperation
+from operator import mul
+
+
+class PricingEngine:
+    """
+    Motor único de precios de una cotización.
+
+    Calcula totales por línea, subtotales por capítulo, AIU, IVA y valor
+    total con Decimal y un redondeo configurable. Lo usan la ventana
+    principal, el generador de Excel, los marcadores de Word y el monto que
+    se guarda en el dashboard, para que todos muestren la misma cifra.
+
+    Reglas:
+        - Jurídica: costo directo + administración + imprevistos + utilidad
+          + IVA sobre la utilidad.
+        - Natural: costo directo + IVA sobre el costo directo.
+
+    Configuración opcional en config.json, sección 'precios':
+        {"decimales": 2, "redondeo": "half_up", "redondear_lineas": true}
+    """
+
+    MODOS_REDONDEO = {
+        'half_up': ROUND_HALF_UP,
+        'half_even': ROUND_HALF_EVEN,
+        'down': ROUND_DOWN,
+        'up': ROUND_UP,
+    }
+
+    # Función de Excel equivalente a cada modo (ROUND redondea mitades alejándose de cero).
+    # Excel no tiene redondeo al par: half_even se arma en excel_formula.
+    FUNCIONES_EXCEL = {
+        'half_up': 'ROUND',
+        'down': 'ROUNDDOWN',
+        'up': 'ROUNDUP',
+    }
+
+    DEFAULT_AIU = {'administracion': 0, 'imprevistos': 0, 'utilidad': 0, 'iva_sobre_utilidad': 19.0}
+
+    def __init__(self, decimales=2, redondeo='half_up', redondear_lineas=True):
+        if redondeo not in self.MODOS_REDONDEO:
+            raise ValueError(f"Modo de redondeo desconocido: {redondeo}")
+        self.decimales = int(decimales)
+        self.redondeo = redondeo
+        self.redondear_lineas = bool(redondear_lineas)
+        self._quantum = Decimal(1).scaleb(-self.decimales)
+        self._rounding = self.MODOS_REDONDEO[redondeo]
+
+    @classmethod
+    def from_config(cls, config_file=None):
+        """Crea el motor con la sección 'precios' de config.json, si existe."""
+        if not config_file:
+            config_file = os.path.join(os.getcwd(), 'config.json')
+        opciones = {}
+        try:
+            if os.path.exists(config_file):
+                with open(config_file, 'r') as f:
+                    opciones = json.load(f).get('precios', {})
+        except Exception as e:
+            print(f"Error al cargar la configuración de precios: {e}")
+        try:
+            return cls(**{k: v for k, v in opciones.items()
+                          if k in ('decimales', 'redondeo', 'redondear_lineas')})
+        except (TypeError, ValueError) as e:
+            print(f"Configuración de precios inválida, se usan valores por defecto: {e}")
+            return cls()
+
+    # ===== UTILIDADES =====
+
+    @staticmethod
+    def to_decimal(value):
+        """Convierte un número o texto a Decimal sin arrastrar errores binarios de float."""
+        if isinstance(value, Decimal):
+            return value
+        if value is None or value == '':
+            return Decimal(0)
+        try:
+            return Decimal(str(value).replace(',', '').replace('$', '').strip())
+        except InvalidOperation:
+            return Decimal(0)
+
+    def round(self, value):
+        """Redondea un Decimal según la configuración."""
+        return value.quantize(self._quantum, rounding=self._rounding)
+
+    @staticmethod
+    def normalize_tipo(tipo_persona):
+        tipo = (tipo_persona or '').strip().lower().replace('í', 'i')
+        return 'juridica' if tipo == 'juridica' else 'natural'
+
+    def excel_formula(self, expresion):
+        """Envuelve una expresión de Excel con el redondeo equivalente."""
+        d = self.decimales
+        if self.redondeo == 'half_even':
+            # En un empate exacto (…,5 en la posición siguiente) se trunca si la cifra anterior es par;
+            # el ROUND interno descarta el ruido binario de la multiplicación.
+            return (f"IF(MOD(ROUND(ABS({expresion})*10^{d},6),2)=0.5,"
+                    f"ROUNDDOWN({expresion},{d}),ROUND({expresion},{d}))")
+        return f"{self.FUNCIONES_EXCEL[self.redondeo]}({expresion},{d})"
+
+    # ===== CÁLCULO =====
+
+    def line_totals(self, cantidades, valores_unitarios):
+        """Totales por línea (cantidad * valor unitario) sobre arreglos completos."""
+        cantidades = list(map(self.to_decimal, cantidades))
+        valores = list(map(self.to_decimal, valores_unitarios))
+        totales = list(map(mul, cantidades, valores))
+        if self.redondear_lineas:
+            totales = list(map(self.round, totales))
+        return totales
+
+    def price_arrays(self, cantidades, valores_unitarios, capitulos, tipo_persona, aiu=None,
+                     nombres_capitulos=None):
+        """
+        Calcula la cotización a partir de arreglos paralelos.
+
+        Args:
+            cantidades (list): Cantidad de cada línea
+            valores_unitarios (list): Valor unitario de cada línea
+            capitulos (list): Índice de capítulo de cada línea (0 = sin capítulo)
+            tipo_persona (str): 'natural' o 'juridica'
+            aiu (dict): Porcentajes de administracion, imprevistos, utilidad, iva_sobre_utilidad
+            nombres_capitulos (dict): {índice: nombre} opcional
+
+        Returns:
+            dict: Ver price()
+        """
+        lineas = self.line_totals(cantidades, valores_unitarios)
+
+        subtotales = {}
+        for capitulo, total in zip(capitulos, lineas):
+            subtotales[capitulo] = subtotales.get(capitulo, Decimal(0)) + total
+        capitulos_resultado = [
+            {'indice': indice, 'nombre': (nombres_capitulos or {}).get(indice, ''),
+             'subtotal': self.round(subtotal)}
+            for indice, subtotal in sorted(subtotales.items())
+        ]
+
+        costo_directo = sum((c['subtotal'] for c in capitulos_resultado), Decimal(0))
+        return self._apply_aiu(costo_directo, lineas, capitulos_resultado, tipo_persona, aiu)
+
+    def _apply_aiu(self, costo_directo, lineas, capitulos, tipo_persona, aiu):
+        porcentajes = dict(self.DEFAULT_AIU)
+        porcentajes.update({k: v for k, v in (aiu or {}).items() if v is not None})
+        pct = {k: self.to_decimal(v) / 100 for k, v in porcentajes.items()}
+        tipo = self.normalize_tipo(tipo_persona)
+
+        administracion = imprevistos = utilidad = Decimal(0)
+        if tipo == 'juridica':
+            administracion = self.round(costo_directo * pct['administracion'])
+            imprevistos = self.round(costo_directo * pct['imprevistos'])
+            utilidad = self.round(costo_directo * pct['utilidad'])
+            iva = self.round(utilidad * pct['iva_sobre_utilidad'])
+        else:
+            iva = self.round(costo_directo * pct['iva_sobre_utilidad'])
+
+        total = costo_directo + administracion + imprevistos + utilidad + iva
+        return {
+            'tipo_persona': tipo,
+            'porcentajes': porcentajes,
+            'lineas': lineas,
+            'capitulos': capitulos,
+            'costo_directo': costo_directo,
+            'administracion': administracion,
+            'imprevistos': imprevistos,
+            'utilidad': utilidad,
+            'iva': iva,
+            'aiu_total': administracion + imprevistos + utilidad,
+            'total': total,
+        }
+
+    def price(self, rows, tipo_persona, aiu=None):
+        """
+        Calcula la cotización a partir de filas de tabla.
+
+        Acepta los formatos de fila de snapshot/Excel ({'type': 'chapter', 'name'})
+        y de archivo ({'type': 'chapter_header', 'descripcion'}). Las
+        actividades anteriores al primer capítulo quedan en el capítulo 0.
+
+        Returns:
+            dict: {'tipo_persona', 'porcentajes', 'lineas', 'capitulos',
+                   'costo_directo', 'administracion', 'imprevistos',
+                   'utilidad', 'iva', 'aiu_total', 'total'} con valores Decimal
+        """
+        cantidades = []
+        valores = []
+        capitulos = []
+        nombres = {}
+        capitulo_actual = 0
+        for row in rows or []:
+            tipo = row.get('type')
+            if tipo in ('chapter', 'chapter_header'):
+                capitulo_actual += 1
+                nombres[capitulo_actual] = row.get('name') or row.get('descripcion') or ''
+            elif tipo == 'activity':
+                cantidades.append(row.get('cantidad', 0))
+                valores.append(row.get('valor_unitario', 0))
+                capitulos.append(capitulo_actual)
+        return self.price_arrays(cantidades, valores, capitulos, tipo_persona, aiu, nombres)
+
+    @staticmethod
+    def to_float(resultado):
+        """Copia del resultado con los Decimal convertidos a float (para JSON/BD)."""
+        convertido = {}
+        for clave, valor in resultado.items():
+            if isinstance(valor, Decimal):
+                convertido[clave] = float(valor)
+            elif clave == 'lineas':
+                convertido[clave] = [float(v) for v in valor]
+            elif clave == 'capitulos':
+                convertido[clave] = [dict(c, subtotal=float(c['subtotal'])) for c in valor]
+            else:
+                convertido[clave] = valor
+        return convertido
+
+
+_default_engine = None
+
+
+def get_pricing_engine():
+    """Instancia compartida del motor, configurada desde config.json."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = PricingEngine.from_config()
+    return _default_engine
@@ -0,0 +1,343 @@
+# utils/quotation_archive_manager.py
+"""
+Métodos de extensión para DatabaseManager: archivo de cotizaciones antiguas
+en bases de datos por año.
+
+Las cotizaciones creadas hace más de `edad_dias` (sección 'archivo' de
+config.json, 730 por defecto) se mueven, con su historial, sus snapshots y
+sus líneas, a `<directorio>/cotizaciones_<año>.db`. La base principal queda
+solo con las cotizaciones recientes, de modo que las consultas del dashboard
+y las copias de seguridad no recorren todo el historial.
+
+Las bases de archivo se adjuntan con ATTACH cuando hacen falta:
+attach_archives() crea la vista temporal `cotizaciones_todas` (principal +
+años archivados, con la columna `archivo` = año o NULL) que usa
+get_all_quotations(include_archived=True). restore_quotations() devuelve
+cotizaciones a la base principal.
+
+Uso por consola:
+    python -m utils.quotation_archive_manager [ruta_db] archivar [--dias N] [--vacuum]
+    python -m utils.quotation_archive_manager [ruta_db] restaurar ID [ID ...]
+    python -m utils.quotation_archive_manager [ruta_db] listar
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+from utils.instrumentation import get_logger
+
+logger = get_logger('archivo')
+
+# Tablas que se archivan y la columna que las une a la cotización, en orden de copia
+TABLAS_ARCHIVO = (
+    ('cotizaciones_generadas', 'id'),
+    ('historial_cotizacion', 'cotizacion_id'),
+    ('cotizaciones_snapshot', 'cotizacion_id'),
+    ('quotation_lines', 'cotizacion_id'),
+)
+
+EDAD_DIAS_DEFECTO = 730
+
+# SQLite admite 10 bases adjuntas por defecto; una queda libre para otros usos
+MAX_ADJUNTAS = 9
+
+
+class QuotationArchiveManager:
+    """Mixin class para el archivo anual de cotizaciones - extiende DatabaseManager"""
+
+    # ===== CONFIGURACIÓN =====
+
+    def archive_settings(self, config_file=None):
+        """Opciones de la sección 'archivo' de config.json ({'edad_dias', 'directorio'})."""
+        if not config_file:
+            config_file = os.path.join(os.getcwd(), 'config.json')
+        opciones = {}
+        try:
+            if os.path.exists(config_file):
+                with open(config_file, 'r') as f:
+                    opciones = json.load(f).get('archivo', {})
+        except Exception as e:
+            logger.error("Error al cargar la configuración del archivo de cotizaciones: %s", e)
+        directorio = opciones.get('directorio') or os.path.join(
+            os.path.dirname(os.path.abspath(self.db_path)), 'archivo')
+        return {
+            'edad_dias': int(opciones.get('edad_dias') or EDAD_DIAS_DEFECTO),
+            'directorio': directorio,
+        }
+
+    def archive_path(self, anio):
+        return os.path.join(self.archive_settings()['directorio'], f"cotizaciones_{anio}.db")
+
+    def list_archives(self):
+        """Años archivados disponibles: [(año, ruta)] del más reciente al más antiguo."""
+        directorio = self.archive_settings()['directorio']
+        if not os.path.isdir(directorio):
+            return []
+        archivos = []
+        for nombre in os.listdir(directorio):
+            coincidencia = re.fullmatch(r'cotizaciones_(\d{4})\.db', nombre)
+            if coincidencia:
+                archivos.append((int(coincidencia.group(1)), os.path.join(directorio, nombre)))
+        return sorted(archivos, reverse=True)
+
+    # ===== ATTACH =====
+
+    def _attach_archive(self, anio, crear=False):
+        """
+        Adjunta la base de archivo de un año y verifica su esquema.
+
+        Returns:
+            tuple: (alias, adjuntada_ahora) o (None, False) si no existe y crear=False
+        """
+        if anio in self._archivos_adjuntos:
+            return self._archivos_adjuntos[anio], False
+        ruta = self.archive_path(anio)
+        if not crear and not os.path.exists(ruta):
+            return None, False
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        alias = f"archivo_{anio}"
+        self.connection.commit()  # ATTACH no puede ejecutarse dentro de una transacción
+        self.connection.execute("ATTACH DATABASE ? AS " + alias, (ruta,))
+        self._archivos_adjuntos[anio] = alias
+        self._ensure_archive_schema(alias)
+        return alias, True
+
+    def _detach_archive(self, anio):
+        alias = self._archivos_adjuntos.pop(anio, None)
+        if alias:
+            self._drop_archive_views()
+            self.connection.commit()
+            self.connection.execute(f"DETACH DATABASE {alias}")
+
+    def detach_archives(self):
+        """Retira todas las bases de archivo adjuntas (y la vista que las une)."""
+        for anio in list(self._archivos_adjuntos):
+            self._detach_archive(anio)
+
+    def _table_columns(self, esquema, tabla):
+        cursor = self.connection.cursor()
+        cursor.execute(f"PRAGMA {esquema}.table_info({tabla})")
+        return [(row[1], row[2], row[4]) for row in cursor.fetchall()]
+
+    def _ensure_archive_schema(self, alias):
+        """Crea en la base de archivo las tablas que falten y las columnas agregadas después en la principal."""
+        cursor = self.connection.cursor()
+        for tabla, clave in TABLAS_ARCHIVO:
+            cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabla,))
+            fila = cursor.fetchone()
+            if not fila:
+                continue
+            sql = re.sub(r'CREATE TABLE\s+(IF NOT EXISTS\s+)?', f'CREATE TABLE IF NOT EXISTS {alias}.',
+                         fila[0], count=1, flags=re.IGNORECASE)
+            cursor.execute(sql)
+            if clave != 'id':
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_{tabla}_cotizacion ON {tabla} ({clave})")
+            existentes = {c[0] for c in self._table_columns(alias, tabla)}
+            for nombre, tipo, defecto in self._table_columns('main', tabla):
+                if nombre not in existentes:
+                    definicion = f"{nombre} {tipo}" + (f" DEFAULT {defecto}" if defecto is not None else "")
+                    cursor.execute(f"ALTER TABLE {alias}.{tabla} ADD COLUMN {definicion}")
+
+    # ===== VISTA UNIFICADA =====
+
+    def _drop_archive_views(self):
+        self.connection.execute("DROP VIEW IF EXISTS temp.cotizaciones_todas")
+        self._vista_archivo = None
+
+    def attach_archives(self, anios=None):
+        """
+        Adjunta los años archivados (los más recientes si hay más de MAX_ADJUNTAS)
+        y crea la vista temporal cotizaciones_todas.
+
+        Returns:
+            str: Nombre de la vista, o None si no hay archivo
+        """
+        try:
+            disponibles = [anio for anio, _ in self.list_archives() if anios is None or anio in anios]
+            if not disponibles:
+                return None
+            if len(disponibles) > MAX_ADJUNTAS:
+                logger.warning("Hay %d años archivados; solo se consultan los %d más recientes.",
+                               len(disponibles), MAX_ADJUNTAS)
+                disponibles = disponibles[:MAX_ADJUNTAS]
+            # Liberar los años que no se van a consultar
+            for anio in list(self._archivos_adjuntos):
+                if anio not in disponibles:
+                    self._detach_archive(anio)
+            alias = {anio: self._attach_archive(anio)[0] for anio in disponibles}
+
+            columnas = ", ".join(c[0] for c in self._table_columns('main', 'cotizaciones_generadas'))
+            partes = [f"SELECT {columnas}, NULL AS archivo FROM main.cotizaciones_generadas"]
+            partes += [f"SELECT {columnas}, {anio} AS archivo FROM {nombre}.cotizaciones_generadas"
+                       for anio, nombre in alias.items()]
+            self.connection.execute("DROP VIEW IF EXISTS temp.cotizaciones_todas")
+            self.connection.execute("CREATE TEMP VIEW cotizaciones_todas AS " + " UNION ALL ".join(partes))
+            self._vista_archivo = tuple(sorted(alias))
+            return 'cotizaciones_todas'
+        except sqlite3.Error as e:
+            logger.error("Error al adjuntar el archivo de cotizaciones: %s", e)
+            return None
+
+    def archived_quotations_view(self):
+        """Vista principal + archivo, creándola si hace falta; None si no hay años archivados."""
+        if self._vista_archivo:
+            return 'cotizaciones_todas'
+        return self.attach_archives()
+
+    # ===== ARCHIVAR Y RESTAURAR =====
+
+    def _move_quotations(self, cursor, origen, destino, ids):
+        """Copia las filas de las cotizaciones de un esquema a otro y las borra del origen. No hace commit."""
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS archivo_ids (id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.archivo_ids")
+        cursor.executemany("INSERT INTO temp.archivo_ids (id) VALUES (?)", [(i,) for i in ids])
+        for tabla, clave in TABLAS_ARCHIVO:
+            columnas_destino = {c[0] for c in self._table_columns(destino, tabla)}
+            columnas = [c[0] for c in self._table_columns(origen, tabla) if c[0] in columnas_destino]
+            if tabla == 'quotation_lines':
+                columnas.remove('id')  # los ids de línea se reutilizan: cada base asigna los suyos
+            lista = ", ".join(columnas)
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO {destino}.{tabla} ({lista})
+                SELECT {lista} FROM {origen}.{tabla} WHERE {clave} IN (SELECT id FROM temp.archivo_ids)
+            """)
+            cursor.execute(f"DELETE FROM {origen}.{tabla} WHERE {clave} IN (SELECT id FROM temp.archivo_ids)")
+
+    def archive_quotations(self, edad_dias=None):
+        """
+        Mueve al archivo anual las cotizaciones creadas hace más de edad_dias.
+
+        Cada año se mueve en una transacción (principal y archivo juntos).
+
+        Returns:
+            dict: {año: cotizaciones archivadas}, o None si hubo error
+        """
+        if edad_dias is None:
+            edad_dias = self.archive_settings()['edad_dias']
+        limite = (datetime.now() - timedelta(days=edad_dias)).strftime('%Y-%m-%d')
+        archivadas = {}
+        try:
+            self.detach_archives()  # cada año se adjunta solo mientras se mueve
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT CAST(strftime('%Y', fecha_creacion) AS INTEGER) AS anio, id
+                FROM cotizaciones_generadas
+                WHERE date(fecha_creacion) < ? AND strftime('%Y', fecha_creacion) IS NOT NULL
+                ORDER BY anio, id
+            """, (limite,))
+            por_anio = {}
+            for anio, cotizacion_id in cursor.fetchall():
+                por_anio.setdefault(anio, []).append(cotizacion_id)
+
+            for anio, ids in por_anio.items():
+                alias, adjuntada = self._attach_archive(anio, crear=True)
+                try:
+                    self._move_quotations(cursor, 'main', alias, ids)
+                    for cotizacion_id in ids:
+                        self.delete_quotation_search_terms(cursor, cotizacion_id)
+                    self.connection.commit()
+                except sqlite3.Error:
+                    self.connection.rollback()
+                    raise
+                finally:
+                    if adjuntada:
+                        self._detach_archive(anio)
+                archivadas[anio] = len(ids)
+                logger.info("Archivadas %d cotizaciones de %d en %s", len(ids), anio, self.archive_path(anio))
+
+            if archivadas:
+                self._drop_archive_views()
+                self._notify_change('cotizacion')
+            return archivadas
+        except sqlite3.Error as e:
+            logger.error("Error al archivar cotizaciones: %s", e)
+            return None
+
+    def restore_quotations(self, quotation_ids):
+        """
+        Devuelve cotizaciones archivadas a la base principal (con historial, snapshots y líneas).
+
+        Returns:
+            int: Cotizaciones restauradas, o None si hubo error
+        """
+        pendientes = set(quotation_ids)
+        restauradas = 0
+        try:
+            self.detach_archives()
+            cursor = self.connection.cursor()
+            for anio, _ in self.list_archives():
+                if not pendientes:
+                    break
+                alias, adjuntada = self._attach_archive(anio)
+                try:
+                    marcadores = ",".join("?" * len(pendientes))
+                    cursor.execute(f"SELECT id FROM {alias}.cotizaciones_generadas WHERE id IN ({marcadores})",
+                                   list(pendientes))
+                    ids = [row[0] for row in cursor.fetchall()]
+                    if not ids:
+                        continue
+                    try:
+                        self._move_quotations(cursor, alias, 'main', ids)
+                        self._reindex_restored(cursor, ids)
+                        self.connection.commit()
+                    except sqlite3.Error:
+                        self.connection.rollback()
+                        raise
+                    pendientes.difference_update(ids)
+                    restauradas += len(ids)
+                    logger.info("Restauradas %d cotizaciones de %d", len(ids), anio)
+                finally:
+                    if adjuntada:
+                        self._detach_archive(anio)
+
+            if restauradas:
+                self._drop_archive_views()
+                self._notify_change('cotizacion')
+            return restauradas
+        except sqlite3.Error as e:
+            logger.error("Error al restaurar cotizaciones: %s", e)
+            return None
+
+    def _reindex_restored(self, cursor, ids):
+        """Vuelve a indexar para búsqueda las cotizaciones restauradas. No hace commit."""
+        for cotizacion_id in ids:
+            cursor.execute("""
+                SELECT snapshot_id, descripcion FROM quotation_lines
+                WHERE cotizacion_id = ? AND vigente = 1
+            """, (cotizacion_id,))
+            filas = cursor.fetchall()
+            if filas:
+                self._index_quotation(cursor, cotizacion_id, filas[0][0], [f[1] for f in filas])
+
+    def vacuum(self):
+        """Compacta la base principal (después de archivar, para devolver el espacio al disco)."""
+        self.detach_archives()
+        self.connection.commit()
+        self.connection.execute("VACUUM")
+
+
+if __name__ == "__main__":
+    from utils.database_manager import DatabaseManager
+    from utils.instrumentation import configure
+
+    configure()
+    args = sys.argv[1:]
+    ruta_db = args.pop(0) if args and args[0].endswith('.db') else None
+    comando = args.pop(0) if args else 'listar'
+    db = DatabaseManager(ruta_db) if ruta_db else DatabaseManager()
+
+    if comando == 'archivar':
+        dias = int(args[args.index('--dias') + 1]) if '--dias' in args else None
+        logger.info("Archivadas: %s", db.archive_quotations(dias))
+        if '--vacuum' in args:
+            db.vacuum()
+    elif comando == 'restaurar':
+        logger.info("Restauradas: %s", db.restore_quotations([int(a) for a in args]))
+    else:
+        for anio, ruta in db.list_archives():
+            tamano = os.path.getsize(ruta) / (1024 * 1024)
+            logger.info("%s: %s (%.1f MB)", anio, ruta, tamano)
+    db.close()
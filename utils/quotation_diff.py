@@ -0,0 +1,428 @@
+"""
+Comparación de versiones de una cotización.
+
+Compara dos versiones (snapshots de cotizaciones_snapshot, archivos .json/.cotiz
+o libros .xlsx generados) y produce un changeset con las filas agregadas,
+eliminadas, modificadas y movidas, los deltas por capítulo y el impacto en
+los totales.
+
+Uso:
+    python -m utils.quotation_diff ANTES DESPUES [--db RUTA] [--json]
+
+ANTES y DESPUES pueden ser "snapshot:ID", "cotizacion:ID" (último snapshot
+de la cotización) o la ruta de un archivo .json, .cotiz o .xlsx.
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+from difflib import SequenceMatcher
+
+from utils.pricing_engine import get_pricing_engine
+from utils.text_utils import normalize_text
+
+
+class QuotationDiffEngine:
+    """
+    Motor de comparación entre dos versiones de una cotización.
+
+    Cada actividad se identifica por (capítulo, descripción) normalizados.
+    Las claves se convierten a enteros y las dos secuencias se alinean con
+    SequenceMatcher después de recortar el prefijo y el sufijo comunes, así
+    que las versiones casi iguales (el caso habitual) se comparan en tiempo
+    lineal aunque tengan miles de filas. Las filas eliminadas y agregadas con
+    la misma clave se reportan como movidas.
+    """
+
+    CAMPOS = ('cantidad', 'unidad', 'valor_unitario')
+    PATRON_FUENTE_BD = re.compile(r'^(snapshot|cotizacion):(\d+)$')
+    SIN_CAPITULO = 'SIN CAPÍTULO'
+
+    def __init__(self, database_manager=None, pricing_engine=None):
+        self.database_manager = database_manager
+        self.pricing_engine = pricing_engine or get_pricing_engine()
+
+    # ===== FUENTES =====
+
+    def cargar(self, fuente):
+        """
+        Carga una versión de cotización.
+
+        Args:
+            fuente: "snapshot:ID", "cotizacion:ID", ruta de archivo, o el dict
+                    de un snapshot (get_latest_snapshot) o de un archivo v2.0
+
+        Returns:
+            dict: {'etiqueta', 'table_rows', 'tipo', 'aiu'}
+
+        Raises:
+            ValueError: Si la fuente no existe o no tiene un formato reconocido
+        """
+        if isinstance(fuente, dict):
+            if 'datos' in fuente:
+                return self._desde_snapshot(fuente)
+            return self._desde_archivo(fuente, fuente.get('origen', 'cotización'))
+
+        fuente = str(fuente).strip()
+        coincidencia = self.PATRON_FUENTE_BD.match(fuente)
+        if coincidencia:
+            if self.database_manager is None:
+                raise ValueError(f"Se necesita la base de datos para cargar '{fuente}'")
+            tipo, item_id = coincidencia.group(1), int(coincidencia.group(2))
+            if tipo == 'snapshot':
+                snapshot = self.database_manager.get_snapshot_by_id(item_id)
+            else:
+                snapshot = self.database_manager.get_latest_snapshot(item_id)
+            if not snapshot:
+                raise ValueError(f"No se encontró el snapshot de '{fuente}'")
+            return self._desde_snapshot(snapshot)
+
+        if not os.path.exists(fuente):
+            raise ValueError(f"El archivo no existe: {fuente}")
+        if fuente.lower().endswith('.xlsx'):
+            from utils.excel_quotation_importer import ExcelQuotationImporter
+            datos = ExcelQuotationImporter(pricing_engine=self.pricing_engine).importar(fuente)
+        else:
+            datos = self._leer_json(fuente)
+        return self._desde_archivo(datos, os.path.basename(fuente))
+
+    @staticmethod
+    def _leer_json(filepath):
+        for encoding in ('utf-8-sig', 'latin-1'):
+            try:
+                with open(filepath, 'r', encoding=encoding) as f:
+                    datos = json.load(f)
+                break
+            except UnicodeDecodeError:
+                continue
+            except json.JSONDecodeError as e:
+                raise ValueError(f"El archivo no tiene formato JSON válido: {e}")
+        if not isinstance(datos, dict):
+            raise ValueError("El archivo no contiene una cotización")
+        return datos
+
+    def _desde_snapshot(self, snapshot):
+        datos = snapshot.get('datos') or {}
+        etiqueta = f"snapshot {snapshot.get('id', '')} ({snapshot.get('fecha_snapshot', '')})"
+        return {
+            'etiqueta': etiqueta,
+            'table_rows': snapshot.get('table_rows') or [],
+            'tipo': datos.get('tipo_cliente') or (datos.get('cliente') or {}).get('tipo'),
+            'aiu': datos.get('aiu'),
+        }
+
+    def _desde_archivo(self, datos, etiqueta):
+        rows = datos.get('table_rows')
+        if not rows:
+            # Archivos anteriores a la versión 2.0: solo la lista de actividades
+            rows = [dict(actividad, type='activity') for actividad in datos.get('actividades', [])]
+        return {
+            'etiqueta': etiqueta,
+            'table_rows': rows,
+            'tipo': (datos.get('cliente') or {}).get('tipo'),
+            'aiu': datos.get('aiu_values'),
+        }
+
+    # ===== COMPARACIÓN =====
+
+    def _lineas(self, table_rows):
+        """Actividades de una versión con su capítulo, clave y total por línea."""
+        to_decimal = self.pricing_engine.to_decimal
+        lineas = []
+        capitulo = self.SIN_CAPITULO
+        for row in table_rows:
+            tipo = row.get('type')
+            if tipo in ('chapter', 'chapter_header'):
+                capitulo = (row.get('name') or row.get('descripcion') or '').strip() or self.SIN_CAPITULO
+            elif tipo == 'activity':
+                descripcion = str(row.get('descripcion') or '').strip()
+                lineas.append({
+                    'capitulo': capitulo,
+                    'descripcion': descripcion,
+                    'clave': (normalize_text(capitulo), normalize_text(descripcion)),
+                    'cantidad': to_decimal(row.get('cantidad') or 0),
+                    'unidad': str(row.get('unidad') or '').strip(),
+                    'valor_unitario': to_decimal(row.get('valor_unitario') or 0),
+                })
+        totales = self.pricing_engine.line_totals([l['cantidad'] for l in lineas],
+                                                  [l['valor_unitario'] for l in lineas])
+        for posicion, (linea, total) in enumerate(zip(lineas, totales), 1):
+            linea['total'] = total
+            linea['posicion'] = posicion
+        return lineas
+
+    @staticmethod
+    def _alinear(claves_a, claves_b):
+        """
+        Alinea dos secuencias de claves.
+
+        Returns:
+            tuple: (pares [(i, j)], índices solo en a, índices solo en b)
+        """
+        # Claves como enteros: comparar y hashear tuplas de textos es lo más caro
+        ids = {}
+        a = [ids.setdefault(clave, len(ids)) for clave in claves_a]
+        b = [ids.setdefault(clave, len(ids)) for clave in claves_b]
+
+        inicio = 0
+        limite = min(len(a), len(b))
+        while inicio < limite and a[inicio] == b[inicio]:
+            inicio += 1
+        fin = 0
+        while fin < limite - inicio and a[len(a) - 1 - fin] == b[len(b) - 1 - fin]:
+            fin += 1
+
+        pares = [(i, i) for i in range(inicio)]
+        solo_a = []
+        solo_b = []
+        medio_a = a[inicio:len(a) - fin]
+        medio_b = b[inicio:len(b) - fin]
+        if medio_a and medio_b:
+            matcher = SequenceMatcher(None, medio_a, medio_b, autojunk=False)
+            for op, i1, i2, j1, j2 in matcher.get_opcodes():
+                if op == 'equal':
+                    pares.extend((inicio + i1 + k, inicio + j1 + k) for k in range(i2 - i1))
+                else:
+                    solo_a.extend(range(inicio + i1, inicio + i2))
+                    solo_b.extend(range(inicio + j1, inicio + j2))
+        else:
+            solo_a.extend(range(inicio, len(a) - fin))
+            solo_b.extend(range(inicio, len(b) - fin))
+        pares.extend((len(a) - fin + k, len(b) - fin + k) for k in range(fin))
+        return pares, solo_a, solo_b
+
+    def _cambios(self, antes, despues):
+        return {campo: {'antes': self._valor(antes[campo]), 'despues': self._valor(despues[campo])}
+                for campo in self.CAMPOS if antes[campo] != despues[campo]}
+
+    @staticmethod
+    def _valor(valor):
+        return valor if isinstance(valor, str) else float(valor)
+
+    @staticmethod
+    def _fila(linea):
+        return {
+            'capitulo': linea['capitulo'],
+            'descripcion': linea['descripcion'],
+            'posicion': linea['posicion'],
+            'cantidad': float(linea['cantidad']),
+            'unidad': linea['unidad'],
+            'valor_unitario': float(linea['valor_unitario']),
+            'total': float(linea['total']),
+        }
+
+    def _cambio(self, antes, despues, cambios):
+        return {
+            'antes': self._fila(antes),
+            'despues': self._fila(despues),
+            'cambios': cambios,
+            'delta': float(despues['total'] - antes['total']),
+        }
+
+    def _totales(self, version):
+        resultado = self.pricing_engine.price(version['table_rows'], version['tipo'], version['aiu'])
+        return {clave: float(resultado[clave])
+                for clave in ('costo_directo', 'administracion', 'imprevistos', 'utilidad', 'iva', 'total')}
+
+    def comparar(self, antes, despues):
+        """
+        Compara dos versiones de una cotización.
+
+        Args:
+            antes, despues: Fuentes aceptadas por cargar()
+
+        Returns:
+            dict: {'antes', 'despues' (etiquetas), 'agregadas', 'eliminadas',
+                   'modificadas', 'movidas', 'sin_cambios', 'capitulos', 'totales'}
+        """
+        version_a = self.cargar(antes)
+        version_b = self.cargar(despues)
+        lineas_a = self._lineas(version_a['table_rows'])
+        lineas_b = self._lineas(version_b['table_rows'])
+
+        pares, solo_a, solo_b = self._alinear([l['clave'] for l in lineas_a],
+                                              [l['clave'] for l in lineas_b])
+
+        modificadas = []
+        sin_cambios = 0
+        for i, j in pares:
+            cambios = self._cambios(lineas_a[i], lineas_b[j])
+            if cambios:
+                modificadas.append(self._cambio(lineas_a[i], lineas_b[j], cambios))
+            else:
+                sin_cambios += 1
+
+        # Eliminadas y agregadas con la misma clave: la fila cambió de posición
+        pendientes = {}
+        for i in solo_a:
+            pendientes.setdefault(lineas_a[i]['clave'], []).append(i)
+        movidas = []
+        agregadas = []
+        for j in solo_b:
+            candidatas = pendientes.get(lineas_b[j]['clave'])
+            if candidatas:
+                i = candidatas.pop(0)
+                movidas.append(self._cambio(lineas_a[i], lineas_b[j], self._cambios(lineas_a[i], lineas_b[j])))
+            else:
+                agregadas.append(self._fila(lineas_b[j]))
+        eliminadas = [self._fila(lineas_a[i]) for candidatas in pendientes.values() for i in candidatas]
+        eliminadas.sort(key=lambda fila: fila['posicion'])
+
+        totales_a = self._totales(version_a)
+        totales_b = self._totales(version_b)
+        return {
+            'antes': version_a['etiqueta'],
+            'despues': version_b['etiqueta'],
+            'agregadas': agregadas,
+            'eliminadas': eliminadas,
+            'modificadas': modificadas,
+            'movidas': movidas,
+            'sin_cambios': sin_cambios,
+            'capitulos': self._capitulos(lineas_a, lineas_b, agregadas, eliminadas, modificadas, movidas),
+            'totales': {
+                'antes': totales_a,
+                'despues': totales_b,
+                'delta': {clave: totales_b[clave] - totales_a[clave] for clave in totales_a},
+            },
+        }
+
+    def _capitulos(self, lineas_a, lineas_b, agregadas, eliminadas, modificadas, movidas):
+        """Subtotal antes/después y número de cambios de cada capítulo."""
+        capitulos = {}
+
+        def capitulo(nombre):
+            clave = normalize_text(nombre)
+            if clave not in capitulos:
+                capitulos[clave] = {'capitulo': nombre, 'antes': 0, 'despues': 0,
+                                    'agregadas': 0, 'eliminadas': 0, 'modificadas': 0, 'movidas': 0}
+            return capitulos[clave]
+
+        subtotales = {}
+        for lado, lineas in (('despues', lineas_b), ('antes', lineas_a)):
+            for linea in lineas:
+                clave = (lado, linea['clave'][0])
+                if clave not in subtotales:
+                    capitulo(linea['capitulo'])
+                    subtotales[clave] = 0
+                subtotales[clave] += linea['total']
+        for (lado, clave), subtotal in subtotales.items():
+            capitulos[clave][lado] = float(subtotal)
+
+        for fila in agregadas:
+            capitulo(fila['capitulo'])['agregadas'] += 1
+        for fila in eliminadas:
+            capitulo(fila['capitulo'])['eliminadas'] += 1
+        for cambio in modificadas:
+            capitulo(cambio['despues']['capitulo'])['modificadas'] += 1
+        for cambio in movidas:
+            capitulo(cambio['despues']['capitulo'])['movidas'] += 1
+
+        resultado = list(capitulos.values())
+        for item in resultado:
+            item['delta'] = item['despues'] - item['antes']
+        return resultado
+
+
+def _delta(valor):
+    return f"-${-valor:,.2f}" if valor < 0 else f"+${valor:,.2f}"
+
+
+def format_changeset(changeset, max_filas=50):
+    """
+    Reporte de texto de un changeset de QuotationDiffEngine.comparar().
+
+    Args:
+        changeset (dict): Resultado de comparar()
+        max_filas (int): Máximo de filas listadas por sección (None = todas)
+    """
+    lineas = [
+        f"Antes:   {changeset['antes']}",
+        f"Después: {changeset['despues']}",
+        "",
+        f"Agregadas: {len(changeset['agregadas'])}  Eliminadas: {len(changeset['eliminadas'])}  "
+        f"Modificadas: {len(changeset['modificadas'])}  Movidas: {len(changeset['movidas'])}  "
+        f"Sin cambios: {changeset['sin_cambios']}",
+    ]
+
+    def listar(titulo, items, formato):
+        if not items:
+            return
+        lineas.extend(["", f"{titulo}:"])
+        visibles = items if max_filas is None else items[:max_filas]
+        lineas.extend(formato(item) for item in visibles)
+        if len(items) > len(visibles):
+            lineas.append(f"  ... y {len(items) - len(visibles)} más")
+
+    def describir_cambios(cambio):
+        partes = [f"{campo}: {valores['antes']} -> {valores['despues']}"
+                  for campo, valores in cambio['cambios'].items()]
+        return "; ".join(partes)
+
+    listar("Agregadas", changeset['agregadas'],
+           lambda f: f"  + [{f['capitulo']}] {f['descripcion']}  "
+                     f"{f['cantidad']:g} {f['unidad']} x ${f['valor_unitario']:,.2f} = ${f['total']:,.2f}")
+    listar("Eliminadas", changeset['eliminadas'],
+           lambda f: f"  - [{f['capitulo']}] {f['descripcion']}  ${f['total']:,.2f}")
+    listar("Modificadas", changeset['modificadas'],
+           lambda c: f"  ~ [{c['despues']['capitulo']}] {c['despues']['descripcion']}  "
+                     f"{describir_cambios(c)}  (delta {_delta(c['delta'])})")
+    listar("Movidas", changeset['movidas'],
+           lambda c: f"  > [{c['despues']['capitulo']}] {c['despues']['descripcion']}  "
+                     f"posición {c['antes']['posicion']} -> {c['despues']['posicion']}"
+                     + (f"  {describir_cambios(c)}" if c['cambios'] else ""))
+
+    cambiados = [c for c in changeset['capitulos']
+                 if c['delta'] or c['agregadas'] or c['eliminadas'] or c['modificadas'] or c['movidas']]
+    if cambiados:
+        lineas.extend(["", "Capítulos:"])
+        for c in cambiados:
+            lineas.append(f"  {c['capitulo']}: ${c['antes']:,.2f} -> ${c['despues']:,.2f} "
+                          f"(delta {_delta(c['delta'])})")
+
+    totales = changeset['totales']
+    lineas.extend(["", "Totales:"])
+    for clave, etiqueta in (('costo_directo', 'Costo directo'), ('administracion', 'Administración'),
+                            ('imprevistos', 'Imprevistos'), ('utilidad', 'Utilidad'),
+                            ('iva', 'IVA'), ('total', 'Total')):
+        if totales['antes'][clave] or totales['despues'][clave]:
+            lineas.append(f"  {etiqueta:<15} ${totales['antes'][clave]:>16,.2f} -> "
+                          f"${totales['despues'][clave]:>16,.2f}  (delta {_delta(totales['delta'][clave])})")
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos versiones de una cotización")
+    parser.add_argument('antes', help='snapshot:ID, cotizacion:ID o ruta de archivo .json/.cotiz/.xlsx')
+    parser.add_argument('despues', help='snapshot:ID, cotizacion:ID o ruta de archivo .json/.cotiz/.xlsx')
+    parser.add_argument('--db', default='data/cotizaciones.db', help='Base de datos para snapshot:/cotizacion:')
+    parser.add_argument('--json', action='store_true', help='Imprime el changeset como JSON')
+    parser.add_argument('--todas', action='store_true', help='Lista todas las filas en el reporte de texto')
+    args = parser.parse_args(argv)
+
+    # Los mensajes de la base de datos y de los cargadores van a stderr para no mezclarse con el reporte
+    with contextlib.redirect_stdout(sys.stderr):
+        database_manager = None
+        if any(QuotationDiffEngine.PATRON_FUENTE_BD.match(f) for f in (args.antes, args.despues)):
+            from utils.database_manager import DatabaseManager
+            database_manager = DatabaseManager(args.db)
+
+        try:
+            changeset = QuotationDiffEngine(database_manager).comparar(args.antes, args.despues)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        finally:
+            if database_manager is not None:
+                database_manager.close()
+
+    if args.json:
+        print(json.dumps(changeset, ensure_ascii=False, indent=2))
+    else:
+        print(format_changeset(changeset, max_filas=None if args.todas else 50))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# utils/quotation_lines_manager.py
+"""
+Métodos de extensión para DatabaseManager que mantienen las líneas de las
+cotizaciones guardadas en una tabla normalizada.
+
+Cada snapshot de `cotizaciones_snapshot` guarda sus filas como JSON; aquí se
+copian sus actividades a `quotation_lines` (una fila por línea, con capítulo,
+actividad del catálogo si coincide la descripción, cantidades y totales), de
+modo que los agregados sobre todo el historial sean SQL simple:
+
+    SELECT SUM(cantidad) FROM quotation_lines
+    WHERE vigente = 1 AND actividad_id = ?
+
+Solo las líneas del snapshot más reciente de cada cotización tienen
+`vigente = 1`; las de snapshots anteriores se conservan con `vigente = 0`.
+
+save_snapshot agrega las líneas en la misma transacción. Los snapshots
+anteriores a esta tabla se cargan con backfill_quotation_lines(), por lotes
+(python -m utils.quotation_lines_manager [ruta_db]).
+"""
+import json
+import sqlite3
+import sys
+
+from utils.pricing_engine import get_pricing_engine
+
+
+class QuotationLinesManager:
+    """Mixin class para las líneas normalizadas de cotizaciones - extiende DatabaseManager"""
+
+    def create_quotation_lines_table(self, cursor):
+        """Crea la tabla de líneas de cotización y sus índices."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS quotation_lines (
+                id INTEGER PRIMARY KEY,
+                cotizacion_id INTEGER NOT NULL,
+                snapshot_id INTEGER NOT NULL,
+                posicion INTEGER NOT NULL,
+                capitulo TEXT,
+                actividad_id INTEGER,
+                descripcion TEXT NOT NULL,
+                unidad TEXT,
+                cantidad REAL NOT NULL DEFAULT 0,
+                valor_unitario REAL NOT NULL DEFAULT 0,
+                total REAL NOT NULL DEFAULT 0,
+                vigente INTEGER NOT NULL DEFAULT 1,
+                FOREIGN KEY (cotizacion_id) REFERENCES cotizaciones_generadas(id) ON DELETE CASCADE,
+                FOREIGN KEY (snapshot_id) REFERENCES cotizaciones_snapshot(id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_quotation_lines_snapshot
+            ON quotation_lines (snapshot_id, posicion)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_quotation_lines_cotizacion
+            ON quotation_lines (cotizacion_id, vigente)
+        """)
+        # Agregados por actividad sobre las líneas vigentes sin leer la tabla
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_quotation_lines_actividad
+            ON quotation_lines (actividad_id, unidad, cantidad, total, cotizacion_id)
+            WHERE vigente = 1
+        """)
+        # Asociación de descripciones cotizadas con el catálogo
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_actividades_descripcion
+            ON actividades (descripcion)
+        """)
+
+    @staticmethod
+    def _lines_from_rows(table_rows):
+        """
+        Actividades de un snapshot con su capítulo y posición.
+
+        Returns:
+            list: [(posicion, capitulo, descripcion, unidad, cantidad, valor_unitario)]
+        """
+        lineas = []
+        capitulo = None
+        for posicion, row in enumerate(table_rows or []):
+            tipo = row.get('type')
+            if tipo in ('chapter', 'chapter_header'):
+                capitulo = row.get('name') or row.get('descripcion') or None
+            elif tipo == 'activity':
+                descripcion = (row.get('descripcion') or '').strip()
+                if descripcion:
+                    lineas.append((posicion, capitulo, descripcion, row.get('unidad') or '',
+                                   row.get('cantidad', 0), row.get('valor_unitario', 0)))
+        return lineas
+
+    def _activity_ids_by_description(self, cursor, descripciones):
+        """{descripcion: id} de las actividades del catálogo con esas descripciones exactas."""
+        ids = {}
+        descripciones = list(set(descripciones))
+        for inicio in range(0, len(descripciones), 500):
+            lote = descripciones[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(lote))
+            cursor.execute(
+                f"SELECT descripcion, MIN(id) FROM actividades WHERE descripcion IN ({marcadores}) GROUP BY descripcion",
+                lote)
+            ids.update(cursor.fetchall())
+        return ids
+
+    def _insert_quotation_lines(self, cursor, snapshots):
+        """
+        Inserta las líneas de varios snapshots y marca como no vigentes las anteriores de cada cotización.
+        No hace commit: se ejecuta dentro de la transacción de quien lo llama.
+
+        Args:
+            snapshots (list): [(snapshot_id, cotizacion_id, table_rows)] en orden de id
+
+        Returns:
+            int: Líneas insertadas
+        """
+        engine = get_pricing_engine()
+        por_snapshot = []
+        descripciones = set()
+        for snapshot_id, cotizacion_id, table_rows in snapshots:
+            lineas = self._lines_from_rows(table_rows)
+            por_snapshot.append((snapshot_id, cotizacion_id, lineas))
+            descripciones.update(linea[2] for linea in lineas)
+        actividad_ids = self._activity_ids_by_description(cursor, descripciones)
+
+        filas = []
+        for snapshot_id, cotizacion_id, lineas in por_snapshot:
+            totales = engine.line_totals([l[4] for l in lineas], [l[5] for l in lineas])
+            for (posicion, capitulo, descripcion, unidad, cantidad, valor_unitario), total in zip(lineas, totales):
+                filas.append((cotizacion_id, snapshot_id, posicion, capitulo, actividad_ids.get(descripcion),
+                              descripcion, unidad, float(engine.to_decimal(cantidad)),
+                              float(engine.to_decimal(valor_unitario)), float(total)))
+
+        # Solo el último snapshot de cada cotización queda vigente
+        ultimos = {}
+        for snapshot_id, cotizacion_id, _ in por_snapshot:
+            ultimos[cotizacion_id] = max(snapshot_id, ultimos.get(cotizacion_id, snapshot_id))
+        cursor.executemany("""
+            INSERT INTO quotation_lines (cotizacion_id, snapshot_id, posicion, capitulo, actividad_id,
+                                         descripcion, unidad, cantidad, valor_unitario, total, vigente)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+        """, filas)
+        cursor.executemany("""
+            UPDATE quotation_lines SET vigente = 0
+            WHERE cotizacion_id = ? AND vigente = 1 AND snapshot_id <> (
+                SELECT MAX(id) FROM cotizaciones_snapshot WHERE cotizacion_id = ?
+            )
+        """, [(cotizacion_id, cotizacion_id) for cotizacion_id in ultimos])
+        return len(filas)
+
+    def backfill_quotation_lines(self, batch_size=200):
+        """
+        Carga las líneas de los snapshots que aún no están en quotation_lines.
+
+        Recorre los snapshots por lotes de id creciente (sin cargar todo el
+        historial en memoria) y confirma cada lote; si se interrumpe, la
+        siguiente ejecución continúa con los que faltan.
+
+        Returns:
+            int: Snapshots procesados, o None si hubo error
+        """
+        try:
+            return self.fill_quotation_lines(self.connection.cursor(), batch_size, commit=True)
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error al cargar líneas de cotización: {e}")
+            return None
+
+    def fill_quotation_lines(self, cursor, batch_size=200, progreso=None, commit=False):
+        """
+        Recorrido por lotes de backfill_quotation_lines. Sin commit (por defecto) todo
+        queda en la transacción en curso, como en la migración de esquema que crea la tabla.
+
+        Args:
+            progreso (callable): progreso(procesados, total) tras cada lote
+
+        Raises:
+            sqlite3.Error: El llamador decide si deshace la transacción
+        """
+        pendientes = """
+            FROM cotizaciones_snapshot s
+            WHERE s.id > ?
+              AND NOT EXISTS (SELECT 1 FROM quotation_lines l WHERE l.snapshot_id = s.id)
+              AND EXISTS (SELECT 1 FROM cotizaciones_generadas c WHERE c.id = s.cotizacion_id)
+        """
+        total = None
+        if progreso:
+            cursor.execute(f"SELECT COUNT(*) {pendientes}", (0,))
+            total = cursor.fetchone()[0]
+        procesados = 0
+        ultimo_id = 0
+        while True:
+            cursor.execute(f"""
+                SELECT s.id, s.cotizacion_id, s.table_rows_json {pendientes}
+                ORDER BY s.id
+                LIMIT ?
+            """, (ultimo_id, batch_size))
+            lote = cursor.fetchall()
+            if not lote:
+                break
+            snapshots = []
+            for snapshot_id, cotizacion_id, table_rows_json in lote:
+                try:
+                    table_rows = json.loads(table_rows_json)
+                except (TypeError, ValueError):
+                    table_rows = []
+                snapshots.append((snapshot_id, cotizacion_id, table_rows))
+            self._insert_quotation_lines(cursor, snapshots)
+            if commit:
+                self.connection.commit()
+            procesados += len(lote)
+            ultimo_id = lote[-1][0]
+            if progreso:
+                progreso(procesados, total)
+        return procesados
+
+    def delete_quotation_lines(self, cursor, quotation_id):
+        """Elimina las líneas de una cotización. No hace commit."""
+        cursor.execute("DELETE FROM quotation_lines WHERE cotizacion_id = ?", (quotation_id,))
+
+    def get_quoted_activity_totals(self, actividad_id=None, texto=None, fecha_inicio=None, fecha_fin=None,
+                                   include_test=False, limit=None):
+        """
+        Totales cotizados por actividad en la versión vigente de cada cotización.
+
+        Las líneas que coinciden con el catálogo se agrupan por actividad; las
+        demás, por descripción.
+
+        Args:
+            actividad_id (int): Solo esta actividad
+            texto (str): Solo descripciones que contienen el texto
+            fecha_inicio, fecha_fin (str): Rango de fecha de creación de la cotización ('YYYY-MM-DD')
+            include_test (bool): Incluir cotizaciones de prueba
+            limit (int): Máximo de filas (ordenadas por monto)
+
+        Returns:
+            list: [{'actividad_id', 'descripcion', 'unidad', 'lineas', 'cotizaciones',
+                    'cantidad_total', 'monto_total'}]
+        """
+        try:
+            cursor = self.connection.cursor()
+            condiciones = ["l.vigente = 1"]
+            parametros = []
+            if actividad_id is not None:
+                condiciones.append("l.actividad_id = ?")
+                parametros.append(actividad_id)
+            if texto:
+                condiciones.append("l.descripcion LIKE ?")
+                parametros.append(f"%{texto}%")
+            if fecha_inicio or fecha_fin or not include_test:
+                condiciones.append("""l.cotizacion_id IN (
+                    SELECT id FROM cotizaciones_generadas
+                    WHERE (? IS NULL OR DATE(fecha_creacion) >= ?)
+                      AND (? IS NULL OR DATE(fecha_creacion) <= ?)
+                      AND (? OR es_prueba = 0)
+                )""")
+                parametros.extend([fecha_inicio, fecha_inicio, fecha_fin, fecha_fin, 1 if include_test else 0])
+            sql = f"""
+                SELECT l.actividad_id, MIN(l.descripcion), l.unidad, COUNT(*), COUNT(DISTINCT l.cotizacion_id),
+                       SUM(l.cantidad), SUM(l.total)
+                FROM quotation_lines l
+                WHERE {' AND '.join(condiciones)}
+                GROUP BY COALESCE(l.actividad_id, l.descripcion), l.unidad
+                ORDER BY SUM(l.total) DESC
+            """
+            if limit:
+                sql += " LIMIT ?"
+                parametros.append(limit)
+            cursor.execute(sql, parametros)
+            return [{
+                'actividad_id': row[0],
+                'descripcion': row[1],
+                'unidad': row[2],
+                'lineas': row[3],
+                'cotizaciones': row[4],
+                'cantidad_total': row[5] or 0,
+                'monto_total': row[6] or 0,
+            } for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error al consultar totales cotizados: {e}")
+            return []
+
+
+if __name__ == "__main__":
+    # Uso: python -m utils.quotation_lines_manager [ruta_db]
+    from utils.database_manager import DatabaseManager
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    db = DatabaseManager(args[0]) if args else DatabaseManager()
+    print(f"Snapshots procesados: {db.backfill_quotation_lines()}")
+    db.close()
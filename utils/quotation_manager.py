@@ -7,12 +7,16 @@ import json
 from datetime import datetime, timedelta
 import sqlite3
 
+from utils.change_events import ALTA, MODIFICACION, BAJA
+from utils.instrumentation import instrumentado
+
 
 class QuotationManager:
     """Mixin class for quotation management - extends DatabaseManager"""
     
     # ===== COTIZACIONES GENERADAS =====
     
+    @instrumentado('db.write')
     def save_quotation(self, **kwargs):
         """
         Saves a generated quotation to the database.
@@ -63,18 +67,22 @@ class QuotationManager:
             self.connection.commit()
             quotation_id = cursor.lastrowid
             print(f"Cotización guardada con ID: {quotation_id}")
+            self._notify_change('cotizacion', quotation_id, ALTA)
             return quotation_id
             
         except sqlite3.Error as e:
             print(f"Error al guardar cotización: {e}")
             return None
     
-    def get_all_quotations(self, include_test=True, filters=None):
+    @instrumentado('db.read')
+    def get_all_quotations(self, include_test=True, filters=None, include_archived=False):
         """
         Gets all quotations with optional filters.
         
         Args:
             include_test (bool): Whether to include test quotations
+            include_archived (bool): Also search the yearly archive databases
+                ('archivo' is the archive year, None for live quotations)
             filters (dict): Optional filters:
                 - estado: Filter by state
                 - cliente_id: Filter by client
@@ -82,6 +90,7 @@ class QuotationManager:
                 - fecha_fin: End date
                 - monto_min: Minimum amount
                 - monto_max: Maximum amount
+                - ids: Only these quotation ids
         
         Returns:
             list: List of quotation dictionaries
@@ -89,14 +98,20 @@ class QuotationManager:
         try:
             cursor = self.connection.cursor()
             
-            query = """
+            source, archivo_column = "cotizaciones_generadas", "NULL"
+            if include_archived:
+                view = self.archived_quotations_view()
+                if view:
+                    source, archivo_column = view, "cg.archivo"
+            
+            query = f"""
                 SELECT 
                     cg.id, cg.cliente_id, c.nombre as cliente_nombre,
                     cg.fecha_creacion, cg.fecha_modificacion, cg.nombre_proyecto,
                     cg.monto_total, cg.estado, cg.es_prueba, cg.ruta_pdf,
                     cg.ruta_excel, cg.ruta_word, cg.notas, cg.validez_dias,
-                    cg.fecha_vencimiento, cg.tipo_cliente
-                FROM cotizaciones_generadas cg
+                    cg.fecha_vencimiento, cg.tipo_cliente, {archivo_column}
+                FROM {source} cg
                 LEFT JOIN clientes c ON cg.cliente_id = c.id
                 WHERE 1=1
             """
@@ -130,6 +145,10 @@ class QuotationManager:
                 if 'monto_max' in filters and filters['monto_max']:
                     query += " AND cg.monto_total <= ?"
                     params.append(filters['monto_max'])
+                
+                if filters.get('ids') is not None:
+                    query += f" AND cg.id IN ({','.join('?' * len(filters['ids']))})"
+                    params.extend(filters['ids'])
             
             query += " ORDER BY cg.fecha_creacion DESC"
             
@@ -153,7 +172,8 @@ class QuotationManager:
                     'notas': row[12],
                     'validez_dias': row[13],
                     'fecha_vencimiento': row[14],
-                    'tipo_cliente': row[15]
+                    'tipo_cliente': row[15],
+                    'archivo': row[16]
                 })
             
             return quotations
@@ -232,6 +252,7 @@ class QuotationManager:
                 accion=f"estado_cambiado_a_{new_state}",
                 notas=notas
             )
+            self._notify_change('cotizacion', quotation_id, MODIFICACION)
             
             return True
             
@@ -244,7 +265,10 @@ class QuotationManager:
         try:
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM cotizaciones_generadas WHERE id = ?", (quotation_id,))
+            self.delete_quotation_lines(cursor, quotation_id)
+            self.delete_quotation_search_terms(cursor, quotation_id)
             self.connection.commit()
+            self._notify_change('cotizacion', quotation_id, BAJA)
             return  True
         except sqlite3.Error as e:
             print(f"Error al eliminar cotización: {e}")
@@ -294,6 +318,7 @@ class QuotationManager:
     
     # ===== SNAPSHOTS =====
     
+    @instrumentado('db.write')
     def save_snapshot(self, quotation_id, datos_dict, table_rows_list, config_dict=None):
         """
         Saves a complete snapshot of a quotation for recovery.
@@ -319,14 +344,19 @@ class QuotationManager:
                 INSERT INTO cotizaciones_snapshot (cotizacion_id, datos_json, table_rows_json, config_json)
                 VALUES (?, ?, ?, ?)
             """, (quotation_id, datos_json, table_rows_json, config_json))
+            snapshot_id = cursor.lastrowid
+            self._insert_quotation_lines(cursor, [(snapshot_id, quotation_id, table_rows_list)])
+            self.index_snapshot_rows(cursor, quotation_id, snapshot_id, table_rows_list)
             
             self.connection.commit()
-            return cursor.lastrowid
+            self._notify_change('snapshot', quotation_id, ALTA)
+            return snapshot_id
             
         except (sqlite3.Error, json.JSONDecodeError) as e:
             print(f"Error al guardar snapshot: {e}")
             return None
     
+    @instrumentado('db.read')
     def get_latest_snapshot(self, quotation_id):
         """Gets the most recent snapshot of a quotation"""
         try:
@@ -335,7 +365,7 @@ class QuotationManager:
                 SELECT id, fecha_snapshot, datos_json, table_rows_json, config_json
                 FROM cotizaciones_snapshot
                 WHERE cotizacion_id = ?
-                ORDER BY fecha_snapshot DESC
+                ORDER BY fecha_snapshot DESC, id DESC
                 LIMIT 1
             """, (quotation_id,))
             
@@ -353,7 +383,51 @@ class QuotationManager:
         except (sqlite3.Error, json.JSONDecodeError) as e:
             print(f"Error al obtener snapshot: {e}")
             return None
-    
+
+    def get_snapshots(self, quotation_id):
+        """Lists the snapshots of a quotation (id and date only), oldest first"""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT id, fecha_snapshot
+                FROM cotizaciones_snapshot
+                WHERE cotizacion_id = ?
+                ORDER BY fecha_snapshot, id
+            """, (quotation_id,))
+
+            return [{'id': row[0], 'fecha_snapshot': row[1]} for row in cursor.fetchall()]
+
+        except sqlite3.Error as e:
+            print(f"Error al listar snapshots: {e}")
+            return []
+
+    @instrumentado('db.read')
+    def get_snapshot_by_id(self, snapshot_id):
+        """Gets a single snapshot by its ID"""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT id, cotizacion_id, fecha_snapshot, datos_json, table_rows_json, config_json
+                FROM cotizaciones_snapshot
+                WHERE id = ?
+            """, (snapshot_id,))
+
+            row = cursor.fetchone()
+            if row:
+                return {
+                    'id': row[0],
+                    'cotizacion_id': row[1],
+                    'fecha_snapshot': row[2],
+                    'datos': json.loads(row[3]),
+                    'table_rows': json.loads(row[4]),
+                    'config': json.loads(row[5]) if row[5] else None
+                }
+            return None
+
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            print(f"Error al obtener snapshot: {e}")
+            return None
+
     # ===== ESTADÍSTICAS =====
     
     def get_quotation_stats(self, mes=None, anio=None, include_test=False):
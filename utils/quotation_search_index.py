@@ -0,0 +1,237 @@
+# utils/quotation_search_index.py
+"""
+Métodos de extensión para DatabaseManager: índice invertido de las
+actividades cotizadas, para encontrar qué cotizaciones incluyeron una
+actividad o un fragmento de descripción.
+
+Almacenamiento:
+    - indice_terminos: palabra normalizada (sin tildes, minúsculas) -> id
+    - indice_terminos_cotizacion: (termino_id, cotizacion_id) WITHOUT ROWID
+    - indice_cotizaciones: snapshot indexado de cada cotización
+
+Solo se indexa la versión vigente de cada cotización (su último snapshot).
+save_snapshot actualiza el índice de la cotización en la misma transacción
+(agrega y quita solo las palabras que cambiaron) y delete_quotation la
+retira. Las cotizaciones guardadas antes de existir el índice se cargan
+desde quotation_lines con build_quotation_search_index().
+
+Para buscar por actividad del catálogo (id) se usa directamente
+quotation_lines, que ya está indexada por actividad_id.
+"""
+import re
+import sqlite3
+
+from utils.text_utils import normalize_text
+
+# Palabras demasiado frecuentes en las descripciones para servir de filtro
+PALABRAS_VACIAS = frozenset({
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'o', 'para', 'por',
+    'segun', 'sin', 'su', 'un', 'una', 'y',
+})
+
+
+def tokenize(texto):
+    """Palabras normalizadas de un texto, sin repetir y sin palabras vacías (en orden de aparición)."""
+    palabras = re.findall(r'\w+', normalize_text(texto))
+    return list(dict.fromkeys(p for p in palabras if p not in PALABRAS_VACIAS))
+
+
+class QuotationSearchIndex:
+    """Mixin class para el índice invertido de actividades cotizadas - extiende DatabaseManager"""
+
+    def create_quotation_search_index_tables(self, cursor):
+        """Crea las tablas del índice invertido."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS indice_terminos (
+                id INTEGER PRIMARY KEY,
+                termino TEXT NOT NULL UNIQUE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS indice_terminos_cotizacion (
+                termino_id INTEGER NOT NULL,
+                cotizacion_id INTEGER NOT NULL,
+                PRIMARY KEY (termino_id, cotizacion_id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_indice_terminos_cotizacion
+            ON indice_terminos_cotizacion (cotizacion_id, termino_id)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS indice_cotizaciones (
+                cotizacion_id INTEGER PRIMARY KEY,
+                snapshot_id INTEGER NOT NULL
+            )
+        """)
+
+    def _term_ids(self, cursor, terminos):
+        """Obtiene (y registra si faltan) los ids de un conjunto de palabras."""
+        terminos = list(terminos)
+        cursor.executemany("INSERT OR IGNORE INTO indice_terminos (termino) VALUES (?)",
+                           [(t,) for t in terminos])
+        ids = {}
+        for inicio in range(0, len(terminos), 500):
+            lote = terminos[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(lote))
+            cursor.execute(f"SELECT termino, id FROM indice_terminos WHERE termino IN ({marcadores})", lote)
+            ids.update(cursor.fetchall())
+        return ids
+
+    def _index_quotation(self, cursor, quotation_id, snapshot_id, descripciones):
+        """
+        Deja en el índice las palabras de las descripciones de una cotización.
+        Solo inserta y borra las diferencias con lo ya indexado. No hace commit.
+        """
+        terminos = set()
+        for descripcion in descripciones:
+            terminos.update(tokenize(descripcion))
+        nuevos = set(self._term_ids(cursor, terminos).values()) if terminos else set()
+
+        cursor.execute("SELECT termino_id FROM indice_terminos_cotizacion WHERE cotizacion_id = ?", (quotation_id,))
+        actuales = {row[0] for row in cursor.fetchall()}
+        cursor.executemany("DELETE FROM indice_terminos_cotizacion WHERE termino_id = ? AND cotizacion_id = ?",
+                           [(t, quotation_id) for t in actuales - nuevos])
+        cursor.executemany("INSERT INTO indice_terminos_cotizacion (termino_id, cotizacion_id) VALUES (?, ?)",
+                           [(t, quotation_id) for t in nuevos - actuales])
+        cursor.execute("INSERT OR REPLACE INTO indice_cotizaciones (cotizacion_id, snapshot_id) VALUES (?, ?)",
+                       (quotation_id, snapshot_id))
+
+    def index_snapshot_rows(self, cursor, quotation_id, snapshot_id, table_rows):
+        """Indexa las actividades de un snapshot recién guardado. No hace commit."""
+        descripciones = [row.get('descripcion') or '' for row in table_rows or []
+                         if row.get('type') == 'activity']
+        self._index_quotation(cursor, quotation_id, snapshot_id, descripciones)
+
+    def delete_quotation_search_terms(self, cursor, quotation_id):
+        """Retira una cotización del índice. No hace commit."""
+        cursor.execute("DELETE FROM indice_terminos_cotizacion WHERE cotizacion_id = ?", (quotation_id,))
+        cursor.execute("DELETE FROM indice_cotizaciones WHERE cotizacion_id = ?", (quotation_id,))
+
+    def build_quotation_search_index(self, batch_size=200):
+        """
+        Indexa las cotizaciones cuyo último snapshot aún no está en el índice.
+
+        Toma las descripciones de quotation_lines a partir del mayor snapshot
+        ya indexado, de modo que con el índice al día no hay trabajo.
+
+        Returns:
+            int: Cotizaciones indexadas, o None si hubo error
+        """
+        try:
+            return self.fill_quotation_search_index(self.connection.cursor(), batch_size, commit=True)
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error al construir el índice de búsqueda: {e}")
+            return None
+
+    def fill_quotation_search_index(self, cursor, batch_size=200, progreso=None, commit=False):
+        """
+        Recorrido por lotes de build_quotation_search_index; sin commit todo queda en
+        la transacción en curso.
+
+        Args:
+            progreso (callable): progreso(indexadas, total) tras cada lote
+
+        Raises:
+            sqlite3.Error: El llamador decide si deshace la transacción
+        """
+        cursor.execute("SELECT COALESCE(MAX(snapshot_id), 0) FROM indice_cotizaciones")
+        desde = cursor.fetchone()[0]
+        # Por último snapshot creciente: si se interrumpe, el mayor indexado sigue siendo un punto de partida válido
+        cursor.execute("""
+            SELECT cotizacion_id FROM quotation_lines
+            WHERE snapshot_id > ?
+            GROUP BY cotizacion_id
+            ORDER BY MAX(snapshot_id)
+        """, (desde,))
+        pendientes = [row[0] for row in cursor.fetchall()]
+        indexadas = 0
+        for inicio in range(0, len(pendientes), batch_size):
+            lote = pendientes[inicio:inicio + batch_size]
+            marcadores = ",".join("?" * len(lote))
+            cursor.execute(f"""
+                SELECT cotizacion_id, snapshot_id, descripcion FROM quotation_lines
+                WHERE vigente = 1 AND cotizacion_id IN ({marcadores})
+            """, lote)
+            por_cotizacion = {}
+            for cotizacion_id, snapshot_id, descripcion in cursor.fetchall():
+                _, descripciones = por_cotizacion.setdefault(cotizacion_id, (snapshot_id, []))
+                descripciones.append(descripcion)
+            for cotizacion_id, (snapshot_id, descripciones) in por_cotizacion.items():
+                self._index_quotation(cursor, cotizacion_id, snapshot_id, descripciones)
+            if commit:
+                self.connection.commit()
+            indexadas += len(por_cotizacion)
+            if progreso:
+                progreso(min(inicio + batch_size, len(pendientes)), len(pendientes))
+        return indexadas
+
+    def search_quotations_by_activity(self, texto):
+        """
+        Cotizaciones cuya versión vigente incluye una actividad con todas las palabras del texto.
+
+        Cada palabra se busca como prefijo ("demol muro" encuentra "Demolición de muro").
+        Con varias palabras se comprueba además que estén en una misma actividad.
+
+        Args:
+            texto (str): Fragmento de descripción
+
+        Returns:
+            set: IDs de las cotizaciones
+        """
+        palabras = tokenize(texto)
+        if not palabras:
+            return set()
+        try:
+            cursor = self.connection.cursor()
+            consulta = """
+                SELECT p.cotizacion_id FROM indice_terminos t
+                JOIN indice_terminos_cotizacion p ON p.termino_id = t.id
+                WHERE t.termino >= ? AND t.termino < ?
+            """
+            parametros = []
+            for palabra in palabras:
+                parametros.extend([palabra, palabra + '\uffff'])
+            cursor.execute(" INTERSECT ".join([consulta] * len(palabras)), parametros)
+            candidatas = {row[0] for row in cursor.fetchall()}
+            if len(palabras) == 1 or not candidatas:
+                return candidatas
+
+            # Las palabras pueden venir de actividades distintas: se confirma por línea
+            # (cada descripción distinta se evalúa una sola vez)
+            coincide = {}
+            encontradas = set()
+            candidatas = list(candidatas)
+            for inicio in range(0, len(candidatas), 500):
+                lote = candidatas[inicio:inicio + 500]
+                marcadores = ",".join("?" * len(lote))
+                cursor.execute(f"""
+                    SELECT cotizacion_id, descripcion FROM quotation_lines
+                    WHERE vigente = 1 AND cotizacion_id IN ({marcadores})
+                """, lote)
+                for cotizacion_id, descripcion in cursor.fetchall():
+                    if cotizacion_id in encontradas:
+                        continue
+                    if descripcion not in coincide:
+                        terminos = tokenize(descripcion)
+                        coincide[descripcion] = all(any(t.startswith(p) for t in terminos) for p in palabras)
+                    if coincide[descripcion]:
+                        encontradas.add(cotizacion_id)
+            return encontradas
+        except sqlite3.Error as e:
+            print(f"Error al buscar cotizaciones por actividad: {e}")
+            return set()
+
+    def get_quotations_with_activity(self, actividad_id):
+        """IDs de las cotizaciones cuya versión vigente incluye una actividad del catálogo."""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT DISTINCT cotizacion_id FROM quotation_lines
+                WHERE vigente = 1 AND actividad_id = ?
+            """, (actividad_id,))
+            return {row[0] for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            print(f"Error al buscar cotizaciones por actividad: {e}")
+            return set()
@@ -0,0 +1,147 @@
+from collections import defaultdict
+
+from utils.text_utils import normalize_text
+
+
+class RelatedActivityIndex:
+    """
+    Índice en memoria de actividad_relacionada.
+
+    Carga las relaciones y los datos de las actividades una sola vez y los
+    mantiene al día con los avisos de cambio del DatabaseManager, de modo que
+    las consultas de actividades relacionadas no tocan la base de datos.
+    También calcula sugerencias de actividades que suelen cotizarse juntas
+    a partir de la matriz de co-ocurrencia (CooccurrenceManager).
+    """
+
+    def __init__(self, database_manager, cooccurrence_manager=None):
+        self.database_manager = database_manager
+        self.cooccurrence_manager = cooccurrence_manager
+        self._adjacency = defaultdict(dict)     # principal_id -> {relacionada_id: relation_id}
+        self._relations = {}                    # relation_id -> (principal_id, relacionada_id)
+        self._activities = {}                   # actividad_id -> dict de la actividad
+        self._ids_por_descripcion = None        # descripción normalizada -> actividad_id
+        self.reload()
+        database_manager.add_change_listener(self._on_catalog_change)
+
+    # ===== CARGA Y ACTUALIZACIÓN =====
+
+    def reload(self):
+        """Reconstruye el índice completo desde la base de datos."""
+        self._adjacency.clear()
+        self._relations.clear()
+        self._activities = {a['id']: a for a in self.database_manager.get_all_activities()}
+        for relation_id, principal_id, relacionada_id in self.database_manager.get_all_activity_relations():
+            self._add_edge(relation_id, principal_id, relacionada_id)
+        self._ids_por_descripcion = None
+
+    def _add_edge(self, relation_id, principal_id, relacionada_id):
+        self._relations[relation_id] = (principal_id, relacionada_id)
+        self._adjacency[principal_id][relacionada_id] = relation_id
+
+    def _remove_edge(self, relation_id):
+        edge = self._relations.pop(relation_id, None)
+        if edge is None:
+            return
+        principal_id, relacionada_id = edge
+        vecinos = self._adjacency.get(principal_id)
+        if vecinos is not None:
+            vecinos.pop(relacionada_id, None)
+            if not vecinos:
+                del self._adjacency[principal_id]
+
+    def _on_catalog_change(self, entidad, item_id=None):
+        if entidad == 'actividad_relacionada':
+            if item_id is None:
+                self.reload()
+                return
+            row = self.database_manager.get_activity_relation_by_id(item_id)
+            if row:
+                self._add_edge(*row)
+            else:
+                self._remove_edge(item_id)
+        elif entidad == 'actividad':
+            if item_id is None:
+                self._activities = {a['id']: a for a in self.database_manager.get_all_activities()}
+                self._ids_por_descripcion = None
+                return
+            activity = self.database_manager.get_activity_by_id(item_id)
+            if activity:
+                self._activities[item_id] = activity
+            else:
+                self._activities.pop(item_id, None)
+            self._ids_por_descripcion = None
+        elif entidad == 'categoria':
+            self._activities = {a['id']: a for a in self.database_manager.get_all_activities()}
+
+    # ===== CONSULTAS =====
+
+    def get_related_activities(self, activity_id):
+        """Actividades relacionadas directamente, con el mismo formato que DatabaseManager."""
+        related = []
+        for relacionada_id, relation_id in self._adjacency.get(activity_id, {}).items():
+            activity = self._activities.get(relacionada_id)
+            if activity:
+                related.append(dict(activity, relation_id=relation_id))
+        return related
+
+    def has_relation(self, main_activity_id, related_activity_id):
+        return related_activity_id in self._adjacency.get(main_activity_id, {})
+
+    def _activity_id_for(self, descripcion):
+        """Asocia una descripción cotizada con la actividad del catálogo."""
+        if self._ids_por_descripcion is None:
+            self._ids_por_descripcion = {}
+            for activity_id in sorted(self._activities):
+                norm = normalize_text(self._activities[activity_id]['descripcion'])
+                self._ids_por_descripcion.setdefault(norm, activity_id)
+        return self._ids_por_descripcion.get(normalize_text(descripcion))
+
+    def find_activity(self, descripcion):
+        """Actividad del catálogo con la misma descripción (sin distinguir tildes ni mayúsculas), o None."""
+        return self._activities.get(self._activity_id_for(descripcion))
+
+    def get_suggestions(self, activity_id, limit=5, min_cotizaciones=2):
+        """
+        Sugiere actividades que suelen cotizarse junto con la indicada.
+
+        Combina la co-ocurrencia en cotizaciones guardadas con las relaciones
+        transitivas (relacionadas de las relacionadas). Excluye la propia
+        actividad y las que ya están relacionadas directamente.
+
+        Returns:
+            list: Actividades (dict) con las claves adicionales 'puntaje' y 'motivo'
+        """
+        directas = self._adjacency.get(activity_id, {})
+        excluidas = set(directas) | {activity_id}
+
+        puntajes = defaultdict(float)
+        motivos = {}
+        activity = self._activities.get(activity_id)
+        if activity and self.cooccurrence_manager is not None:
+            for otra in self.cooccurrence_manager.get_also_quoted(
+                    activity['descripcion'], limit=limit + len(excluidas), min_veces=min_cotizaciones):
+                otra_id = self._activity_id_for(otra['descripcion'])
+                if otra_id is None or otra_id in excluidas:
+                    continue
+                puntajes[otra_id] += otra['veces']
+                motivos[otra_id] = f"Cotizada junto {otra['veces']} veces"
+
+        # Relaciones transitivas: pesan la mitad que una co-ocurrencia
+        for intermedia_id in directas:
+            for otra_id in self._adjacency.get(intermedia_id, {}):
+                if otra_id in excluidas:
+                    continue
+                puntajes[otra_id] += 0.5
+                motivos.setdefault(otra_id, "Relacionada con una actividad relacionada")
+
+        ordenadas = sorted(puntajes.items(), key=lambda item: (-item[1], item[0]))
+        suggestions = []
+        for otra_id, puntaje in ordenadas:
+            activity = self._activities.get(otra_id)
+            if not activity:
+                continue
+            suggestions.append(dict(activity, puntaje=puntaje, motivo=motivos[otra_id]))
+            if len(suggestions) >= limit:
+                break
+        return suggestions
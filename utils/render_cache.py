@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from utils.instrumentation import get_logger
+
+logger = get_logger('cache_render')
+
+
+class RenderCache:
+    """
+    Caché en disco de documentos generados (.xlsx, .docx, .pdf).
+
+    Cada entrada se identifica con un hash estable del contenido que produce
+    los documentos (filas de la tabla, cliente, valores AIU, plantillas con su
+    fecha de modificación y configuración). Si al generar de nuevo nada
+    relevante cambió, los archivos se copian desde la caché en lugar de
+    repetir la generación y el paso por Office.
+
+    Estructura: <directorio>/<clave>/manifest.json más una copia de cada
+    archivo. La fecha de modificación del manifiesto marca el último uso y
+    las entradas más antiguas se eliminan cuando la caché supera max_bytes.
+    """
+
+    MANIFIESTO = 'manifest.json'
+    VERSION = 1
+
+    def __init__(self, directorio=os.path.join('data', 'cache', 'render'), max_bytes=500 * 1024 * 1024):
+        self.directorio = directorio
+        self.max_bytes = int(max_bytes)
+
+    @classmethod
+    def from_config(cls, config_file=None):
+        """Crea la caché con la sección 'cache_render' de config.json ({'directorio', 'max_mb'}), si existe."""
+        if not config_file:
+            config_file = os.path.join(os.getcwd(), 'config.json')
+        opciones = {}
+        try:
+            if os.path.exists(config_file):
+                with open(config_file, 'r') as f:
+                    opciones = json.load(f).get('cache_render', {})
+        except Exception as e:
+            logger.error("Error al cargar la configuración de la caché de documentos: %s", e)
+        kwargs = {}
+        if opciones.get('directorio'):
+            kwargs['directorio'] = opciones['directorio']
+        if opciones.get('max_mb'):
+            kwargs['max_bytes'] = float(opciones['max_mb']) * 1024 * 1024
+        return cls(**kwargs)
+
+    # ===== CLAVES =====
+
+    @staticmethod
+    def huella_archivos(rutas):
+        """
+        Huella (ruta, mtime, tamaño) de plantillas o directorios de plantillas.
+
+        Un archivo faltante también forma parte de la huella, para que la
+        clave cambie cuando aparezca.
+        """
+        huella = []
+        for ruta in rutas:
+            if not ruta:
+                continue
+            ruta = os.path.abspath(ruta)
+            if os.path.isdir(ruta):
+                archivos = sorted(os.path.join(raiz, nombre)
+                                  for raiz, _, nombres in os.walk(ruta) for nombre in nombres)
+            else:
+                archivos = [ruta]
+            for archivo in archivos:
+                try:
+                    stat = os.stat(archivo)
+                    huella.append([archivo, stat.st_mtime_ns, stat.st_size])
+                except OSError:
+                    huella.append([archivo, None, None])
+        return huella
+
+    def clave(self, tipo, table_rows, cliente=None, aiu=None, plantillas=None, config=None, fecha=None):
+        """
+        Hash estable de todo lo que determina el resultado de una generación.
+
+        Args:
+            tipo (str): Tipo de generación ('excel', 'word', ...)
+            table_rows (list): Filas serializadas de la tabla
+            cliente (dict): Datos del cliente
+            aiu (dict): Valores AIU
+            plantillas (list): Rutas de plantillas o directorios de plantillas
+            config (dict): Configuración adicional (diálogo de Word, motor de precios, ...)
+            fecha (date): Fecha que se imprime en los documentos (propuesta Word, PDF jurídico);
+                          con ella una entrada de otro día no se reutiliza
+
+        Returns:
+            str: Hash SHA-256 en hexadecimal
+        """
+        contenido = {
+            'version': self.VERSION,
+            'tipo': tipo,
+            'table_rows': table_rows,
+            'cliente': cliente,
+            'aiu': aiu,
+            'plantillas': self.huella_archivos(plantillas or []),
+            'config': config,
+            'fecha': fecha,
+        }
+        serializado = json.dumps(contenido, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+    # ===== ENTRADAS =====
+
+    def _ruta_entrada(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    def get(self, clave):
+        """
+        Busca una entrada y la marca como usada.
+
+        Returns:
+            dict: Manifiesto {'clave', 'creado', 'cotizacion_id', 'archivos': {nombre: {'ruta', 'nombre'}}}
+                  con rutas absolutas dentro de la caché, o None si no existe o está incompleta
+        """
+        entrada = self._ruta_entrada(clave)
+        manifiesto_path = os.path.join(entrada, self.MANIFIESTO)
+        try:
+            with open(manifiesto_path, 'r', encoding='utf-8') as f:
+                manifiesto = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        for archivo in manifiesto.get('archivos', {}).values():
+            archivo['ruta'] = os.path.join(entrada, archivo['ruta'])
+            if not os.path.exists(archivo['ruta']):
+                logger.warning("Caché de documentos incompleta, se descarta: %s", clave[:12])
+                shutil.rmtree(entrada, ignore_errors=True)
+                return None
+
+        os.utime(manifiesto_path, None)
+        return manifiesto
+
+    def put(self, clave, archivos, cotizacion_id=None):
+        """
+        Guarda una copia de los archivos generados.
+
+        Args:
+            clave (str): Clave de clave()
+            archivos (dict): {nombre lógico: ruta del archivo generado}; se omiten los que no existan
+            cotizacion_id (int): Cotización asociada, si ya se conoce
+
+        Returns:
+            bool: True si se guardó la entrada
+        """
+        archivos = {nombre: ruta for nombre, ruta in archivos.items() if ruta and os.path.exists(ruta)}
+        if not archivos:
+            return False
+        temporal = None
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            temporal = tempfile.mkdtemp(prefix='.tmp_', dir=self.directorio)
+            manifiesto = {'clave': clave, 'creado': time.time(), 'cotizacion_id': cotizacion_id, 'archivos': {}}
+            for nombre, ruta in archivos.items():
+                destino = f"{nombre}{os.path.splitext(ruta)[1]}"
+                shutil.copy2(ruta, os.path.join(temporal, destino))
+                manifiesto['archivos'][nombre] = {'ruta': destino, 'nombre': os.path.basename(ruta)}
+            with open(os.path.join(temporal, self.MANIFIESTO), 'w', encoding='utf-8') as f:
+                json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+            entrada = self._ruta_entrada(clave)
+            shutil.rmtree(entrada, ignore_errors=True)
+            os.replace(temporal, entrada)
+        except OSError as e:
+            logger.error("Error al guardar en la caché de documentos: %s", e)
+            if temporal:
+                shutil.rmtree(temporal, ignore_errors=True)
+            return False
+
+        self.evict(conservar=clave)
+        return True
+
+    def asociar(self, clave, cotizacion_id):
+        """Registra en el manifiesto la cotización guardada a partir de esta entrada."""
+        manifiesto_path = os.path.join(self._ruta_entrada(clave), self.MANIFIESTO)
+        if not os.path.exists(manifiesto_path):
+            return False
+        try:
+            with open(manifiesto_path, 'r', encoding='utf-8') as f:
+                manifiesto = json.load(f)
+            manifiesto['cotizacion_id'] = cotizacion_id
+            with open(manifiesto_path, 'w', encoding='utf-8') as f:
+                json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+            return True
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Error al actualizar la caché de documentos: %s", e)
+            return False
+
+    @staticmethod
+    def restore(manifiesto, destinos):
+        """
+        Copia los archivos de una entrada a sus destinos.
+
+        Un destino que ya es idéntico a la copia en caché (mismo tamaño y
+        fecha, que copy2 conserva) no se vuelve a copiar.
+
+        Args:
+            manifiesto (dict): Resultado de get()
+            destinos (dict): {nombre lógico: ruta de destino}
+
+        Returns:
+            dict: {nombre lógico: ruta restaurada}, o None si falta algún archivo o hubo error
+        """
+        restaurados = {}
+        try:
+            for nombre, destino in destinos.items():
+                archivo = manifiesto['archivos'].get(nombre)
+                if archivo is None:
+                    return None
+                origen = os.stat(archivo['ruta'])
+                try:
+                    actual = os.stat(destino)
+                    identico = actual.st_size == origen.st_size and int(actual.st_mtime) == int(origen.st_mtime)
+                except OSError:
+                    identico = False
+                if not identico:
+                    shutil.copy2(archivo['ruta'], destino)
+                restaurados[nombre] = destino
+        except OSError as e:
+            logger.error("Error al restaurar desde la caché de documentos: %s", e)
+            return None
+        return restaurados
+
+    # ===== LÍMITE DE TAMAÑO =====
+
+    def _entradas(self):
+        """[(último uso, tamaño, clave)] de las entradas en disco."""
+        entradas = []
+        try:
+            nombres = os.listdir(self.directorio)
+        except OSError:
+            return entradas
+        for nombre in nombres:
+            entrada = self._ruta_entrada(nombre)
+            manifiesto = os.path.join(entrada, self.MANIFIESTO)
+            if nombre.startswith('.tmp_') or not os.path.exists(manifiesto):
+                continue
+            tamano = 0
+            for raiz, _, archivos in os.walk(entrada):
+                for archivo in archivos:
+                    try:
+                        tamano += os.path.getsize(os.path.join(raiz, archivo))
+                    except OSError:
+                        pass
+            entradas.append((os.path.getmtime(manifiesto), tamano, nombre))
+        return entradas
+
+    def size(self):
+        """Tamaño total de la caché en bytes."""
+        return sum(tamano for _, tamano, _ in self._entradas())
+
+    def evict(self, conservar=None):
+        """
+        Elimina las entradas usadas hace más tiempo hasta quedar bajo max_bytes.
+
+        Args:
+            conservar (str): Clave que no se elimina (la recién guardada)
+
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        entradas = sorted(self._entradas())
+        total = sum(tamano for _, tamano, _ in entradas)
+        eliminadas = 0
+        for _, tamano, clave in entradas:
+            if total <= self.max_bytes:
+                break
+            if clave == conservar:
+                continue
+            shutil.rmtree(self._ruta_entrada(clave), ignore_errors=True)
+            total -= tamano
+            eliminadas += 1
+        return eliminadas
+
+    def clear(self):
+        """Elimina todas las entradas."""
+        for _, _, clave in self._entradas():
+            shutil.rmtree(self._ruta_entrada(clave), ignore_errors=True)
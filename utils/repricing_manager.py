@@ -0,0 +1,161 @@
+import sqlite3
+
+
+class RepricingManager:
+    """
+    Reajuste masivo de precios de actividades y productos.
+
+    Los nuevos precios se calculan en una sola consulta SQL sobre el conjunto
+    filtrado (por categoría, texto o producto relacionado), se muestran como
+    vista previa y se aplican en una única transacción mediante
+    DatabaseManager.bulk_update_prices, que además registra el historial.
+    """
+
+    MODOS = {
+        'porcentaje': "Porcentaje (%)",
+        'valor_fijo': "Valor fijo (+/-)",
+        'apu': "Recalcular desde productos (APU)",
+    }
+
+    def __init__(self, database_manager):
+        self.database_manager = database_manager
+
+    def _build_selection(self, tipo_item, categoria_id=None, texto=None, producto_id=None):
+        """Construye la consulta base (id, descripción, precio) y el filtro WHERE."""
+        if tipo_item == 'actividad':
+            base = "SELECT t.id, t.descripcion AS nombre, t.valor_unitario AS precio FROM actividades t"
+            texto_col = "t.descripcion"
+        elif tipo_item == 'producto':
+            base = "SELECT t.id, t.nombre AS nombre, t.precio_unitario AS precio FROM productos t"
+            texto_col = "t.nombre"
+        else:
+            raise ValueError(f"Tipo de ítem desconocido: {tipo_item}")
+
+        condiciones = []
+        params = []
+        if categoria_id is not None:
+            condiciones.append("t.categoria_id = ?")
+            params.append(categoria_id)
+        if texto:
+            condiciones.append(f"{texto_col} LIKE ?")
+            params.append(f"%{texto}%")
+        if producto_id is not None:
+            if tipo_item == 'actividad':
+                condiciones.append("t.id IN (SELECT actividad_id FROM actividad_producto WHERE producto_id = ?)")
+            else:
+                condiciones.append("t.id = ?")
+            params.append(producto_id)
+
+        if condiciones:
+            base += " WHERE " + " AND ".join(condiciones)
+        return base, params
+
+    def preview(self, tipo_item, modo, valor=0.0, categoria_id=None, texto=None,
+                producto_id=None, decimales=2):
+        """
+        Calcula los nuevos precios sin modificar la base de datos.
+
+        Args:
+            tipo_item (str): 'actividad' o 'producto'
+            modo (str): 'porcentaje', 'valor_fijo' o 'apu'
+            valor (float): Porcentaje o valor a sumar. En modo 'apu' es el
+                           porcentaje adicional sobre el costo de materiales.
+            categoria_id, texto, producto_id: Filtros opcionales
+            decimales (int): Decimales de redondeo del nuevo precio
+
+        Returns:
+            dict: {'cambios': [...], 'total_actual', 'total_nuevo',
+                   'diferencia', 'variacion_pct', 'actividades_afectadas'}
+                  o None si hubo error
+        """
+        if modo not in self.MODOS:
+            print(f"Error en reajuste: modo desconocido '{modo}'")
+            return None
+        if modo == 'apu' and tipo_item != 'actividad':
+            print("Error en reajuste: el recálculo por APU solo aplica a actividades")
+            return None
+
+        try:
+            seleccion, params = self._build_selection(tipo_item, categoria_id, texto, producto_id)
+        except ValueError as e:
+            print(f"Error en reajuste: {e}")
+            return None
+
+        if modo == 'porcentaje':
+            nuevo_sql = "ROUND(s.precio * (1 + ? / 100.0), ?)"
+            query = f"SELECT s.id, s.nombre, s.precio, {nuevo_sql} FROM ({seleccion}) s"
+            query_params = [valor, decimales] + params
+        elif modo == 'valor_fijo':
+            nuevo_sql = "ROUND(MAX(s.precio + ?, 0), ?)"
+            query = f"SELECT s.id, s.nombre, s.precio, {nuevo_sql} FROM ({seleccion}) s"
+            query_params = [valor, decimales] + params
+        else:
+            # Actividades sin productos asociados conservan su precio actual
+            query = f"""
+                SELECT s.id, s.nombre, s.precio,
+                       CASE WHEN apu.costo IS NULL THEN s.precio
+                            ELSE ROUND(apu.costo * (1 + ? / 100.0), ?) END
+                FROM ({seleccion}) s
+                LEFT JOIN (
+                    SELECT ap.actividad_id, SUM(ap.cantidad * p.precio_unitario) AS costo
+                    FROM actividad_producto ap
+                    JOIN productos p ON p.id = ap.producto_id
+                    GROUP BY ap.actividad_id
+                ) apu ON apu.actividad_id = s.id
+            """
+            query_params = [valor, decimales] + params
+        query += " ORDER BY s.nombre"
+
+        try:
+            cursor = self.database_manager.connection.cursor()
+            cursor.execute(query, query_params)
+            cambios = []
+            total_actual = 0.0
+            total_nuevo = 0.0
+            for item_id, nombre, precio, nuevo in cursor.fetchall():
+                total_actual += precio
+                total_nuevo += nuevo
+                if nuevo == precio:
+                    continue
+                cambios.append({
+                    'id': item_id,
+                    'nombre': nombre,
+                    'precio_actual': precio,
+                    'precio_nuevo': nuevo,
+                    'diferencia': nuevo - precio,
+                })
+
+            actividades_afectadas = 0
+            if tipo_item == 'producto' and cambios:
+                ids = [c['id'] for c in cambios]
+                marcadores = ",".join("?" * len(ids))
+                cursor.execute(
+                    f"SELECT COUNT(DISTINCT actividad_id) FROM actividad_producto WHERE producto_id IN ({marcadores})",
+                    ids)
+                actividades_afectadas = cursor.fetchone()[0]
+
+            diferencia = total_nuevo - total_actual
+            return {
+                'tipo_item': tipo_item,
+                'cambios': cambios,
+                'total_actual': total_actual,
+                'total_nuevo': total_nuevo,
+                'diferencia': diferencia,
+                'variacion_pct': (diferencia / total_actual * 100) if total_actual else 0.0,
+                'actividades_afectadas': actividades_afectadas,
+            }
+        except sqlite3.Error as e:
+            print(f"Error al calcular vista previa de reajuste: {e}")
+            return None
+
+    def apply(self, preview, motivo=None):
+        """
+        Aplica una vista previa calculada con preview() en una sola transacción.
+
+        Returns:
+            int: Número de ítems actualizados, o None si hubo error
+        """
+        if not preview or not preview['cambios']:
+            return 0
+        nuevos_precios = {c['id']: c['precio_nuevo'] for c in preview['cambios']}
+        return self.database_manager.bulk_update_prices(preview['tipo_item'], nuevos_precios, motivo)
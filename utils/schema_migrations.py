@@ -0,0 +1,311 @@
+"""
+Migraciones de esquema numeradas.
+
+La versión del esquema se guarda en PRAGMA user_version (cabecera del
+archivo, sin tablas auxiliares). Al abrir la base, migrar() la compara con
+la última migración registrada: si ya está al día no se ejecuta ninguna
+sentencia de esquema; si no, aplica en orden las pendientes, cada una en
+su propia transacción (BEGIN IMMEDIATE ... PRAGMA user_version = N ...
+COMMIT). Si una falla se deshace entera y la base queda en la versión
+anterior, lista para reintentar.
+
+Para agregar un cambio de esquema se registra una función nueva con el
+número siguiente; las existentes no se modifican, porque ya se aplicaron
+en las bases de los usuarios. Los cambios que SQLite no admite con ALTER
+TABLE (restricciones, tipos, columnas eliminadas) se hacen con
+reconstruir_tabla().
+
+Uso por consola:
+    python -m utils.schema_migrations [ruta_db] [--version]
+"""
+import sqlite3
+import sys
+
+from utils.cooccurrence_manager import CooccurrenceManager
+from utils.instrumentation import get_logger, span
+
+logger = get_logger('esquema')
+
+# (versión, nombre, función(db, cursor, progreso)) en orden de versión
+MIGRACIONES = []
+
+
+def migracion(version, nombre):
+    """Registra una migración; las versiones deben ser consecutivas."""
+    def decorador(funcion):
+        if MIGRACIONES and version != MIGRACIONES[-1][0] + 1:
+            raise ValueError(f"Migración {version} fuera de orden (última: {MIGRACIONES[-1][0]})")
+        MIGRACIONES.append((version, nombre, funcion))
+        return funcion
+    return decorador
+
+
+# ===== MIGRACIONES =====
+
+@migracion(1, 'esquema_base')
+def _esquema_base(db, cursor, progreso):
+    db.create_base_tables(cursor)
+    # Bases anteriores a las categorías (antes las reconstruía db_migration.py)
+    agregar_columna(cursor, 'actividades', 'categoria_id', 'INTEGER REFERENCES categorias(id)')
+    db.create_price_history_table(cursor)
+
+
+@migracion(2, 'coocurrencia')
+def _coocurrencia(db, cursor, progreso):
+    CooccurrenceManager.create_schema(cursor)
+
+
+@migracion(3, 'lineas_cotizacion')
+def _lineas_cotizacion(db, cursor, progreso):
+    db.create_quotation_lines_table(cursor)
+    # Snapshots guardados antes de existir quotation_lines
+    db.fill_quotation_lines(cursor, progreso=progreso)
+
+
+@migracion(4, 'indice_busqueda')
+def _indice_busqueda(db, cursor, progreso):
+    db.create_quotation_search_index_tables(cursor)
+    db.fill_quotation_search_index(cursor, progreso=progreso)
+
+
+@migracion(5, 'indice_snapshot_cotizacion')
+def _indice_snapshot_cotizacion(db, cursor, progreso):
+    # get_latest_snapshot / get_quotation_history filtran por cotización
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cotizaciones_snapshot_cotizacion
+        ON cotizaciones_snapshot (cotizacion_id, id)
+    """)
+
+
+@migracion(6, 'categorias_nombre_unico')
+def _categorias_nombre_unico(db, cursor, progreso):
+    # Bases creadas por versiones anteriores de reset_db.py / init_db.py / db_migration.py:
+    # categorias sin UNIQUE(nombre) y con una columna descripcion que la aplicación no usa.
+    if tiene_indice_unico(cursor, 'categorias', 'nombre'):
+        return
+    # Las actividades y productos de categorías repetidas pasan a la primera con ese nombre
+    for tabla in ('actividades', 'productos'):
+        cursor.execute(f"""
+            UPDATE {tabla} SET categoria_id = (
+                SELECT MIN(c2.id) FROM categorias c1 JOIN categorias c2 ON c2.nombre = c1.nombre
+                WHERE c1.id = {tabla}.categoria_id
+            )
+            WHERE categoria_id IN (
+                SELECT id FROM categorias WHERE id NOT IN (SELECT MIN(id) FROM categorias GROUP BY nombre)
+            )
+        """)
+    reconstruir_tabla(
+        cursor, 'categorias',
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL UNIQUE",
+        condicion="id IN (SELECT MIN(id) FROM categorias GROUP BY nombre)",
+        progreso=progreso)
+
+
+@migracion(7, 'coocurrencia_descripciones')
+def _coocurrencia_descripciones(db, cursor, progreso):
+    # Cada cotización guarda las descripciones que aportó, para descontarlas al eliminarla.
+    # Los conteos anteriores no descontaban las cotizaciones eliminadas: la matriz se vacía y
+    # CooccurrenceManager.update() la vuelve a calcular desde los snapshots.
+    cursor.execute("ALTER TABLE coocurrencia_cotizacion ADD COLUMN descripciones TEXT")
+    cursor.execute("DELETE FROM coocurrencia_actividades")
+    cursor.execute("DELETE FROM coocurrencia_cotizacion")
+    cursor.execute("DELETE FROM coocurrencia_estado")
+    cursor.execute("UPDATE descripciones_cotizadas SET veces = 0")
+
+
+@migracion(8, 'actividades_capitulo')
+def _actividades_capitulo(db, cursor, progreso):
+    # Columnas que usa CapitulosManager (utils/excel_utils.py)
+    agregar_columna(cursor, 'actividades', 'capitulo_id', 'INTEGER REFERENCES capitulos(id)')
+    agregar_columna(cursor, 'actividades', 'orden', 'INTEGER DEFAULT 0')
+
+
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+
+# ===== MOTOR =====
+
+def version_actual(connection):
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(db, progreso=None):
+    """
+    Aplica las migraciones pendientes sobre la conexión de un DatabaseManager.
+
+    Args:
+        db: DatabaseManager (las migraciones usan sus métodos de esquema)
+        progreso (callable): progreso(version, nombre, hechos, total) durante las
+            migraciones largas; total puede ser None
+
+    Returns:
+        int: Migraciones aplicadas (0 si el esquema ya estaba al día)
+
+    Raises:
+        sqlite3.Error: La migración que falló se deshizo; las anteriores quedan aplicadas
+    """
+    connection = db.connection
+    version = version_actual(connection)
+    if version >= VERSION_ESQUEMA:
+        if version > VERSION_ESQUEMA:
+            logger.warning("La base %s tiene el esquema %d, más nuevo que esta versión de la aplicación (%d)",
+                           db.db_path, version, VERSION_ESQUEMA)
+        return 0
+
+    aplicadas = 0
+    for numero, nombre, funcion in MIGRACIONES:
+        if numero <= version:
+            continue
+        avance = (lambda hechos, total, n=numero, m=nombre: progreso(n, m, hechos, total)) if progreso else None
+        connection.commit()
+        cursor = connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Otro proceso pudo aplicarla mientras se esperaba el bloqueo
+            if version_actual(connection) >= numero:
+                connection.commit()
+                continue
+            with span('esquema.migracion', version=numero, migracion=nombre):
+                funcion(db, cursor, avance)
+                cursor.execute(f"PRAGMA user_version = {int(numero)}")
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            logger.error("Falló la migración de esquema %d (%s): %s", numero, nombre, e)
+            raise
+        aplicadas += 1
+        logger.info("Migración de esquema %d aplicada: %s", numero, nombre)
+    return aplicadas
+
+
+def aplicar_migraciones(db_path):
+    """Abre la base con DatabaseManager (que aplica las migraciones pendientes) y devuelve su versión."""
+    from utils.database_manager import DatabaseManager
+
+    db = DatabaseManager(db_path)
+    try:
+        return version_actual(db.connection)
+    finally:
+        db.close()
+
+
+# ===== AYUDAS PARA MIGRACIONES =====
+
+def agregar_columna(cursor, tabla, columna, definicion):
+    """Agrega la columna si la tabla no la tiene. Devuelve True si la agregó."""
+    cursor.execute(f'PRAGMA table_info("{tabla}")')
+    if columna in [fila[1] for fila in cursor.fetchall()]:
+        return False
+    cursor.execute(f'ALTER TABLE "{tabla}" ADD COLUMN "{columna}" {definicion}')
+    return True
+
+
+def tiene_indice_unico(cursor, tabla, columna):
+    """True si la tabla tiene una restricción o índice UNIQUE exactamente sobre esa columna."""
+    cursor.execute(f'PRAGMA index_list("{tabla}")')
+    for indice in cursor.fetchall():
+        nombre, unico = indice[1], indice[2]
+        if not unico:
+            continue
+        cursor.execute(f'PRAGMA index_info("{nombre}")')
+        if [fila[2] for fila in cursor.fetchall()] == [columna]:
+            return True
+    return False
+
+
+def reconstruir_tabla(cursor, tabla, definicion, columnas=None, condicion=None, progreso=None, lote=5000):
+    """
+    Cambia el esquema de una tabla copiándola a una nueva (procedimiento de
+    12 pasos de la documentación de SQLite). Debe llamarse dentro de la
+    transacción de la migración: si algo falla no queda ningún cambio.
+
+    La copia avanza por lotes de rowid creciente para poder informar el
+    progreso en tablas grandes. Los índices y triggers de la tabla se
+    vuelven a crear con su SQL original y se conserva el contador de
+    AUTOINCREMENT.
+
+    Args:
+        tabla (str): Tabla a reconstruir (con rowid)
+        definicion (str): Columnas y restricciones del nuevo CREATE TABLE
+        columnas (dict): {columna_nueva: expresión sobre la tabla vieja}; por defecto las columnas comunes
+        condicion (str): Filtro opcional de las filas que se copian
+        progreso (callable): progreso(copiadas, total) tras cada lote
+        lote (int): Filas por lote
+
+    Returns:
+        int: Filas copiadas
+    """
+    if not cursor.connection.in_transaction:
+        raise sqlite3.OperationalError("reconstruir_tabla requiere una transacción abierta")
+    nueva = f"{tabla}__nueva"
+    cursor.execute(f'DROP TABLE IF EXISTS "{nueva}"')
+    cursor.execute(f'CREATE TABLE "{nueva}" ({definicion})')
+
+    if columnas is None:
+        cursor.execute(f'PRAGMA table_info("{tabla}")')
+        existentes = {fila[1] for fila in cursor.fetchall()}
+        cursor.execute(f'PRAGMA table_info("{nueva}")')
+        columnas = {fila[1]: f'"{fila[1]}"' for fila in cursor.fetchall() if fila[1] in existentes}
+    destino = ", ".join(f'"{c}"' for c in columnas)
+    origen = ", ".join(columnas.values())
+    filtro = f"AND ({condicion})" if condicion else ""
+
+    cursor.execute("SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') "
+                   "AND sql IS NOT NULL", (tabla,))
+    objetos = [fila[0] for fila in cursor.fetchall()]
+    secuencia = None
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")
+    if cursor.fetchone():
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,))
+        fila = cursor.fetchone()
+        secuencia = fila[0] if fila else None
+
+    cursor.execute(f'SELECT COUNT(*) FROM "{tabla}" WHERE 1 {filtro}')
+    total = cursor.fetchone()[0]
+    copiadas = 0
+    desde = None
+    while True:
+        desde_sql = "rowid > ?" if desde is not None else "1"
+        parametros = (desde,) if desde is not None else ()
+        cursor.execute(f'SELECT rowid FROM "{tabla}" WHERE {desde_sql} ORDER BY rowid LIMIT 1 OFFSET ?',
+                       parametros + (lote - 1,))
+        fila = cursor.fetchone()
+        hasta_sql = "AND rowid <= ?" if fila else ""
+        cursor.execute(f'INSERT INTO "{nueva}" ({destino}) SELECT {origen} FROM "{tabla}" '
+                       f'WHERE {desde_sql} {hasta_sql} {filtro} ORDER BY rowid',
+                       parametros + ((fila[0],) if fila else ()))
+        copiadas += cursor.rowcount
+        if progreso:
+            progreso(copiadas, total)
+        if not fila:
+            break
+        desde = fila[0]
+
+    cursor.execute(f'DROP TABLE "{tabla}"')
+    # Sin reescribir las referencias de vistas y triggers de otras tablas (siguen nombrando la tabla original)
+    cursor.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        cursor.execute(f'ALTER TABLE "{nueva}" RENAME TO "{tabla}"')
+    finally:
+        cursor.execute("PRAGMA legacy_alter_table = OFF")
+    for sql in objetos:
+        cursor.execute(sql)
+    if secuencia is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (secuencia, tabla))
+        if not cursor.rowcount:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (tabla, secuencia))
+    return copiadas
+
+
+if __name__ == "__main__":
+    from utils.instrumentation import configure
+
+    configure()
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    ruta = args[0] if args else 'data/cotizaciones.db'
+    if '--version' in sys.argv:
+        conexion = sqlite3.connect(ruta)
+        logger.info("Esquema %d (última versión: %d)", version_actual(conexion), VERSION_ESQUEMA)
+        conexion.close()
+    else:
+        logger.info("Esquema en la versión %d", aplicar_migraciones(ruta))
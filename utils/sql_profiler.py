@@ -0,0 +1,369 @@
+"""
+Perfilador de SQL para la conexión de DatabaseManager.
+
+DatabaseManager abre la conexión con conectar(), que devuelve una conexión
+sqlite3 cuyos cursores miden cada execute/executemany/executescript y las
+lecturas posteriores (fetch* o iterando el cursor). Como QuotationManager, FilterManager,
+AIUManager y los demás managers usan connection.cursor(), todas sus
+consultas quedan cubiertas sin cambiarlas.
+
+Por cada ejecución se registra el texto, la forma de los parámetros (tipos,
+nunca valores), las filas leídas o afectadas y el tiempo. Las consultas se
+agregan por sentencia normalizada (literales y listas IN colapsadas) y las
+que superan el umbral se escriben, con su EXPLAIN QUERY PLAN, en el
+registro de consultas lentas (JSONL).
+
+Desactivado (por defecto), la conexión entrega cursores sqlite3 normales y
+sus atajos execute* son los de sqlite3, así que las consultas no pasan por
+el perfilador; se puede activar en tiempo de ejecución y desde entonces los
+cursores nuevos se miden.
+
+Configuración: sección 'perfil_sql' de config.json
+({"activo": true, "umbral_ms": 50, "registro": "logs/consultas_lentas.jsonl"})
+o la variable de entorno COTIZER_PERFIL_SQL=1.
+"""
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from utils.instrumentation import get_logger
+
+logger = get_logger('sql')
+
+UMBRAL_MS_POR_DEFECTO = 50.0
+REGISTRO_POR_DEFECTO = os.path.join('logs', 'consultas_lentas.jsonl')
+
+
+class _Estado:
+    activo = False
+    umbral_ms = UMBRAL_MS_POR_DEFECTO
+    registro = REGISTRO_POR_DEFECTO
+    estadisticas = {}
+    lock = threading.Lock()
+
+
+_estado = _Estado()
+
+
+# ===== CONFIGURACIÓN =====
+
+def configure(activo=None, umbral_ms=None, registro=None, config_file=None):
+    """
+    Configura el perfilador desde config.json y el entorno.
+
+    Los argumentos explícitos tienen prioridad sobre la variable de entorno
+    y esta sobre config.json.
+    """
+    if not config_file:
+        config_file = os.path.join(os.getcwd(), 'config.json')
+    opciones = {}
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r') as f:
+                opciones = json.load(f).get('perfil_sql', {})
+    except Exception as e:
+        logger.error("Error al cargar la configuración del perfil SQL: %s", e)
+
+    if activo is None:
+        entorno = os.environ.get('COTIZER_PERFIL_SQL')
+        activo = entorno not in ('', '0', 'false', 'no') if entorno is not None else bool(opciones.get('activo'))
+    set_enabled(activo,
+                umbral_ms if umbral_ms is not None else opciones.get('umbral_ms', UMBRAL_MS_POR_DEFECTO),
+                registro or opciones.get('registro', REGISTRO_POR_DEFECTO))
+
+
+def set_enabled(activo, umbral_ms=None, registro=None):
+    """Activa o desactiva el perfilador en tiempo de ejecución."""
+    _estado.activo = bool(activo)
+    if umbral_ms is not None:
+        _estado.umbral_ms = float(umbral_ms)
+    if registro is not None:
+        _estado.registro = registro or None
+
+
+def is_enabled():
+    return _estado.activo
+
+
+def threshold_ms():
+    return _estado.umbral_ms
+
+
+def slow_log_path():
+    return _estado.registro
+
+
+# ===== ESTADÍSTICAS =====
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS_IN = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_ESPACIOS = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize(sql):
+    """Sentencia con espacios colapsados, literales como ? y listas IN (?, ?, ...) como IN (...)."""
+    texto = _ESPACIOS.sub(' ', sql).strip()
+    texto = _LITERALES.sub('?', texto)
+    return _LISTAS_IN.sub('IN (...)', texto)
+
+
+def forma_parametros(parametros):
+    """Tipos de los parámetros, sin sus valores: '(int, str)' o '{nombre: str}'."""
+    if parametros is None:
+        return ''
+    if isinstance(parametros, dict):
+        return '{' + ', '.join(f"{k}: {type(v).__name__}" for k, v in parametros.items()) + '}'
+    try:
+        return '(' + ', '.join(type(v).__name__ for v in parametros) + ')'
+    except TypeError:
+        return type(parametros).__name__
+
+
+class EstadisticaConsulta:
+    """Acumulado de las ejecuciones de una sentencia normalizada."""
+
+    __slots__ = ('sentencia', 'llamadas', 'total_ms', 'max_ms', 'filas', 'lentas', 'forma')
+
+    def __init__(self, sentencia):
+        self.sentencia = sentencia
+        self.llamadas = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.filas = 0
+        self.lentas = 0
+        self.forma = ''
+
+    @property
+    def promedio_ms(self):
+        return self.total_ms / self.llamadas if self.llamadas else 0.0
+
+    def to_dict(self):
+        return {
+            'sentencia': self.sentencia,
+            'llamadas': self.llamadas,
+            'total_ms': round(self.total_ms, 3),
+            'promedio_ms': round(self.promedio_ms, 3),
+            'max_ms': round(self.max_ms, 3),
+            'filas': self.filas,
+            'lentas': self.lentas,
+            'parametros': self.forma,
+        }
+
+
+def estadisticas(orden='total_ms'):
+    """
+    Consultas agregadas desde el último reset.
+
+    Returns:
+        list: EstadisticaConsulta ordenadas de mayor a menor por el atributo indicado
+    """
+    with _estado.lock:
+        filas = list(_estado.estadisticas.values())
+    return sorted(filas, key=lambda e: getattr(e, orden), reverse=True)
+
+
+def reset():
+    """Borra las estadísticas acumuladas."""
+    with _estado.lock:
+        _estado.estadisticas = {}
+
+
+class _Ejecucion:
+    """Una ejecución en curso: se completa con las lecturas fetch* del mismo cursor."""
+
+    __slots__ = ('estadistica', 'sql', 'parametros', 'forma', 'ms', 'filas', 'registrada')
+
+    def __init__(self, estadistica, sql, parametros, forma):
+        self.estadistica = estadistica
+        self.sql = sql
+        self.parametros = parametros
+        self.forma = forma
+        self.ms = 0.0
+        self.filas = 0
+        self.registrada = False
+
+
+def _registrar(conexion, sql, parametros, forma, ms, filas):
+    sentencia = normalize(sql)
+    with _estado.lock:
+        estadistica = _estado.estadisticas.get(sentencia)
+        if estadistica is None:
+            estadistica = _estado.estadisticas[sentencia] = EstadisticaConsulta(sentencia)
+        estadistica.llamadas += 1
+        estadistica.forma = forma
+    ejecucion = _Ejecucion(estadistica, sql, parametros, forma)
+    _sumar(conexion, ejecucion, ms, filas)
+    return ejecucion
+
+
+def _sumar(conexion, ejecucion, ms, filas):
+    """Suma tiempo y filas a la ejecución y a su estadística; la registra como lenta al pasar el umbral."""
+    ejecucion.ms += ms
+    ejecucion.filas += filas
+    estadistica = ejecucion.estadistica
+    with _estado.lock:
+        estadistica.total_ms += ms
+        estadistica.filas += filas
+        if ejecucion.ms > estadistica.max_ms:
+            estadistica.max_ms = ejecucion.ms
+        lenta = not ejecucion.registrada and ejecucion.ms >= _estado.umbral_ms
+        if lenta:
+            ejecucion.registrada = True
+            estadistica.lentas += 1
+    if lenta:
+        _registrar_lenta(conexion, ejecucion)
+
+
+def explain(conexion, sql, parametros=()):
+    """EXPLAIN QUERY PLAN de una sentencia como lista de líneas, o [] si no aplica."""
+    primera = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    if primera not in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+        return []
+    try:
+        # Cursor base: el plan no se mide ni se agrega a las estadísticas
+        cursor = sqlite3.Cursor(conexion)
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, parametros if parametros is not None else ())
+        return [detalle for _, _, _, detalle in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f"(sin plan: {e})"]
+
+
+def _registrar_lenta(conexion, ejecucion):
+    plan = explain(conexion, ejecucion.sql, ejecucion.parametros)
+    logger.warning("Consulta lenta (%.1f ms, %d filas): %s", ejecucion.ms, ejecucion.filas,
+                   ejecucion.estadistica.sentencia)
+    if not _estado.registro:
+        return
+    linea = json.dumps({
+        'fecha': datetime.now().isoformat(timespec='milliseconds'),
+        'duracion_ms': round(ejecucion.ms, 3),
+        'filas': ejecucion.filas,
+        'sentencia': ejecucion.estadistica.sentencia,
+        'sql': ejecucion.sql.strip(),
+        'parametros': ejecucion.forma,
+        'plan': plan,
+    }, ensure_ascii=False)
+    try:
+        with _estado.lock:
+            directorio = os.path.dirname(os.path.abspath(_estado.registro))
+            os.makedirs(directorio, exist_ok=True)
+            with open(_estado.registro, 'a', encoding='utf-8') as f:
+                f.write(linea + '\n')
+    except OSError as e:
+        logger.warning("No se pudo escribir el registro de consultas lentas %s: %s", _estado.registro, e)
+
+
+# ===== CONEXIÓN Y CURSOR =====
+
+class PerfilCursor(sqlite3.Cursor):
+    """Cursor que mide sus ejecuciones y lecturas (fetch* e iteración) cuando el perfilador está activo."""
+
+    _ejecucion = None
+
+    def execute(self, sql, parametros=()):
+        if not _estado.activo:
+            return super().execute(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            filas = max(self.rowcount, 0)
+            self._ejecucion = _registrar(self.connection, sql, parametros, forma_parametros(parametros), ms, filas)
+
+    def executemany(self, sql, secuencia):
+        if not _estado.activo:
+            return super().executemany(sql, secuencia)
+        secuencia = secuencia if isinstance(secuencia, (list, tuple)) else list(secuencia)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, secuencia)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            primero = secuencia[0] if secuencia else None
+            forma = f"{len(secuencia)} x {forma_parametros(primero)}"
+            self._ejecucion = _registrar(self.connection, sql, primero, forma, ms, max(self.rowcount, 0))
+
+    def executescript(self, script):
+        if not _estado.activo:
+            return super().executescript(script)
+        inicio = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            # Un script no tiene plan único: se registra con parámetros vacíos y sin filas
+            self._ejecucion = _registrar(self.connection, script, None, '', ms, 0)
+
+    def _leer(self, lectura, *args):
+        if not _estado.activo or self._ejecucion is None:
+            return lectura(*args)
+        inicio = time.perf_counter()
+        resultado = lectura(*args)
+        ms = (time.perf_counter() - inicio) * 1000
+        filas = len(resultado) if isinstance(resultado, list) else int(resultado is not None)
+        _sumar(self.connection, self._ejecucion, ms, filas)
+        return resultado
+
+    def fetchone(self):
+        return self._leer(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._leer(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._leer(super().fetchall)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not _estado.activo or self._ejecucion is None:
+            return super().__next__()
+        inicio = time.perf_counter()
+        try:
+            fila = super().__next__()
+        except StopIteration:
+            _sumar(self.connection, self._ejecucion, (time.perf_counter() - inicio) * 1000, 0)
+            raise
+        _sumar(self.connection, self._ejecucion, (time.perf_counter() - inicio) * 1000, 1)
+        return fila
+
+
+class PerfilConnection(sqlite3.Connection):
+    """
+    Conexión sqlite3 cuyos cursores (incluidos los de connection.execute) son
+    PerfilCursor mientras el perfilador está activo, y sqlite3.Cursor si no.
+    """
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = PerfilCursor if _estado.activo else sqlite3.Cursor
+        return super().cursor(factory)
+
+    # Los atajos de sqlite3.Connection crean un cursor base internamente
+    def execute(self, sql, parametros=()):
+        if not _estado.activo:
+            return super().execute(sql, parametros)
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        if not _estado.activo:
+            return super().executemany(sql, secuencia)
+        return self.cursor().executemany(sql, secuencia)
+
+    def executescript(self, script):
+        if not _estado.activo:
+            return super().executescript(script)
+        return self.cursor().executescript(script)
+
+
+def conectar(ruta, **kwargs):
+    """sqlite3.connect con cursores perfilables; sustituye a sqlite3.connect en DatabaseManager."""
+    return sqlite3.connect(ruta, factory=PerfilConnection, **kwargs)
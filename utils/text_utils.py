@@ -0,0 +1,9 @@
+import re
+import unicodedata
+
+
+def normalize_text(texto):
+    """Normaliza un texto para compararlo: sin tildes, minúsculas y espacios simples."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip().lower()
@@ -0,0 +1,88 @@
+import re
+from decimal import Decimal
+
+from utils.xlsx_stitch import rewrite_sheets
+
+
+_PATRON_FORMULA = re.compile(r'(<c r="([A-Z]+[0-9]+)"[^>]*>)(<f>.*?</f>|<f [^>]*/>|<f [^>]*>.*?</f>)'
+                             r'(?:<v\s*/>|<v>[^<]*</v>)?</c>', re.S)
+
+
+def _format_value(value):
+    """Formatea un número para <v>, sin notación científica."""
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    texto = format(Decimal(str(value)), 'f')
+    if '.' in texto:
+        texto = texto.rstrip('0').rstrip('.')
+    return texto or '0'
+
+
+def inject_cached_values(xlsx_path, sheet_name, values):
+    """
+    Escribe el valor calculado de celdas con fórmula en un .xlsx ya guardado.
+
+    openpyxl guarda las fórmulas sin resultado (<v/>), así que quien lea el
+    libro con data_only=True obtiene None hasta que Excel lo recalcule. Esta
+    función completa el <v> de cada celda indicada sin tocar la fórmula, de
+    modo que el archivo se lee con valores al instante y Excel sigue
+    recalculando al abrirlo (fullCalcOnLoad).
+
+    Args:
+        xlsx_path (str): Ruta del libro
+        sheet_name (str): Nombre de la hoja
+        values (dict): {'F12': número, ...}
+
+    Returns:
+        int: Número de celdas actualizadas, o None si hubo error
+    """
+    return inject_workbook_cached_values(xlsx_path, {sheet_name: values})
+
+
+def fill_cached_values(sheet_xml, values):
+    """
+    Completa el <v> de las celdas con fórmula en el XML de una hoja.
+
+    Returns:
+        tuple: (xml, número de celdas actualizadas)
+    """
+    pendientes = {addr.upper(): _format_value(v) for addr, v in values.items()}
+    actualizadas = 0
+
+    def reemplazar(match):
+        nonlocal actualizadas
+        valor = pendientes.get(match.group(2))
+        if valor is None:
+            return match.group(0)
+        actualizadas += 1
+        return f"{match.group(1)}{match.group(3)}<v>{valor}</v></c>"
+
+    sheet_xml = _PATRON_FORMULA.sub(reemplazar, sheet_xml)
+    return sheet_xml, actualizadas
+
+
+def inject_workbook_cached_values(xlsx_path, values_by_sheet):
+    """
+    Igual que inject_cached_values para varias hojas, reescribiendo el libro una sola vez.
+
+    Args:
+        xlsx_path (str): Ruta del libro
+        values_by_sheet (dict): {nombre_hoja: {'F12': número, ...}}
+
+    Returns:
+        int: Número de celdas actualizadas, o None si hubo error
+    """
+    values_by_sheet = {name: values for name, values in values_by_sheet.items() if values}
+    actualizadas = 0
+
+    def transform(values):
+        def _transform(sheet_xml):
+            nonlocal actualizadas
+            sheet_xml, n = fill_cached_values(sheet_xml, values)
+            actualizadas += n
+            return sheet_xml
+        return _transform
+
+    if not rewrite_sheets(xlsx_path, {name: transform(values) for name, values in values_by_sheet.items()}):
+        return None
+    return actualizadas
@@ -0,0 +1,150 @@
+import io
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+def sheet_part(zf, sheet_name):
+    """Devuelve la ruta interna (xl/worksheets/sheetN.xml) de una hoja por su nombre."""
+    workbook_xml = zf.read('xl/workbook.xml').decode('utf-8')
+    rels_xml = zf.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+
+    rel_id = None
+    for match in re.finditer(r'<(?:\w+:)?sheet\b[^>]*>', workbook_xml):
+        tag = match.group(0)
+        name = re.search(r'\bname="([^"]*)"', tag)
+        if name and name.group(1) == escape(sheet_name, {'"': '&quot;'}):
+            rel = re.search(r'\br:id="([^"]*)"', tag) or re.search(r'\bid="([^"]*)"', tag)
+            rel_id = rel.group(1) if rel else None
+            break
+    if rel_id is None:
+        return None
+
+    for match in re.finditer(r'<Relationship\b[^>]*>', rels_xml):
+        tag = match.group(0)
+        if re.search(rf'\bId="{re.escape(rel_id)}"', tag):
+            target = re.search(r'\bTarget="([^"]*)"', tag).group(1)
+            if target.startswith('/'):
+                return target.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', target))
+    return None
+
+
+def rewrite_sheets(xlsx_path, transforms):
+    """
+    Reescribe el XML de varias hojas de un .xlsx ya guardado, en una sola pasada.
+
+    Args:
+        xlsx_path (str): Ruta del libro
+        transforms (dict): {nombre_hoja: función(xml) -> xml}
+
+    Returns:
+        bool: True si se reescribió el libro
+    """
+    if not transforms:
+        return True
+    try:
+        with zipfile.ZipFile(xlsx_path, 'r') as zf:
+            parts = {}
+            for sheet_name, transform in transforms.items():
+                part = sheet_part(zf, sheet_name)
+                if part is None:
+                    print(f"Error al reescribir el libro: no existe la hoja '{sheet_name}'")
+                    return False
+                parts[part] = transform
+            entries = [(info, zf.read(info.filename)) for info in zf.infolist()]
+
+        fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', dir=os.path.dirname(os.path.abspath(xlsx_path)))
+        os.close(fd)
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as out:
+            for info, data in entries:
+                transform = parts.get(info.filename)
+                if transform is not None:
+                    data = transform(data.decode('utf-8')).encode('utf-8')
+                out.writestr(info, data)
+        shutil.move(tmp_path, xlsx_path)
+        return True
+    except (OSError, zipfile.BadZipFile, KeyError) as e:
+        print(f"Error al reescribir el libro: {e}")
+        return False
+
+
+def _firma_xf(xf):
+    """Atributos de formato de un <xf> de styles.xml, sin la referencia a su estilo con nombre."""
+    atributos = tuple(sorted((k, v) for k, v in xf.attrib.items()
+                             if k not in ('xfId', 'pivotButton', 'quotePrefix') and not k.startswith('apply')))
+    return atributos, tuple(ElementTree.tostring(hijo) for hijo in xf)
+
+
+def _estilos_con_nombre(zf):
+    """
+    Recorre los estilos de celda (cellXfs) de un libro guardado que usan un NamedStyle.
+
+    Yields:
+        tuple: (índice de estilo, nombre del NamedStyle, True si el estilo es el
+                NamedStyle sin cambios)
+    """
+    estilos = ElementTree.fromstring(zf.read('xl/styles.xml'))
+    nombres = {int(cs.get('xfId')): cs.get('name') for cs in estilos.iter(f'{_NS}cellStyle')}
+    base = [_firma_xf(xf) for xf in estilos.find(f'{_NS}cellStyleXfs')]
+    for indice, xf in enumerate(estilos.find(f'{_NS}cellXfs')):
+        xf_id = int(xf.get('xfId', 0))
+        if indice and xf_id and xf_id in nombres:
+            yield indice, nombres[xf_id], _firma_xf(xf) == base[xf_id]
+
+
+def worksheet_xml(workbook, sheet_name):
+    """
+    Serializa un libro de openpyxl en memoria y devuelve el XML de una hoja.
+
+    Returns:
+        tuple: (xml, {índice de estilo en el XML: nombre del NamedStyle}).
+               Las celdas con el estilo por defecto no aparecen en el diccionario.
+    """
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    with zipfile.ZipFile(buffer, 'r') as zf:
+        xml = zf.read(sheet_part(zf, sheet_name)).decode('utf-8')
+        estilos = {indice: nombre for indice, nombre, _ in _estilos_con_nombre(zf)}
+    return xml, estilos
+
+
+def use_named_styles(sheet, style_names):
+    """
+    Asigna cada NamedStyle a una celda de una hoja que se reemplazará al guardar.
+
+    Así el libro guarda un estilo de celda para cada uno aunque ninguna otra
+    celda lo use; named_style_indices() da luego su índice en el archivo.
+    """
+    for fila, nombre in enumerate(style_names, start=1):
+        sheet.cell(row=fila, column=1).style = nombre
+
+
+def named_style_indices(xlsx_path):
+    """
+    Índice de estilo de celda (cellXfs) de cada NamedStyle en un .xlsx ya guardado.
+
+    Returns:
+        dict: {nombre del NamedStyle: índice}; solo los estilos aplicados sin cambios
+    """
+    indices = {}
+    with zipfile.ZipFile(xlsx_path, 'r') as zf:
+        for indice, nombre, sin_cambios in _estilos_con_nombre(zf):
+            if sin_cambios:
+                indices.setdefault(nombre, indice)
+    return indices
+
+
+def remap_styles(xml, mapping):
+    """Cambia los índices de estilo (s="N") de las celdas de una hoja según `mapping`."""
+    def reemplazar(match):
+        return f'{match.group(1)} s="{mapping.get(int(match.group(2)), 0)}"'
+    return re.sub(r'(<c r="[A-Z]+[0-9]+") s="([0-9]+)"', reemplazar, xml)
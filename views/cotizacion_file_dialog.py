@@ -171,14 +171,19 @@ class CotizacionFileDialog(QDialog):
             self,
             "Importar Cotización",
             "",
-            "Archivos JSON (*.json);;Archivos de Cotización (*.cotiz)"
+            "Cotizaciones (*.json *.cotiz *.xlsx);;Archivos JSON (*.json);;Archivos de Cotización (*.cotiz);;"
+            "Libros de Excel (*.xlsx)"
         )
 
         if not filepath:
             return
 
         try:
-            cotizacion = self.file_manager.cargar_cotizacion(filepath)
+            if filepath.lower().endswith('.xlsx'):
+                # Excel generado por la aplicación (p. ej. devuelto por el cliente con cantidades editadas)
+                cotizacion = self.controller.import_excel_quotation(filepath)
+            else:
+                cotizacion = self.file_manager.cargar_cotizacion(filepath)
 
             if 'cliente' not in cotizacion or not isinstance(cotizacion['cliente'], dict):
                 QMessageBox.critical(self, "Error", "Información de cliente inválida.")
@@ -2,10 +2,14 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QT
                              QPushButton, QLabel, QComboBox, QCheckBox, QDateEdit, QLineEdit,
                              QGroupBox, QHeaderView, QWidget, QMessageBox, QMenu, QAction, QTextEdit,
                              QGridLayout)
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtCore import Qt, QDate, pyqtSlot
 from PyQt5.QtGui import QColor, QFont, QIcon
 from datetime import datetime
 import os
+from utils.quotation_diff import QuotationDiffEngine
+from views.quotation_diff_dialog import QuotationDiffDialog
+from utils.change_event_bridge import get_event_bridge, apply_combo_change
+from utils.change_events import BAJA, MODIFICACION, RECARGA
 
 
 class DashboardWindow(QDialog):
@@ -23,6 +27,18 @@ class DashboardWindow(QDialog):
         
         self.setup_ui()
         self.load_quotations()
+        
+        # Keep the table in sync with database changes, row by row (see utils/change_events.py)
+        self.event_bridge = get_event_bridge(database_manager)
+        self.event_bridge.changed.connect(self.on_data_changed)
+    
+    def done(self, result):
+        """Stops listening for changes when the dialog closes"""
+        try:
+            self.event_bridge.changed.disconnect(self.on_data_changed)
+        except TypeError:
+            pass  # Already disconnected
+        super().done(result)
     
     def setup_ui(self):
         """Setup the UI components"""
@@ -74,6 +90,12 @@ class DashboardWindow(QDialog):
         self.filter_solo_reales_check.stateChanged.connect(self.apply_filters)
         layout.addWidget(self.filter_solo_reales_check)
         
+        self.filter_archivadas_check = QCheckBox("Incluir Archivadas")
+        self.filter_archivadas_check.setToolTip("Buscar también en los años archivados (más lento)")
+        self.filter_archivadas_check.setChecked(False)
+        self.filter_archivadas_check.stateChanged.connect(self.apply_filters)
+        layout.addWidget(self.filter_archivadas_check)
+        
         layout.addWidget(QLabel(""))  # Spacer
         
         # State filters
@@ -193,7 +215,14 @@ class DashboardWindow(QDialog):
         new_btn.clicked.connect(self.new_quotation)
         layout.addWidget(new_btn)
         
-        # Search box
+        # Search box: by project name or by quoted activity (inverted index)
+        self.search_mode_combo = QComboBox()
+        self.search_mode_combo.addItem("Proyecto", 'proyecto')
+        self.search_mode_combo.addItem("Actividad", 'actividad')
+        self.search_mode_combo.setToolTip("Buscar por nombre de proyecto o por actividad cotizada")
+        self.search_mode_combo.currentIndexChanged.connect(self.on_search_mode_changed)
+        layout.addWidget(self.search_mode_combo)
+        
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Buscar proyecto...")
         self.search_input.textChanged.connect(self.apply_filters)
@@ -241,6 +270,19 @@ class DashboardWindow(QDialog):
         
         return layout
     
+    def reload_clients_filter(self):
+        """Reloads the client filter keeping the current selection"""
+        current = self.filter_cliente_combo.currentData()
+        self.filter_cliente_combo.blockSignals(True)
+        self.filter_cliente_combo.clear()
+        self.filter_cliente_combo.addItem("Todos", None)
+        self.load_clients_to_filter()
+        index = self.filter_cliente_combo.findData(current)
+        self.filter_cliente_combo.setCurrentIndex(max(index, 0))
+        self.filter_cliente_combo.blockSignals(False)
+        if index < 0 and current is not None:
+            self.apply_filters()
+    
     def load_clients_to_filter(self):
         """Loads clients into the filter combo"""
         try:
@@ -256,10 +298,20 @@ class DashboardWindow(QDialog):
             filters = self.get_current_filters()
             include_test = self.filter_pruebas_check.isChecked()
             
+            activity_ids = None
+            if self.is_activity_search():
+                # Activity search covers the whole history, not just the date range
+                activity_ids = self.db.search_quotations_by_activity(self.search_input.text())
+                filters.pop('fecha_inicio', None)
+                filters.pop('fecha_fin', None)
+            
             self.current_quotations = self.db.get_all_quotations(
                 include_test=include_test,
-                filters=filters
+                filters=filters,
+                include_archived=self.filter_archivadas_check.isChecked()
             )
+            if activity_ids is not None:
+                self.current_quotations = [q for q in self.current_quotations if q['id'] in activity_ids]
             
             self.populate_table()
             self.update_statistics()
@@ -297,71 +349,166 @@ class DashboardWindow(QDialog):
         
         return filters
     
+    def is_activity_search(self):
+        """True when the search box is in activity mode and has text"""
+        return (self.search_mode_combo.currentData() == 'actividad'
+                and bool(self.search_input.text().strip()))
+    
+    def on_search_mode_changed(self):
+        """Switches the search box between project name and quoted activity"""
+        activity_mode = self.search_mode_combo.currentData() == 'actividad'
+        self.search_input.setPlaceholderText(
+            "Buscar actividad cotizada (todas las fechas)..." if activity_mode else "Buscar proyecto...")
+        self.filter_fecha_inicio.setEnabled(not activity_mode)
+        self.filter_fecha_fin.setEnabled(not activity_mode)
+        if self.search_input.text():
+            self.apply_filters()
+    
     def populate_table(self):
         """Populates the table with quotations"""
         self.quotations_table.setRowCount(0)
         
-        # Filter by search text
-        search_text = self.search_input.text().lower()
-        
         for quotation in self.current_quotations:
-            # Apply search filter
-            if search_text and search_text not in quotation['nombre_proyecto'].lower():
+            if not self.is_row_visible(quotation):
                 continue
-            
-            # Check estado filter
-            estado_checks = {
-                'pendiente': self.filter_pendiente_check,
-                'ganada': self.filter_ganada_check,
-                'perdida': self.filter_perdida_check,
-                'cancelada': self.filter_cancelada_check
-            }
-            
-            if quotation['estado'] in estado_checks:
-                if not estado_checks[quotation['estado']].isChecked():
-                    continue
-            
             row = self.quotations_table.rowCount()
             self.quotations_table.insertRow(row)
-            
-            # ID
-            id_item = QTableWidgetItem(f"COT-{quotation['id']:03d}")
-            id_item.setData(Qt.UserRole, quotation)
-            self.quotations_table.setItem(row, 0, id_item)
-            
-            # Cliente
-            self.quotations_table.setItem(row, 1, QTableWidgetItem(quotation['cliente_nombre'] or "N/A"))
-            
-            # Proyecto
-            proyecto_item = QTableWidgetItem(quotation['nombre_proyecto'])
-            if quotation['es_prueba']:
-                proyecto_item.setBackground(QColor("#E3F2FD"))  # Light blue for tests
-            self.quotations_table.setItem(row, 2, proyecto_item)
-            
-            # Fecha
-            try:
-                fecha = datetime.fromisoformat(quotation['fecha_creacion']).strftime("%d/%m/%Y")
-            except:
-                fecha = quotation['fecha_creacion']
-            self.quotations_table.setItem(row, 3, QTableWidgetItem(fecha))
-            
-            # Monto
-            monto_item = QTableWidgetItem(f"${quotation['monto_total']:,.0f}")
-            monto_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.quotations_table.setItem(row, 4, monto_item)
-            
-            # Estado
-            estado_item = self.create_estado_item(quotation['estado'])
-            self.quotations_table.setItem(row, 5, estado_item)
-            
-            # Tipo
-            tipo_text = "🧪 Prueba" if quotation['es_prueba'] else "📄 Real"
-            self.quotations_table.setItem(row, 6, QTableWidgetItem(tipo_text))
-            
-            # Ver button (would be better as QPushButton in cell widget)
-            ver_item = QTableWidgetItem("👁")
-            ver_item.setTextAlignment(Qt.AlignCenter)
-            self.quotations_table.setItem(row, 7, ver_item)
+            self.fill_row(row, quotation)
+    
+    def is_row_visible(self, quotation):
+        """Filters applied on the loaded quotations: project search text and estado checks"""
+        # Filter by search text (activity search is already applied in load_quotations)
+        search_text = "" if self.search_mode_combo.currentData() == 'actividad' else self.search_input.text().lower()
+        if search_text and search_text not in quotation['nombre_proyecto'].lower():
+            return False
+        
+        # Check estado filter
+        estado_checks = {
+            'pendiente': self.filter_pendiente_check,
+            'ganada': self.filter_ganada_check,
+            'perdida': self.filter_perdida_check,
+            'cancelada': self.filter_cancelada_check
+        }
+        
+        if quotation['estado'] in estado_checks:
+            if not estado_checks[quotation['estado']].isChecked():
+                return False
+        return True
+    
+    def fill_row(self, row, quotation):
+        """Writes one quotation into a table row"""
+        # ID
+        id_item = QTableWidgetItem(f"COT-{quotation['id']:03d}")
+        id_item.setData(Qt.UserRole, quotation)
+        self.quotations_table.setItem(row, 0, id_item)
+        
+        # Cliente
+        self.quotations_table.setItem(row, 1, QTableWidgetItem(quotation['cliente_nombre'] or "N/A"))
+        
+        # Proyecto
+        proyecto_item = QTableWidgetItem(quotation['nombre_proyecto'])
+        if quotation['es_prueba']:
+            proyecto_item.setBackground(QColor("#E3F2FD"))  # Light blue for tests
+        self.quotations_table.setItem(row, 2, proyecto_item)
+        
+        # Fecha
+        try:
+            fecha = datetime.fromisoformat(quotation['fecha_creacion']).strftime("%d/%m/%Y")
+        except:
+            fecha = quotation['fecha_creacion']
+        self.quotations_table.setItem(row, 3, QTableWidgetItem(fecha))
+        
+        # Monto
+        monto_item = QTableWidgetItem(f"${quotation['monto_total']:,.0f}")
+        monto_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.quotations_table.setItem(row, 4, monto_item)
+        
+        # Estado
+        estado_item = self.create_estado_item(quotation['estado'])
+        self.quotations_table.setItem(row, 5, estado_item)
+        
+        # Tipo
+        tipo_text = "🧪 Prueba" if quotation['es_prueba'] else "📄 Real"
+        if quotation.get('archivo'):
+            tipo_text = f"🗄 Archivada {quotation['archivo']}"
+            proyecto_item.setForeground(QColor("#757575"))
+            proyecto_item.setToolTip("Cotización archivada: se restaura al abrirla")
+        self.quotations_table.setItem(row, 6, QTableWidgetItem(tipo_text))
+        
+        # Ver button (would be better as QPushButton in cell widget)
+        ver_item = QTableWidgetItem("👁")
+        ver_item.setTextAlignment(Qt.AlignCenter)
+        self.quotations_table.setItem(row, 7, ver_item)
+    
+    def find_row(self, quotation_id):
+        """Table row showing a quotation, or -1"""
+        for row in range(self.quotations_table.rowCount()):
+            if self.quotations_table.item(row, 0).data(Qt.UserRole)['id'] == quotation_id:
+                return row
+        return -1
+    
+    @pyqtSlot(str, object, str, bool)
+    def on_data_changed(self, entidad, item_id, operacion, externo):
+        """Applies one database change to the table instead of reloading it"""
+        try:
+            if entidad == 'cotizacion':
+                self.apply_quotation_change(item_id, operacion)
+            elif entidad == 'snapshot' and self.is_activity_search():
+                # A new version may add or drop the searched activity
+                self.load_quotations()
+            elif entidad == 'cliente':
+                client = self.db.get_client_by_id(item_id) if item_id is not None else None
+                apply_combo_change(self.filter_cliente_combo, item_id, operacion, client and client['nombre'],
+                                   self.reload_clients_filter)
+                if operacion == RECARGA or item_id is None:
+                    self.load_quotations()
+                else:
+                    # Client name column of that client's quotations
+                    for quotation_id in [q['id'] for q in self.current_quotations if q['cliente_id'] == item_id]:
+                        self.apply_quotation_change(quotation_id, MODIFICACION)
+        except Exception as e:
+            print(f"Error applying {entidad} change: {e}")
+    
+    def apply_quotation_change(self, quotation_id, operacion):
+        """Adds, updates or removes the row of one quotation, re-checking the current filters"""
+        if operacion == RECARGA or quotation_id is None or self.is_activity_search():
+            self.load_quotations()
+            return
+        
+        quotation = None
+        if operacion != BAJA:
+            filters = self.get_current_filters()
+            filters['ids'] = [quotation_id]
+            found = self.db.get_all_quotations(
+                include_test=self.filter_pruebas_check.isChecked(),
+                filters=filters,
+                include_archived=self.filter_archivadas_check.isChecked()
+            )
+            quotation = found[0] if found else None
+        
+        position = next((i for i, q in enumerate(self.current_quotations) if q['id'] == quotation_id), None)
+        if quotation is None:
+            if position is not None:
+                del self.current_quotations[position]
+        elif position is not None:
+            self.current_quotations[position] = quotation
+        else:
+            # Newest first, as in get_all_quotations
+            position = next((i for i, q in enumerate(self.current_quotations)
+                             if q['fecha_creacion'] < quotation['fecha_creacion']), len(self.current_quotations))
+            self.current_quotations.insert(position, quotation)
+        
+        row = self.find_row(quotation_id)
+        if quotation is None or not self.is_row_visible(quotation):
+            if row >= 0:
+                self.quotations_table.removeRow(row)
+        elif row >= 0:
+            self.fill_row(row, quotation)
+        else:
+            row = sum(1 for q in self.current_quotations[:position] if self.is_row_visible(q))
+            self.quotations_table.insertRow(row)
+            self.fill_row(row, quotation)
+        self.update_statistics()
     
     def create_estado_item(self, estado):
         """Creates a colored estado item"""
@@ -432,6 +579,7 @@ class DashboardWindow(QDialog):
         """Clears all filters to defaults"""
         self.filter_pruebas_check.setChecked(False)
         self.filter_solo_reales_check.setChecked(True)
+        self.filter_archivadas_check.setChecked(False)
         self.filter_pendiente_check.setChecked(True)
         self.filter_ganada_check.setChecked(True)
         self.filter_perdida_check.setChecked(True)
@@ -439,6 +587,7 @@ class DashboardWindow(QDialog):
         self.filter_fecha_inicio.setDate(QDate.currentDate().addMonths(-1))
         self.filter_fecha_fin.setDate(QDate.currentDate())
         self.filter_cliente_combo.setCurrentIndex(0)
+        self.search_mode_combo.setCurrentIndex(0)
         self.search_input.clear()
     
     def show_context_menu(self, position):
@@ -452,6 +601,14 @@ class DashboardWindow(QDialog):
         
         menu = QMenu()
         
+        if quotation.get('archivo'):
+            # Archived quotations only live in the yearly archive: restore them first
+            restore_action = QAction("♻ Restaurar del Archivo", self)
+            restore_action.triggered.connect(lambda: self.restore_archived_quotation(quotation))
+            menu.addAction(restore_action)
+            menu.exec_(self.quotations_table.mapToGlobal(position))
+            return
+        
         open_action = QAction("📂 Abrir Cotización", self)
         open_action.triggered.connect(lambda: self.open_quotation_by_id(quotation['id']))
         menu.addAction(open_action)
@@ -459,7 +616,23 @@ class DashboardWindow(QDialog):
         duplicate_action = QAction("📋 Duplicar", self)
         duplicate_action.triggered.connect(lambda: self.duplicate_quotation(quotation['id']))
         menu.addAction(duplicate_action)
-        
+
+        # Version comparison
+        snapshots = self.db.get_snapshots(quotation['id'])
+        if len(snapshots) >= 2:
+            previous_action = QAction("🔍 Comparar con versión anterior", self)
+            previous_action.triggered.connect(lambda: self.compare_quotations(
+                f"snapshot:{snapshots[-2]['id']}", f"snapshot:{snapshots[-1]['id']}"))
+            menu.addAction(previous_action)
+
+        selected = self.get_selected_quotations()
+        if len(selected) == 2:
+            older, newer = sorted(selected, key=lambda q: (q['fecha_creacion'] or '', q['id']))
+            compare_action = QAction("🔍 Comparar cotizaciones seleccionadas", self)
+            compare_action.triggered.connect(lambda: self.compare_quotations(
+                f"cotizacion:{older['id']}", f"cotizacion:{newer['id']}"))
+            menu.addAction(compare_action)
+
         menu.addSeparator()
         
         # State changes
@@ -505,8 +678,25 @@ class DashboardWindow(QDialog):
         if row >= 0:
             item = self.quotations_table.item(row, 0)
             quotation = item.data(Qt.UserRole)
+            if quotation.get('archivo'):
+                if not self.restore_archived_quotation(quotation):
+                    return
             self.open_quotation_by_id(quotation['id'])
     
+    def restore_archived_quotation(self, quotation):
+        """Moves an archived quotation back to the live database, after confirmation"""
+        reply = QMessageBox.question(
+            self, "Cotización Archivada",
+            f"COT-{quotation['id']:03d} está en el archivo de {quotation['archivo']}.\n"
+            "¿Restaurarla a la base de datos principal?",
+            QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return False
+        if not self.db.restore_quotations([quotation['id']]):
+            QMessageBox.critical(self, "Error", "No se pudo restaurar la cotización del archivo.")
+            return False
+        return True
+    
     def open_quotation_by_id(self, quotation_id):
         """Loads a quotation into the main window"""
         if self.parent_window:
@@ -534,11 +724,26 @@ class DashboardWindow(QDialog):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al duplicar: {e}")
     
+    def get_selected_quotations(self):
+        """Returns the quotation dicts of the selected table rows"""
+        rows = sorted({index.row() for index in self.quotations_table.selectionModel().selectedRows()})
+        return [self.quotations_table.item(row, 0).data(Qt.UserRole) for row in rows]
+
+    def compare_quotations(self, before, after):
+        """Shows the changeset between two quotation versions (see QuotationDiffEngine)"""
+        try:
+            changeset = QuotationDiffEngine(self.db).comparar(before, after)
+            QuotationDiffDialog(changeset, self).exec_()
+        except ValueError as e:
+            QMessageBox.warning(self, "Comparación", str(e))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al comparar cotizaciones: {e}")
+            print(f"Error comparing quotations: {e}")
+
     def change_state(self, quotation_id, new_state):
         """Changes the state of a quotation"""
         try:
             self.db.update_quotation_state(quotation_id, new_state)
-            self.load_quotations()  # Reload
             QMessageBox.information(self, "Éxito", f"Estado actualizado a: {new_state}")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al cambiar estado: {e}")
@@ -554,7 +759,6 @@ class DashboardWindow(QDialog):
         if reply == QMessageBox.Yes:
             try:
                 self.db.delete_quotation(quotation_id)
-                self.load_quotations()
                 QMessageBox.information(self, "Éxito", "Cotización eliminada.")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error al eliminar: {e}")
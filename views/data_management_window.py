@@ -5,6 +5,8 @@ from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QHBoxLayout, QTabWidget,
                              QCheckBox, QRadioButton, QButtonGroup, QAbstractItemView)
 from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot
 from utils.filter_manager import FilterManager
+from views.repricing_dialog import RepricingDialog
+from utils.change_event_bridge import get_event_bridge, apply_combo_change, apply_list_change
 
 class DataManagementWindow(QMainWindow):
     # Señal para notificar cuando se cierra la ventana
@@ -36,6 +38,10 @@ class DataManagementWindow(QMainWindow):
         
         # Inicializar todos los combos y listas
         self.refresh_all_data()
+
+        # Después, cada cambio en la base (de esta ventana, de otra o de otro proceso) se aplica solo
+        self.event_bridge = get_event_bridge(controller.database_manager)
+        self.event_bridge.changed.connect(self.on_data_changed)
         
     def refresh_all_data(self):
         """Refresca todos los datos en la interfaz"""
@@ -63,10 +69,104 @@ class DataManagementWindow(QMainWindow):
             print(f"Error al refrescar datos: {str(e)}")
         
     def closeEvent(self, event):
+        try:
+            self.event_bridge.changed.disconnect(self.on_data_changed)
+        except TypeError:
+            pass  # Ya desconectada
         # Emitir señal cuando se cierra la ventana
         self.closed.emit()
         super().closeEvent(event)
 
+    # --- CAMBIOS EN LA BASE DE DATOS ---
+
+    @staticmethod
+    def _client_text(client):
+        return f"{client['nombre']} ({client['tipo']})"
+
+    @staticmethod
+    def _activity_text(activity):
+        return f"{activity['descripcion']}\n   📏 {activity['unidad']} | 💰 ${activity['valor_unitario']:,.2f}"
+
+    @staticmethod
+    def _activity_combo_text(activity):
+        description = activity['descripcion']
+        if len(description) > 60:
+            description = description[:37] + "..."
+        return f"{description} ({activity['unidad']} - ${activity['valor_unitario']:,.2f})"
+
+    @staticmethod
+    def _product_text(product):
+        return f"{product['nombre']} ({product['unidad']} - ${product['precio_unitario']})"
+
+    @pyqtSlot(str, object, str, bool)
+    def on_data_changed(self, entidad, item_id, operacion, externo):
+        """Actualiza solo las listas y combos afectados por un cambio (ver utils/change_events.py)."""
+        try:
+            if entidad == 'cliente':
+                self.apply_client_change(item_id, operacion)
+            elif entidad == 'actividad':
+                self.apply_activity_change(item_id, operacion)
+            elif entidad == 'producto':
+                self.apply_product_change(item_id, operacion)
+            elif entidad == 'categoria':
+                self.apply_category_change(item_id, operacion)
+            elif entidad == 'actividad_relacionada':
+                activity_id = self.main_activity_combo.currentData()
+                if activity_id is not None:
+                    self.refresh_related_activities_list(activity_id)
+            elif entidad == 'actividad_producto':
+                activity_id = self.activity_for_product_combo.currentData()
+                if activity_id is not None:
+                    self.refresh_related_products_list(activity_id)
+            elif entidad == 'capitulo' and externo:
+                # Los cambios hechos en la pestaña de capítulos ya refrescan la tabla
+                self.refresh_chapters_table()
+            elif entidad == 'aiu':
+                self.load_aiu_values()
+        except Exception as e:
+            print(f"Error al aplicar cambio de {entidad}: {str(e)}")
+
+    def apply_client_change(self, client_id, operacion):
+        client = self.controller.database_manager.get_client_by_id(client_id) if client_id is not None else None
+        apply_list_change(self.client_list, client_id, operacion, client and self._client_text(client),
+                          self.refresh_client_list)
+
+    def apply_activity_change(self, activity_id, operacion):
+        activity = None
+        if activity_id is not None:
+            activity = self.controller.database_manager.get_activity_by_id(activity_id)
+        if self.activity_search_input.text() or self.activity_category_combo.currentData() is not None:
+            # Con filtro activo la lista se vuelve a filtrar (el cambio puede entrar o salir del filtro)
+            self.filter_activities()
+        else:
+            apply_list_change(self.activity_list, activity_id, operacion, activity and self._activity_text(activity),
+                              self.refresh_activity_list)
+        for combo in (self.main_activity_combo, self.related_activity_combo, self.activity_for_product_combo):
+            apply_combo_change(combo, activity_id, operacion, activity and self._activity_combo_text(activity),
+                               lambda c=combo: self.refresh_activity_combo(c))
+
+    def apply_product_change(self, product_id, operacion):
+        product = None
+        if product_id is not None:
+            product = self.controller.database_manager.get_product_by_id(product_id)
+        if self.product_search_input.text() or self.product_category_combo.currentData() is not None:
+            self.filter_products()
+        else:
+            apply_list_change(self.product_list, product_id, operacion, product and self._product_text(product),
+                              self.refresh_product_list)
+        apply_combo_change(self.product_combo, product_id, operacion, product and self._product_text(product),
+                           lambda: self.refresh_product_combo(self.product_combo))
+
+    def apply_category_change(self, category_id, operacion):
+        category = None
+        if category_id is not None:
+            category = self.controller.database_manager.get_category_by_id(category_id)
+        nombre = category['nombre'] if category else None
+        apply_list_change(self.category_list, category_id, operacion, nombre, self.refresh_category_list)
+        for combo in (self.activity_category_combo, self.activity_category_select,
+                      self.product_category_combo, self.product_category_select):
+            apply_combo_change(combo, category_id, operacion, nombre, lambda c=combo: self.refresh_category_combo(c))
+
     def setup_client_tab(self):
         tab = QWidget()
         layout = QVBoxLayout(tab)
@@ -171,6 +271,10 @@ class DataManagementWindow(QMainWindow):
         
         layout.addLayout(buttons_layout)
 
+        repricing_activity_btn = QPushButton("Reajuste Masivo de Precios...")
+        repricing_activity_btn.clicked.connect(lambda: self.open_repricing_dialog('actividad'))
+        layout.addWidget(repricing_activity_btn)
+
         # Lista de actividades existentes
         self.activity_list = QListWidget()
         self.activity_list.setWordWrap(True)
@@ -246,6 +350,10 @@ class DataManagementWindow(QMainWindow):
         buttons_layout.addWidget(clear_product_btn)
         
         layout.addLayout(buttons_layout)
+
+        repricing_product_btn = QPushButton("Reajuste Masivo de Precios...")
+        repricing_product_btn.clicked.connect(lambda: self.open_repricing_dialog('producto'))
+        layout.addWidget(repricing_product_btn)
         
         # Lista de productos existentes
         self.product_list = QListWidget()
@@ -411,7 +519,6 @@ class DataManagementWindow(QMainWindow):
         try:
             self.controller.add_client(client_data)
             QMessageBox.information(self, "Éxito", "Cliente agregado correctamente.")
-            self.refresh_client_list()
             self.clear_client_form()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al agregar cliente: {str(e)}")
@@ -430,7 +537,6 @@ class DataManagementWindow(QMainWindow):
             try:
                 self.controller.database_manager.delete_client(client_id)
                 QMessageBox.information(self, "Éxito", "Cliente eliminado correctamente.")
-                self.refresh_client_list()
                 self.clear_client_form()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error al eliminar cliente: {str(e)}")
@@ -459,7 +565,7 @@ class DataManagementWindow(QMainWindow):
             self.client_list.clear()
             clients = self.controller.get_all_clients()
             for client in clients:
-                item = QListWidgetItem(f"{client['nombre']} ({client['tipo']})")
+                item = QListWidgetItem(self._client_text(client))
                 item.setData(Qt.UserRole, client['id'])
                 self.client_list.addItem(item)
         except Exception as e:
@@ -485,13 +591,7 @@ class DataManagementWindow(QMainWindow):
         try:
             self.controller.add_activity(activity_data)
             QMessageBox.information(self, "Éxito", "Actividad agregada correctamente.")
-            self.refresh_activity_list()
             self.clear_activity_form()
-            
-            # Actualizar combos de actividades en la pestaña de relaciones
-            self.refresh_activity_combo(self.main_activity_combo)
-            self.refresh_activity_combo(self.related_activity_combo)
-            self.refresh_activity_combo(self.activity_for_product_combo)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al agregar actividad: {str(e)}")
     
@@ -521,12 +621,6 @@ class DataManagementWindow(QMainWindow):
         try:
             self.controller.update_activity(activity_id, activity_data)
             QMessageBox.information(self, "Éxito", "Actividad actualizada correctamente.")
-            self.refresh_activity_list()
-            
-            # Actualizar combos de actividades en la pestaña de relaciones
-            self.refresh_activity_combo(self.main_activity_combo)
-            self.refresh_activity_combo(self.related_activity_combo)
-            self.refresh_activity_combo(self.activity_for_product_combo)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al actualizar actividad: {str(e)}")
     
@@ -544,13 +638,7 @@ class DataManagementWindow(QMainWindow):
             try:
                 self.controller.delete_activity(activity_id)
                 QMessageBox.information(self, "Éxito", "Actividad eliminada correctamente.")
-                self.refresh_activity_list()
                 self.clear_activity_form()
-                
-                # Actualizar combos de actividades en la pestaña de relaciones
-                self.refresh_activity_combo(self.main_activity_combo)
-                self.refresh_activity_combo(self.related_activity_combo)
-                self.refresh_activity_combo(self.activity_for_product_combo)
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error al eliminar actividad: {str(e)}")
     
@@ -579,14 +667,17 @@ class DataManagementWindow(QMainWindow):
             activities = self.controller.get_all_activities()
             for activity in activities:
                 # Formato en múltiples líneas
-                text = f"{activity['descripcion']}\n   📏 {activity['unidad']} | 💰 ${activity['valor_unitario']:,.2f}"
-
-                item = QListWidgetItem(text)
+                item = QListWidgetItem(self._activity_text(activity))
                 item.setData(Qt.UserRole, activity['id'])
                 self.activity_list.addItem(item)
         except Exception as e:
             print(f"Error al refrescar lista de actividades: {str(e)}")
     
+    def open_repricing_dialog(self, tipo_item):
+        """Abre el diálogo de reajuste masivo; las listas se recargan con el evento del reajuste."""
+        dialog = RepricingDialog(self.controller, tipo_item, self)
+        dialog.exec_()
+
     def filter_activities(self):
         try:
             search_text = self.activity_search_input.text()
@@ -596,8 +687,7 @@ class DataManagementWindow(QMainWindow):
             activities = self.controller.search_activities(search_text, category_id)
             
             for activity in activities:
-                text = f"{activity['descripcion']}\n   📏 {activity['unidad']} | 💰 ${activity['valor_unitario']:,.2f}"
-                item = QListWidgetItem(text)
+                item = QListWidgetItem(self._activity_text(activity))
                 item.setData(Qt.UserRole, activity['id'])
                 self.activity_list.addItem(item)
         except Exception as e:
@@ -625,11 +715,7 @@ class DataManagementWindow(QMainWindow):
         try:
             self.controller.database_manager.add_product(product_data)
             QMessageBox.information(self, "Éxito", "Producto agregado correctamente.")
-            self.refresh_product_list()
             self.clear_product_form()
-            
-            # Actualizar combo de productos en la pestaña de relaciones
-            self.refresh_product_combo(self.product_combo)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al agregar producto: {str(e)}")
     
@@ -661,10 +747,6 @@ class DataManagementWindow(QMainWindow):
         try:
             self.controller.database_manager.update_product(product_id, product_data)
             QMessageBox.information(self, "Éxito", "Producto actualizado correctamente.")
-            self.refresh_product_list()
-            
-            # Actualizar combo de productos en la pestaña de relaciones
-            self.refresh_product_combo(self.product_combo)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al actualizar producto: {str(e)}")
     
@@ -682,11 +764,7 @@ class DataManagementWindow(QMainWindow):
             try:
                 self.controller.database_manager.delete_product(product_id)
                 QMessageBox.information(self, "Éxito", "Producto eliminado correctamente.")
-                self.refresh_product_list()
                 self.clear_product_form()
-                
-                # Actualizar combo de productos en la pestaña de relaciones
-                self.refresh_product_combo(self.product_combo)
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error al eliminar producto: {str(e)}")
     
@@ -716,7 +794,7 @@ class DataManagementWindow(QMainWindow):
             self.product_list.clear()
             products = self.controller.get_all_products()
             for product in products:
-                item = QListWidgetItem(f"{product['nombre']} ({product['unidad']} - ${product['precio_unitario']})")
+                item = QListWidgetItem(self._product_text(product))
                 item.setData(Qt.UserRole, product['id'])
                 self.product_list.addItem(item)
         except Exception as e:
@@ -731,7 +809,7 @@ class DataManagementWindow(QMainWindow):
             products = self.filter_manager.search_products(search_text, category_id)
             
             for product in products:
-                item = QListWidgetItem(f"{product['nombre']} ({product['unidad']} - ${product['precio_unitario']})")
+                item = QListWidgetItem(self._product_text(product))
                 item.setData(Qt.UserRole, product['id'])
                 self.product_list.addItem(item)
         except Exception as e:
@@ -751,16 +829,9 @@ class DataManagementWindow(QMainWindow):
         }
         
         try:
-            self.controller.database_manager.add_category(category_data)
+            self.controller.database_manager.add_category(category_data['nombre'])
             QMessageBox.information(self, "Éxito", "Categoría agregada correctamente.")
-            self.refresh_category_list()
             self.clear_category_form()
-            
-            # Actualizar combos de categorías
-            self.refresh_category_combo(self.activity_category_combo)
-            self.refresh_category_combo(self.activity_category_select)
-            self.refresh_category_combo(self.product_category_combo)
-            self.refresh_category_combo(self.product_category_select)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al agregar categoría: {str(e)}")
     
@@ -784,15 +855,8 @@ class DataManagementWindow(QMainWindow):
         }
         
         try:
-            self.controller.database_manager.update_category(category_id, category_data)
+            self.controller.database_manager.update_category(category_id, category_data['nombre'])
             QMessageBox.information(self, "Éxito", "Categoría actualizada correctamente.")
-            self.refresh_category_list()
-            
-            # Actualizar combos de categorías
-            self.refresh_category_combo(self.activity_category_combo)
-            self.refresh_category_combo(self.activity_category_select)
-            self.refresh_category_combo(self.product_category_combo)
-            self.refresh_category_combo(self.product_category_select)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al actualizar categoría: {str(e)}")
     
@@ -810,14 +874,7 @@ class DataManagementWindow(QMainWindow):
             try:
                 self.controller.database_manager.delete_category(category_id)
                 QMessageBox.information(self, "Éxito", "Categoría eliminada correctamente.")
-                self.refresh_category_list()
                 self.clear_category_form()
-                
-                # Actualizar combos de categorías
-                self.refresh_category_combo(self.activity_category_combo)
-                self.refresh_category_combo(self.activity_category_select)
-                self.refresh_category_combo(self.product_category_combo)
-                self.refresh_category_combo(self.product_category_select)
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error al eliminar categoría: {str(e)}")
     
@@ -881,12 +938,7 @@ class DataManagementWindow(QMainWindow):
             # Agregar las actividades
             activities = self.controller.get_all_activities()
             for activity in activities:
-                description = activity['descripcion']
-                if len(description) > 60:
-                    description = description[:37] + "..."
-
-                text = f"{description} ({activity['unidad']} - ${activity['valor_unitario']:,.2f})"
-                combo.addItem(text, activity['id'])
+                combo.addItem(self._activity_combo_text(activity), activity['id'])
             
             # Restaurar el ítem seleccionado si existe
             if current_data is not None:
@@ -907,7 +959,7 @@ class DataManagementWindow(QMainWindow):
             # Agregar los productos
             products = self.controller.get_all_products()
             for product in products:
-                combo.addItem(f"{product['nombre']} ({product['unidad']} - ${product['precio_unitario']})", product['id'])
+                combo.addItem(self._product_text(product), product['id'])
             
             # Restaurar el ítem seleccionado si existe
             if current_data is not None:
@@ -958,18 +1010,13 @@ class DataManagementWindow(QMainWindow):
                 return
                 
             # Verificar si ya existe la relación
-            related_activities = self.controller.get_related_activities(main_activity_id)
-            for activity in related_activities:
-                if activity['id'] == related_activity_id:
-                    QMessageBox.warning(self, "Error", "Esta relación ya existe.")
-                    return
+            if self.controller.related_activity_index.has_relation(main_activity_id, related_activity_id):
+                QMessageBox.warning(self, "Error", "Esta relación ya existe.")
+                return
             
             # Agregar la relación
             self.controller.database_manager.add_related_activity(main_activity_id, related_activity_id)
             QMessageBox.information(self, "Éxito", "Relación agregada correctamente.")
-            
-            # Actualizar la lista
-            self.refresh_related_activities_list(main_activity_id)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al agregar relación: {str(e)}")
     
@@ -987,12 +1034,6 @@ class DataManagementWindow(QMainWindow):
             if reply == QMessageBox.Yes:
                 self.controller.database_manager.delete_related_activity(relation_id)
                 QMessageBox.information(self, "Éxito", "Relación eliminada correctamente.")
-                
-                # Actualizar la lista
-                main_index = self.main_activity_combo.currentIndex()
-                if main_index >= 0:
-                    main_activity_id = self.main_activity_combo.itemData(main_index)
-                    self.refresh_related_activities_list(main_activity_id)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al eliminar relación: {str(e)}")
     
@@ -1042,9 +1083,6 @@ class DataManagementWindow(QMainWindow):
             # Agregar la relación
             self.controller.database_manager.add_activity_product(activity_id, product_id, quantity)
             QMessageBox.information(self, "Éxito", "Relación agregada correctamente.")
-            
-            # Actualizar la lista
-            self.refresh_related_products_list(activity_id)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al agregar relación: {str(e)}")
     
@@ -1062,12 +1100,6 @@ class DataManagementWindow(QMainWindow):
             if reply == QMessageBox.Yes:
                 self.controller.database_manager.delete_activity_product(relation_id)
                 QMessageBox.information(self, "Éxito", "Relación eliminada correctamente.")
-                
-                # Actualizar la lista
-                activity_index = self.activity_for_product_combo.currentIndex()
-                if activity_index >= 0:
-                    activity_id = self.activity_for_product_combo.itemData(activity_index)
-                    self.refresh_related_products_list(activity_id)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al eliminar relación: {str(e)}")
 
@@ -1,7 +1,9 @@
 from PyQt5.QtWidgets import QMainWindow, QCheckBox, QDialog, QPushButton, QLabel, QLineEdit, QComboBox, QTableWidget, \
     QTableWidgetItem, QMessageBox, QWidget, QDoubleSpinBox, QHeaderView, QTextEdit, QFileDialog, QSplitter,\
-    QGridLayout, QApplication, QVBoxLayout, QHBoxLayout, QAbstractItemView, QGroupBox,QFormLayout,QScrollArea, QStyledItemDelegate
-from PyQt5.QtCore import Qt, pyqtSlot, QMimeData, QByteArray, QEvent
+    QGridLayout, QApplication, QVBoxLayout, QHBoxLayout, QAbstractItemView, QGroupBox,QFormLayout,QScrollArea, QStyledItemDelegate, \
+    QListWidget, QListWidgetItem
+from PyQt5.QtCore import Qt, pyqtSlot, pyqtSignal, QMimeData, QByteArray, QEvent, QItemSelection, \
+    QItemSelectionModel, QTimer
 from PyQt5.QtGui import QPalette, QColor, QDrag, QFont, QPixmap
 import os
 from datetime import datetime
@@ -12,6 +14,14 @@ from views.word_dialog import ImprovedWordConfigDialog
 from views.cotizacion_file_dialog import CotizacionFileDialog
 from views.dashboard_window import DashboardWindow
 from utils.excel_to_word import ExcelToWordAutomation
+from utils.pricing_engine import get_pricing_engine
+from utils.render_cache import RenderCache
+from utils.instrumentation import instrumentado, current_span
+from views.timings_dialog import TimingsDialog
+from views.sql_profile_dialog import SqlProfileDialog
+from utils.backup_manager import BackupManager
+from utils.backup_worker import BackupWorker
+from utils.change_event_bridge import get_event_bridge, apply_combo_change
 
 class MultiLineDelegate(QStyledItemDelegate):
     """Delegado para permitir edición multilínea en celdas de la tabla."""
@@ -50,180 +60,263 @@ class EditableTableWidgetItem(QTableWidgetItem):
 
 
 class DraggableTableWidget(QTableWidget):
+    """
+    Tabla de la cotización con reordenamiento de filas por arrastre o con Ctrl+↑/Ctrl+↓.
+
+    Los movimientos trasladan los mismos items (takeItem/setItem) con una sola
+    eliminación y una sola inserción de filas en el modelo: no se copian ni se
+    recrean celdas. Se pueden mover varias filas seleccionadas a la vez y un
+    encabezado de capítulo se mueve junto con sus actividades.
+
+    Tras cada movimiento se emite rowsMoved(fila_inicio, cantidad, filas_capitulo):
+    las filas que quedaron en su nueva posición y los encabezados de los
+    capítulos cuyo subtotal cambió.
+    """
+
+    MIME_FILAS = 'application/x-delfos-table-row'
+
+    rowsMoved = pyqtSignal(int, int, list)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setDragEnabled(True)
         self.setAcceptDrops(True)
-        # Es importante que el modo de drop sea InternalMove para que Qt gestione
-        # el movimiento de la fila automáticamente si no lo haces tú manualmente.
-        # Sin embargo, como lo haces manualmente, esto es más una indicación.
+        # El movimiento lo hace move_rows; InternalMove solo define el cursor y el indicador
         self.setDragDropMode(self.DragDropMode.InternalMove)
         self.setSelectionBehavior(self.SelectionBehavior.SelectRows)
         self.setDropIndicatorShown(True)
-        self.drag_row_data = None
-        self.drag_row_index = -1  # Inicializar el índice
+        self.drag_rows = []
+
+    # ===== ESTRUCTURA DE CAPÍTULOS =====
+
+    def row_type(self, row):
+        """'chapter', 'activity' o None según los metadatos de la primera columna."""
+        item = self.item(row, 0)
+        datos = item.data(Qt.UserRole) if item else None
+        return datos.get('type') if isinstance(datos, dict) else None
+
+    def chapter_start(self, row):
+        """Fila del encabezado del capítulo que contiene la fila, o -1 si está antes del primer capítulo."""
+        fila = min(row, self.rowCount() - 1)
+        while fila >= 0 and self.row_type(fila) != 'chapter':
+            fila -= 1
+        return fila
+
+    def chapter_end(self, header_row):
+        """Fila siguiente a la última actividad del capítulo (el próximo encabezado o el final)."""
+        fila = header_row + 1
+        while fila < self.rowCount() and self.row_type(fila) != 'chapter':
+            fila += 1
+        return fila
+
+    def selected_row_indexes(self):
+        filas = sorted(index.row() for index in self.selectionModel().selectedRows())
+        if not filas and self.currentRow() >= 0:
+            filas = [self.currentRow()]
+        return filas
+
+    # ===== MOVIMIENTO DE FILAS =====
+
+    def move_rows(self, rows, destination):
+        """
+        Mueve un conjunto de filas para que queden antes de la fila `destination`.
 
-    def startDrag(self, supportedActions):
-        """Inicia el arrastre de una fila."""
+        Un encabezado de capítulo arrastra todas sus actividades, y los
+        capítulos completos solo se sueltan entre capítulos (el destino se
+        ajusta al límite más cercano en la dirección del movimiento).
+
+        Args:
+            rows (list): Filas a mover (no necesariamente contiguas)
+            destination (int): Fila antes de la cual se insertan, en índices previos al movimiento
+                (rowCount() para moverlas al final)
+
+        Returns:
+            list: Nuevas posiciones de las filas movidas, en orden
+        """
+        total = self.rowCount()
+        filas = sorted({fila for fila in rows if 0 <= fila < total})
+        if not filas:
+            return []
+        destino = max(0, min(destination, total))
+
+        # Un encabezado arrastra su capítulo completo
+        bloques = set()
+        for fila in filas:
+            if self.row_type(fila) == 'chapter':
+                bloques.update(range(fila, self.chapter_end(fila)))
+        filas = sorted(set(filas) | bloques)
+        movidas = set(filas)
+
+        if bloques and destino < total:
+            inicio_capitulo = self.chapter_start(destino)
+            if inicio_capitulo >= 0 and inicio_capitulo != destino:
+                destino = inicio_capitulo if destino <= filas[0] else self.chapter_end(inicio_capitulo)
+        while destino in movidas:
+            destino += 1
+
+        nueva_fila = destino - sum(1 for fila in filas if fila < destino)
+        if nueva_fila == filas[0] and filas[-1] - filas[0] + 1 == len(filas):
+            return filas  # Ya están ahí
+
+        # Capítulos cuyo subtotal cambia: los que pierden actividades sueltas (no los que se mueven completos)
+        sueltas = [fila for fila in filas if fila not in bloques]
+        origenes = {self.chapter_start(fila) for fila in sueltas}
+        encabezados = [self.item(fila, 0) for fila in origenes if fila >= 0 and fila not in movidas]
+
+        columnas = self.columnCount()
+        self.setUpdatesEnabled(False)
+        senales_bloqueadas = self.blockSignals(True)
         try:
-            self.drag_row_index = self.currentRow()
-            if self.drag_row_index < 0:
-                return
+            items = [[self.takeItem(fila, col) for col in range(columnas)] for fila in filas]
+            capitulos = [self.row_type_of_item(fila_items[0]) == 'chapter' for fila_items in items]
+
+            # Eliminar por rangos contiguos, de abajo hacia arriba
+            rangos = []
+            for fila in filas:
+                if rangos and rangos[-1][0] + rangos[-1][1] == fila:
+                    rangos[-1][1] += 1
+                else:
+                    rangos.append([fila, 1])
+            for inicio, cantidad in reversed(rangos):
+                self.model().removeRows(inicio, cantidad)
+
+            self.model().insertRows(nueva_fila, len(filas))
+            for desplazamiento, fila_items in enumerate(items):
+                fila = nueva_fila + desplazamiento
+                for col, item in enumerate(fila_items):
+                    if item is not None:
+                        self.setItem(fila, col, item)
+                if capitulos[desplazamiento]:
+                    self.setSpan(fila, 0, 1, columnas)
+        finally:
+            self.blockSignals(senales_bloqueadas)
+            self.setUpdatesEnabled(True)
+
+        if sueltas:
+            destino_capitulo = self.chapter_start(nueva_fila + filas.index(sueltas[0]))
+            if destino_capitulo >= 0:
+                encabezados.append(self.item(destino_capitulo, 0))
+        filas_capitulo = sorted({item.row() for item in encabezados if item is not None})
+
+        nuevas = list(range(nueva_fila, nueva_fila + len(filas)))
+        self.select_rows(nuevas)
+        self.rowsMoved.emit(nueva_fila, len(filas), filas_capitulo)
+        return nuevas
+
+    def apply_row_order(self, order):
+        """
+        Reordena toda la tabla en una sola operación.
 
-            # Se permite arrastrar filas de capítulo ahora
-            # first_item = self.item(self.drag_row_index, 0)
-            # if first_item and first_item.data(Qt.UserRole) and first_item.data(Qt.UserRole).get('type') == 'chapter':
-            #     return
-
-            self.drag_row_data = []
-            # Guardar los datos de la fila que se está arrastrando
-            for col in range(self.columnCount()):  # Itera sobre todas las columnas
-                item = self.item(self.drag_row_index, col)
-                # Guardamos el texto y cualquier otro dato relevante (como UserRole)
-                if item:
-                    item_info = {
-                        'text': item.text(),
-                        'data': item.data(Qt.UserRole),
-                        'flags': item.flags(),
-                        'font': item.font(),
-                        'background': item.background(),
-                        'foreground': item.foreground(),
-                        'text_alignment': item.textAlignment()
-                    }
-                    self.drag_row_data.append(item_info)
+        Args:
+            order (list): Permutación de las filas actuales (order[i] = fila que queda en la posición i)
+        """
+        total = self.rowCount()
+        if sorted(order) != list(range(total)):
+            raise ValueError("El orden debe ser una permutación de las filas de la tabla")
+        columnas = self.columnCount()
+        self.setUpdatesEnabled(False)
+        senales_bloqueadas = self.blockSignals(True)
+        try:
+            items = [[self.takeItem(fila, col) for col in range(columnas)] for fila in range(total)]
+            self.clearSpans()
+            for fila, origen in enumerate(order):
+                for col, item in enumerate(items[origen]):
+                    if item is not None:
+                        self.setItem(fila, col, item)
+                if self.row_type_of_item(items[origen][0]) == 'chapter':
+                    self.setSpan(fila, 0, 1, columnas)
+        finally:
+            self.blockSignals(senales_bloqueadas)
+            self.setUpdatesEnabled(True)
+        self.rowsMoved.emit(0, total, [fila for fila in range(total) if self.row_type(fila) == 'chapter'])
+
+    @staticmethod
+    def row_type_of_item(item):
+        datos = item.data(Qt.UserRole) if item else None
+        return datos.get('type') if isinstance(datos, dict) else None
+
+    def select_rows(self, rows):
+        """Selecciona un rango contiguo de filas."""
+        if not rows:
+            return
+        seleccion = QItemSelection(self.model().index(rows[0], 0),
+                                   self.model().index(rows[-1], self.columnCount() - 1))
+        self.selectionModel().select(seleccion, QItemSelectionModel.ClearAndSelect | QItemSelectionModel.Rows)
+        self.setCurrentCell(rows[0], 0, QItemSelectionModel.NoUpdate)
+
+    def keyPressEvent(self, event):
+        """Ctrl+↑ / Ctrl+↓ mueven las filas seleccionadas (o el capítulo completo) una posición."""
+        if event.modifiers() & Qt.ControlModifier and event.key() in (Qt.Key_Up, Qt.Key_Down):
+            filas = self.selected_row_indexes()
+            if filas:
+                if event.key() == Qt.Key_Up:
+                    self.move_rows(filas, filas[0] - 1)
                 else:
-                    self.drag_row_data.append(None)
+                    ultima = filas[-1]
+                    if self.row_type(filas[0]) == 'chapter':
+                        ultima = max(ultima, self.chapter_end(filas[0]) - 1)
+                    self.move_rows(filas, ultima + 2)
+            event.accept()
+            return
+        super().keyPressEvent(event)
+
+    # ===== ARRASTRAR Y SOLTAR =====
+
+    def startDrag(self, supportedActions):
+        """Inicia el arrastre de las filas seleccionadas."""
+        try:
+            self.drag_rows = self.selected_row_indexes()
+            if not self.drag_rows:
+                return
 
             drag = QDrag(self)
-            # Definimos un MIME type personalizado para asegurarnos de que solo
-            # nuestro widget acepte el drop.
+            # MIME type propio para que solo esta tabla acepte el drop
             mimeData = QMimeData()
-            # Es necesario poner algún dato, aunque sea vacío.
-            mimeData.setData('application/x-delfos-table-row', QByteArray())
+            mimeData.setData(self.MIME_FILAS, QByteArray())
             drag.setMimeData(mimeData)
-
-            # Inicia la operación de arrastre y espera a que termine.
-            # El cursor cambiará según lo que retornen dragEnterEvent/dragMoveEvent.
             drag.exec(supportedActions)
 
         except Exception as e:
             print(f"[startDrag] ERROR: {e}")
 
     def dragEnterEvent(self, event):
-        """
-        Este evento se dispara cuando el cursor entra en el widget mientras se arrastra.
-        Aquí debemos indicar si el widget puede aceptar el drop.
-        """
-        # Comprobamos si los datos arrastrados tienen nuestro formato personalizado.
-        if event.mimeData().hasFormat('application/x-delfos-table-row'):
-            event.accept()  # Aceptamos el evento, el cursor cambiará a una flecha.
+        """Acepta solo arrastres que vienen de esta tabla."""
+        if event.mimeData().hasFormat(self.MIME_FILAS):
+            event.accept()
         else:
-            event.ignore()  # Lo rechazamos, el cursor mostrará el signo de prohibido.
+            event.ignore()
 
     def dragMoveEvent(self, event):
-        """
-        Este evento se dispara continuamente mientras el cursor se mueve sobre el widget.
-        También debe aceptar el evento para que el drop sea posible.
-        """
-        if event.mimeData().hasFormat('application/x-delfos-table-row'):
+        if event.mimeData().hasFormat(self.MIME_FILAS):
             event.accept()
         else:
             event.ignore()
 
     def dropEvent(self, event):
-        """Maneja el evento de soltar una fila."""
-        if not event.mimeData().hasFormat('application/x-delfos-table-row'):
+        """Mueve las filas arrastradas antes de la fila donde se sueltan."""
+        if not event.mimeData().hasFormat(self.MIME_FILAS) or not self.drag_rows:
             event.ignore()
             return
 
         drop_row = self.indexAt(event.pos()).row()
-
         # Si se suelta fuera de cualquier fila, se añade al final.
         if drop_row == -1:
             drop_row = self.rowCount()
 
-        # Si se suelta en la misma fila de origen, no hacemos nada.
-        if drop_row == self.drag_row_index:
-            return
-
-        # Lógica para manejar el drop sobre un capítulo (impedirlo)
-        drop_item = self.item(drop_row, 0)
-        if drop_item and drop_item.data(Qt.UserRole) and drop_item.data(Qt.UserRole).get('type') == 'chapter':
-            # Opcional: podrías buscar la siguiente fila válida o simplemente ignorar el drop
-            event.ignore()
-            return
-
-        # Guardamos el índice de la fila de origen y la eliminamos.
-        # Es importante hacerlo antes de calcular el nuevo índice de inserción.
-        origin_row = self.drag_row_index
-        self.removeRow(origin_row)
-
-        # Si la fila se mueve hacia abajo, el índice de destino disminuye en uno
-        # porque acabamos de eliminar una fila de antes.
-        if origin_row < drop_row:
-            drop_row -= 1
-
-        # Insertamos una nueva fila en la posición de destino
-        self.insertRow(drop_row)
-        for col, item_data in enumerate(self.drag_row_data):
-            if item_data:
-                # Recuperar propiedades
-                text = item_data['text']
-                data = item_data['data']
-                flags = item_data.get('flags')
-                font = item_data.get('font')
-                background = item_data.get('background')
-                foreground = item_data.get('foreground')
-                text_alignment = item_data.get('text_alignment')
-                
-                # Intentar mantener la clase original si es posible, sino usar EditableTableWidgetItem o QTableWidgetItem
-                # Sin embargo, dado que solo serializamos datos basicos, recrearemos items apropiados
-                # Si es un capítulo (col 0 y tiene data type chapter), usamos QTableWidgetItem estándar restringido
-                # Si es una celda editable numérica, usamos EditableTableWidgetItem
-                
-                is_chapter = False
-                if data and isinstance(data, dict) and data.get('type') == 'chapter':
-                    is_chapter = True
-                
-                if is_chapter and col == 0:
-                     new_item = QTableWidgetItem(text)
-                elif col == 4: # Total column, always read only
-                     new_item = EditableTableWidgetItem(text, editable=False)
-                else:
-                     # Por defecto intentamos que sea editable, los flags corregirán si no lo es
-                     new_item = EditableTableWidgetItem(text, editable=True)
-
-                new_item.setData(Qt.UserRole, data)
-                
-                if flags is not None:
-                    new_item.setFlags(flags)
-                if font:
-                    new_item.setFont(font)
-                if background:
-                    new_item.setBackground(background)
-                if foreground:
-                    new_item.setForeground(foreground)
-                if text_alignment:
-                    new_item.setTextAlignment(text_alignment)
-                
-                self.setItem(drop_row, col, new_item)
-
-        # Seleccionar la fila que acabamos de mover
-        self.selectRow(drop_row)
-
-        # Llamadas a métodos del padre para actualizar la UI
-        if hasattr(self.parent(), "reconnect_delete_button"):
-            self.parent().reconnect_delete_button(drop_row)
-        if hasattr(self.parent(), "update_totals"):
-            self.parent().update_totals()
-
+        self.move_rows(self.drag_rows, drop_row)
+        self.drag_rows = []
+        # El movimiento ya está hecho: evita que Qt elimine las filas de origen
+        event.setDropAction(Qt.IgnoreAction)
         event.accept()
 
     def insert_chapter_header(self, chapter_id, chapter_name):
         """Método público para insertar una fila de encabezado de capítulo en la tabla."""
         row = self.rowCount()  # Siempre insertar al final
         self.insertRow(row)
+        self.set_chapter_header(row, chapter_id, chapter_name)
+
+    def set_chapter_header(self, row, chapter_id, chapter_name):
+        """Convierte una fila existente (vacía) en encabezado de capítulo."""
         header_item = QTableWidgetItem(chapter_name.upper())
         header_item.setTextAlignment(Qt.AlignCenter)
         header_item.setData(Qt.UserRole, {'type': 'chapter', 'id': chapter_id, 'name': chapter_name})
@@ -273,6 +366,11 @@ class MainWindow(QMainWindow):
         self.cotizacion_controller = cotizacion_controller
         self.excel_controller = excel_controller
         self.aiu_manager = self.cotizacion_controller.aiu_manager
+        # Caché de documentos generados (Excel, Word y PDF sin cambios)
+        self.render_cache = RenderCache.from_config()
+        # Respaldos de la base de datos en segundo plano (sección 'respaldo' de config.json)
+        self.backup_manager = BackupManager.from_config(self.cotizacion_controller.database_manager.db_path)
+        self.backup_worker = None
         # Variable para almacenar la ruta del logo
         self.RUTA_LOGO_ESTATICO = "ING_INT_LOG.png"
         
@@ -285,6 +383,9 @@ class MainWindow(QMainWindow):
         
         # Add Menu Bar
         self.create_menu_bar()
+        # Respaldo automático si el último es más antiguo que el intervalo configurado
+        if self.backup_manager.is_due():
+            QTimer.singleShot(10000, lambda: self.start_backup(manual=False))
 
 
         central_widget = QWidget()
@@ -314,6 +415,7 @@ class MainWindow(QMainWindow):
         client_form_layout = QGridLayout()
         self.tipo_combo = QComboBox();
         self.tipo_combo.addItems(["Natural", "Juridica"])
+        self.tipo_combo.currentIndexChanged.connect(self.update_totals)
         self.nit_input = QLineEdit()
         self.nombre_input = QLineEdit()
         self.telefono_input = QLineEdit()
@@ -405,6 +507,7 @@ class MainWindow(QMainWindow):
             ["Descripción", "Cantidad", "Unidad", "Valor Unitario", "Total", "Acción"])
         self.activities_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.activities_table.itemChanged.connect(self.on_item_changed)
+        self.activities_table.rowsMoved.connect(self.on_rows_moved)
         
         # Asignar el delegado multilínea a la columna de Descripción (índice 0)
         self.activities_table.setItemDelegateForColumn(0, MultiLineDelegate(self.activities_table))
@@ -416,7 +519,8 @@ class MainWindow(QMainWindow):
         totals_layout.addWidget(QLabel("Subtotal:"));
         self.subtotal_label = QLabel("0.00")
         totals_layout.addWidget(self.subtotal_label)
-        totals_layout.addWidget(QLabel("IVA:"));
+        self.iva_caption_label = QLabel("IVA:")
+        totals_layout.addWidget(self.iva_caption_label)
         self.iva_label = QLabel("0.00")
         totals_layout.addWidget(self.iva_label)
         totals_layout.addWidget(QLabel("Total:"));
@@ -484,6 +588,15 @@ class MainWindow(QMainWindow):
         add_btns_layout.addWidget(add_activity_btn);
         add_btns_layout.addWidget(add_related_btn)
         activity_layout.addLayout(add_btns_layout)
+
+        # Sugerencias "también cotizado con" (doble clic para agregar)
+        self.also_quoted_label = QLabel("También cotizado con:")
+        self.also_quoted_list = QListWidget()
+        self.also_quoted_list.setMaximumHeight(100)
+        self.also_quoted_list.setToolTip("Doble clic para agregar la actividad a la cotización")
+        self.also_quoted_list.itemDoubleClicked.connect(self.add_also_quoted_activity)
+        activity_layout.addWidget(self.also_quoted_label)
+        activity_layout.addWidget(self.also_quoted_list)
         right_layout.addWidget(activity_group)
 
         # Grupo para Entrada Manual
@@ -563,6 +676,9 @@ class MainWindow(QMainWindow):
         ### -----------------------------------------------------------------------------------------
         self.dark_mode = False
         self.load_initial_data()
+        # Los combos se mantienen al día con los cambios de la base (ver utils/change_events.py)
+        self.event_bridge = get_event_bridge(self.cotizacion_controller.database_manager)
+        self.event_bridge.changed.connect(self.on_data_changed)
     
     def create_menu_bar(self):
         """Creates the menu bar with Dashboard option"""
@@ -578,7 +694,138 @@ class MainWindow(QMainWindow):
         
         historial_action = dashboard_menu.addAction('📜 Ver Historial')
         historial_action.setEnabled(False)  # To be implemented later
+
+        # Materials Menu
+        materials_menu = menubar.addMenu('&Materiales')
+
+        export_materials_action = materials_menu.addAction('🧱 Exportar Lista de Materiales...')
+        export_materials_action.triggered.connect(self.export_materials_list)
+
+        # Export Menu
+        export_menu = menubar.addMenu('&Exportar')
+
+        excel_by_chapters_action = export_menu.addAction('📑 Excel por Capítulos...')
+        excel_by_chapters_action.triggered.connect(self.generate_excel_by_chapters)
+
+        # Tools Menu
+        tools_menu = menubar.addMenu('&Herramientas')
+
+        timings_action = tools_menu.addAction('⏱ Tiempos de la Última Ejecución...')
+        timings_action.triggered.connect(self.show_timings)
+
+        sql_profile_action = tools_menu.addAction('🗄 Perfil de Consultas SQL...')
+        sql_profile_action.triggered.connect(self.show_sql_profile)
+
+        tools_menu.addSeparator()
+        backup_action = tools_menu.addAction('💾 Respaldar Base de Datos')
+        backup_action.triggered.connect(lambda: self.start_backup(manual=True))
+        
+    def start_backup(self, manual=True):
+        """Copies the database in a background thread (sqlite backup API + integrity_check)"""
+        if not manual and not self.isVisible():
+            return  # La ventana se cerró antes del respaldo automático
+        if self.backup_worker is not None and self.backup_worker.isRunning():
+            if manual:
+                self.statusBar().showMessage("Ya hay un respaldo en curso.", 5000)
+            return
+        self.backup_worker = BackupWorker(self.backup_manager, self)
+        self.backup_worker.progress.connect(self.on_backup_progress)
+        self.backup_worker.finished_ok.connect(lambda resultado: self.on_backup_finished(resultado, manual))
+        self.backup_worker.failed.connect(lambda error: self.on_backup_failed(error, manual))
+        self.statusBar().showMessage("Respaldando base de datos...")
+        self.backup_worker.start()
+
+    def closeEvent(self, event):
+        """Stops a running backup before the window (and its worker thread) is destroyed"""
+        if self.backup_worker is not None and self.backup_worker.isRunning():
+            self.backup_worker.cancel()
+            self.backup_worker.wait()
+        super().closeEvent(event)
+
+    def on_backup_progress(self, copiadas, total):
+        if total:
+            self.statusBar().showMessage(f"Respaldando base de datos... {copiadas * 100 // total}%")
+
+    def on_backup_finished(self, resultado, manual):
+        mensaje = (f"Respaldo verificado: {os.path.basename(resultado['ruta'])} "
+                   f"({resultado['bytes'] / (1024 * 1024):.1f} MB)")
+        self.statusBar().showMessage(mensaje, 10000)
+        if manual:
+            QMessageBox.information(self, "Respaldo", f"{mensaje}\n\nCarpeta: {self.backup_manager.directorio}")
+
+    def on_backup_failed(self, error, manual):
+        self.statusBar().showMessage(f"Error en el respaldo: {error}", 15000)
+        if manual:
+            QMessageBox.critical(self, "Error de Respaldo", f"No se pudo crear el respaldo:\n{error}")
         
+    def show_timings(self):
+        """Shows the per-stage timings of the last instrumented run"""
+        TimingsDialog(self).exec_()
+
+    def show_sql_profile(self):
+        """Shows the aggregated SQL statistics and the slow-query settings"""
+        SqlProfileDialog(self).exec_()
+
+    @pyqtSlot()
+    @instrumentado('generar.excel_capitulos')
+    def generate_excel_by_chapters(self):
+        """Generates a multi-sheet Excel: summary, one sheet per chapter and materials"""
+        ruta_proyecto = self.path_input.text().strip()
+        if not os.path.isdir(ruta_proyecto):
+            QMessageBox.warning(self, "Error de Ubicación",
+                                "La ruta de destino no es válida. Seleccione una carpeta primero.")
+            return None
+
+        structured_items = self.get_structured_items()
+        if not any(item['type'] == 'activity' for item in structured_items):
+            QMessageBox.warning(self, "Vacío", "No hay actividades para procesar.")
+            return None
+
+        aiu_values = self.aiu_manager.get_aiu_values()
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            excel_path = self.excel_controller.generate_excel_por_capitulos(
+                items=structured_items,
+                tipo_persona=self.tipo_combo.currentText().lower(),
+                administracion=aiu_values['administracion'],
+                imprevistos=aiu_values['imprevistos'],
+                utilidad=aiu_values['utilidad'],
+                iva_utilidad=aiu_values['iva_sobre_utilidad'],
+                nombre_cliente=self.nombre_input.text(),
+                ruta_personalizada=ruta_proyecto
+            )
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if excel_path:
+            QMessageBox.information(self, "Excel Generado", f"Cotización por capítulos guardada en:\n{excel_path}")
+        else:
+            QMessageBox.critical(self, "Error", "No se pudo generar el Excel por capítulos.")
+        return excel_path
+
+    def export_materials_list(self):
+        """Exports the aggregated materials of the current quotation to Excel"""
+        table_rows = self.serialize_table_rows()
+        if not any(row['type'] == 'activity' for row in table_rows):
+            QMessageBox.warning(self, "Sin Actividades", "Agregue actividades a la cotización primero.")
+            return
+
+        default_dir = self.path_input.text().strip()
+        if not os.path.isdir(default_dir):
+            default_dir = ""
+        filepath, _ = QFileDialog.getSaveFileName(
+            self, "Guardar Lista de Materiales",
+            os.path.join(default_dir, "lista_materiales.xlsx"),
+            "Archivos Excel (*.xlsx)")
+        if not filepath:
+            return
+
+        titulo = f"LISTA DE MATERIALES - {self.nombre_input.text().strip()}" if self.nombre_input.text().strip() else None
+        if self.cotizacion_controller.export_materials_list(table_rows, filepath, titulo):
+            QMessageBox.information(self, "Éxito", f"Lista de materiales guardada en:\n{filepath}")
+        else:
+            QMessageBox.critical(self, "Error", "No se pudo generar la lista de materiales.")
+
     def open_dashboard(self):
         """Opens the dashboard window"""
         try:
@@ -684,9 +931,6 @@ class MainWindow(QMainWindow):
             as_new (bool): If True, treats as new quotation (duplicate)
         """
         try:
-            # Clear current form
-            self.activities_table.setRowCount(0)
-            
             # Load client data
             if 'datos' in snapshot and 'cliente' in snapshot['datos']:
                 cliente = snapshot['datos']['cliente']
@@ -697,31 +941,14 @@ class MainWindow(QMainWindow):
                 self.telefono_input.setText(cliente.get('telefono', ''))
                 self.email_input.setText(cliente.get('email', ''))
             
-            # Load table rows
-            if 'table_rows' in snapshot:
-                for row_data in snapshot['table_rows']:
-                    if row_data['type'] == 'chapter':
-                        # Find chapter ID by name (if exists in DB)
-                        chapters = self.cotizacion_controller.get_all_chapters()
-                        chapter_id = next((c['id'] for c in chapters if c['nombre'] == row_data['name']), None)
-                        if chapter_id:
-                            self.activities_table.insert_chapter_header(chapter_id, row_data['name'])
-                    elif row_data['type'] == 'activity':
-                        self.add_activity_to_table(
-                            row_data['descripcion'],
-                            row_data['cantidad'],
-                            row_data['unidad'],
-                            row_data['valor_unitario']
-                        )
+            # Load table rows (totals are computed once by the bulk loader)
+            self.load_table_rows(snapshot.get('table_rows', []))
             
             # Load AIU values
             if 'datos' in snapshot and 'aiu' in snapshot['datos']:
                 aiu = snapshot['datos']['aiu']
                 # AIU values are managed by aiu_manager, would need to update if there's UI for it
             
-            # Update totals
-            self.update_totals()
-            
             # Set quotation ID if not duplicate
             if not as_new:
                 # quotation_id would need to be passed separately or stored in snapshot
@@ -833,26 +1060,159 @@ class MainWindow(QMainWindow):
         self.activities_table.setItem(row, 1, EditableTableWidgetItem(cantidad))
         self.activities_table.setItem(row, 2, EditableTableWidgetItem(unidad))
         self.activities_table.setItem(row, 3, EditableTableWidgetItem(valor_unitario))
-        total = float(cantidad) * float(valor_unitario)
+        total = get_pricing_engine().line_totals([cantidad], [valor_unitario])[0]
         self.activities_table.setItem(row, 4, EditableTableWidgetItem(f"{total:.2f}", editable=False))
         self.reconnect_delete_button(row)
+        self.warn_unusual_price(row, descripcion, unidad, valor_unitario)
         self.update_totals()
 
+    def warn_unusual_price(self, row, descripcion, unidad, valor_unitario):
+        """Resalta el valor unitario si queda fuera de la banda de precios cotizados antes."""
+        try:
+            aviso = self.cotizacion_controller.check_quoted_price(descripcion, unidad, valor_unitario)
+        except Exception as e:
+            print(f"Error al comparar con precios históricos: {e}")
+            return
+        if not aviso or aviso['estado'] == 'normal':
+            return
+        estadistica = aviso['estadistica']
+        comparacion = "más alto" if aviso['estado'] == 'alto' else "más bajo"
+        mensaje = (f"Valor unitario {comparacion} que lo cotizado antes: mediana ${estadistica.p50:,.2f}, "
+                   f"rango habitual ${estadistica.limite_inferior:,.2f} – ${estadistica.limite_superior:,.2f} "
+                   f"({estadistica.cotizaciones} cotizaciones)")
+        valor_item = self.activities_table.item(row, 3)
+        if valor_item:
+            valor_item.setBackground(QColor("#FFE0B2"))
+            valor_item.setToolTip(mensaje)
+        self.statusBar().showMessage(f"⚠ {descripcion[:60]}: {mensaje}", 10000)
+
+    def load_table_rows(self, table_rows, append=False, recalculate=True):
+        """
+        Carga filas en la tabla en un solo lote.
+
+        Acepta los formatos de snapshot ({'type': 'chapter', 'name'}), de archivo
+        v2.0 ({'type': 'chapter_header', 'descripcion'}) y las actividades de
+        archivos v1.0 (sin 'type'). Los nombres de capítulo se resuelven con un
+        solo mapa nombre → ID, los totales de línea se calculan juntos con el
+        motor de precios y la tabla se llena sin señales ni repintado; los
+        totales generales se calculan una vez al final.
+
+        Args:
+            table_rows (list): Filas a cargar
+            append (bool): Agregar al final en lugar de reemplazar el contenido
+            recalculate (bool): Recalcular los totales al terminar (False si el llamador
+                todavía va a cambiar el AIU o el tipo de cliente)
+
+        Returns:
+            int: Número de actividades cargadas
+        """
+        table = self.activities_table
+        chapter_ids = {c['nombre']: c['id'] for c in self.cotizacion_controller.get_all_chapters()}
+
+        filas = []
+        cantidades = []
+        valores = []
+        for row_data in table_rows or []:
+            tipo = row_data.get('type', 'activity')
+            if tipo in ('chapter', 'chapter_header'):
+                nombre = row_data.get('name') or row_data.get('descripcion') or ''
+                filas.append(('chapter', nombre, row_data.get('chapter_id') or chapter_ids.get(nombre)))
+            elif tipo == 'activity':
+                cantidad = row_data.get('cantidad', 0)
+                valor_unitario = row_data.get('valor_unitario', 0)
+                filas.append(('activity', str(row_data.get('descripcion', '')), cantidad,
+                              str(row_data.get('unidad', '')), valor_unitario))
+                cantidades.append(cantidad)
+                valores.append(valor_unitario)
+        totales = iter(get_pricing_engine().line_totals(cantidades, valores))
+
+        inicio = table.rowCount() if append else 0
+        table.setUpdatesEnabled(False)
+        signals_blocked = table.blockSignals(True)
+        try:
+            if not append:
+                table.setRowCount(0)
+            table.setRowCount(inicio + len(filas))
+            for row, fila in enumerate(filas, start=inicio):
+                if fila[0] == 'chapter':
+                    table.set_chapter_header(row, fila[2], fila[1])
+                    continue
+                _, descripcion, cantidad, unidad, valor_unitario = fila
+                desc_item = EditableTableWidgetItem(descripcion)
+                desc_item.setData(Qt.UserRole, {'type': 'activity'})
+                table.setItem(row, 0, desc_item)
+                table.setItem(row, 1, EditableTableWidgetItem(cantidad))
+                table.setItem(row, 2, EditableTableWidgetItem(unidad))
+                table.setItem(row, 3, EditableTableWidgetItem(valor_unitario))
+                table.setItem(row, 4, EditableTableWidgetItem(f"{next(totales):.2f}", editable=False))
+                self.reconnect_delete_button(row)
+        finally:
+            table.blockSignals(signals_blocked)
+            table.setUpdatesEnabled(True)
+
+        if recalculate:
+            self.update_totals()
+        return len(cantidades)
+
     def reconnect_delete_button(self, row):
         """Crea y conecta el botón de eliminar para una fila específica."""
         delete_btn = QPushButton("Eliminar")
-        delete_btn.clicked.connect(lambda _, r=row: self.delete_activity(r))
+        # La fila se resuelve al hacer clic: el botón sigue siendo válido si las filas se mueven
+        delete_btn.clicked.connect(
+            lambda _, b=delete_btn: self.delete_activity(self.activities_table.indexAt(b.pos()).row()))
         self.activities_table.setCellWidget(row, 5, delete_btn)
 
     def delete_activity(self, row):
-        """Elimina una fila de la tabla y re-conecta los botones."""
+        """Elimina una fila de la tabla."""
+        if row < 0:
+            return
         self.activities_table.removeRow(row)
-        for r in range(self.activities_table.rowCount()):
-            first_item = self.activities_table.item(r, 0)
-            if first_item and first_item.data(Qt.UserRole) and first_item.data(Qt.UserRole).get('type') == 'activity':
-                self.reconnect_delete_button(r)
         self.update_totals()
 
+    def on_rows_moved(self, first_row, count, chapter_rows):
+        """Ajusta los botones de las filas movidas y los subtotales de los capítulos afectados."""
+        table = self.activities_table
+        for row in range(first_row, first_row + count):
+            if table.row_type(row) == 'activity':
+                if table.cellWidget(row, 5) is None:
+                    self.reconnect_delete_button(row)
+            elif table.cellWidget(row, 5) is not None:
+                table.removeCellWidget(row, 5)
+        self.update_chapter_subtotals(chapter_rows)
+
+    def update_chapter_subtotals(self, chapter_rows):
+        """
+        Recalcula el subtotal de los capítulos indicados (filas de encabezado).
+
+        Reordenar no cambia las líneas, así que los totales generales solo se
+        recalculan si el redondeo por capítulo cambia el costo directo.
+        """
+        engine = get_pricing_engine()
+        table = self.activities_table
+        delta = 0
+        for header_row in chapter_rows:
+            header_item = table.item(header_row, 0)
+            if header_item is None:
+                continue
+            lineas = []
+            for row in range(header_row + 1, table.chapter_end(header_row)):
+                total_item = table.item(row, 4)
+                if total_item and table.row_type(row) == 'activity':
+                    lineas.append(engine.to_decimal(total_item.text()))
+            subtotal = engine.round(sum(lineas, engine.to_decimal(0)))
+            anterior = header_item.data(self.CHAPTER_SUBTOTAL_ROLE)
+            if anterior is not None:
+                delta += subtotal - engine.to_decimal(anterior)
+            self.set_chapter_subtotal(header_item, subtotal)
+        if delta:
+            self.update_totals()
+
+    CHAPTER_SUBTOTAL_ROLE = Qt.UserRole + 1
+
+    def set_chapter_subtotal(self, header_item, subtotal):
+        header_item.setData(self.CHAPTER_SUBTOTAL_ROLE, str(subtotal))
+        header_item.setToolTip(f"Subtotal del capítulo: ${subtotal:,.2f}")
+
     def on_item_changed(self, item):
         """Actualiza el total de una fila cuando se edita la cantidad o el valor."""
         row = item.row()
@@ -863,7 +1223,7 @@ class MainWindow(QMainWindow):
             try:
                 cantidad = float(self.activities_table.item(row, 1).text())
                 valor_unitario = float(self.activities_table.item(row, 3).text())
-                total = cantidad * valor_unitario
+                total = get_pricing_engine().line_totals([cantidad], [valor_unitario])[0]
                 self.activities_table.itemChanged.disconnect(self.on_item_changed)
                 self.activities_table.setItem(row, 4, EditableTableWidgetItem(f"{total:.2f}", editable=False))
                 self.activities_table.itemChanged.connect(self.on_item_changed)
@@ -872,44 +1232,48 @@ class MainWindow(QMainWindow):
                 pass
 
     def update_totals(self):
-        """Actualiza los totales, ignorando las filas de capítulo."""
-        subtotal = 0
+        """Actualiza los totales con el motor de precios, ignorando las filas de capítulo."""
+        rows = []
+        header_items = []
         for row in range(self.activities_table.rowCount()):
             first_item = self.activities_table.item(row, 0)
-            if first_item and first_item.data(Qt.UserRole) and first_item.data(Qt.UserRole).get('type') == 'activity':
-                try:
-                    total_item = self.activities_table.item(row, 4)
-                    if total_item and total_item.text():
-                        subtotal += float(total_item.text())
-                except (ValueError, AttributeError):
-                    pass
+            if not first_item or not first_item.data(Qt.UserRole):
+                continue
+            row_type = first_item.data(Qt.UserRole).get('type')
+            if row_type == 'chapter':
+                rows.append({'type': 'chapter', 'name': first_item.text()})
+                header_items.append(first_item)
+            elif row_type == 'activity':
+                cantidad_item = self.activities_table.item(row, 1)
+                valor_item = self.activities_table.item(row, 3)
+                rows.append({
+                    'type': 'activity',
+                    'cantidad': cantidad_item.text() if cantidad_item else 0,
+                    'valor_unitario': valor_item.text() if valor_item else 0
+                })
 
         aiu_values = self.aiu_manager.get_aiu_values()
-        if not aiu_values: aiu_values = {'utilidad': 0, 'iva_sobre_utilidad': 19.0}
+        self.current_pricing = get_pricing_engine().price(rows, self.tipo_combo.currentText(), aiu_values)
+
+        # Subtotal de cada capítulo en el encabezado (el capítulo 0 son las actividades sin capítulo)
+        subtotales = {c['indice']: c['subtotal'] for c in self.current_pricing['capitulos']}
+        for indice, header_item in enumerate(header_items, start=1):
+            self.set_chapter_subtotal(header_item, subtotales.get(indice, get_pricing_engine().to_decimal(0)))
 
-        iva = 0
-        if self.tipo_combo.currentText().lower() == "jurídica":
-            utilidad = subtotal * (aiu_values.get('utilidad', 0) / 100)
-            iva = utilidad * (aiu_values.get('iva_sobre_utilidad', 0) / 100)
+        if self.current_pricing['tipo_persona'] == 'juridica':
+            self.iva_caption_label.setText("AIU + IVA:")
+            impuestos = self.current_pricing['aiu_total'] + self.current_pricing['iva']
         else:
-            iva = subtotal * (aiu_values.get('iva_sobre_utilidad', 19.0) / 100)
+            self.iva_caption_label.setText("IVA:")
+            impuestos = self.current_pricing['iva']
 
-        total = subtotal + iva
-        self.subtotal_label.setText(f"${subtotal:,.2f}")
-        self.iva_label.setText(f"${iva:,.2f}")
-        self.total_label.setText(f"${total:,.2f}")
+        self.subtotal_label.setText(f"${self.current_pricing['costo_directo']:,.2f}")
+        self.iva_label.setText(f"${impuestos:,.2f}")
+        self.total_label.setText(f"${self.current_pricing['total']:,.2f}")
 
-    def generate_excel(self, show_message=True):
-        # VALIDACIÓN DE SEGURIDAD
-        ruta_proyecto = self.path_input.text().strip()
-        if not os.path.isdir(ruta_proyecto):
-            QMessageBox.warning(self, "Error de Ubicación",
-                                "La ruta de destino no es válida. Seleccione una carpeta primero.")
-            return None
-        """Prepara los datos, genera el Excel y luego automatiza Word y PDF."""
+    def get_structured_items(self):
+        """Capítulos y actividades de la cotización en el formato de los generadores de Excel."""
         structured_items = []
-
-        # --- 1. RECOLECCIÓN DE DATOS ---
         if hasattr(self, 'selected_cotizacion') and self.selected_cotizacion:
             cotizacion = self.selected_cotizacion
             if 'table_rows' in cotizacion:
@@ -941,6 +1305,20 @@ class MainWindow(QMainWindow):
                         'unidad': self.activities_table.item(row, 2).text(),
                         'valor_unitario': float(self.activities_table.item(row, 3).text()),
                     })
+        return structured_items
+
+    @pyqtSlot()
+    @instrumentado('generar.excel')
+    def generate_excel(self, show_message=True):
+        # VALIDACIÓN DE SEGURIDAD
+        ruta_proyecto = self.path_input.text().strip()
+        if not os.path.isdir(ruta_proyecto):
+            QMessageBox.warning(self, "Error de Ubicación",
+                                "La ruta de destino no es válida. Seleccione una carpeta primero.")
+            return None
+        """Prepara los datos, genera el Excel y luego automatiza Word y PDF."""
+        # --- 1. RECOLECCIÓN DE DATOS ---
+        structured_items = self.get_structured_items()
 
         # Validación: Si no hay actividades, salir
         if not any(item['type'] == 'activity' for item in structured_items):
@@ -951,6 +1329,23 @@ class MainWindow(QMainWindow):
         try:
             aiu_values = self.aiu_manager.get_aiu_values()
             ruta_proyecto = self.path_input.text()
+            tipo_cliente_principal = self.tipo_combo.currentText().lower().strip()
+            es_juridica = tipo_cliente_principal in ["juridica", "jurídica"]
+            word_template = os.path.join(os.getcwd(), "plantilla_base.docx")
+
+            # Si nada cambió desde la última generación, se reutilizan los archivos de la caché
+            cache_key = self.render_cache.clave(
+                'excel', structured_items, self.get_cliente_data(), aiu_values,
+                plantillas=[word_template] if es_juridica else [],
+                config=self.get_render_config(),
+                fecha=datetime.now().date() if es_juridica else None)
+            excel_path = self.restore_cached_excel(cache_key, ruta_proyecto, structured_items, aiu_values)
+            if excel_path:
+                if show_message:
+                    QMessageBox.information(self, "Sin Cambios",
+                                            f"La cotización no cambió; se reutilizaron los archivos generados:\n"
+                                            f"{os.path.basename(excel_path)}")
+                return excel_path
 
             # Generar el archivo Excel
             excel_path = self.excel_controller.generate_excel(
@@ -967,14 +1362,11 @@ class MainWindow(QMainWindow):
 
             # 3. AUTOMATIZACIÓN WORD/PDF (Solo para clientes Jurídicos)
             if excel_path and os.path.exists(excel_path):
-                tipo_cliente_principal = self.tipo_combo.currentText().lower().strip()
-
-                if tipo_cliente_principal in ["juridica", "jurídica"]:
+                if es_juridica:
                     directorio = os.path.dirname(excel_path)
                     nombre_archivo = os.path.splitext(os.path.basename(excel_path))[0]
 
                     # Definimos rutas específicas para el flujo Office
-                    word_template = os.path.join(os.getcwd(), "plantilla_base.docx")
                     pdf_path = os.path.join(directorio, f"juridico_{nombre_archivo}.pdf")
 
                     # Verificación de seguridad antes de iniciar Office
@@ -993,6 +1385,8 @@ class MainWindow(QMainWindow):
                         QApplication.restoreOverrideCursor()
 
                         if exito:
+                            self.render_cache.put(cache_key, {'excel': excel_path, 'pdf': pdf_path},
+                                                  self.current_quotation_id)
                             if show_message:
                                 QMessageBox.information(self, "Éxito",
                                                         f"Archivos generados correctamente en:\n{directorio}")
@@ -1005,6 +1399,7 @@ class MainWindow(QMainWindow):
                                             f"Error al conectar con Office: {str(e_office)}")
                 else:
                     # Si es Natural, simplemente terminamos el proceso tras el Excel
+                    self.render_cache.put(cache_key, {'excel': excel_path}, self.current_quotation_id)
                     if show_message:
                         QMessageBox.information(self, "Excel Generado",
                                                 "La cotización para Persona Natural se ha generado en Excel con éxito.")
@@ -1020,6 +1415,148 @@ class MainWindow(QMainWindow):
             traceback.print_exc()
             return None
 
+    def get_render_config(self):
+        """Configuración del motor de precios que afecta a los documentos generados (para la caché)."""
+        engine = self.excel_controller.pricing_engine
+        return {'decimales': engine.decimales, 'redondeo': engine.redondeo,
+                'redondear_lineas': engine.redondear_lineas}
+
+    def restore_cached_excel(self, cache_key, ruta_proyecto, structured_items, aiu_values):
+        """
+        Copia a la carpeta del proyecto el Excel (y el PDF jurídico) de una generación idéntica anterior.
+
+        Returns:
+            str: Ruta del Excel restaurado, o None si no está en la caché
+        """
+        cached = self.render_cache.get(cache_key)
+        if not cached:
+            return None
+        destinos = {nombre: os.path.join(ruta_proyecto, archivo['nombre'])
+                    for nombre, archivo in cached['archivos'].items()}
+        restaurados = RenderCache.restore(cached, destinos)
+        if not restaurados or 'excel' not in restaurados:
+            return None
+
+        # generate_word usa los totales del último Excel generado
+        self.excel_controller.last_pricing = self.excel_controller.pricing_engine.price(
+            structured_items, self.tipo_combo.currentText().lower(), aiu_values)
+        self.record_render_cache_hit(cached.get('cotizacion_id') or self.current_quotation_id,
+                                     cache_key, "Excel/PDF")
+        print(f"Documentos reutilizados de la caché ({cache_key[:12]})")
+        current_span().set(cache='hit')
+        return restaurados['excel']
+
+    def record_render_cache_hit(self, quotation_id, cache_key, documentos):
+        """Registra en el historial de la cotización que sus documentos salieron de la caché."""
+        if not quotation_id:
+            return
+        self.cotizacion_controller.database_manager.add_quotation_history(
+            quotation_id,
+            accion='documentos_desde_cache',
+            notas=f"{documentos} reutilizados de la caché de documentos ({cache_key[:12]})"
+        )
+
+    def build_word_pipeline(self, word_controller, id_cot, excel_path, datos_para_word, formato, config,
+                            client_type, word_proposal_path, pdf_proposal_path, pdf_budget_path, pdf_merged_path):
+        """
+        Builds the stage graph of the Word/PDF proposal.
+
+        propuesta_docx (Word, main process) -> propuesta_pdf (worker process)
+        presupuesto_pdf (worker process, or a copy of the budget PDF already exported by generate_excel)
+        propuesta_pdf + presupuesto_pdf -> unir_pdfs (only for complete jurídica quotations)
+
+        The two conversions are independent and run concurrently.
+        """
+        import shutil
+        from utils.pipeline import Pipeline
+        from utils.excel_to_word import convertir_word_a_pdf, convertir_excel_a_pdf
+
+        pipeline = Pipeline('propuesta')
+
+        # --- PASO A: Generar Word de Propuesta Técnica ---
+        def generar_propuesta():
+            temp_word_path = word_controller.generate_word_document(
+                cotizacion_id=id_cot,
+                excel_path=excel_path,
+                datos_adicionales=datos_para_word,
+                formato=formato
+            )
+            # Mover y renombrar
+            if not temp_word_path or not os.path.exists(temp_word_path):
+                raise RuntimeError("Error Word: no se generó el documento de la propuesta")
+            shutil.move(temp_word_path, word_proposal_path)
+            return word_proposal_path
+
+        # Los datos del diálogo y la fecha impresa no están en el Excel: si cambian, la propuesta se repite
+        pipeline.agregar('propuesta_docx', generar_propuesta, entradas=[excel_path], salidas=[word_proposal_path],
+                         version={'cotizacion': id_cot, 'datos': datos_para_word, 'formato': formato,
+                                  'fecha': datetime.now().date()})
+
+        # --- PASO B: Conversión a PDF Independiente (Propuesta y Presupuesto) ---
+        pipeline.agregar('propuesta_pdf', convertir_word_a_pdf, (word_proposal_path, pdf_proposal_path),
+                         entradas=[word_proposal_path], salidas=[pdf_proposal_path], proceso=True)
+
+        # Para jurídica, generate_excel ya exportó el presupuesto como juridico_{nombre_excel}.pdf:
+        # si está vigente se copia en lugar de convertir el Excel otra vez
+        target_dir = os.path.dirname(os.path.abspath(excel_path))
+        excel_basename = os.path.splitext(os.path.basename(excel_path))[0]
+        existing_budget_pdf = os.path.join(target_dir, f"juridico_{excel_basename}.pdf")
+        pipeline.agregar('presupuesto_pdf', convertir_excel_a_pdf, (excel_path, pdf_budget_path),
+                         entradas=[excel_path], salidas=[pdf_budget_path], proceso=True,
+                         reutilizar={pdf_budget_path: existing_budget_pdf})
+
+        # --- PASO C: Merging de PDFs (Solo Jurídica Completa) ---
+        if client_type == 'juridica' and config.get('cotizacion_completa'):
+            def unir_pdfs():
+                from utils.pdf_merger import PDFMerger
+                templates_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'templates')
+                merger = PDFMerger(templates_dir)
+
+                # Preparar lista de orden
+                raw_order = config.get('section_order', [])
+                final_order = []
+                external_map = {}
+
+                # IMPORTANTE: Si 'propuesta_tecnica' no está en la lista (configuracion anterior),
+                # la insertamos manualmente antes de 'paginas_estandar' o al inicio.
+                if 'propuesta_tecnica' not in raw_order:
+                    if 'paginas_estandar' in raw_order:
+                        idx = raw_order.index('paginas_estandar')
+                        raw_order.insert(idx, 'propuesta_tecnica')
+                    else:
+                        raw_order.insert(1, 'propuesta_tecnica') # Despues de portadas/separadores
+
+                # Procesar lista
+                for item in raw_order:
+                    if item.startswith("external::"):
+                        path = item.replace("external::", "")
+                        if os.path.exists(path):
+                            key = f"ext_{os.path.basename(path)}"
+                            external_map[key] = path
+                            final_order.append(key)
+                    else:
+                        final_order.append(item)
+
+                # 'generated_quotation_pdf' se usa para el presupuesto en pdf_merger;
+                # la propuesta técnica se pasa como external map
+                if 'propuesta_tecnica' in final_order:
+                    external_map['propuesta_tecnica'] = pdf_proposal_path
+
+                if not merger.merge_pdfs(
+                        output_path=pdf_merged_path,
+                        ordered_items=final_order,
+                        generated_quotation_pdf=pdf_budget_path,
+                        external_files_map=external_map):
+                    raise RuntimeError("PDFMerger no pudo unir los documentos")
+                return pdf_merged_path
+
+            pipeline.agregar('unir_pdfs', unir_pdfs, entradas=[pdf_proposal_path, pdf_budget_path],
+                             salidas=[pdf_merged_path])
+
+        return pipeline
+
+    @pyqtSlot()
+    @instrumentado('generar.word')
     def generate_word(self):
         """Genera Word y PDF en la misma carpeta del Excel para todos los clientes (NUEVO)."""
         # VALIDACIÓN DE SEGURIDAD
@@ -1034,6 +1571,8 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Error", "Agregue actividades.")
                 return
 
+            # Las etapas siguientes quedan asociadas a la cotización cargada (si hay una)
+            current_span().set_cotizacion(self.current_quotation_id)
             excel_path = self.generate_excel(show_message=False)
             if not excel_path: return
 
@@ -1092,7 +1631,10 @@ class MainWindow(QMainWindow):
                     'polizas_incluir': config.get('polizas_incluir', {}),
                     'director_obra': config.get('director_obra', ''),
                     'residente_obra': config.get('residente_obra', ''),
-                    'tecnologo': config.get('tecnologo_sgsst', '') 
+                    'tecnologo': config.get('tecnologo_sgsst', ''),
+
+                    # Totales del motor de precios (los mismos del Excel)
+                    'totales': self.excel_controller.last_pricing
                 }
 
                 word_controller = WordController(self.cotizacion_controller)
@@ -1119,154 +1661,82 @@ class MainWindow(QMainWindow):
                 pdf_budget_path = os.path.join(target_dir, f"{base_name}_Presupuesto.pdf")
                 pdf_merged_path = os.path.join(target_dir, f"{base_name}_COMPLETO.pdf")
 
-                # --- PASO A: Generar Word de Propuesta Técnica ---
-                temp_word_path = word_controller.generate_word_document(
-                    cotizacion_id=id_cot,
-                    excel_path=excel_path,
-                    datos_adicionales=datos_para_word,
-                    formato=formato
-                )
-                
-                # Mover y renombrar
-                import shutil
-                if os.path.exists(temp_word_path):
-                    shutil.move(temp_word_path, word_proposal_path)
+                # Generación idéntica anterior (mismas filas, cliente, AIU, plantillas y configuración)
+                cache_key = self.render_cache.clave(
+                    'word', self.get_structured_items(), self.get_cliente_data(),
+                    self.aiu_manager.get_aiu_values(),
+                    plantillas=[word_controller.templates_dir,
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'templates'),
+                                os.path.join(os.getcwd(), "plantilla_base.docx")]
+                               + [item.replace("external::", "") for item in config.get('section_order', [])
+                                  if item.startswith("external::")],
+                    config={'word': config, 'formato': formato, 'cotizacion_id': id_cot,
+                            'precios': self.get_render_config()},
+                    fecha=datetime.now().date())
+                cached = self.render_cache.get(cache_key)
+                restaurados = None
+                if cached:
+                    destinos = {'propuesta_docx': word_proposal_path, 'propuesta_pdf': pdf_proposal_path,
+                                'presupuesto_pdf': pdf_budget_path}
+                    if 'completo_pdf' in cached['archivos']:
+                        destinos['completo_pdf'] = pdf_merged_path
+                    restaurados = RenderCache.restore(cached, destinos)
+
+                if restaurados:
+                    final_output = restaurados.get('completo_pdf', pdf_proposal_path)
+                    print(f"Documentos reutilizados de la caché ({cache_key[:12]})")
+                    current_span().set(cache='hit')
+                    QMessageBox.information(self, "Sin Cambios",
+                                            f"La cotización no cambió; se reutilizaron los documentos generados:\n"
+                                            f"{os.path.basename(final_output)}")
+                    self.save_word_generation(config, client_type, final_output, pdf_proposal_path,
+                                              word_proposal_path, excel_path, cache_key, desde_cache=True)
+                    QApplication.restoreOverrideCursor()
+                    return
 
-                # --- PASO B: Conversión a PDF Independiente (Propuesta y Presupuesto) ---
-                automator = ExcelToWordAutomation()
-                
-                # 1. Convertir Word Propuesta a PDF
-                success_word, msg_word = automator.convert_word_to_pdf(word_proposal_path, pdf_proposal_path)
-                
-                # 2. Buscar el PDF del presupuesto existente (ya generado por generate_excel)
-                # El patrón es: juridico_{nombre_excel}.pdf
-                excel_basename = os.path.splitext(os.path.basename(excel_path))[0]
-                existing_budget_pdf = os.path.join(target_dir, f"juridico_{excel_basename}.pdf")
-                
-                success_excel = False
-                msg_excel = ""
-                
-                if os.path.exists(existing_budget_pdf):
-                    # Reutilizar el PDF existente, solo renombrarlo si es necesario
-                    if existing_budget_pdf != pdf_budget_path:
-                        import shutil
-                        shutil.copy2(existing_budget_pdf, pdf_budget_path)
-                    success_excel = True
-                    msg_excel = f"Reutilizando presupuesto existente: {os.path.basename(existing_budget_pdf)}"
-                else:
-                    # Si no existe, convertir el Excel a PDF
-                    success_excel, msg_excel = automator.convert_excel_to_pdf(excel_path, pdf_budget_path)
+                # Word, conversiones a PDF y unión como grafo de etapas (utils/pipeline.py)
+                pipeline = self.build_word_pipeline(
+                    word_controller, id_cot, excel_path, datos_para_word, formato, config, client_type,
+                    word_proposal_path, pdf_proposal_path, pdf_budget_path, pdf_merged_path)
+                resultados = pipeline.ejecutar()
+                print(pipeline.resumen())
 
-                exito = success_word and success_excel
-                mensaje = ""
-                if not success_word: mensaje += f"Error Word: {msg_word}\n"
-                if not success_excel: mensaje += f"Error Excel: {msg_excel}\n"
+                exito = resultados['propuesta_pdf'].exito and resultados['presupuesto_pdf'].exito
+                mensaje = "".join(f"{resultado.error}\n" for nombre, resultado in resultados.items()
+                                  if nombre != 'unir_pdfs' and resultado.estado == 'error')
 
-                # --- PASO C: Merging de PDFs (Solo Jurídica Completa) ---
+                # --- Unión de PDFs (Solo Jurídica Completa) ---
                 final_output = pdf_proposal_path # Default fallback
-                
-                if client_type == 'juridica' and config.get('cotizacion_completa'):
-                    if exito:
-                        try:
-                            from utils.pdf_merger import PDFMerger
-                            templates_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'templates')
-                            merger = PDFMerger(templates_dir)
-                            
-                            # Preparar lista de orden
-                            raw_order = config.get('section_order', [])
-                            final_order = []
-                            external_map = {}
-                            
-                            # Mapear "propuesta_tecnica" a nuestro pdf generado
-                            # Mapear "presupuesto_programacion" a nuestro pdf generado
-                            
-                            # IMPORTANTE: Si 'propuesta_tecnica' no está en la lista (configuracion anterior),
-                            # la insertamos manualmente antes de 'paginas_estandar' o al inicio.
-                            if 'propuesta_tecnica' not in raw_order:
-                                if 'paginas_estandar' in raw_order:
-                                    idx = raw_order.index('paginas_estandar')
-                                    raw_order.insert(idx, 'propuesta_tecnica')
-                                else:
-                                    raw_order.insert(1, 'propuesta_tecnica') # Despues de portadas/separadores
-                            
-                            # Procesar lista
-                            for item in raw_order:
-                                if item.startswith("external::"):
-                                    path = item.replace("external::", "")
-                                    if os.path.exists(path):
-                                        key = f"ext_{os.path.basename(path)}"
-                                        external_map[key] = path
-                                        final_order.append(key)
-                                else:
-                                    final_order.append(item)
-                                    
-                            # Mapa de archivos especiales
-                            # 'generated_quotation_pdf' se usa para el presupuesto en pdf_merger
-                            # Para la propuesta técnica, la pasaremos como external map
-                            if 'propuesta_tecnica' in final_order:
-                                external_map['propuesta_tecnica'] = pdf_proposal_path
-
-                            # Ejecutar Merge
-                            merge_success = merger.merge_pdfs(
-                                output_path=pdf_merged_path,
-                                ordered_items=final_order,
-                                generated_quotation_pdf=pdf_budget_path,
-                                external_files_map=external_map
-                            )
-                            
-                            if merge_success:
-                                final_output = pdf_merged_path
-                                QMessageBox.information(self, "Éxito", f"Cotización Generada Correctamente:\n{os.path.basename(final_output)}")
-                            else:
-                                QMessageBox.warning(self, "Error Parcial", "Se generaron los PDFs individuales pero falló la unión.")
-                                
-                        except Exception as e:
-                            QMessageBox.critical(self, "Error Merging", f"Error crítico uniendo PDFs: {e}")
-                            print(f"Merge error: {e}")
+
+                if 'unir_pdfs' in resultados:
+                    if not exito:
+                        QMessageBox.warning(self, "Error Conversión", f"Error generando PDFs base:\n{mensaje}")
+                    elif resultados['unir_pdfs'].exito:
+                        final_output = pdf_merged_path
+                        QMessageBox.information(self, "Éxito", f"Cotización Generada Correctamente:\n{os.path.basename(final_output)}")
                     else:
-                         QMessageBox.warning(self, "Error Conversión", f"Error generando PDFs base:\n{mensaje}")
+                        QMessageBox.warning(self, "Error Parcial",
+                                            f"Se generaron los PDFs individuales pero falló la unión.\n"
+                                            f"{resultados['unir_pdfs'].error}")
                 else:
                     # Caso Natural o Jurídica Básica (Solo Word o archivos sueltos)
-                     if exito:
+                    if exito:
                         QMessageBox.information(self, "Éxito", f"Archivos generados correctamente.\nWord: {os.path.basename(word_proposal_path)}")
-                     else:
+                    else:
                         QMessageBox.warning(self, "Error", f"Falló la generación: {mensaje}")
 
-                self.last_generated_pdf = final_output
-                
-                # ===== SAVE TO DATABASE =====
-                try:
-                    # Determine which PDF to save as main
-                    main_pdf = final_output if final_output else (pdf_proposal_path if os.path.exists(pdf_proposal_path) else None)
-                    
-                    if main_pdf:
-                        quotation_id = self.save_quotation_to_db(
-                            cliente_id=self.client_combo.currentData() if self.client_combo.currentData() else None,
-                            nombre_proyecto=config.get('lugar', 'Proyecto Sin Nombre'),
-                            monto_total=self.get_total_from_labels(),
-                            es_prueba=self.es_prueba_check.isChecked(),
-                            ruta_pdf=main_pdf,
-                            ruta_excel=excel_path,
-                            ruta_word=word_proposal_path if os.path.exists(word_proposal_path) else None,
-                            validez_dias=config.get('validez', 30),
-                            tipo_cliente=client_type,
-                            config=config
-                        )
-                        
-                        if quotation_id:
-                            print(f"\n{'='*60}")
-                            print(f"🎉 COTIZACIÓN GUARDADA EN DASHBOARD")
-                            print(f"{'='*60}")
-                            print(f"ID: COT-{quotation_id:03d}")
-                            print(f"Cliente: {self.nombre_input.text()}")
-                            print(f"Proyecto: {config.get('lugar')}")
-                            print(f"Monto: ${self.get_total_from_labels():,.0f}")
-                            print(f"Tipo: {'🧪 Prueba' if self.es_prueba_check.isChecked() else '📄 Real'}")
-                            print(f"{'='*60}\n")
-                except Exception as e_save:
-                    print(f"⚠ Advertencia: No se pudo guardar en dashboard: {e_save}")
-                    # No mostramos el error al usuario, la cotización se generó bien
-                
+                # Solo se guarda en caché una generación completa
+                if exito and (final_output == pdf_merged_path or not (
+                        client_type == 'juridica' and config.get('cotizacion_completa'))):
+                    self.render_cache.put(cache_key, {
+                        'propuesta_docx': word_proposal_path,
+                        'propuesta_pdf': pdf_proposal_path,
+                        'presupuesto_pdf': pdf_budget_path,
+                        'completo_pdf': pdf_merged_path if final_output == pdf_merged_path else None,
+                    })
+
+                self.save_word_generation(config, client_type, final_output, pdf_proposal_path,
+                                          word_proposal_path, excel_path, cache_key)
                 QApplication.restoreOverrideCursor()
 
         except Exception as e:
@@ -1275,16 +1745,52 @@ class MainWindow(QMainWindow):
             import traceback
             traceback.print_exc()
 
-    def get_total_from_labels(self):
-        """Extrae el monto total de la etiqueta para guardar en BD"""
+    def save_word_generation(self, config, client_type, final_output, pdf_proposal_path, word_proposal_path,
+                             excel_path, cache_key, desde_cache=False):
+        """Guarda en el dashboard la cotización cuyos documentos Word/PDF se acaban de generar o restaurar."""
+        self.last_generated_pdf = final_output
+
+        # ===== SAVE TO DATABASE =====
         try:
-            total_text = self.total_label.text()
-            # Remover $, comas y espacios, luego convertir
-            total_text = total_text.replace('$', '').replace(',', '').strip()
-            return float(total_text)
-        except Exception as e:
-            print(f"Error extrayendo total: {e}")
-            return 0.0
+            # Determine which PDF to save as main
+            main_pdf = final_output if final_output else (pdf_proposal_path if os.path.exists(pdf_proposal_path) else None)
+
+            if main_pdf:
+                quotation_id = self.save_quotation_to_db(
+                    cliente_id=self.client_combo.currentData() if self.client_combo.currentData() else None,
+                    nombre_proyecto=config.get('lugar', 'Proyecto Sin Nombre'),
+                    monto_total=self.get_total_from_labels(),
+                    es_prueba=self.es_prueba_check.isChecked(),
+                    ruta_pdf=main_pdf,
+                    ruta_excel=excel_path,
+                    ruta_word=word_proposal_path if os.path.exists(word_proposal_path) else None,
+                    validez_dias=config.get('validez', 30),
+                    tipo_cliente=client_type,
+                    config=config
+                )
+
+                if quotation_id:
+                    current_span().set_cotizacion(quotation_id)
+                    self.render_cache.asociar(cache_key, quotation_id)
+                    if desde_cache:
+                        self.record_render_cache_hit(quotation_id, cache_key, "Word/PDF")
+                    print(f"\n{'='*60}")
+                    print(f"🎉 COTIZACIÓN GUARDADA EN DASHBOARD")
+                    print(f"{'='*60}")
+                    print(f"ID: COT-{quotation_id:03d}")
+                    print(f"Cliente: {self.nombre_input.text()}")
+                    print(f"Proyecto: {config.get('lugar')}")
+                    print(f"Monto: ${self.get_total_from_labels():,.0f}")
+                    print(f"Tipo: {'🧪 Prueba' if self.es_prueba_check.isChecked() else '📄 Real'}")
+                    print(f"{'='*60}\n")
+        except Exception as e_save:
+            print(f"⚠ Advertencia: No se pudo guardar en dashboard: {e_save}")
+            # No mostramos el error al usuario, la cotización se generó bien
+
+    def get_total_from_labels(self):
+        """Devuelve el monto total calculado por el motor de precios para guardar en BD"""
+        self.update_totals()
+        return float(self.current_pricing['total'])
 
     def _old_generate_word(self):
         """Genera Word y PDF en la misma carpeta del Excel para todos los clientes."""
@@ -1529,24 +2035,15 @@ class MainWindow(QMainWindow):
             print("INICIO DE TRACING DE CARGA")
             print("=" * 50)
 
-            # 1. Limpiar tabla
-            self.activities_table.setRowCount(0)
-            print(f"TRACING: Tabla reseteada. Filas actuales: {self.activities_table.rowCount()}")
-
-            # 2. CARGAR INFORMACIÓN DEL CLIENTE
+            # 1. CARGAR INFORMACIÓN DEL CLIENTE
             if 'cliente' in cotizacion_data:
                 self._apply_cliente_to_ui(cotizacion_data['cliente'])
 
-            # 3. CARGAR ACTIVIDADES
+            # 2-3. REEMPLAZAR LAS ACTIVIDADES DE LA TABLA (en un solo lote)
             acts = cotizacion_data.get('actividades', [])
             print(f"TRACING: Intentando insertar {len(acts)} actividades...")
-
-            for i, act in enumerate(acts):
-                # Aquí llamamos a tu función existente
-                self.add_imported_activity_to_table(act)
-                # Verificamos si la fila realmente se creó
-                if self.activities_table.rowCount() <= i:
-                    print(f"ALERTA: La actividad {i} no aumentó el rowCount de la tabla!")
+            self.load_table_rows(acts, recalculate=False)
+            print(f"TRACING: Filas en la tabla: {self.activities_table.rowCount()}")
 
             # 4. VALORES AIU
             if 'aiu_values' in cotizacion_data:
@@ -1556,7 +2053,7 @@ class MainWindow(QMainWindow):
                 if hasattr(self, 'util_input'): self.util_input.setValue(float(aiu.get('utilidad', 0)))
                 print("TRACING: Valores AIU asignados a los SpinBoxes.")
 
-            self.calculate_totals()
+            self.update_totals()
 
 
         except Exception as e:
@@ -1587,89 +2084,6 @@ class MainWindow(QMainWindow):
         self.client_combo.blockSignals(False)
         self.tipo_combo.blockSignals(False)
 
-    def add_imported_row_to_table(self, row_data):
-        """
-        Añade una fila importada a la tabla de actividades
-
-        Args:
-            row_data (dict): Datos de la fila (chapter_header o activity)
-        """
-        row_position = self.activities_table.rowCount()
-        self.activities_table.insertRow(row_position)
-
-        if row_data['type'] == 'chapter_header':
-            # Crear ítem de capítulo
-            item = QTableWidgetItem(row_data['descripcion'])
-            item.setData(Qt.UserRole, {'type': 'chapter'})
-            item.setBackground(QColor(200, 200, 200))  # Color de fondo para capítulos
-            self.activities_table.setItem(row_position, 0, item)
-
-            # Llenar celdas vacías para el capítulo
-            for col in range(1, self.activities_table.columnCount()):
-                empty_item = QTableWidgetItem("")
-                empty_item.setBackground(QColor(200, 200, 200))
-                self.activities_table.setItem(row_position, col, empty_item)
-
-        elif row_data['type'] == 'activity':
-            # Crear ítem de actividad
-            desc_item = QTableWidgetItem(row_data['descripcion'])
-            desc_item.setData(Qt.UserRole, {'type': 'activity'})
-
-
-            self.activities_table.setItem(row_position, 0, desc_item)
-
-            # Cantidad
-            self.activities_table.setItem(row_position, 1,
-                                          QTableWidgetItem(str(row_data.get('cantidad', 0))))
-
-            # Unidad
-            self.activities_table.setItem(row_position, 2,
-                                          QTableWidgetItem(row_data.get('unidad', '')))
-
-            # Valor unitario
-            self.activities_table.setItem(row_position, 3,
-                                          QTableWidgetItem(str(row_data.get('valor_unitario', 0))))
-
-            # Total (calculado)
-            cantidad = float(row_data.get('cantidad', 0))
-            valor_unitario = float(row_data.get('valor_unitario', 0))
-            total = cantidad * valor_unitario
-            self.activities_table.setItem(row_position, 4,
-                                          QTableWidgetItem(str(total)))
-
-    def add_imported_activity_to_table(self, activity_data):
-        """
-        Añade una actividad importada (formato anterior) a la tabla
-
-        Args:
-            activity_data (dict): Datos de la actividad
-        """
-        row_position = self.activities_table.rowCount()
-        self.activities_table.insertRow(row_position)
-
-        # Descripción
-        desc_item = QTableWidgetItem(activity_data.get('descripcion', ''))
-        desc_item.setData(Qt.UserRole, {'type': 'activity'})
-        self.activities_table.setItem(row_position, 0, desc_item)
-
-        # Cantidad
-        self.activities_table.setItem(row_position, 1,
-                                      QTableWidgetItem(str(activity_data.get('cantidad', 0))))
-
-        # Unidad
-        self.activities_table.setItem(row_position, 2,
-                                      QTableWidgetItem(activity_data.get('unidad', '')))
-
-        # Valor unitario
-        self.activities_table.setItem(row_position, 3,
-                                      QTableWidgetItem(str(activity_data.get('valor_unitario', 0))))
-
-        # Total
-        cantidad = float(activity_data.get('cantidad', 0))
-        valor_unitario = float(activity_data.get('valor_unitario', 0))
-        total = cantidad * valor_unitario
-        self.activities_table.setItem(row_position, 4,
-                                      QTableWidgetItem(str(total)))
     def clear_form(self):
         """Limpia el formulario"""
         try:
@@ -2013,25 +2427,10 @@ class MainWindow(QMainWindow):
             # 🔒 Flag de carga
             self.is_loading_cotizacion = True
 
-            # 1. LIMPIAR TABLA
-            self.activities_table.setRowCount(0)
-            print("Tabla limpiada")
-
-            # 2. CARGAR ACTIVIDADES
-            activities_loaded = 0
-
-            if cotizacion_data.get('table_rows'):
-                print(f"Cargando {len(cotizacion_data['table_rows'])} filas de table_rows")
-                for row_data in cotizacion_data['table_rows']:
-                    self.add_imported_row_to_table(row_data)
-                    if row_data.get('type') == 'activity':
-                        activities_loaded += 1
-
-            elif cotizacion_data.get('actividades'):
-                print(f"Cargando {len(cotizacion_data['actividades'])} actividades")
-                for activity in cotizacion_data['actividades']:
-                    self.add_imported_activity_to_table(activity)
-                    activities_loaded += 1
+            # 1-2. REEMPLAZAR LAS FILAS DE LA TABLA (en un solo lote)
+            filas = cotizacion_data.get('table_rows') or cotizacion_data.get('actividades') or []
+            print(f"Cargando {len(filas)} filas")
+            activities_loaded = self.load_table_rows(filas, recalculate=False)
 
             print(f"Actividades cargadas en tabla: {activities_loaded}")
 
@@ -2043,13 +2442,12 @@ class MainWindow(QMainWindow):
                 except Exception as e:
                     print(f"Error cargando AIU: {e}")
 
-            # 4. TOTALES
-            if hasattr(self, 'calculate_totals'):
-                self.calculate_totals()
-
-            # 5. 🔥 APLICAR CLIENTE (AQUÍ Y SOLO AQUÍ)
+            # 4. 🔥 APLICAR CLIENTE (AQUÍ Y SOLO AQUÍ)
             self._apply_cliente_to_ui(cotizacion_data.get("cliente"))
 
+            # 5. TOTALES: una sola vez, con el AIU y el tipo de cliente ya aplicados
+            self.update_totals()
+
             # 6. FECHA
             if hasattr(self, 'date_field') and cotizacion_data.get('fecha'):
                 self.date_field.setText(cotizacion_data['fecha'])
@@ -2065,91 +2463,6 @@ class MainWindow(QMainWindow):
             traceback.print_exc()
             return False
 
-    def add_imported_row_to_table(self, row_data):
-        """
-        Añade una fila importada a la tabla de actividades
-        """
-        try:
-            row_position = self.activities_table.rowCount()
-            self.activities_table.insertRow(row_position)
-
-            if row_data['type'] == 'chapter_header':
-                # Crear ítem de capítulo
-                item = QTableWidgetItem(row_data['descripcion'])
-                item.setData(Qt.UserRole, {'type': 'chapter'})
-                item.setBackground(QColor(200, 200, 200))
-                self.activities_table.setItem(row_position, 0, item)
-
-                # Llenar celdas vacías para el capítulo
-                for col in range(1, self.activities_table.columnCount()):
-                    empty_item = QTableWidgetItem("")
-                    empty_item.setBackground(QColor(200, 200, 200))
-                    self.activities_table.setItem(row_position, col, empty_item)
-
-            elif row_data['type'] == 'activity':
-                # Descripción
-                desc_item = QTableWidgetItem(row_data['descripcion'])
-                desc_item.setData(Qt.UserRole, {'type': 'activity'})
-                self.activities_table.setItem(row_position, 0, desc_item)
-
-                # Cantidad
-                self.activities_table.setItem(row_position, 1,
-                                              QTableWidgetItem(str(row_data.get('cantidad', 0))))
-
-                # Unidad
-                self.activities_table.setItem(row_position, 2,
-                                              QTableWidgetItem(row_data.get('unidad', '')))
-
-                # Valor unitario
-                self.activities_table.setItem(row_position, 3,
-                                              QTableWidgetItem(str(row_data.get('valor_unitario', 0))))
-
-                # Total
-                total = row_data.get('total', 0)
-                if not total:  # Calcular si no existe
-                    cantidad = float(row_data.get('cantidad', 0))
-                    valor_unitario = float(row_data.get('valor_unitario', 0))
-                    total = cantidad * valor_unitario
-
-                self.activities_table.setItem(row_position, 4, QTableWidgetItem(str(total)))
-
-        except Exception as e:
-            print(f"Error añadiendo fila a tabla: {e}")
-
-    def add_imported_activity_to_table(self, activity_data):
-        """
-        Añade una actividad importada (formato anterior) a la tabla
-        """
-        try:
-            row_position = self.activities_table.rowCount()
-            self.activities_table.insertRow(row_position)
-
-            # Descripción
-            desc_item = QTableWidgetItem(activity_data.get('descripcion', ''))
-            desc_item.setData(Qt.UserRole, {'type': 'activity'})
-            self.activities_table.setItem(row_position, 0, desc_item)
-
-            # Cantidad
-            self.activities_table.setItem(row_position, 1,
-                                          QTableWidgetItem(str(activity_data.get('cantidad', 0))))
-
-            # Unidad
-            self.activities_table.setItem(row_position, 2,
-                                          QTableWidgetItem(activity_data.get('unidad', '')))
-
-            # Valor unitario
-            self.activities_table.setItem(row_position, 3,
-                                          QTableWidgetItem(str(activity_data.get('valor_unitario', 0))))
-
-            # Total
-            cantidad = float(activity_data.get('cantidad', 0))
-            valor_unitario = float(activity_data.get('valor_unitario', 0))
-            total = cantidad * valor_unitario
-            self.activities_table.setItem(row_position, 4, QTableWidgetItem(str(total)))
-
-        except Exception as e:
-            print(f"Error añadiendo actividad a tabla: {e}")
-
     def send_email(self):
         """Abre el diálogo para enviar cotización por correo (SMTP integrado)"""
         # Verificar si hay archivos para enviar
@@ -2197,102 +2510,10 @@ class MainWindow(QMainWindow):
         email_dialog = SendEmailDialog(attachments, self, client_email=client_email)
         email_dialog.exec_()
 
-    def _load_table_rows_with_headers(self, table_rows):
-        """Carga las filas de la tabla incluyendo encabezados de capítulo (formato v2.0)"""
-        for row_data in table_rows:
-            if row_data['type'] == 'chapter_header':
-                # Es un encabezado de capítulo
-                self._insert_chapter_header_from_file(row_data)
-            elif row_data['type'] == 'activity':
-                # Es una actividad normal
-                self._insert_activity_from_file(row_data)
-
-    def _load_activities_only(self, activities):
-        """Carga solo actividades (formato v1.0 - compatibilidad hacia atrás)"""
-        for activity in activities:
-            self._insert_activity_from_file(activity)
-
-    def _insert_chapter_header_from_file(self, chapter_data):
-        """Inserta un encabezado de capítulo desde el archivo"""
-        row = self.activities_table.rowCount()
-        self.activities_table.insertRow(row)
-
-        # Crear item para el encabezado del capítulo
-        chapter_name = chapter_data.get('descripcion', '')
-        chapter_item = EditableTableWidgetItem(chapter_name, False)  # No editable
-
-        # Aplicar estilo visual para distinguirlo
-        from PyQt5.QtCore import Qt
-        from PyQt5.QtGui import QColor, QFont
-
-        # Fondo diferente para el encabezado
-        chapter_item.setBackground(QColor(230, 230, 250))  # Color lavanda claro
-
-        # Fuente en negrita
-        font = QFont()
-        font.setBold(True)
-        chapter_item.setFont(font)
-
-        # Centrar el texto
-        chapter_item.setTextAlignment(Qt.AlignCenter)
-
-        # Guardar información del capítulo como atributo personalizado
-        chapter_id = chapter_data.get('chapter_id')
-        if chapter_id:
-            chapter_item.chapter_id = chapter_id
-            chapter_item.is_chapter_header = True
-
-        # Colocar en la primera columna
-        self.activities_table.setItem(row, 0, chapter_item)
-
-        # Para las demás columnas, crear items vacíos con el mismo estilo
-        for col in range(1, 5):  # Columnas 1-4 (cantidad, unidad, valor, total)
-            empty_item = EditableTableWidgetItem("", False)
-            empty_item.setBackground(QColor(230, 230, 250))
-            empty_item.setTextAlignment(Qt.AlignCenter)
-            self.activities_table.setItem(row, col, empty_item)
-
-        # No agregar botón eliminar en la columna 5 para encabezados
-        # O agregar un botón especial si lo deseas
-
-    def _insert_activity_from_file(self, activity):
-        """Inserta una actividad desde el archivo"""
-        row = self.activities_table.rowCount()
-        self.activities_table.insertRow(row)
-
-        # Descripción
-        self.activities_table.setItem(row, 0, EditableTableWidgetItem(str(activity.get('descripcion', ''))))
-
-        # Cantidad
-        cantidad = activity.get('cantidad', 0)
-        self.activities_table.setItem(row, 1, EditableTableWidgetItem(str(cantidad)))
-
-        # Unidad
-        self.activities_table.setItem(row, 2, EditableTableWidgetItem(str(activity.get('unidad', ''))))
-
-        # Valor unitario
-        valor_unitario = activity.get('valor_unitario', 0)
-        self.activities_table.setItem(row, 3, EditableTableWidgetItem(str(valor_unitario)))
-
-        # Total (calculado o desde archivo)
-        if 'total' in activity:
-            total = activity['total']
-        else:
-            total = float(cantidad) * float(valor_unitario)
-
-        self.activities_table.setItem(row, 4, EditableTableWidgetItem(str(total), False))
-
-        # Botón eliminar
-        delete_btn = QPushButton("Eliminar")
-        delete_btn.clicked.connect(lambda _, r=row: self.delete_activity(r))
-        self.activities_table.setCellWidget(row, 5, delete_btn)
-
-
     def open_data_management(self):
         """Abre la ventana de gestión de datos"""
         try:
             self.data_management_window = DataManagementWindow(self.cotizacion_controller, self)
-            self.data_management_window.chapters_updated.connect(self.refresh_chapters_combo)
             self.data_management_window.closed.connect(self.on_data_management_closed)
             self.data_management_window.show()
         except Exception as e:
@@ -2457,6 +2678,16 @@ class MainWindow(QMainWindow):
                 for rel_activity in related_activities:
                     self.related_activities_combo.addItem(rel_activity['descripcion'], rel_activity['id'])
 
+                # Sugerencias: actividades que suelen cotizarse juntas
+                suggestions = self.cotizacion_controller.get_activity_suggestions(activity_id)
+                if suggestions:
+                    if related_activities:
+                        self.related_activities_combo.insertSeparator(self.related_activities_combo.count())
+                    for suggestion in suggestions:
+                        self.related_activities_combo.addItem(f"💡 {suggestion['descripcion']}", suggestion['id'])
+                        self.related_activities_combo.setItemData(
+                            self.related_activities_combo.count() - 1, suggestion['motivo'], Qt.ToolTipRole)
+
         except Exception as e:
             print(f"Error al actualizar actividades relacionadas: {e}")
             import traceback
@@ -2495,6 +2726,7 @@ class MainWindow(QMainWindow):
                     unidad=activity['unidad'],
                     valor_unitario=activity['valor_unitario']
                 )
+                self.update_also_quoted(activity['descripcion'])
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Ocurrió un error al agregar la actividad: {e}")
                 import traceback
@@ -2531,11 +2763,56 @@ class MainWindow(QMainWindow):
                 unidad=activity['unidad'],
                 valor_unitario=activity['valor_unitario']
             )
+            self.update_also_quoted(activity['descripcion'])
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Ocurrió un error al agregar la actividad relacionada: {e}")
             import traceback
             traceback.print_exc()
 
+    def update_also_quoted(self, descripcion):
+        """
+        Muestra las actividades que otros clientes cotizaron junto con la
+        actividad recién agregada, omitiendo las que ya están en la tabla.
+        """
+        try:
+            self.also_quoted_list.clear()
+            en_tabla = set()
+            for row in range(self.activities_table.rowCount()):
+                item = self.activities_table.item(row, 0)
+                if item and item.data(Qt.UserRole) and item.data(Qt.UserRole).get('type') == 'activity':
+                    en_tabla.add(item.text().strip().lower())
+
+            for sugerencia in self.cotizacion_controller.get_also_quoted(descripcion, limit=10):
+                if sugerencia['descripcion'].strip().lower() in en_tabla:
+                    continue
+                item = QListWidgetItem(f"{sugerencia['descripcion']} ({sugerencia['confianza']:.0%})")
+                item.setData(Qt.UserRole, sugerencia['descripcion'])
+                item.setToolTip(f"Cotizada junto en {sugerencia['veces']} cotizaciones")
+                self.also_quoted_list.addItem(item)
+        except Exception as e:
+            print(f"Error al actualizar sugerencias de actividades: {e}")
+
+    def add_also_quoted_activity(self, item):
+        """Agrega a la tabla la actividad sugerida, con los datos del catálogo si existe."""
+        descripcion = item.data(Qt.UserRole)
+        coincidencias = [a for a in self.cotizacion_controller.search_activities(descripcion)
+                         if a['descripcion'].strip().lower() == descripcion.strip().lower()]
+        if not coincidencias:
+            QMessageBox.information(self, "Actividad no encontrada",
+                                    "La actividad sugerida ya no está en el catálogo. "
+                                    "Puede agregarla como actividad manual.")
+            self.description_input.setText(descripcion)
+            return
+
+        activity = coincidencias[0]
+        self.add_activity_to_table(
+            descripcion=activity['descripcion'],
+            cantidad=self.pred_quantity_spinbox.value(),
+            unidad=activity['unidad'],
+            valor_unitario=activity['valor_unitario']
+        )
+        self.update_also_quoted(activity['descripcion'])
+
         # Pega este método dentro de la clase MainWindow en views/main_window.py
 
     def add_manual_activity(self):
@@ -2731,7 +3008,37 @@ class MainWindow(QMainWindow):
     @pyqtSlot()
     def on_data_management_closed(self):
         """Se ejecuta cuando se cierra la ventana de gestión de datos"""
-        # Actualizar combos
-        self.refresh_client_combo()
-        self.refresh_category_combo()
-        self.refresh_activity_combo()
\ No newline at end of file
+        # Nada que recargar: los combos ya recibieron cada cambio por on_data_changed
+
+    @pyqtSlot(str, object, str, bool)
+    def on_data_changed(self, entidad, item_id, operacion, externo):
+        """Aplica a los combos solo el registro que cambió en la base de datos."""
+        db = self.cotizacion_controller.database_manager
+        try:
+            if entidad == 'cliente':
+                client = db.get_client_by_id(item_id) if item_id is not None else None
+                apply_combo_change(self.client_combo, item_id, operacion, client and client['nombre'],
+                                   self.refresh_client_combo)
+            elif entidad == 'categoria':
+                category = db.get_category_by_id(item_id) if item_id is not None else None
+                apply_combo_change(self.category_combo, item_id, operacion, category and category['nombre'],
+                                   self.refresh_category_combo)
+            elif entidad == 'actividad':
+                if self.search_input.text() or self.category_combo.currentData() is not None:
+                    # Con filtro activo el cambio puede entrar o salir de la lista filtrada
+                    self.filter_activities()
+                else:
+                    activity = db.get_activity_by_id(item_id) if item_id is not None else None
+                    apply_combo_change(self.activity_combo, item_id, operacion,
+                                       activity and activity['descripcion'], self.refresh_activity_combo)
+                    if item_id is not None and item_id == self.activity_combo.currentData():
+                        self.update_related_activities()
+            elif entidad == 'actividad_relacionada':
+                if self.activity_combo.currentData():
+                    self.update_related_activities()
+            elif entidad == 'capitulo':
+                chapter = db.get_chapter_by_id(item_id) if item_id is not None else None
+                apply_combo_change(self.chapter_selection_combo, item_id, operacion, chapter and chapter['nombre'],
+                                   self.load_chapters_into_selection_combo)
+        except Exception as e:
+            print(f"Error al aplicar cambio de {entidad}: {e}")
\ No newline at end of file
@@ -0,0 +1,40 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton
+from PyQt5.QtGui import QFont
+from utils.quotation_diff import format_changeset
+
+
+class QuotationDiffDialog(QDialog):
+    """Diálogo que muestra el changeset entre dos versiones de una cotización."""
+
+    def __init__(self, changeset, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Comparación de Cotizaciones")
+        self.setMinimumSize(900, 600)
+
+        layout = QVBoxLayout(self)
+
+        delta = changeset['totales']['delta']['total']
+        resumen = QLabel(
+            f"<b>{len(changeset['agregadas'])}</b> agregadas, "
+            f"<b>{len(changeset['eliminadas'])}</b> eliminadas, "
+            f"<b>{len(changeset['modificadas'])}</b> modificadas, "
+            f"<b>{len(changeset['movidas'])}</b> movidas — "
+            f"diferencia en el total: <b>${delta:,.2f}</b>"
+        )
+        layout.addWidget(resumen)
+
+        reporte = QTextEdit()
+        reporte.setReadOnly(True)
+        reporte.setLineWrapMode(QTextEdit.NoWrap)
+        fuente = QFont("Courier New")
+        fuente.setStyleHint(QFont.Monospace)
+        reporte.setFont(fuente)
+        reporte.setPlainText(format_changeset(changeset, max_filas=None))
+        layout.addWidget(reporte)
+
+        botones = QHBoxLayout()
+        botones.addStretch()
+        cerrar = QPushButton("Cerrar")
+        cerrar.clicked.connect(self.accept)
+        botones.addWidget(cerrar)
+        layout.addLayout(botones)
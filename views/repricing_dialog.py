@@ -0,0 +1,180 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QGroupBox, QLabel,
+                             QLineEdit, QComboBox, QDoubleSpinBox, QPushButton, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QMessageBox, QAbstractItemView)
+from PyQt5.QtCore import Qt
+from utils.repricing_manager import RepricingManager
+
+
+class RepricingDialog(QDialog):
+    """Diálogo de reajuste masivo de precios con vista previa."""
+
+    def __init__(self, controller, tipo_item='actividad', parent=None):
+        super().__init__(parent)
+        self.controller = controller
+        self.repricing_manager = RepricingManager(controller.database_manager)
+        self.current_preview = None
+        self.setWindowTitle("Reajuste Masivo de Precios")
+        self.setMinimumSize(800, 600)
+
+        main_layout = QVBoxLayout(self)
+
+        # Parámetros del reajuste
+        params_group = QGroupBox("Parámetros del Reajuste")
+        params_layout = QFormLayout()
+
+        self.tipo_combo = QComboBox()
+        self.tipo_combo.addItem("Actividades", 'actividad')
+        self.tipo_combo.addItem("Productos", 'producto')
+        self.tipo_combo.setCurrentIndex(self.tipo_combo.findData(tipo_item))
+        self.tipo_combo.currentIndexChanged.connect(self.on_tipo_changed)
+
+        self.modo_combo = QComboBox()
+        for modo, etiqueta in RepricingManager.MODOS.items():
+            self.modo_combo.addItem(etiqueta, modo)
+        self.modo_combo.currentIndexChanged.connect(self.on_modo_changed)
+
+        self.valor_input = QDoubleSpinBox()
+        self.valor_input.setRange(-1000000000, 1000000000)
+        self.valor_input.setDecimals(2)
+        self.valor_input.valueChanged.connect(self.invalidate_preview)
+        self.valor_label = QLabel("Porcentaje:")
+
+        params_layout.addRow("Aplicar a:", self.tipo_combo)
+        params_layout.addRow("Tipo de ajuste:", self.modo_combo)
+        params_layout.addRow(self.valor_label, self.valor_input)
+        params_group.setLayout(params_layout)
+        main_layout.addWidget(params_group)
+
+        # Filtros
+        filter_group = QGroupBox("Filtros")
+        filter_layout = QFormLayout()
+
+        self.categoria_combo = QComboBox()
+        self.categoria_combo.addItem("Todas las categorías", None)
+        for category in self.controller.get_all_categories():
+            self.categoria_combo.addItem(category['nombre'], category['id'])
+        self.categoria_combo.currentIndexChanged.connect(self.invalidate_preview)
+
+        self.texto_input = QLineEdit()
+        self.texto_input.setPlaceholderText("Texto contenido en la descripción o nombre...")
+        self.texto_input.textChanged.connect(self.invalidate_preview)
+
+        self.producto_combo = QComboBox()
+        self.producto_combo.addItem("Cualquier producto", None)
+        for product in self.controller.get_all_products():
+            self.producto_combo.addItem(f"{product['nombre']} ({product['unidad']})", product['id'])
+        self.producto_combo.currentIndexChanged.connect(self.invalidate_preview)
+
+        filter_layout.addRow("Categoría:", self.categoria_combo)
+        filter_layout.addRow("Texto:", self.texto_input)
+        filter_layout.addRow("Producto relacionado:", self.producto_combo)
+        filter_group.setLayout(filter_layout)
+        main_layout.addWidget(filter_group)
+
+        preview_btn = QPushButton("Vista Previa")
+        preview_btn.clicked.connect(self.update_preview)
+        main_layout.addWidget(preview_btn)
+
+        # Tabla de diferencias
+        self.preview_table = QTableWidget(0, 4)
+        self.preview_table.setHorizontalHeaderLabels(["Descripción", "Precio Actual", "Precio Nuevo", "Diferencia"])
+        self.preview_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.preview_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        main_layout.addWidget(self.preview_table)
+
+        self.summary_label = QLabel("Sin vista previa.")
+        main_layout.addWidget(self.summary_label)
+
+        # Aplicar
+        apply_layout = QHBoxLayout()
+        self.motivo_input = QLineEdit()
+        self.motivo_input.setPlaceholderText("Motivo del reajuste (ej. alza del cemento)")
+        self.apply_btn = QPushButton("Aplicar Reajuste")
+        self.apply_btn.setEnabled(False)
+        self.apply_btn.clicked.connect(self.apply_repricing)
+        close_btn = QPushButton("Cerrar")
+        close_btn.clicked.connect(self.reject)
+
+        apply_layout.addWidget(QLabel("Motivo:"))
+        apply_layout.addWidget(self.motivo_input, 3)
+        apply_layout.addWidget(self.apply_btn)
+        apply_layout.addWidget(close_btn)
+        main_layout.addLayout(apply_layout)
+
+        self.on_tipo_changed()
+
+    def on_tipo_changed(self):
+        es_actividad = self.tipo_combo.currentData() == 'actividad'
+        index = self.modo_combo.findData('apu')
+        self.modo_combo.model().item(index).setEnabled(es_actividad)
+        if not es_actividad and self.modo_combo.currentData() == 'apu':
+            self.modo_combo.setCurrentIndex(self.modo_combo.findData('porcentaje'))
+        self.invalidate_preview()
+
+    def on_modo_changed(self):
+        modo = self.modo_combo.currentData()
+        if modo == 'valor_fijo':
+            self.valor_label.setText("Valor a sumar:")
+        elif modo == 'apu':
+            self.valor_label.setText("% sobre costo de productos:")
+        else:
+            self.valor_label.setText("Porcentaje:")
+        self.invalidate_preview()
+
+    def invalidate_preview(self):
+        self.current_preview = None
+        self.apply_btn.setEnabled(False)
+        self.preview_table.setRowCount(0)
+        self.summary_label.setText("Sin vista previa.")
+
+    def update_preview(self):
+        preview = self.repricing_manager.preview(
+            self.tipo_combo.currentData(),
+            self.modo_combo.currentData(),
+            self.valor_input.value(),
+            categoria_id=self.categoria_combo.currentData(),
+            texto=self.texto_input.text().strip() or None,
+            producto_id=self.producto_combo.currentData()
+        )
+        if preview is None:
+            QMessageBox.critical(self, "Error", "No se pudo calcular la vista previa del reajuste.")
+            self.invalidate_preview()
+            return
+
+        cambios = preview['cambios']
+        self.preview_table.setRowCount(len(cambios))
+        for row, cambio in enumerate(cambios):
+            self.preview_table.setItem(row, 0, QTableWidgetItem(cambio['nombre']))
+            for col, key in ((1, 'precio_actual'), (2, 'precio_nuevo'), (3, 'diferencia')):
+                item = QTableWidgetItem(f"${cambio[key]:,.2f}")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.preview_table.setItem(row, col, item)
+
+        resumen = (f"{len(cambios)} ítems cambian. Total actual: ${preview['total_actual']:,.2f} | "
+                   f"Total nuevo: ${preview['total_nuevo']:,.2f} | "
+                   f"Diferencia: ${preview['diferencia']:,.2f} ({preview['variacion_pct']:+.2f}%)")
+        if preview['actividades_afectadas']:
+            resumen += f" | Actividades con APU afectado: {preview['actividades_afectadas']}"
+        self.summary_label.setText(resumen)
+
+        self.current_preview = preview
+        self.apply_btn.setEnabled(bool(cambios))
+
+    def apply_repricing(self):
+        if not self.current_preview:
+            return
+        total = len(self.current_preview['cambios'])
+        reply = QMessageBox.question(self, "Confirmar Reajuste",
+                                     f"¿Aplicar el nuevo precio a {total} ítems?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+
+        motivo = self.motivo_input.text().strip() or "Reajuste masivo"
+        result = self.repricing_manager.apply(self.current_preview, motivo)
+        if result is None:
+            QMessageBox.critical(self, "Error", "No se pudo aplicar el reajuste. No se modificó ningún precio.")
+            return
+
+        QMessageBox.information(self, "Éxito", f"Se actualizaron {result} precios.")
+        self.accept()
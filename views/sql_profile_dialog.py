@@ -0,0 +1,109 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QPushButton, QDoubleSpinBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from utils import sql_profiler
+
+
+class SqlProfileDialog(QDialog):
+    """Panel con las consultas SQL agregadas por sentencia y el umbral de consultas lentas."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Perfil de Consultas SQL")
+        self.setMinimumSize(900, 500)
+
+        layout = QVBoxLayout(self)
+
+        opciones = QHBoxLayout()
+        self.enabled_check = QCheckBox("Perfilar consultas")
+        self.enabled_check.setChecked(sql_profiler.is_enabled())
+        self.enabled_check.toggled.connect(self.on_enabled_toggled)
+        opciones.addWidget(self.enabled_check)
+        opciones.addWidget(QLabel("Consulta lenta desde:"))
+        self.threshold_spin = QDoubleSpinBox()
+        self.threshold_spin.setRange(0, 60000)
+        self.threshold_spin.setDecimals(1)
+        self.threshold_spin.setSuffix(" ms")
+        self.threshold_spin.setValue(sql_profiler.threshold_ms())
+        self.threshold_spin.valueChanged.connect(self.on_threshold_changed)
+        opciones.addWidget(self.threshold_spin)
+        opciones.addStretch()
+        registro = sql_profiler.slow_log_path()
+        opciones.addWidget(QLabel(f"Registro: {registro}" if registro else "Registro de consultas lentas desactivado"))
+        layout.addLayout(opciones)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, 7)
+        self.table.setHorizontalHeaderLabels(["Sentencia", "Llamadas", "Total (ms)", "Promedio (ms)",
+                                              "Máx. (ms)", "Filas", "Lentas"])
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+        for col in range(1, 7):
+            header.setSectionResizeMode(col, QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setWordWrap(False)
+        layout.addWidget(self.table)
+
+        botones = QHBoxLayout()
+        reset_btn = QPushButton("🗑 Reiniciar Estadísticas")
+        reset_btn.clicked.connect(self.on_reset)
+        botones.addWidget(reset_btn)
+        botones.addStretch()
+        refresh_btn = QPushButton("🔄 Actualizar")
+        refresh_btn.clicked.connect(self.load_statistics)
+        botones.addWidget(refresh_btn)
+        close_btn = QPushButton("Cerrar")
+        close_btn.clicked.connect(self.accept)
+        botones.addWidget(close_btn)
+        layout.addLayout(botones)
+
+        self.load_statistics()
+
+    def on_enabled_toggled(self, activo):
+        sql_profiler.set_enabled(activo)
+        self.load_statistics()
+
+    def on_threshold_changed(self, valor):
+        sql_profiler.set_enabled(sql_profiler.is_enabled(), umbral_ms=valor)
+
+    def on_reset(self):
+        sql_profiler.reset()
+        self.load_statistics()
+
+    def load_statistics(self):
+        """Llena la tabla con las sentencias ordenadas por tiempo total."""
+        filas = sql_profiler.estadisticas()
+        self.table.setRowCount(len(filas))
+        if not filas:
+            if sql_profiler.is_enabled():
+                self.summary_label.setText("Aún no hay consultas medidas.")
+            else:
+                self.summary_label.setText("El perfil de consultas está desactivado.")
+            return
+
+        total_ms = sum(e.total_ms for e in filas)
+        llamadas = sum(e.llamadas for e in filas)
+        self.summary_label.setText(f"<b>{len(filas)}</b> sentencias, {llamadas:,} llamadas, {total_ms:,.1f} ms")
+        for fila, estadistica in enumerate(filas):
+            valores = [
+                estadistica.sentencia,
+                f"{estadistica.llamadas:,}",
+                f"{estadistica.total_ms:,.1f}",
+                f"{estadistica.promedio_ms:,.2f}",
+                f"{estadistica.max_ms:,.1f}",
+                f"{estadistica.filas:,}",
+                f"{estadistica.lentas:,}",
+            ]
+            for col, valor in enumerate(valores):
+                item = QTableWidgetItem(valor)
+                if col == 0:
+                    item.setToolTip(f"{estadistica.sentencia}\nParámetros: {estadistica.forma or '-'}")
+                else:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if estadistica.lentas:
+                    item.setForeground(QColor("#c62828"))
+                self.table.setItem(fila, col, item)
@@ -0,0 +1,91 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from utils import instrumentation
+
+
+class TimingsDialog(QDialog):
+    """Panel con los tiempos por etapa de la última ejecución instrumentada."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Tiempos de la Última Ejecución")
+        self.setMinimumSize(750, 450)
+
+        layout = QVBoxLayout(self)
+
+        opciones = QHBoxLayout()
+        self.enabled_check = QCheckBox("Medir tiempos de generación")
+        self.enabled_check.setChecked(instrumentation.is_enabled())
+        self.enabled_check.toggled.connect(self.on_enabled_toggled)
+        opciones.addWidget(self.enabled_check)
+        opciones.addStretch()
+        self.trace_label = QLabel()
+        opciones.addWidget(self.trace_label)
+        layout.addLayout(opciones)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Etapa", "Duración (ms)", "% del total", "Cotización", "Estado"])
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+        for col in range(1, 5):
+            header.setSectionResizeMode(col, QHeaderView.ResizeToContents)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        layout.addWidget(self.table)
+
+        botones = QHBoxLayout()
+        botones.addStretch()
+        refresh_btn = QPushButton("🔄 Actualizar")
+        refresh_btn.clicked.connect(self.load_timings)
+        botones.addWidget(refresh_btn)
+        close_btn = QPushButton("Cerrar")
+        close_btn.clicked.connect(self.accept)
+        botones.addWidget(close_btn)
+        layout.addLayout(botones)
+
+        self.load_timings()
+
+    def on_enabled_toggled(self, activo):
+        instrumentation.set_enabled(activo, instrumentation.trace_path())
+        self.load_timings()
+
+    def load_timings(self):
+        """Llena la tabla con las etapas de la última ejecución."""
+        traza = instrumentation.trace_path()
+        self.trace_label.setText(f"Traza: {traza}" if traza else "Traza JSONL desactivada")
+
+        etapas = instrumentation.ultima_ejecucion()
+        self.table.setRowCount(len(etapas))
+        if not etapas:
+            if instrumentation.is_enabled():
+                self.summary_label.setText("Aún no hay ejecuciones medidas. Genere una cotización.")
+            else:
+                self.summary_label.setText("La medición está desactivada.")
+            return
+
+        raiz = etapas[0][1]
+        total = raiz.duracion_ms or 0
+        self.summary_label.setText(f"<b>{raiz.nombre}</b>: {total:,.1f} ms")
+        for fila, (nivel, etapa) in enumerate(etapas):
+            nombre = etapa.nombre
+            if etapa.atributos:
+                nombre += "  (" + ", ".join(f"{k}={v}" for k, v in etapa.atributos.items()) + ")"
+            valores = [
+                "    " * nivel + nombre,
+                f"{etapa.duracion_ms:,.1f}",
+                f"{etapa.duracion_ms / total * 100:.1f}%" if total else "",
+                str(etapa.cotizacion_id) if etapa.cotizacion_id is not None else "",
+                etapa.error or etapa.estado,
+            ]
+            for col, valor in enumerate(valores):
+                item = QTableWidgetItem(valor)
+                if col in (1, 2):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if etapa.estado == 'error':
+                    item.setForeground(QColor("#c62828"))
+                self.table.setItem(fila, col, item)